@@ -1,368 +1,283 @@
 """
 Background Analytics Cache System
 Pre-computes heavy analytics data for faster frontend display
+
+The battery audit and morning charge audit are cached per vehicle-day:
+
+* one entry per (cache type, vehicle, date) in ``analytics_cache_entries``,
+  computed from the vehicle day summary with the same rules as the live
+  endpoints (``battery_audit_row`` / ``morning_audit_row``). Days without an
+  audit row are cached too, with ``entry: None``.
+* each entry records the ``updated_at`` of the summary it came from, so an
+  entry is stale as soon as the day is re-imported
+* ``compose_entries`` answers any date range from the cached days and only
+  computes (and writes back) missing or stale ones
+* the nightly run recomputes the vehicle-days in ``feed_import_log`` since
+  the previous run (the first run, or ``--full``, recomputes the whole
+  window), then publishes the last 30 days as the ``analytics_cache``
+  documents the endpoints return by default
+
+Run statistics are kept in the ``refresh_state`` analytics_cache document.
+
+Usage:
+    python analytics_cache.py [--full]
 """
 
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, date, time as dt_time, timedelta, timezone
+from datetime import datetime, date, timedelta, timezone
+from pymongo import DeleteOne, UpdateOne
 import os
 from dotenv import load_dotenv
 import logging
 
+from vehicle_day_summary import (
+    SUMMARY_COLLECTION, battery_audit_row, changed_days, get_day_summaries, morning_audit_row
+)
+
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-MONGO_URL = os.getenv('MONGO_URL')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client['nura_db']
+CACHE_COLLECTION = "analytics_cache"
+ENTRIES_COLLECTION = "analytics_cache_entries"
+STATE_CACHE_TYPE = "refresh_state"
+REFRESH_LEASE = "analytics_cache_refresh"
+WINDOW_DAYS = 30
+# Log entries written just before a run started may commit after it; re-reading them is harmless
+LOG_OVERLAP = timedelta(minutes=5)
+SUMMARY_BATCH = 500
 
+# cache_type -> entry builder (None when the vehicle-day has no entry)
+CACHE_BUILDERS = {
+    "battery_audit": battery_audit_row,
+    "morning_charge_audit": morning_audit_row,
+}
+SUMMARY_PROJECTION = {
+    "_id": 0, "vehicle_id": 1, "date": 1, "registration_number": 1, "audit_readings": 1, "morning_soc": 1,
+    "updated_at": 1
+}
 
-async def compute_battery_audit_cache():
-    """Pre-compute battery audit data and cache it"""
-    try:
-        logger.info("=== Starting Battery Audit Cache Computation ===")
-        
-        # Limit to last 30 days
-        cutoff_date = (date.today() - timedelta(days=30)).isoformat()
-        
-        pipeline = [
-            {"$match": {"date": {"$gte": cutoff_date}}},
-            {"$project": {
-                "_id": 0,
-                "vehicle_id": 1,
-                "registration_number": 1,
-                "date": 1,
-                "Date": 1,
-                "Battery Soc(%)": 1,
-                "Battery SOC(%)": 1,
-                "Odometer (km)": 1
-            }},
-            {"$sort": {"date": -1, "Date": 1}},
-            {"$limit": 50000}
-        ]
-        
-        cursor = db.montra_feed_data.aggregate(pipeline)
-        
-        # Group records by vehicle and date
-        vehicle_date_groups = {}
-        record_count = 0
-        
-        async for record in cursor:
-            record_count += 1
-            vehicle_id = record.get("vehicle_id")
-            registration = record.get("registration_number")
-            date_val = record.get("date")
-            
-            if not vehicle_id or not date_val:
-                continue
-            
-            display_name = registration if registration else vehicle_id
-            key = f"{vehicle_id}_{date_val}"
-            
-            if key not in vehicle_date_groups:
-                vehicle_date_groups[key] = {
-                    "vehicle_id": vehicle_id,
-                    "display_name": display_name,
-                    "date": date_val,
-                    "records": []
-                }
-            vehicle_date_groups[key]["records"].append(record)
-        
-        logger.info(f"Grouped {record_count} records into {len(vehicle_date_groups)} vehicle-dates")
-        
-        # Process audit data
-        audit_results = []
-        critical_count = 0
-        
-        for key, group in vehicle_date_groups.items():
-            records = group["records"]
-            
-            # Find records closest to 6 AM, 12 PM, and 5 PM
-            target_times = {
-                "6am": dt_time(6, 0),
-                "12pm": dt_time(12, 0),
-                "5pm": dt_time(17, 0)
-            }
-            
-            closest_records = {}
-            for time_label, target_time in target_times.items():
-                min_diff = timedelta(hours=24)
-                closest_record = None
-                
-                for record in records:
-                    time_str = record.get("Date") or record.get("time")
-                    if not time_str:
-                        continue
-                    
-                    try:
-                        if isinstance(time_str, str):
-                            record_time = datetime.fromisoformat(time_str.replace('Z', '+00:00')).time()
-                        else:
-                            record_time = time_str if isinstance(time_str, dt_time) else datetime.min.time()
-                        
-                        time_diff = abs(
-                            datetime.combine(date.today(), record_time) - 
-                            datetime.combine(date.today(), target_time)
-                        )
-                        
-                        if time_diff < min_diff:
-                            min_diff = time_diff
-                            closest_record = record
-                    except:
-                        continue
-                
-                if closest_record and min_diff < timedelta(hours=2):
-                    closest_records[time_label] = closest_record
-            
-            if len(closest_records) >= 2:
-                charge_6am = None
-                charge_12pm = None
-                charge_5pm = None
-                odometer_6am = None
-                odometer_12pm = None
-                odometer_5pm = None
-                
-                if "6am" in closest_records:
-                    rec = closest_records["6am"]
-                    charge_6am = rec.get("Battery Soc(%)") or rec.get("Battery SOC(%)")
-                    odometer_6am = rec.get("Odometer (km)")
-                
-                if "12pm" in closest_records:
-                    rec = closest_records["12pm"]
-                    charge_12pm = rec.get("Battery Soc(%)") or rec.get("Battery SOC(%)")
-                    odometer_12pm = rec.get("Odometer (km)")
-                
-                if "5pm" in closest_records:
-                    rec = closest_records["5pm"]
-                    charge_5pm = rec.get("Battery Soc(%)") or rec.get("Battery SOC(%)")
-                    odometer_5pm = rec.get("Odometer (km)")
-                
-                km_6_to_12 = None
-                km_6_to_5 = None
-                mileage_6_to_12 = None
-                mileage_6_to_5 = None
-                
-                if odometer_6am and odometer_12pm:
-                    km_6_to_12 = odometer_12pm - odometer_6am
-                    if charge_6am and charge_12pm and charge_6am > charge_12pm:
-                        charge_drop = charge_6am - charge_12pm
-                        if charge_drop > 0:
-                            mileage_6_to_12 = round(km_6_to_12 / charge_drop, 2)
-                
-                if odometer_6am and odometer_5pm:
-                    km_6_to_5 = odometer_5pm - odometer_6am
-                    if charge_6am and charge_5pm and charge_6am > charge_5pm:
-                        charge_drop = charge_6am - charge_5pm
-                        if charge_drop > 0:
-                            mileage_6_to_5 = round(km_6_to_5 / charge_drop, 2)
-                
-                is_critical = False
-                if charge_12pm and charge_5pm:
-                    if charge_12pm < 60 and charge_5pm < 20:
-                        is_critical = True
-                        critical_count += 1
-                
-                audit_results.append({
-                    "date": group["date"],
-                    "vehicle_name": group["display_name"],
-                    "charge_6am": charge_6am,
-                    "charge_12pm": charge_12pm,
-                    "charge_5pm": charge_5pm,
-                    "km_6_to_12": km_6_to_12,
-                    "km_6_to_5": km_6_to_5,
-                    "mileage_6_to_12": mileage_6_to_12,
-                    "mileage_6_to_5": mileage_6_to_5,
-                    "is_critical": is_critical
-                })
-        
-        # Sort by date descending
-        audit_results.sort(key=lambda x: x["date"], reverse=True)
-        
-        # Cache the results
-        cache_doc = {
+
+async def recompute_entries(db, keys, cache_types=tuple(CACHE_BUILDERS)) -> dict:
+    """Recompute and store the cache entries of the given (vehicle_id, date) pairs"""
+    keys = sorted(keys)
+    recomputed, summaries_read = 0, 0
+    for start in range(0, len(keys), SUMMARY_BATCH):
+        batch = keys[start:start + SUMMARY_BATCH]
+        summaries = await db[SUMMARY_COLLECTION].find(
+            {"$or": [{"vehicle_id": vehicle_id, "date": day} for vehicle_id, day in batch]},
+            SUMMARY_PROJECTION
+        ).to_list(length=None)
+        summaries_read += len(summaries)
+        by_key = {(s["vehicle_id"], s["date"]): s for s in summaries}
+
+        operations = []
+        for vehicle_id, day in batch:
+            summary = by_key.get((vehicle_id, day))
+            for cache_type in cache_types:
+                key = {"cache_type": cache_type, "vehicle_id": vehicle_id, "date": day}
+                if summary:
+                    operations.append(UpdateOne(key, {"$set": {
+                        **key,
+                        "entry": CACHE_BUILDERS[cache_type](summary),
+                        "source_updated_at": summary.get("updated_at")
+                    }}, upsert=True))
+                else:
+                    operations.append(DeleteOne(key))
+        if operations:
+            await db[ENTRIES_COLLECTION].bulk_write(operations, ordered=False)
+        recomputed += len(batch)
+    return {"entries_recomputed": recomputed, "summaries_read": summaries_read}
+
+
+async def compose_entries(db, cache_type: str, start_date: str, end_date: str = None):
+    """
+    Audit rows of every vehicle-day in [start_date, end_date] for one cache
+    type, from cached days; missing or stale days are computed and written
+    back first. Returns (rows, stats).
+    """
+    versions = {
+        (s["vehicle_id"], s["date"]): s.get("updated_at")
+        for s in await get_day_summaries(
+            db, start_date, end_date, projection={"_id": 0, "vehicle_id": 1, "date": 1, "updated_at": 1}
+        )
+    }
+    date_match = {"$gte": start_date, **({"$lte": end_date} if end_date else {})}
+    cached = {
+        (e["vehicle_id"], e["date"]): e
+        async for e in db[ENTRIES_COLLECTION].find(
+            {"cache_type": cache_type, "date": date_match},
+            {"_id": 0, "vehicle_id": 1, "date": 1, "entry": 1, "source_updated_at": 1}
+        )
+    }
+
+    missing = [key for key, version in versions.items()
+               if key not in cached or cached[key].get("source_updated_at") != version]
+    stats = {"vehicle_days": len(versions), "cached": len(versions) - len(missing), "computed": len(missing)}
+    if missing:
+        await recompute_entries(db, missing, cache_types=(cache_type,))
+        async for e in db[ENTRIES_COLLECTION].find(
+            {"cache_type": cache_type, "$or": [{"vehicle_id": v, "date": d} for v, d in missing]},
+            {"_id": 0, "vehicle_id": 1, "date": 1, "entry": 1}
+        ):
+            cached[(e["vehicle_id"], e["date"])] = e
+
+    # Entries of days whose data was deleted are skipped
+    rows = [cached[key]["entry"] for key in versions if key in cached and cached[key].get("entry")]
+    return rows, stats
+
+
+async def publish_caches(db, cutoff_date: str) -> dict:
+    """Assemble the analytics_cache documents from the entries of the window"""
+    now = datetime.now(timezone.utc)
+    counts = {}
+
+    battery = [e["entry"] async for e in db[ENTRIES_COLLECTION].find(
+        {"cache_type": "battery_audit", "date": {"$gte": cutoff_date}, "entry": {"$ne": None}}, {"_id": 0, "entry": 1}
+    )]
+    battery.sort(key=lambda x: (x["date"], x["vehicle_name"]), reverse=True)
+    critical_count = sum(1 for r in battery if r["is_critical"])
+    await db[CACHE_COLLECTION].update_one(
+        {"cache_type": "battery_audit"},
+        {"$set": {
             "cache_type": "battery_audit",
-            "computed_at": datetime.now(timezone.utc).isoformat(),
+            "computed_at": now.isoformat(),
             "data": {
                 "success": True,
-                "audit_results": audit_results,
-                "count": len(audit_results),
+                "audit_results": battery,
+                "count": len(battery),
                 "critical_count": critical_count,
-                "message": f"Battery audit data (last 30 days). Cached at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC"
+                "message": f"Battery audit data (last {WINDOW_DAYS} days). Cached at {now.strftime('%Y-%m-%d %H:%M:%S')} UTC"
             }
-        }
-        
-        # Upsert into cache collection
-        await db.analytics_cache.update_one(
-            {"cache_type": "battery_audit"},
-            {"$set": cache_doc},
-            upsert=True
-        )
-        
-        logger.info(f"✓ Battery Audit Cache Updated: {len(audit_results)} results, {critical_count} critical")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error computing battery audit cache: {e}")
-        return False
-
+        }},
+        upsert=True
+    )
+    counts["battery_audit_results"] = len(battery)
+    counts["battery_audit_critical"] = critical_count
 
-async def compute_morning_charge_cache():
-    """Pre-compute morning charge audit data and cache it"""
-    try:
-        logger.info("=== Starting Morning Charge Audit Cache Computation ===")
-        
-        cutoff_date = (date.today() - timedelta(days=30)).isoformat()
-        
-        pipeline = [
-            {"$match": {"date": {"$gte": cutoff_date}}},
-            {"$project": {
-                "_id": 0,
-                "vehicle_id": 1,
-                "Vehicle ID": 1,
-                "registration_number": 1,
-                "Registration Number": 1,
-                "date": 1,
-                "Date": 1,
-                "Portal Received Time": 1,
-                "time": 1,
-                "Time": 1,
-                "Battery Soc(%)": 1,
-                "Battery SOC(%)": 1,
-                "Battery %": 1,
-                "battery_soc_percentage": 1
-            }},
-            {"$sort": {"date": -1}},
-            {"$limit": 50000}
-        ]
-        
-        cursor = db.montra_feed_data.aggregate(pipeline)
-        
-        vehicle_date_groups = {}
-        record_count = 0
-        
-        async for record in cursor:
-            record_count += 1
-            vehicle_id = record.get("vehicle_id") or record.get("Vehicle ID")
-            registration = record.get("registration_number") or record.get("Registration Number")
-            date_val = record.get("date")
-            
-            if not vehicle_id or not date_val:
-                continue
-            
-            display_name = registration if registration else vehicle_id
-            key = f"{vehicle_id}_{date_val}"
-            
-            if key not in vehicle_date_groups:
-                vehicle_date_groups[key] = {
-                    "vehicle_id": vehicle_id,
-                    "display_name": display_name,
-                    "date": date_val,
-                    "records": []
-                }
-            vehicle_date_groups[key]["records"].append(record)
-        
-        logger.info(f"Grouped {record_count} records into {len(vehicle_date_groups)} vehicle-dates")
-        
-        audit_results = []
-        target_time_6am = dt_time(6, 0)
-        
-        for key, group in vehicle_date_groups.items():
-            records = group["records"]
-            
-            min_diff = timedelta(hours=24)
-            closest_record = None
-            
-            for record in records:
-                time_str = (record.get("Date") or record.get("time") or 
-                           record.get("Time") or record.get("Portal Received Time"))
-                
-                if not time_str:
-                    continue
-                
-                try:
-                    if isinstance(time_str, str):
-                        record_time = datetime.fromisoformat(time_str.replace('Z', '+00:00')).time()
-                    else:
-                        record_time = time_str if isinstance(time_str, dt_time) else datetime.min.time()
-                    
-                    time_diff = abs(
-                        datetime.combine(date.today(), record_time) - 
-                        datetime.combine(date.today(), target_time_6am)
-                    )
-                    
-                    if time_diff < min_diff:
-                        min_diff = time_diff
-                        closest_record = record
-                except:
-                    continue
-            
-            if closest_record and min_diff < timedelta(hours=2):
-                battery_charge = (closest_record.get("Battery Soc(%)") or 
-                                 closest_record.get("Battery SOC(%)") or
-                                 closest_record.get("Battery %") or
-                                 closest_record.get("battery_soc_percentage"))
-                
-                if battery_charge and battery_charge < 95:
-                    audit_results.append({
-                        "date": group["date"],
-                        "vehicle_name": group["display_name"],
-                        "charge_6am": battery_charge
-                    })
-        
-        audit_results.sort(key=lambda x: x["date"], reverse=True)
-        
-        cache_doc = {
+    morning = [e["entry"] async for e in db[ENTRIES_COLLECTION].find(
+        {"cache_type": "morning_charge_audit", "date": {"$gte": cutoff_date}, "entry": {"$ne": None}}, {"_id": 0, "entry": 1}
+    )]
+    morning.sort(key=lambda x: (x["date"], x["vehicle_name"]))
+    await db[CACHE_COLLECTION].update_one(
+        {"cache_type": "morning_charge_audit"},
+        {"$set": {
             "cache_type": "morning_charge_audit",
-            "computed_at": datetime.now(timezone.utc).isoformat(),
+            "computed_at": now.isoformat(),
             "data": {
                 "success": True,
-                "audit_results": audit_results,
-                "count": len(audit_results),
-                "message": f"Morning charge audit data (last 30 days). Cached at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC"
+                "audit_results": morning,
+                "count": len(morning),
+                "message": f"Morning charge audit data (last {WINDOW_DAYS} days). Cached at {now.strftime('%Y-%m-%d %H:%M:%S')} UTC"
             }
-        }
-        
-        await db.analytics_cache.update_one(
-            {"cache_type": "morning_charge_audit"},
-            {"$set": cache_doc},
-            upsert=True
-        )
-        
-        logger.info(f"✓ Morning Charge Audit Cache Updated: {len(audit_results)} results")
-        return True
-        
+        }},
+        upsert=True
+    )
+    counts["morning_charge_results"] = len(morning)
+    return counts
+
+
+async def refresh_analytics_cache(db, full: bool = False) -> dict:
+    """
+    Recompute the entries of the vehicle-days changed since the last run (all
+    days of the window on the first run or with ``full``) and republish the
+    caches. Returns the run statistics.
+    """
+    started = datetime.now(timezone.utc)
+    cutoff_date = (date.today() - timedelta(days=WINDOW_DAYS)).isoformat()
+    state = await db[CACHE_COLLECTION].find_one({"cache_type": STATE_CACHE_TYPE}, {"_id": 0})
+    checkpoint = None if full or not state else state.get("checkpoint")
+
+    if checkpoint:
+        keys, log_entries_read = await changed_days(db, checkpoint - LOG_OVERLAP)
+        keys = {(vehicle_id, day) for vehicle_id, day in keys if day >= cutoff_date}
+        mode = "incremental"
+    else:
+        summaries = await get_day_summaries(db, cutoff_date, projection={"_id": 0, "vehicle_id": 1, "date": 1})
+        keys, log_entries_read = {(s["vehicle_id"], s["date"]) for s in summaries}, 0
+        # Full runs also drop entries of the window whose summary is gone
+        await db[ENTRIES_COLLECTION].delete_many({"date": {"$gte": cutoff_date}})
+        mode = "full"
+
+    stats = await recompute_entries(db, keys)
+    # Entries older than the window stay: they serve custom date ranges
+    published = await publish_caches(db, cutoff_date)
+
+    stats.update(published)
+    stats.update({
+        "mode": mode,
+        "window_start": cutoff_date,
+        "log_entries_read": log_entries_read,
+        "rows_scanned": log_entries_read + stats["summaries_read"],
+        "started_at": started.isoformat(),
+        "duration_seconds": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+    })
+    await db[CACHE_COLLECTION].update_one(
+        {"cache_type": STATE_CACHE_TYPE},
+        {"$set": {"cache_type": STATE_CACHE_TYPE, "checkpoint": started, "last_run": stats}},
+        upsert=True
+    )
+    logger.info(
+        f"Analytics cache {mode} refresh: {stats['entries_recomputed']} vehicle-days recomputed, "
+        f"{stats['rows_scanned']} rows scanned in {stats['duration_seconds']}s"
+    )
+    return stats
+
+
+async def refresh_with_lease(db, full: bool = False):
+    """refresh_analytics_cache unless another instance is already refreshing"""
+    from scheduler_worker import acquire_lease, release_lease
+
+    if not await acquire_lease(db, REFRESH_LEASE, ttl_seconds=3600):
+        logger.info("Analytics cache refresh already running elsewhere")
+        return None
+    try:
+        return await refresh_analytics_cache(db, full=full)
     except Exception as e:
-        logger.error(f"Error computing morning charge cache: {e}")
-        return False
+        logger.error(f"Error refreshing analytics cache: {e}")
+        return None
+    finally:
+        await release_lease(db, REFRESH_LEASE)
+
+
+async def ensure_analytics_cache_indexes(db) -> None:
+    await db[ENTRIES_COLLECTION].create_index(
+        [("cache_type", 1), ("vehicle_id", 1), ("date", 1)], name="uniq_type_vehicle_date", unique=True
+    )
+    await db[ENTRIES_COLLECTION].create_index([("cache_type", 1), ("date", 1)], name="idx_type_date")
 
 
-async def run_all_cache_jobs():
+async def run_all_cache_jobs(full: bool = False):
     """Run all cache computation jobs"""
     logger.info("=" * 60)
     logger.info("STARTING ANALYTICS CACHE COMPUTATION")
     logger.info("=" * 60)
-    
-    start_time = datetime.now()
-    
-    # Run jobs in parallel
-    results = await asyncio.gather(
-        compute_battery_audit_cache(),
-        compute_morning_charge_cache(),
-        return_exceptions=True
-    )
-    
-    end_time = datetime.now()
-    duration = (end_time - start_time).total_seconds()
-    
+
+    client = AsyncIOMotorClient(os.getenv('MONGO_URL'))
+    db = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+    try:
+        await ensure_analytics_cache_indexes(db)
+        stats = await refresh_with_lease(db, full=full)
+    finally:
+        client.close()
+
     logger.info("=" * 60)
-    logger.info(f"CACHE COMPUTATION COMPLETE in {duration:.2f} seconds")
-    logger.info(f"Battery Audit: {'✓ SUCCESS' if results[0] else '✗ FAILED'}")
-    logger.info(f"Morning Charge Audit: {'✓ SUCCESS' if results[1] else '✗ FAILED'}")
+    if stats:
+        logger.info(f"CACHE COMPUTATION COMPLETE in {stats['duration_seconds']:.2f} seconds ({stats['mode']})")
+        logger.info(f"Vehicle-days recomputed: {stats['entries_recomputed']}, rows scanned: {stats['rows_scanned']}")
+        logger.info(f"Battery Audit: {stats['battery_audit_results']} results, {stats['battery_audit_critical']} critical")
+        logger.info(f"Morning Charge Audit: {stats['morning_charge_results']} results")
+    else:
+        logger.info("CACHE COMPUTATION SKIPPED OR FAILED")
     logger.info("=" * 60)
+    return stats
 
 
 if __name__ == "__main__":
-    asyncio.run(run_all_cache_jobs())
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Refresh the battery and morning charge audit caches")
+    parser.add_argument("--full", action="store_true", help="Recompute every vehicle-day of the window")
+    args = parser.parse_args()
+    asyncio.run(run_all_cache_jobs(full=args.full))
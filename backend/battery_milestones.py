@@ -0,0 +1,227 @@
+"""
+Battery Milestones
+Vectorized engine behind ``/montra-vehicle/battery-milestones``.
+
+All requested vehicles are fetched in a single query, and the rows become
+flat NumPy arrays sorted by (vehicle, date, time of day). Every vehicle-day
+is a contiguous segment of those arrays. Each rule is a mask over the
+arrays, reduced per segment with ``searchsorted``/``bincount``, so nothing
+loops over individual rows. The rules are the same as the previous
+per-record loops:
+
+* ``charge_at_6am``: the last SOC reading at or before 07:00. Days without
+  one are skipped.
+* ``time_at_N`` / ``km_at_N`` (80/50/30/20): the first reading at or below N%
+  that is either the day's first SOC reading or lower than the previous
+  reading (driving, not charging). Days that reach no milestone are skipped.
+* ``derived_mileage``: the mean km per % over consecutive readings where SOC
+  drops by 0-50% and the odometer advances by 0-100 km.
+* ``midday_charge``: the sum of SOC increases below 50% between consecutive
+  readings from 07:00 to 19:00.
+
+Days with fewer than ``MIN_DAY_RECORDS`` rows are skipped.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from telemetry_fields import (
+    ODOMETER_FIELDS, SOC_FIELDS, TIME_FIELDS, datetime_column, numeric_column, seconds_of_day
+)
+
+MILESTONES = (80, 50, 30, 20)
+# Milestones that also report the odometer reading
+KM_MILESTONES = (80, 50, 20)
+MIN_DAY_RECORDS = 5
+MORNING_CUTOFF = 7 * 3600
+MIDDAY_START, MIDDAY_END = 7 * 3600, 19 * 3600
+MAX_CHARGE_STEP = 50
+MAX_KM_STEP = 100
+
+# Projection for the milestone query
+MILESTONE_FIELDS = ["vehicle_id", "date"] + TIME_FIELDS + SOC_FIELDS + ODOMETER_FIELDS
+
+
+def _parse_day(value: str, year: int) -> Tuple[Optional[datetime], bool]:
+    """(date, had_year) for "2025-09-01", "01 Sep 2025" or "01 Sep" (in ``year``)"""
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%d %b %Y", "%d %B %Y"):
+        try:
+            return datetime.strptime(value, fmt), True
+        except ValueError:
+            pass
+    for fmt in ("%d %b", "%d %B"):
+        try:
+            return datetime.strptime(f"{value} {year}", f"{fmt} %Y"), False
+        except ValueError:
+            pass
+    return None, False
+
+
+def iso_date_range(start_date: str, end_date: str, year: Optional[int] = None) -> Tuple[str, str]:
+    """
+    The page sends "DD MMM" while montra_feed_data.date is ISO. Dates without a
+    year fall in ``year`` (default: current year); a range that wraps past
+    December starts in the previous year. Unparsable values pass through.
+    """
+    year = year or datetime.now().year
+    start, start_has_year = _parse_day(start_date, year)
+    end, end_has_year = _parse_day(end_date, year)
+    if start and end and not start_has_year and not end_has_year and start > end:
+        start = start.replace(year=year - 1)
+    return (
+        start.strftime("%Y-%m-%d") if start else start_date,
+        end.strftime("%Y-%m-%d") if end else end_date,
+    )
+
+
+def _format_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _format_number(value: float):
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def _first_in_segment(mask: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Index of the first True per [start, end) segment, -1 where there is none"""
+    positions = np.flatnonzero(mask)
+    found = np.full(len(starts), -1, dtype=np.int64)
+    if len(positions):
+        at = np.searchsorted(positions, starts)
+        ok = at < len(positions)
+        ok[ok] = positions[at[ok]] < ends[ok]
+        found[ok] = positions[at[ok]]
+    return found
+
+
+def _last_in_segment(mask: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Index of the last True per [start, end) segment, -1 where there is none"""
+    positions = np.flatnonzero(mask)
+    found = np.full(len(starts), -1, dtype=np.int64)
+    if len(positions):
+        at = np.searchsorted(positions, ends) - 1
+        ok = at >= 0
+        ok[ok] = positions[at[ok]] >= starts[ok]
+        found[ok] = positions[at[ok]]
+    return found
+
+
+def _pairs_within_segment(indices: np.ndarray, segment_of: np.ndarray):
+    """(previous, current) index pairs of consecutive indices in the same segment"""
+    prev, cur = indices[:-1], indices[1:]
+    same = segment_of[prev] == segment_of[cur]
+    return prev[same], cur[same]
+
+
+def compute_milestones(rows: List[Dict], vehicle_order: Sequence[str] = ()) -> List[Dict]:
+    """Milestone analysis per vehicle-day, ordered by vehicle_order then date"""
+    if not rows:
+        return []
+
+    frame = pd.DataFrame.from_records(rows)
+    if "vehicle_id" not in frame.columns or "date" not in frame.columns:
+        return []
+    frame = frame[frame["vehicle_id"].notna() & frame["date"].notna()].reset_index(drop=True)
+    if frame.empty:
+        return []
+
+    # Integer codes in output order: vehicles as requested (others after), dates ascending
+    vehicle_codes, vehicle_names = pd.factorize(frame["vehicle_id"].astype(str))
+    order_rank = {vehicle_id: rank for rank, vehicle_id in enumerate(vehicle_order)}
+    name_rank = np.array([order_rank.get(name, len(order_rank)) for name in vehicle_names])
+    date_codes, date_names = pd.factorize(frame["date"].astype(str), sort=True)
+    tod = seconds_of_day(datetime_column(frame, TIME_FIELDS))
+    soc = numeric_column(frame, SOC_FIELDS)
+    km = numeric_column(frame, ODOMETER_FIELDS)
+
+    # Sort by (vehicle, date, time); rows without a time keep their order at the end of the day
+    sortable_tod = np.where(np.isnan(tod), np.inf, tod)
+    order = np.lexsort((sortable_tod, date_codes, vehicle_codes, name_rank[vehicle_codes]))
+    tod, soc, km = tod[order], soc[order], km[order]
+    vehicle_codes, date_codes = vehicle_codes[order], date_codes[order]
+
+    n = len(order)
+    boundary = np.ones(n, dtype=bool)
+    boundary[1:] = (vehicle_codes[1:] != vehicle_codes[:-1]) | (date_codes[1:] != date_codes[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n)
+    segment_of = np.cumsum(boundary) - 1
+    segments = len(starts)
+    has_soc = ~np.isnan(soc)
+
+    # Charge at 6 AM: last SOC reading at or before 07:00
+    morning = _last_in_segment(has_soc & (tod <= MORNING_CUTOFF), starts, ends)
+
+    # Milestones: first reading at/below N that starts the day or is lower than the previous reading
+    soc_idx = np.flatnonzero(has_soc)
+    eligible = np.zeros(n, dtype=bool)
+    if len(soc_idx):
+        first_of_segment = np.ones(len(soc_idx), dtype=bool)
+        first_of_segment[1:] = segment_of[soc_idx[1:]] != segment_of[soc_idx[:-1]]
+        dropping = np.zeros(len(soc_idx), dtype=bool)
+        dropping[1:] = soc[soc_idx[1:]] < soc[soc_idx[:-1]]
+        eligible[soc_idx] = first_of_segment | dropping
+    milestone_at = {m: _first_in_segment(eligible & (soc <= m), starts, ends) for m in MILESTONES}
+
+    # Derived mileage over consecutive rows of the day
+    prev, cur = _pairs_within_segment(np.arange(n), segment_of)
+    drop = soc[prev] - soc[cur]
+    travelled = km[cur] - km[prev]
+    with np.errstate(invalid="ignore"):
+        usable = (
+            has_soc[cur] & ~np.isnan(km[cur])
+            & (soc[prev] != 0) & ~np.isnan(soc[prev]) & (km[prev] != 0) & ~np.isnan(km[prev])
+            & (drop > 0) & (drop < MAX_CHARGE_STEP) & (travelled > 0) & (travelled < MAX_KM_STEP)
+        )
+    efficiency_sum = np.bincount(segment_of[cur[usable]], weights=travelled[usable] / drop[usable], minlength=segments)
+    efficiency_count = np.bincount(segment_of[cur[usable]], minlength=segments)
+
+    # Mid-day charge: SOC increases between consecutive 07:00-19:00 readings
+    midday_idx = np.flatnonzero((tod >= MIDDAY_START) & (tod <= MIDDAY_END))
+    prev, cur = _pairs_within_segment(midday_idx, segment_of)
+    added = soc[cur] - soc[prev]
+    with np.errstate(invalid="ignore"):
+        charging = (added > 0) & (added < MAX_CHARGE_STEP)
+    midday_charge = np.bincount(segment_of[cur[charging]], weights=added[charging], minlength=segments)
+
+    results = []
+    for s in range(segments):
+        if ends[s] - starts[s] < MIN_DAY_RECORDS or morning[s] < 0:
+            continue
+        if all(milestone_at[m][s] < 0 for m in MILESTONES):
+            continue
+
+        analysis = {
+            "date": date_names[date_codes[starts[s]]],
+            "vehicle": vehicle_names[vehicle_codes[starts[s]]],
+            "charge_at_6am": f"{_format_number(soc[morning[s]])}%",
+            "time_at_80": None,
+            "km_at_80": None,
+            "time_at_50": None,
+            "km_at_50": None,
+            "time_at_30": None,
+            "time_at_20": None,
+            "km_at_20": None,
+            "derived_mileage": None,
+            "midday_charge": None
+        }
+        for m in MILESTONES:
+            i = milestone_at[m][s]
+            if i < 0:
+                continue
+            if not np.isnan(tod[i]):
+                analysis[f"time_at_{m}"] = _format_time(tod[i])
+            if m in KM_MILESTONES and not np.isnan(km[i]) and km[i]:
+                analysis[f"km_at_{m}"] = _format_number(km[i])
+
+        if efficiency_count[s]:
+            analysis["derived_mileage"] = f"{efficiency_sum[s] / efficiency_count[s]:.2f}"
+        if midday_charge[s] > 0:
+            analysis["midday_charge"] = f"{midday_charge[s]:.1f}%"
+        results.append(analysis)
+    return results
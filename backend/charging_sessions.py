@@ -0,0 +1,337 @@
+"""
+Charging Sessions
+Extracts charging sessions from Montra telemetry into ``charging_sessions``:
+one document per session with the vehicle, start / end time, SOC in and out,
+SOC added, estimated energy and duration.
+
+A session is found on each vehicle's SOC series in time order:
+
+* a charging step is a pair of consecutive readings where SOC rises and the
+  odometer advances at most ``MAX_STEP_KM``, at most ``MAX_STEP_GAP`` apart
+  (a charger can run while the unit is offline)
+* consecutive charging steps belong to the same session unless, between
+  them, SOC drops by more than ``SOC_NOISE`` or the vehicle moves (odometer
+  step above ``MAX_STEP_KM``), or more than ``SESSION_GAP`` passes between the
+  end of one step and the start of the next
+* a session starts at the reading before its first charging step and ends
+  at its last charging step; it is kept if it adds at least
+  ``MIN_SESSION_SOC`` % and the odometer advances at most ``MAX_SESSION_KM``
+  (regeneration while driving is not charging)
+
+Every rule is a mask over flat NumPy arrays of all rows, sorted by (vehicle,
+time), and steps are grouped into sessions with ``cumsum``; nothing loops
+over rows.
+Sessions can run past midnight, so a session belongs to the date of its first
+reading, and a vehicle-day is always extracted together with the day before
+and after.
+
+Sessions are refreshed incrementally: ``refresh_charging_sessions`` reads the
+vehicle-days changed since its checkpoint from ``feed_import_log`` and
+re-extracts the dates whose sessions they can touch (the day itself and its
+neighbours). The first run, or ``--full``, extracts everything.
+
+Usage:
+    python charging_sessions.py [--full]
+"""
+
+import logging
+import os
+import uuid
+from datetime import date as date_type, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import DeleteMany, InsertOne
+
+from telemetry_fields import ODOMETER_FIELDS, SOC_FIELDS, TIME_FIELDS, datetime_column, numeric_column
+from vehicle_day_summary import IMPORT_LOG_TTL_DAYS, SUMMARY_COLLECTION, changed_days
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_COLLECTION = "charging_sessions"
+STATE_COLLECTION = "charging_session_state"
+STATE_ID = "refresh"
+REFRESH_LEASE = "charging_sessions_refresh"
+REFRESH_LEASE_SECONDS = 3600
+
+# Session rules
+MAX_STEP_GAP = 12 * 3600
+SESSION_GAP = 30 * 60
+SOC_NOISE = 1.0
+MAX_STEP_KM = 0.1
+MIN_SESSION_SOC = 3.0
+MAX_SESSION_KM = 1.0
+# Usable pack energy per 100% SOC, for the energy estimate
+BATTERY_KWH = float(os.environ.get('MONTRA_BATTERY_KWH', '10'))
+
+# Owner dates re-extracted per query (each query also reads one day either side)
+DATES_PER_QUERY = 31
+# Log entries written just before a run started may commit after it; re-reading them is harmless
+LOG_OVERLAP = timedelta(minutes=5)
+
+# Projection for reading telemetry
+SESSION_SOURCE_FIELDS = list(dict.fromkeys(
+    ["vehicle_id", "date", "registration_number"] + TIME_FIELDS + SOC_FIELDS + ODOMETER_FIELDS
+))
+
+
+def session_id(vehicle_id: str, start: datetime) -> str:
+    """Stable id, so re-extracting a session keeps its id"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"charging-session:{vehicle_id}:{start.isoformat()}"))
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else round(float(value), 3)
+
+
+def extract_sessions(rows: List[Dict]) -> List[Dict]:
+    """Charging sessions in telemetry rows of any vehicles and days, by vehicle then start"""
+    if not rows:
+        return []
+    frame = pd.DataFrame.from_records(rows)
+    if "vehicle_id" not in frame.columns:
+        return []
+
+    timestamps = datetime_column(frame, TIME_FIELDS)
+    soc = numeric_column(frame, SOC_FIELDS)
+    km = numeric_column(frame, ODOMETER_FIELDS)
+    keep = np.flatnonzero(timestamps.notna().to_numpy() & ~np.isnan(soc) & frame["vehicle_id"].notna().to_numpy())
+    if len(keep) < 2:
+        return []
+
+    vehicle_codes, vehicle_names = pd.factorize(frame["vehicle_id"].to_numpy()[keep], sort=True)
+    seconds = timestamps.to_numpy()[keep].astype("datetime64[ns]").astype(np.int64) / 1e9
+    order = np.lexsort((np.arange(len(keep)), seconds, vehicle_codes))
+    rows_at = keep[order]
+    vehicle_codes, seconds = vehicle_codes[order], seconds[order]
+    soc, km = soc[rows_at], km[rows_at]
+
+    # Step i goes from reading i to reading i + 1
+    same_vehicle = vehicle_codes[1:] == vehicle_codes[:-1]
+    rise = np.diff(soc)
+    gap = np.diff(seconds)
+    with np.errstate(invalid="ignore"):
+        # Unknown odometer counts as not moving
+        moving = np.diff(km) > MAX_STEP_KM
+    charging = same_vehicle & (rise > 0) & (gap <= MAX_STEP_GAP) & ~moving
+    breaking = ~same_vehicle | (rise < -SOC_NOISE) | moving
+
+    steps = np.flatnonzero(charging)
+    if not len(steps):
+        return []
+    # Breaking steps before each charging step; a change between two charging steps ends the session
+    breaks_before = np.cumsum(breaking)[steps]
+    new_session = np.ones(len(steps), dtype=bool)
+    new_session[1:] = (
+        (breaks_before[1:] != breaks_before[:-1])
+        | (seconds[steps[1:]] - seconds[steps[:-1] + 1] > SESSION_GAP)
+    )
+    firsts = np.flatnonzero(new_session)
+    lasts = np.append(firsts[1:], len(steps)) - 1
+    start_idx = steps[firsts]
+    end_idx = steps[lasts] + 1
+
+    added = soc[end_idx] - soc[start_idx]
+    travelled = km[end_idx] - km[start_idx]
+    with np.errstate(invalid="ignore"):
+        valid = (added >= MIN_SESSION_SOC) & ~(travelled > MAX_SESSION_KM)
+
+    dates = frame["date"].to_numpy()[rows_at] if "date" in frame.columns else None
+    registrations = (
+        frame["registration_number"].to_numpy()[rows_at] if "registration_number" in frame.columns else None
+    )
+    times = timestamps.to_numpy()[rows_at]
+
+    sessions = []
+    for s, e in zip(start_idx[valid], end_idx[valid]):
+        start = pd.Timestamp(times[s]).to_pydatetime()
+        end = pd.Timestamp(times[e]).to_pydatetime()
+        vehicle_id = vehicle_names[vehicle_codes[s]]
+        registration = registrations[s] if registrations is not None else None
+        soc_added = float(soc[e] - soc[s])
+        sessions.append({
+            "id": session_id(vehicle_id, start),
+            "vehicle_id": vehicle_id,
+            "registration_number": registration if isinstance(registration, str) else "",
+            "date": dates[s] if dates is not None and isinstance(dates[s], str) else start.strftime("%Y-%m-%d"),
+            "start": start,
+            "end": end,
+            "duration_minutes": round((seconds[e] - seconds[s]) / 60, 1),
+            "soc_start": _number(soc[s]),
+            "soc_end": _number(soc[e]),
+            "soc_added": _number(soc_added),
+            "energy_kwh": round(soc_added / 100 * BATTERY_KWH, 3),
+            "odometer": None if np.isnan(km[s]) else _number(km[s]),
+            "readings": int(e - s + 1),
+        })
+    return sessions
+
+
+def _shift(day: str, days: int) -> str:
+    return (date_type.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def owner_dates(changed: set) -> Dict[str, List[str]]:
+    """Per vehicle, the dates whose sessions a change to (vehicle, date) can affect"""
+    owners = {}
+    for vehicle_id, day in changed:
+        try:
+            dates = {_shift(day, -1), day, _shift(day, 1)}
+        except ValueError:
+            # Not an ISO date: only the day itself
+            dates = {day}
+        owners.setdefault(vehicle_id, set()).update(dates)
+    return {vehicle_id: sorted(dates) for vehicle_id, dates in owners.items()}
+
+
+async def extract_vehicle_dates(db, vehicle_id: str, dates: List[str]) -> Dict:
+    """Re-extract and replace the sessions of one vehicle that start on the given dates"""
+    replaced = inserted = rows_read = 0
+    for start in range(0, len(dates), DATES_PER_QUERY):
+        owners = dates[start:start + DATES_PER_QUERY]
+        window = set(owners)
+        for day in owners:
+            try:
+                window.update((_shift(day, -1), _shift(day, 1)))
+            except ValueError:
+                pass
+        rows = await db.montra_feed_data.find(
+            {"vehicle_id": vehicle_id, "date": {"$in": sorted(window)}},
+            {"_id": 0, **{field: 1 for field in SESSION_SOURCE_FIELDS}}
+        ).to_list(length=None)
+        rows_read += len(rows)
+        sessions = [s for s in extract_sessions(rows) if s["date"] in set(owners)]
+        now = datetime.now(timezone.utc)
+        operations = [DeleteMany({"vehicle_id": vehicle_id, "date": {"$in": owners}})]
+        operations += [InsertOne({**session, "updated_at": now}) for session in sessions]
+        # Ordered: the delete runs before the inserts
+        result = await db[SESSIONS_COLLECTION].bulk_write(operations, ordered=True)
+        replaced += result.deleted_count
+        inserted += result.inserted_count
+    return {"sessions_replaced": replaced, "sessions_inserted": inserted, "rows_read": rows_read}
+
+
+async def refresh_charging_sessions(db, full: bool = False) -> Dict:
+    """
+    Re-extract the sessions the vehicle-days changed since the last run can
+    affect (every vehicle-day on the first run, with ``full``, or when the
+    checkpoint is older than the import log keeps). Returns the run statistics.
+    """
+    started = datetime.now(timezone.utc)
+    state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID})
+    checkpoint = None if full or not state else state.get("checkpoint")
+    if checkpoint and checkpoint.tzinfo is None:
+        checkpoint = checkpoint.replace(tzinfo=timezone.utc)
+    if checkpoint and checkpoint < started - timedelta(days=IMPORT_LOG_TTL_DAYS):
+        checkpoint = None
+
+    if checkpoint:
+        changed, log_entries_read = await changed_days(db, checkpoint - LOG_OVERLAP)
+        mode = "incremental"
+    else:
+        changed = {
+            (s["vehicle_id"], s["date"])
+            async for s in db[SUMMARY_COLLECTION].find({}, {"_id": 0, "vehicle_id": 1, "date": 1})
+        }
+        log_entries_read = 0
+        mode = "full"
+
+    stats = {"sessions_replaced": 0, "sessions_inserted": 0, "rows_read": 0}
+    owners = owner_dates(changed)
+    for vehicle_id, dates in owners.items():
+        result = await extract_vehicle_dates(db, vehicle_id, dates)
+        for key, value in result.items():
+            stats[key] += value
+    if mode == "full":
+        # Sessions of vehicle-days that no longer exist
+        stats["sessions_replaced"] += (await db[SESSIONS_COLLECTION].delete_many(
+            {"updated_at": {"$lt": started}}
+        )).deleted_count
+
+    stats.update({
+        "mode": mode,
+        "vehicle_days_changed": len(changed),
+        "vehicles": len(owners),
+        "log_entries_read": log_entries_read,
+        "started_at": started.isoformat(),
+        "duration_seconds": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+    })
+    await db[STATE_COLLECTION].update_one(
+        {"_id": STATE_ID}, {"$set": {"checkpoint": started, "last_run": stats}}, upsert=True
+    )
+    logger.info(
+        f"Charging sessions {mode} refresh: {len(changed)} changed vehicle-days, "
+        f"{stats['sessions_inserted']} sessions written in {stats['duration_seconds']}s"
+    )
+    return stats
+
+
+async def refresh_with_lease(db, full: bool = False) -> Optional[Dict]:
+    """refresh_charging_sessions unless another instance is already refreshing"""
+    from scheduler_worker import acquire_lease, release_lease
+
+    if not await acquire_lease(db, REFRESH_LEASE, ttl_seconds=REFRESH_LEASE_SECONDS):
+        logger.info("Charging sessions refresh already running elsewhere")
+        return None
+    try:
+        return await refresh_charging_sessions(db, full=full)
+    except Exception as e:
+        logger.error(f"Error refreshing charging sessions: {str(e)}")
+        return None
+    finally:
+        await release_lease(db, REFRESH_LEASE)
+
+
+async def get_charging_sessions(
+    db,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vehicle_ids: Optional[List[str]] = None
+) -> List[Dict]:
+    """Sessions starting in [start_date, end_date], by vehicle then start"""
+    match = {}
+    if start_date or end_date:
+        match["date"] = {key: value for key, value in (("$gte", start_date), ("$lte", end_date)) if value}
+    if vehicle_ids is not None:
+        match["vehicle_id"] = {"$in": vehicle_ids}
+    return await db[SESSIONS_COLLECTION].find(match, {"_id": 0}).sort(
+        [("vehicle_id", 1), ("start", 1)]
+    ).to_list(length=None)
+
+
+async def ensure_charging_session_indexes(db) -> None:
+    await db[SESSIONS_COLLECTION].create_index(
+        [("vehicle_id", 1), ("start", 1)], name="uniq_vehicle_start", unique=True
+    )
+    await db[SESSIONS_COLLECTION].create_index([("vehicle_id", 1), ("date", 1)], name="idx_vehicle_date")
+    await db[SESSIONS_COLLECTION].create_index([("date", 1)], name="idx_date")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Extract charging sessions from Montra telemetry")
+    parser.add_argument("--full", action="store_true", help="Re-extract every vehicle-day")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+        await ensure_charging_session_indexes(database)
+        stats = await refresh_with_lease(database, full=args.full)
+        if stats:
+            print(f"{stats['mode']} refresh: {stats['sessions_inserted']} sessions from "
+                  f"{stats['vehicle_days_changed']} changed vehicle-days, {stats['rows_read']} rows read "
+                  f"({stats['duration_seconds']}s)")
+        else:
+            print("Charging sessions refresh skipped or failed")
+        client.close()
+
+    asyncio.run(main())
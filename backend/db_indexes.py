@@ -56,6 +56,34 @@ async def create_indexes():
     )
     print("✓ Created index on Date (for sorting)")
     
+    # Natural key (vehicle_id, feed_ts) for idempotent re-imports, plus the
+    # feed_files content hash. Legacy rows without feed_ts are outside the
+    # partial index until `python montra_feed_import.py dedupe` removes their
+    # duplicates and backfills feed_ts.
+    try:
+        from montra_feed_import import ensure_feed_indexes
+        await ensure_feed_indexes(db)
+        print("✓ Created unique index on (vehicle_id, feed_ts) and feed_files.content_hash")
+    except Exception as e:
+        print(f"✗ Natural-key index not created ({e}); run `python montra_feed_import.py dedupe`")
+    
+    # Hourly columnar buckets (MONTRA_FEED_STORE=buckets)
+    from montra_feed_store import ensure_feed_bucket_indexes
+    await ensure_feed_bucket_indexes(db)
+    print("✓ Created index on montra_feed_buckets (vehicle_id, date, hour, seq)")
+
+    from vehicle_day_summary import ensure_day_summary_indexes
+    await ensure_day_summary_indexes(db)
+    print("✓ Created indexes on vehicle_day_summary (vehicle_id + date unique, date, imported_at) and feed_import_log (TTL)")
+
+    from analytics_cache import ensure_analytics_cache_indexes
+    await ensure_analytics_cache_indexes(db)
+    print("✓ Created indexes on analytics_cache_entries (cache_type, vehicle_id, date)")
+
+    from charging_sessions import ensure_charging_session_indexes
+    await ensure_charging_session_indexes(db)
+    print("✓ Created indexes on charging_sessions (vehicle_id + start unique, vehicle_id + date, date)")
+    
     # ==================== DRIVER LEADS INDEXES ====================
     print("\n[Driver Leads] Creating indexes...")
     
@@ -118,6 +146,58 @@ async def create_indexes():
     )
     print("✓ Created index on source")
     
+    # Index for last_modified (performance tracking dirty-day detection)
+    await db.driver_leads.create_index(
+        [("last_modified", 1)],
+        name="idx_last_modified"
+    )
+    print("✓ Created index on last_modified")
+    
+    # Compound index for the no-response queue (grouped, keyset paginated)
+    await db.driver_leads.create_index(
+        [("last_no_response_by", 1), ("last_no_response", -1), ("id", -1)],
+        name="idx_no_response_queue"
+    )
+    print("✓ Created compound index on (last_no_response_by, last_no_response, id)")
+    
+    # ==================== PERFORMANCE TRACKING CACHE INDEXES ====================
+    print("\n[Performance Tracking Cache] Creating indexes...")
+    
+    await db.performance_tracking_cache.create_index(
+        [("kind", 1), ("day", 1)],
+        name="idx_kind_day"
+    )
+    print("✓ Created compound index on (kind, day)")
+    
+    # ==================== TELECALLER ROLLUPS INDEXES ====================
+    print("\n[Telecaller Rollups] Creating indexes...")
+    
+    # Date-range reads for the telecaller daily summary
+    await db.telecaller_daily_rollups.create_index(
+        [("date", 1), ("telecaller", 1)],
+        name="idx_rollup_date_telecaller"
+    )
+    print("✓ Created compound index on (date, telecaller)")
+    
+    # ==================== SHEETS OUTBOX INDEXES ====================
+    print("\n[Sheets Outbox] Creating indexes...")
+    
+    # Flusher picks due entries, status endpoint reads the oldest one
+    await db.sheets_outbox.create_index([("next_attempt_at", 1)], name="idx_next_attempt_at")
+    print("✓ Created index on next_attempt_at")
+    await db.sheets_outbox.create_index([("enqueued_at", 1)], name="idx_enqueued_at")
+    print("✓ Created index on enqueued_at")
+    
+    # Delta sync tombstones, expired after 30 days
+    await db.sheets_tombstones.create_index([("tab", 1), ("deleted_at", 1)], name="idx_tab_deleted_at")
+    print("✓ Created compound index on (tab, deleted_at)")
+    await db.sheets_tombstones.create_index(
+        [("deleted_at", 1)],
+        name="idx_tombstone_ttl",
+        expireAfterSeconds=30 * 24 * 3600
+    )
+    print("✓ Created TTL index on deleted_at")
+    
     # ==================== QR CODES INDEXES ====================
     print("\n[QR Codes] Creating indexes...")
     
@@ -204,7 +284,15 @@ async def create_indexes():
     
     collections_to_check = [
         "montra_feed_data",
+        "feed_files",
+        "montra_feed_buckets",
+        "vehicle_day_summary",
+        "feed_import_log",
+        "analytics_cache_entries",
+        "charging_sessions",
         "driver_leads",
+        "telecaller_daily_rollups",
+        "sheets_outbox",
         "qr_codes",
         "qr_scans",
         "users"
@@ -0,0 +1,83 @@
+"""
+Feed Export
+Streams Montra feed data as CSV (optionally gzip) for the feed database
+download, without holding the export in memory.
+
+The CSV has one column per field found in the selected rows, sorted by name.
+The header is therefore computed first, server-side, with an aggregation that
+returns only the field names. The rows are then read from one cursor per
+vehicle-day, one after another, written through ``csv.DictWriter`` into a
+small buffer, and flushed through an incremental UTF-8 encoder (and a gzip
+compressor) every ``EXPORT_CHUNK_BYTES``. Memory use depends on the chunk
+and cursor batch sizes, not on the number of rows.
+"""
+
+import codecs
+import csv
+import io
+import zlib
+from typing import AsyncIterator, Dict, List, Sequence, Tuple
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+CURSOR_BATCH_SIZE = 2000
+COMPRESSIONS = ("gzip",)
+
+
+def vehicle_day_keys(files: Sequence[Dict]) -> List[Tuple[str, str]]:
+    """Unique (vehicle_id, date) pairs of the selected files, in selection order"""
+    return list(dict.fromkeys((f["vehicle_id"], f["date"]) for f in files))
+
+
+def _match(vehicle_days: Sequence[Tuple[str, str]]) -> Dict:
+    return {"$or": [{"vehicle_id": vehicle_id, "date": date} for vehicle_id, date in vehicle_days]}
+
+
+async def export_fieldnames(db, vehicle_days: Sequence[Tuple[str, str]]) -> List[str]:
+    """Sorted names of every field in the selected rows (except _id); empty when there are no rows"""
+    if not vehicle_days:
+        return []
+    names = await db.montra_feed_data.aggregate([
+        {"$match": _match(vehicle_days)},
+        {"$project": {"_id": 0, "fields": {"$objectToArray": "$$ROOT"}}},
+        {"$unwind": "$fields"},
+        {"$group": {"_id": "$fields.k"}},
+    ], allowDiskUse=True).to_list(None)
+    return sorted(n["_id"] for n in names if n["_id"] != "_id")
+
+
+async def stream_feed_csv(
+    db,
+    vehicle_days: Sequence[Tuple[str, str]],
+    fieldnames: List[str],
+    compression: str = None,
+    chunk_bytes: int = EXPORT_CHUNK_BYTES
+) -> AsyncIterator[bytes]:
+    """CSV bytes of the selected vehicle-days, chunk by chunk"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    encoder = codecs.getincrementalencoder("utf-8")()
+    # wbits 31: gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compression == "gzip" else None
+
+    def drain(final: bool = False) -> bytes:
+        data = encoder.encode(buffer.getvalue(), final=final)
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor:
+            data = compressor.compress(data) + (compressor.flush() if final else b"")
+        return data
+
+    writer.writeheader()
+    for vehicle_id, date in vehicle_days:
+        cursor = db.montra_feed_data.find(
+            {"vehicle_id": vehicle_id, "date": date}, {"_id": 0}
+        ).batch_size(CURSOR_BATCH_SIZE)
+        async for record in cursor:
+            writer.writerow(record)
+            if buffer.tell() >= chunk_bytes:
+                data = drain()
+                if data:
+                    yield data
+    data = drain(final=True)
+    if data:
+        yield data
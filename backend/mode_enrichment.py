@@ -0,0 +1,145 @@
+"""
+Mode Enrichment
+Re-applies the Mode Name / Mode Type mapping to montra_feed_data that is
+already stored (``/montra-vehicle/enrich-existing-data``).
+
+Every row of a vehicle with the same registration number and Ride Mode gets
+the same values, so the job works on the distinct (vehicle_id,
+registration_number, Ride Mode) groups found by one aggregation instead of
+on the rows:
+
+* each group is resolved once and written with one ``UpdateMany``; the
+  updates are sent in ``bulk_write`` batches of ``GROUP_BATCH`` groups
+* the filters skip rows that already have the resolved values, so a group
+  that was done costs an index scan and no writes
+* progress (groups and rows done) is saved in ``mode_enrichment_state``
+  after every batch; a run that stopped part way resumes at the saved group
+  when the mapping file has not changed since
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateMany
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "mode_enrichment_state"
+STATE_ID = "montra_feed_data"
+ENRICHMENT_LEASE = "mode_enrichment"
+ENRICHMENT_LEASE_SECONDS = 6 * 3600
+GROUP_BATCH = 200
+
+# (lookup_id, ride_mode) -> (mode_name, mode_type)
+Resolver = Callable[[str, str], Tuple[str, str]]
+
+
+async def mode_groups(db) -> List[Dict]:
+    """Distinct (vehicle_id, registration_number, Ride Mode) groups with their row counts, in a stable order"""
+    groups = await db.montra_feed_data.aggregate([
+        {"$match": {"Ride Mode": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "registration_number": "$registration_number", "ride_mode": "$Ride Mode"},
+            "rows": {"$sum": 1}
+        }},
+    ], allowDiskUse=True).to_list(length=None)
+    result = [
+        {
+            "vehicle_id": g["_id"].get("vehicle_id"),
+            "registration_number": g["_id"].get("registration_number"),
+            "ride_mode": g["_id"].get("ride_mode"),
+            "rows": g["rows"],
+        }
+        for g in groups
+    ]
+    # Ride Mode 0 / False is skipped, as in the per-row version
+    result = [g for g in result if g["ride_mode"]]
+    result.sort(key=lambda g: (str(g["vehicle_id"]), str(g["registration_number"]), str(g["ride_mode"])))
+    return result
+
+
+def group_update(group: Dict, resolve: Resolver) -> UpdateMany:
+    """UpdateMany setting the resolved mode fields on the group's rows that differ"""
+    # Registration number if available, otherwise vehicle ID
+    lookup_id = group["registration_number"] or group["vehicle_id"]
+    mode_name, mode_type = resolve(lookup_id, str(group["ride_mode"]))
+    return UpdateMany(
+        {
+            "vehicle_id": group["vehicle_id"],
+            "registration_number": group["registration_number"],
+            "Ride Mode": group["ride_mode"],
+            "$or": [{"mode_name": {"$ne": mode_name}}, {"mode_type": {"$ne": mode_type}}],
+        },
+        {"$set": {"mode_name": mode_name, "mode_type": mode_type}}
+    )
+
+
+async def get_enrichment_state(db) -> Optional[Dict]:
+    return await db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"_id": 0})
+
+
+async def _save_state(db, **fields) -> None:
+    await db[STATE_COLLECTION].update_one(
+        {"_id": STATE_ID},
+        {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+async def enrich_existing_modes(db, resolve: Resolver, mapping_fingerprint=None) -> Dict:
+    """
+    Apply ``resolve`` to every Ride Mode group of montra_feed_data. Resumes
+    an unfinished run for the same mapping fingerprint. Returns the run state.
+    """
+    fingerprint = list(mapping_fingerprint) if mapping_fingerprint else None
+    groups = await mode_groups(db)
+    previous = await get_enrichment_state(db)
+
+    start = 0
+    rows_matched, rows_updated = 0, 0
+    if (previous and previous.get("status") == "running" and previous.get("mapping_fingerprint") == fingerprint
+            and previous.get("groups_total") == len(groups)):
+        start = previous.get("groups_done", 0)
+        rows_matched, rows_updated = previous.get("rows_matched", 0), previous.get("rows_updated", 0)
+        logger.info(f"Resuming mode enrichment at group {start} of {len(groups)}")
+
+    started = previous.get("started_at") if start else datetime.now(timezone.utc)
+    await _save_state(
+        db, status="running", mapping_fingerprint=fingerprint, started_at=started, finished_at=None,
+        groups_total=len(groups), rows_total=sum(g["rows"] for g in groups),
+        groups_done=start, rows_matched=rows_matched, rows_updated=rows_updated
+    )
+
+    for offset in range(start, len(groups), GROUP_BATCH):
+        batch = groups[offset:offset + GROUP_BATCH]
+        result = await db.montra_feed_data.bulk_write([group_update(g, resolve) for g in batch], ordered=False)
+        rows_matched += sum(g["rows"] for g in batch)
+        rows_updated += result.modified_count
+        await _save_state(db, groups_done=offset + len(batch), rows_matched=rows_matched, rows_updated=rows_updated)
+        logger.info(
+            f"Mode enrichment: {offset + len(batch)} of {len(groups)} groups, "
+            f"{rows_matched} rows checked, {rows_updated} updated"
+        )
+
+    await _save_state(db, status="completed", finished_at=datetime.now(timezone.utc))
+    state = await get_enrichment_state(db)
+    logger.info(f"Mode enrichment completed: {rows_updated} of {rows_matched} rows updated in {len(groups)} groups")
+    return state
+
+
+async def enrich_with_lease(db, resolve: Resolver, mapping_fingerprint=None) -> Optional[Dict]:
+    """enrich_existing_modes unless another instance is already enriching"""
+    from scheduler_worker import acquire_lease, release_lease
+
+    if not await acquire_lease(db, ENRICHMENT_LEASE, ttl_seconds=ENRICHMENT_LEASE_SECONDS):
+        logger.info("Mode enrichment already running elsewhere")
+        return None
+    try:
+        return await enrich_existing_modes(db, resolve, mapping_fingerprint)
+    except Exception as e:
+        # The state stays "running" so the next run resumes from the last saved batch
+        logger.error(f"Mode enrichment failed: {str(e)}")
+        return None
+    finally:
+        await release_lease(db, ENRICHMENT_LEASE)
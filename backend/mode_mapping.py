@@ -0,0 +1,131 @@
+"""
+Mode Mapping Cache
+In-process cache of the Model Mapping / Ride Mode Mapping tables from
+``uploaded_files/mode_details.xlsx``.
+
+The workbook is parsed once and kept until its fingerprint (mtime, size)
+changes, so imports only pay for an ``os.stat``. Besides the plain dicts used
+by ``enrich_with_mode_data``, the mapping is exposed as a pandas Series and a
+lookup frame for vectorized enrichment (merge / ``Series.map``).
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAPPING_FILE_PATH = "/app/backend/uploaded_files/mode_details.xlsx"
+
+
+@dataclass
+class ModeMapping:
+    model_dict: Dict[str, str] = field(default_factory=dict)
+    mode_dict: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    # Vehicle Number -> Model
+    model_series: pd.Series = field(default_factory=lambda: pd.Series(dtype=object))
+    # One row per "<Model> <Ride Mode>" key: _mode_key, mode_name, mode_type
+    mode_table: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=['_mode_key', 'mode_name', 'mode_type'])
+    )
+    fingerprint: Optional[Tuple[int, int]] = None
+    loaded_at: Optional[str] = None
+
+
+def _strip(series: pd.Series) -> pd.Series:
+    return series.astype(str).str.strip()
+
+
+def read_mode_mapping(path: str = MAPPING_FILE_PATH) -> ModeMapping:
+    """Parse both sheets of the mapping workbook without row iteration"""
+    sheets = pd.read_excel(path, sheet_name=['Model Mapping', 'Ride Mode Mapping'])
+    models = sheets['Model Mapping']
+    modes = sheets['Ride Mode Mapping']
+
+    model_series = pd.Series(_strip(models['Model']).values, index=_strip(models['Vehicle Number']).values)
+    # Later rows win, as with the previous dict-building loop
+    model_series = model_series[~model_series.index.duplicated(keep='last')]
+
+    mode_table = pd.DataFrame({
+        '_mode_key': _strip(modes['Vehicle-Mode Concatenation']),
+        'mode_name': _strip(modes['Mode Name']),
+        'mode_type': _strip(modes['Mode Type']),
+    }).drop_duplicates('_mode_key', keep='last').reset_index(drop=True)
+
+    return ModeMapping(
+        model_dict=model_series.to_dict(),
+        mode_dict={
+            key: {'mode_name': name, 'mode_type': kind}
+            for key, name, kind in zip(mode_table['_mode_key'], mode_table['mode_name'], mode_table['mode_type'])
+        },
+        model_series=model_series,
+        mode_table=mode_table,
+    )
+
+
+def file_fingerprint(path: str = MAPPING_FILE_PATH) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModeMappingCache:
+    def __init__(self, path: str = MAPPING_FILE_PATH):
+        self.path = path
+        self._mapping = ModeMapping()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, force: bool = False) -> ModeMapping:
+        """Current mapping; re-reads the workbook only if it changed (or force)"""
+        fingerprint = file_fingerprint(self.path)
+        if not force and fingerprint == self._mapping.fingerprint:
+            return self._mapping
+
+        with self._lock:
+            if not force and fingerprint == self._mapping.fingerprint:
+                return self._mapping
+            if fingerprint is None:
+                logger.error(f"Mode mapping file not found: {self.path}")
+                self._mapping = ModeMapping()
+                return self._mapping
+            try:
+                mapping = read_mode_mapping(self.path)
+            except Exception as e:
+                logger.error(f"Error loading mode mapping tables: {str(e)}")
+                # Keep serving the last good mapping; retry on the next change
+                self._mapping.fingerprint = fingerprint
+                return self._mapping
+            mapping.fingerprint = fingerprint
+            mapping.loaded_at = datetime.now(timezone.utc).isoformat()
+            self._mapping = mapping
+            self.loads += 1
+            logger.info(f"Loaded {len(mapping.model_dict)} vehicle models and {len(mapping.mode_dict)} ride modes")
+            return mapping
+
+    def status(self) -> Dict:
+        mapping = self._mapping
+        return {
+            "path": self.path,
+            "loaded": mapping.loaded_at is not None,
+            "loaded_at": mapping.loaded_at,
+            "fingerprint": {"mtime_ns": mapping.fingerprint[0], "size": mapping.fingerprint[1]}
+            if mapping.fingerprint else None,
+            "vehicle_models": len(mapping.model_dict),
+            "ride_modes": len(mapping.mode_dict),
+            "loads": self.loads,
+        }
+
+
+mode_mapping_cache = ModeMappingCache()
+
+
+def get_mode_mapping(force: bool = False) -> ModeMapping:
+    return mode_mapping_cache.get(force=force)
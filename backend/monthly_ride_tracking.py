@@ -0,0 +1,106 @@
+"""
+Monthly Ride Tracking
+One aggregation for ``/montra-vehicle/analytics/monthly-ride-tracking``.
+
+The selected period and the comparison period (30 days earlier) are
+matched together, on the (vehicle_id, date) index. Each vehicle-day gets its
+km (max - min odometer), and a ``$facet`` returns in the same round trip:
+
+* ``daily``: the vehicle-days of the selected period
+* ``vehicles``: per-vehicle totals of the selected period
+* ``previous``: the total km of the comparison period
+
+Source ``summary`` (default) reads the min/max odometer of vehicle_day_summary.
+Source ``raw`` groups montra_feed_data by vehicle-day first, on the typed
+``odometer_km`` (the "Odometer (km)" header for rows not yet canonicalized);
+it serves data that has no summaries yet.
+"""
+
+from typing import Dict, List
+
+from telemetry_fields import ODOMETER
+from vehicle_day_summary import SUMMARY_COLLECTION
+
+SOURCES = ("summary", "raw")
+RAW_ODOMETER = {"$ifNull": [f"${ODOMETER}", "$Odometer (km)"]}
+
+
+def ride_tracking_pipeline(
+    vehicle_ids: List[str],
+    start_date: str,
+    end_date: str,
+    prev_start: str,
+    prev_end: str,
+    source: str = "summary"
+) -> List[Dict]:
+    """Aggregation over vehicle_day_summary (or montra_feed_data for ``raw``)"""
+    match = {"$match": {
+        "vehicle_id": {"$in": vehicle_ids},
+        "date": {"$gte": min(start_date, prev_start), "$lte": max(end_date, prev_end)}
+    }}
+    if source == "raw":
+        vehicle_days = [
+            match,
+            {"$group": {
+                "_id": {"vehicle_id": "$vehicle_id", "date": "$date"},
+                "min_odometer": {"$min": RAW_ODOMETER},
+                "max_odometer": {"$max": RAW_ODOMETER}
+            }},
+            {"$project": {
+                "_id": 0,
+                "vehicle_id": "$_id.vehicle_id",
+                "date": "$_id.date",
+                "min_odometer": {"$ifNull": ["$min_odometer", 0]},
+                "max_odometer": {"$ifNull": ["$max_odometer", 0]}
+            }},
+        ]
+    else:
+        vehicle_days = [
+            match,
+            {"$project": {
+                "_id": 0,
+                "vehicle_id": 1,
+                "date": 1,
+                "min_odometer": {"$ifNull": ["$min_odometer", 0]},
+                "max_odometer": {"$ifNull": ["$max_odometer", 0]}
+            }},
+        ]
+
+    current = {"$match": {"date": {"$gte": start_date, "$lte": end_date}}}
+    return vehicle_days + [
+        # KM traveled = max odometer - min odometer for the day
+        {"$addFields": {"km_traveled": {"$max": [0, {"$subtract": ["$max_odometer", "$min_odometer"]}]}}},
+        {"$facet": {
+            "daily": [current, {"$sort": {"date": 1, "vehicle_id": 1}}],
+            "vehicles": [
+                current,
+                {"$group": {
+                    "_id": "$vehicle_id",
+                    "total_km": {"$sum": "$km_traveled"},
+                    "days_active": {"$sum": 1},
+                    "max_daily_km": {"$max": "$km_traveled"},
+                    "min_daily_km": {"$min": "$km_traveled"}
+                }}
+            ],
+            "previous": [
+                {"$match": {"date": {"$gte": prev_start, "$lte": prev_end}}},
+                {"$group": {"_id": None, "total_km": {"$sum": "$km_traveled"}, "vehicle_days": {"$sum": 1}}}
+            ]
+        }}
+    ]
+
+
+async def fetch_ride_tracking(
+    db,
+    vehicle_ids: List[str],
+    start_date: str,
+    end_date: str,
+    prev_start: str,
+    prev_end: str,
+    source: str = "summary"
+) -> Dict:
+    """{"daily": [...], "vehicles": [...], "previous": [...]} in one round trip"""
+    collection = db.montra_feed_data if source == "raw" else db[SUMMARY_COLLECTION]
+    pipeline = ride_tracking_pipeline(vehicle_ids, start_date, end_date, prev_start, prev_end, source)
+    result = await collection.aggregate(pipeline, allowDiskUse=True).to_list(1)
+    return result[0] if result else {"daily": [], "vehicles": [], "previous": []}
@@ -0,0 +1,647 @@
+"""
+Montra Feed Import
+Vectorized parsing and enrichment of Montra vehicle telemetry feed files.
+
+A feed file is one vehicle's telemetry for one day, named
+"P60G2512500002032 - 01 Sep 2025.csv", with 21 columns (A-U). Rows are
+sorted by the time column, tagged with the filename metadata and enriched
+with Mode Name / Mode Type by merging against the ride mode mapping table,
+then turned into documents in one pass over whole columns.
+
+Documents keep the columns of the file and the metadata fields of the
+previous row-by-row importer, plus the canonical typed telemetry fields of
+telemetry_fields.py (SOC, odometer and speed as numbers, whatever the header
+was called), marked with ``schema_version``. ``python montra_feed_import.py
+canonicalize`` adds the canonical fields to rows imported before they
+existed.
+
+Imports are idempotent: every row carries its natural key ``feed_ts`` (the
+time column A value), backed by a unique (vehicle_id, feed_ts) index, and
+inserts skip rows that already exist. Each imported file is recorded in
+``feed_files`` by content hash, so re-uploading the same file returns
+immediately. ``python montra_feed_import.py dedupe`` cleans up duplicates
+imported before the index existed and then creates it.
+
+Batch ingestion (many files or a ZIP) parses and inserts each file in a
+worker process of a spawn-based ``ProcessPoolExecutor``; every worker holds
+its own synchronous pymongo client, so the event loop only waits on futures.
+"""
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import re
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from montra_feed_store import buckets_enabled, write_feed_buckets_sync
+from telemetry_fields import CANONICAL_NUMERIC_FIELDS, TELEMETRY_SCHEMA_VERSION, canonical_values
+from vehicle_day_summary import summarize_imported_sync
+
+logger = logging.getLogger(__name__)
+
+FEED_FILENAME_PATTERN = re.compile(r"^([A-Z0-9]+)\s*-\s*(\d{2})\s+([A-Za-z]+)\s+(\d{4})\.(csv|xlsx)$")
+EXPECTED_COLUMNS = 21
+SEPARATOR = "-"
+INSERT_BATCH_SIZE = 5000
+RIDE_MODE_COLUMN = "Ride Mode"
+FEED_FILES_COLLECTION = "feed_files"
+NATURAL_KEY_INDEX = "uniq_vehicle_feed_ts"
+# Header of time column A in feeds imported before feed_ts existed
+LEGACY_TIME_FIELDS = ["Date", "Time", "Timestamp"]
+DUPLICATE_KEY_ERROR = 11000
+INGEST_WORKERS = int(os.environ.get('MONTRA_IMPORT_WORKERS', '0')) or os.cpu_count() or 1
+
+
+class FeedFileError(ValueError):
+    """A feed file that cannot be imported (bad name, format or shape)"""
+
+
+def parse_feed_filename(filename: str) -> Dict:
+    """Vehicle ID and day metadata from "VEHICLE_ID - DD MMM YYYY.csv" """
+    match = FEED_FILENAME_PATTERN.match(filename)
+    if not match:
+        raise FeedFileError(
+            f"Invalid filename format. Expected: 'VEHICLE_ID - DD MMM YYYY.csv'. Got: {filename}"
+        )
+    vehicle_id, day, month, year, extension = match.groups()
+    try:
+        # Convert "01 Sep 2025" to ISO date "2025-09-01"
+        iso_date = datetime.strptime(f"{day} {month} {year}", "%d %b %Y").strftime("%Y-%m-%d")
+    except ValueError:
+        # Fallback if parsing fails
+        iso_date = f"{year}-01-01"
+        logger.warning(f"Could not parse date '{day} {month} {year}', using fallback: {iso_date}")
+    return {
+        "vehicle_id": vehicle_id,
+        "day": day,
+        "month": month,
+        "year": year,
+        "iso_date": iso_date,
+        "extension": extension.lower(),
+    }
+
+
+def read_feed_frame(content: bytes, extension: str) -> pd.DataFrame:
+    if extension == 'csv':
+        return pd.read_csv(io.BytesIO(content))
+    if extension == 'xlsx':
+        return pd.read_excel(io.BytesIO(content))
+    raise FeedFileError("Unsupported file format")
+
+
+def prepare_feed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort chronologically by the time column (A) and check the A-U shape"""
+    # CRITICAL: battery consumption calculations rely on chronological order
+    time_col = df.columns[0]
+    try:
+        df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
+        df = df.sort_values(by=time_col, kind='stable').reset_index(drop=True)
+    except Exception as sort_error:
+        logger.warning(f"Could not sort by time column: {sort_error}. Proceeding with original order.")
+
+    if len(df.columns) != EXPECTED_COLUMNS:
+        raise FeedFileError(f"Expected {EXPECTED_COLUMNS} columns (A-U), but found {len(df.columns)} columns")
+    return df
+
+
+def mode_table_frame(mode_dict: Dict[str, Dict]) -> pd.DataFrame:
+    """Ride mode mapping as a frame keyed by "<Model> <Ride Mode>" """
+    return pd.DataFrame(
+        [(key, value['mode_name'], value['mode_type']) for key, value in mode_dict.items()],
+        columns=['_mode_key', 'mode_name', 'mode_type']
+    )
+
+
+def enrich_modes(ride_modes: pd.Series, model: Optional[str], mode_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized equivalent of enrich_with_mode_data for one vehicle's rows:
+    empty ride mode -> Unknown, unmapped vehicle -> Unknown Model,
+    unmapped "<Model> <Ride Mode>" -> Unknown Mode.
+    """
+    values = ride_modes.astype(object)
+    # Same truthiness as the per-row importer: "", 0 and None are "no ride mode", NaN is not
+    empty = values.isin(["", 0]) | (values.isnull() & (values.astype(str) == "None"))
+
+    result = pd.DataFrame({"mode_name": "Unknown", "mode_type": "Unknown"}, index=ride_modes.index)
+    if model is None or model == "Unknown":
+        result.loc[~empty, "mode_name"] = "Unknown Model"
+        return result
+
+    keys = pd.DataFrame({'_mode_key': model + " " + values.astype(str)}, index=ride_modes.index)
+    merged = keys.merge(mode_table, on='_mode_key', how='left')
+    merged.index = ride_modes.index
+    found = merged['mode_name'].notna()
+    result.loc[~empty & found, "mode_name"] = merged['mode_name']
+    result.loc[~empty & found, "mode_type"] = merged['mode_type']
+    result.loc[~empty & ~found, "mode_name"] = "Unknown Mode"
+    return result
+
+
+def build_feed_documents(
+    df: pd.DataFrame,
+    meta: Dict,
+    filename: str,
+    registration_number: str,
+    model_dict: Dict[str, str],
+    mode_dict: Dict[str, Dict],
+    mode_table: Optional[pd.DataFrame] = None
+) -> List[Dict]:
+    """montra_feed_data documents for a prepared feed frame"""
+    day, month, year = meta["day"], meta["month"], meta["year"]
+    frame = pd.DataFrame({
+        "vehicle_id": meta["vehicle_id"],
+        "date": meta["iso_date"],  # Store in ISO format for easy querying
+        "date_display": f"{day} {month} {year}",  # Keep original for display
+        "day": day,
+        "month": month,
+        "year": year,
+        "registration_number": registration_number,
+        "filename": filename,
+        "imported_at": datetime.now(timezone.utc).isoformat(),
+    }, index=df.index)
+    # A feed column with the same name as a metadata field wins, as before
+    frame = pd.concat([frame.drop(columns=[c for c in frame.columns if c in df.columns]), df], axis=1)
+
+    # Sheet-style filename columns (Y-AC) kept for the feed database view
+    frame["Vehicle ID"] = meta["vehicle_id"]
+    frame["Separator"] = SEPARATOR
+    frame["Day"] = day
+    frame["Month"] = month
+    frame["Registration Number"] = registration_number
+
+    if RIDE_MODE_COLUMN in df.columns:
+        model = model_dict.get(registration_number if registration_number else meta["vehicle_id"])
+        if mode_table is None:
+            mode_table = mode_table_frame(mode_dict)
+        modes = enrich_modes(df[RIDE_MODE_COLUMN], model, mode_table)
+        frame["mode_name"] = modes["mode_name"]
+        frame["mode_type"] = modes["mode_type"]
+    else:
+        frame["mode_name"] = "Unknown"
+        frame["mode_type"] = "Unknown"
+
+    # Natural key of the row together with vehicle_id
+    frame["feed_ts"] = df[df.columns[0]]
+
+    # Canonical typed telemetry, resolved from whichever headers the file uses
+    for field, values in canonical_values(df).items():
+        frame[field] = pd.Series(values, index=df.index, dtype=object)
+    frame["schema_version"] = TELEMETRY_SCHEMA_VERSION
+
+    # NaT cannot be encoded as BSON
+    for column in frame.columns[frame.dtypes.map(pd.api.types.is_datetime64_any_dtype)]:
+        frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+
+    return frame_records(frame)
+
+
+def frame_records(frame: pd.DataFrame) -> List[Dict]:
+    """
+    Same result as ``frame.to_dict('records')`` but converts whole columns with
+    ``tolist()`` instead of boxing every value one at a time
+    """
+    columns = frame.columns.tolist()
+    values = [frame[column].tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def feed_file_record(meta: Dict, filename: str, file_hash: str, size_bytes: int, rows: int, duplicates: int) -> Dict:
+    """feed_files document for an imported file"""
+    return {
+        "id": str(uuid.uuid4()),
+        "content_hash": file_hash,
+        "filename": filename,
+        "vehicle_id": meta["vehicle_id"],
+        "date": meta["iso_date"],
+        "month": meta["month"],
+        "year": meta["year"],
+        "rows": rows,
+        "duplicates_skipped": duplicates,
+        "size_bytes": size_bytes,
+        "imported_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _count_duplicates(error: BulkWriteError) -> int:
+    """Duplicate-key failures in an unordered insert; anything else is re-raised"""
+    write_errors = error.details.get("writeErrors", [])
+    if any(e.get("code") != DUPLICATE_KEY_ERROR for e in write_errors):
+        raise error
+    return len(write_errors)
+
+
+async def insert_feed_documents(collection, docs: List[Dict], batch_size: int = INSERT_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Insert documents in unordered batches, ignoring rows whose natural key
+    already exists. Returns (inserted, duplicates skipped).
+    """
+    inserted = duplicates = 0
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            skipped = _count_duplicates(e)
+            inserted += len(batch) - skipped
+            duplicates += skipped
+    return inserted, duplicates
+
+
+def insert_feed_documents_sync(collection, docs: List[Dict], batch_size: int = INSERT_BATCH_SIZE) -> Tuple[int, int]:
+    """pymongo counterpart of insert_feed_documents for worker processes"""
+    inserted = duplicates = 0
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        try:
+            result = collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            skipped = _count_duplicates(e)
+            inserted += len(batch) - skipped
+            duplicates += skipped
+    return inserted, duplicates
+
+
+# ==================== BATCH INGESTION ====================
+
+def expand_feed_uploads(uploads: List[Tuple[str, bytes]]) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+    """
+    Flatten uploaded files and ZIP archives into (filename, content) feed files.
+    Returns the feed files and the names of skipped archive entries.
+    """
+    feed_files, skipped = [], []
+    for name, content in uploads:
+        if not name.lower().endswith('.zip'):
+            feed_files.append((name, content))
+            continue
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            for entry in archive.infolist():
+                entry_name = os.path.basename(entry.filename)
+                if entry.is_dir() or entry.filename.startswith('__MACOSX') or entry_name.startswith('.'):
+                    continue
+                if not entry_name.lower().endswith(('.csv', '.xlsx')):
+                    skipped.append(entry.filename)
+                    continue
+                feed_files.append((entry_name, archive.read(entry)))
+    return feed_files, skipped
+
+
+# Per-process database handle, set by init_ingest_worker (None = parse only)
+_worker_db = None
+
+
+def init_ingest_worker(mongo_url: Optional[str], db_name: str) -> None:
+    global _worker_db
+    logging.basicConfig(level=logging.INFO)
+    if mongo_url:
+        from pymongo import MongoClient
+        _worker_db = MongoClient(mongo_url)[db_name]
+
+
+def ingest_feed_file(
+    filename: str,
+    content: bytes,
+    registration_number: str,
+    model_dict: Dict[str, str],
+    mode_dict: Dict[str, Dict],
+    batch_size: int = INSERT_BATCH_SIZE
+) -> Dict:
+    """Parse, enrich and insert one feed file inside a worker process"""
+    started = time.perf_counter()
+    result = {"filename": filename, "success": False, "rows": 0, "inserted": 0, "duplicates_skipped": 0}
+    try:
+        meta = parse_feed_filename(filename)
+        result.update(vehicle_id=meta["vehicle_id"], date=meta["iso_date"])
+        file_hash = content_hash(content)
+
+        if _worker_db is not None:
+            previous = _worker_db[FEED_FILES_COLLECTION].find_one({"content_hash": file_hash}, {"_id": 0})
+            if previous:
+                result.update(success=True, already_imported=True, previous_import=previous)
+                result["seconds"] = round(time.perf_counter() - started, 3)
+                return result
+
+        df = prepare_feed_frame(read_feed_frame(content, meta["extension"]))
+        docs = build_feed_documents(df, meta, filename, registration_number, model_dict, mode_dict)
+        result["rows"] = len(docs)
+
+        if _worker_db is not None:
+            inserted, duplicates = insert_feed_documents_sync(_worker_db.montra_feed_data, docs, batch_size)
+            if buckets_enabled():
+                write_feed_buckets_sync(_worker_db, docs)
+            summarize_imported_sync(_worker_db, docs)
+            result.update(inserted=inserted, duplicates_skipped=duplicates)
+            _worker_db[FEED_FILES_COLLECTION].update_one(
+                {"content_hash": file_hash},
+                {"$setOnInsert": feed_file_record(meta, filename, file_hash, len(content), inserted, duplicates)},
+                upsert=True
+            )
+        result["success"] = True
+    except FeedFileError as e:
+        result["error"] = str(e)
+    except Exception as e:
+        logger.error(f"Error importing Montra feed {filename}: {str(e)}")
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def create_ingest_pool(workers: int = INGEST_WORKERS, mongo_url: Optional[str] = None, db_name: str = None) -> ProcessPoolExecutor:
+    # spawn, not fork: the web process runs an event loop and driver threads
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_ingest_worker,
+        initargs=(mongo_url, db_name or 'nura_pulse_db')
+    )
+
+
+_ingest_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_ingest_pool() -> ProcessPoolExecutor:
+    """Process-wide pool writing to the app's database, created on first use"""
+    global _ingest_pool
+    if _ingest_pool is None:
+        _ingest_pool = create_ingest_pool(
+            mongo_url=os.environ['MONGO_URL'],
+            db_name=os.environ.get('DB_NAME', 'nura_pulse_db')
+        )
+    return _ingest_pool
+
+
+def shutdown_ingest_pool() -> None:
+    global _ingest_pool
+    if _ingest_pool is not None:
+        _ingest_pool.shutdown(wait=False, cancel_futures=True)
+        _ingest_pool = None
+
+
+# ==================== DEDUPLICATION ====================
+
+async def ensure_feed_indexes(db) -> None:
+    """Natural-key and file-hash indexes (the natural key needs a deduplicated collection)"""
+    await db[FEED_FILES_COLLECTION].create_index([("content_hash", 1)], name="uniq_content_hash", unique=True)
+    await db[FEED_FILES_COLLECTION].create_index([("imported_at", -1)], name="idx_imported_at")
+    await db[FEED_FILES_COLLECTION].create_index([("vehicle_id", 1), ("date", 1)], name="idx_vehicle_date")
+    await db.montra_feed_data.create_index(
+        [("vehicle_id", 1), ("feed_ts", 1)],
+        name=NATURAL_KEY_INDEX,
+        unique=True,
+        # Rows without a parsable timestamp have no natural key
+        partialFilterExpression={"feed_ts": {"$type": "date"}}
+    )
+
+
+# ==================== FEED FILE MANIFEST ====================
+
+def feed_file_listing(record: Dict) -> Dict:
+    """Feed database view entry for a feed_files document"""
+    year = record.get("year") or "2024"  # Default to 2024 if year is missing
+    return {
+        "id": record["id"],
+        "vehicle_id": record["vehicle_id"],
+        "date": record["date"],
+        "filename": record.get("filename") or "Unknown",
+        "month": record.get("month"),
+        "year": year,
+        "month_year": f"{record.get('month')} {year}" if record.get("month") else None,
+        "record_count": record.get("rows", 0),
+        "duplicates_skipped": record.get("duplicates_skipped", 0),
+        "uploaded_at": record.get("imported_at"),
+        "file_size": record.get("size_bytes"),
+    }
+
+
+async def list_feed_files(db, skip: int = 0, limit: int = 500) -> Tuple[List[Dict], int]:
+    """One page of the manifest, newest imports first, and the total number of files"""
+    total = await db[FEED_FILES_COLLECTION].count_documents({})
+    records = await db[FEED_FILES_COLLECTION].find({}, {"_id": 0}).sort(
+        [("imported_at", -1), ("id", 1)]
+    ).skip(skip).limit(limit).to_list(limit)
+    return [feed_file_listing(r) for r in records], total
+
+
+async def backfill_feed_manifest(db) -> Dict:
+    """
+    Manifest entries for vehicle-days imported before feed_files existed,
+    from their vehicle day summaries. These have no file bytes to hash, so
+    their content_hash is a "legacy:" key that can never match an upload.
+    """
+    from vehicle_day_summary import SUMMARY_COLLECTION
+
+    known = {
+        (r["vehicle_id"], r["date"])
+        async for r in db[FEED_FILES_COLLECTION].find({}, {"_id": 0, "vehicle_id": 1, "date": 1})
+    }
+    created = 0
+    async for summary in db[SUMMARY_COLLECTION].find(
+        {}, {"_id": 0, "vehicle_id": 1, "date": 1, "filenames": 1, "month": 1, "year": 1, "rows": 1, "imported_at": 1}
+    ):
+        key = (summary["vehicle_id"], summary["date"])
+        if key in known:
+            continue
+        legacy_hash = f"legacy:{key[0]}|{key[1]}"
+        result = await db[FEED_FILES_COLLECTION].update_one(
+            {"content_hash": legacy_hash},
+            {"$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "content_hash": legacy_hash,
+                "filename": ", ".join(summary.get("filenames") or []) or None,
+                "vehicle_id": key[0],
+                "date": key[1],
+                "month": summary.get("month"),
+                "year": summary.get("year"),
+                "rows": summary.get("rows", 0),
+                "duplicates_skipped": 0,
+                "size_bytes": None,
+                "imported_at": summary.get("imported_at"),
+                "legacy": True,
+            }},
+            upsert=True
+        )
+        created += 1 if result.upserted_id else 0
+    if created:
+        logger.info(f"Feed manifest backfill: {created} legacy vehicle-days added to {FEED_FILES_COLLECTION}")
+    return {"created": created}
+
+
+async def resolve_feed_files(db, identifiers: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Manifest entries for the files selected in the feed database view, by
+    manifest id (or vehicle_id + date for older clients). Returns (found,
+    not found identifiers).
+    """
+    found, missing = [], []
+    for identifier in identifiers:
+        if identifier.get("id"):
+            record = await db[FEED_FILES_COLLECTION].find_one({"id": identifier["id"]}, {"_id": 0})
+        elif identifier.get("vehicle_id") and identifier.get("date"):
+            record = await db[FEED_FILES_COLLECTION].find_one(
+                {"vehicle_id": identifier["vehicle_id"], "date": identifier["date"]}, {"_id": 0}
+            )
+        else:
+            record = None
+        if record:
+            found.append(record)
+        else:
+            missing.append(identifier)
+    return found, missing
+
+
+def _effective_ts() -> Dict:
+    """feed_ts, or the legacy time field the backfill would copy into it"""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": f"${field}"}, "date"]}, "then": f"${field}"}
+            for field in ["feed_ts"] + LEGACY_TIME_FIELDS
+        ],
+        "default": None
+    }}
+
+
+async def dedupe_feed_data(db, dry_run: bool = False, batch_size: int = 10000) -> Dict:
+    """
+    One-off cleanup: delete every duplicate (vehicle_id, timestamp) row except
+    the first imported one, backfill feed_ts on legacy rows, then create the
+    unique index so duplicates cannot come back.
+
+    Legacy rows have no feed_ts, so the partial natural-key index ignores
+    them and may already exist. Duplicates are therefore found on feed_ts or
+    the legacy time field it will be filled from, and deleted before the
+    backfill moves the legacy rows under the index.
+    """
+    started = time.perf_counter()
+
+    # The smallest ObjectId is the earliest insert, which is the copy that is kept
+    pipeline = [
+        {"$match": {"$or": [{field: {"$type": "date"}} for field in ["feed_ts"] + LEGACY_TIME_FIELDS]}},
+        {"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "feed_ts": _effective_ts()},
+            "keep": {"$min": "$_id"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}, "_id.feed_ts": {"$ne": None}}},
+    ]
+    duplicate_keys = deleted = 0
+    pending = []
+    async for group in db.montra_feed_data.aggregate(pipeline, allowDiskUse=True):
+        duplicate_keys += 1
+        pending.extend(_id for _id in group["ids"] if _id != group["keep"])
+        if len(pending) >= batch_size:
+            if not dry_run:
+                deleted += (await db.montra_feed_data.delete_many({"_id": {"$in": pending}})).deleted_count
+            else:
+                deleted += len(pending)
+            logger.info(f"Montra dedupe: {deleted} duplicate rows removed so far")
+            pending = []
+    if pending:
+        if not dry_run:
+            deleted += (await db.montra_feed_data.delete_many({"_id": {"$in": pending}})).deleted_count
+        else:
+            deleted += len(pending)
+
+    backfilled = 0
+    for field in LEGACY_TIME_FIELDS:
+        query = {"feed_ts": {"$exists": False}, field: {"$type": "date"}}
+        if dry_run:
+            backfilled += await db.montra_feed_data.count_documents(query)
+        else:
+            result = await db.montra_feed_data.update_many(query, [{"$set": {"feed_ts": f"${field}"}}])
+            backfilled += result.modified_count
+
+    if not dry_run:
+        await ensure_feed_indexes(db)
+
+    return {
+        "success": True,
+        "dry_run": dry_run,
+        "feed_ts_backfilled": backfilled,
+        "duplicate_keys": duplicate_keys,
+        "duplicates_deleted": deleted,
+        "duration_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def canonicalize_feed_data(db, batch_size: int = INSERT_BATCH_SIZE) -> Dict:
+    """
+    Add the canonical typed telemetry fields to rows imported before they
+    existed (rows without the current ``schema_version``). Rows are read in
+    _id order and updated in bulk batches; a stopped run can simply be
+    started again, as finished rows no longer match.
+    """
+    started = time.perf_counter()
+    query = {"schema_version": {"$ne": TELEMETRY_SCHEMA_VERSION}}
+    projection = {"_id": 1, **{f: 1 for aliases in CANONICAL_NUMERIC_FIELDS.values() for f in aliases}}
+    converted, last_id = 0, None
+    while True:
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+        rows = await db.montra_feed_data.find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not rows:
+            break
+        values = canonical_values(pd.DataFrame.from_records(rows))
+        await db.montra_feed_data.bulk_write([
+            UpdateOne({"_id": row["_id"]}, {"$set": {
+                **{field: column[i] for field, column in values.items()},
+                "schema_version": TELEMETRY_SCHEMA_VERSION
+            }})
+            for i, row in enumerate(rows)
+        ], ordered=False)
+        converted += len(rows)
+        last_id = rows[-1]["_id"]
+        logger.info(f"Montra canonicalize: {converted} rows converted so far")
+
+    return {
+        "success": True,
+        "rows_converted": converted,
+        "schema_version": TELEMETRY_SCHEMA_VERSION,
+        "duration_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Montra feed maintenance")
+    parser.add_argument("command", choices=["dedupe", "canonicalize"])
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be changed (dedupe)")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+        if args.command == "canonicalize":
+            report = await canonicalize_feed_data(database)
+            print(f"Added canonical telemetry fields to {report['rows_converted']} rows ({report['duration_seconds']}s)")
+        else:
+            report = await dedupe_feed_data(database, dry_run=args.dry_run)
+            print(f"Backfilled feed_ts on {report['feed_ts_backfilled']} rows, "
+                  f"{report['duplicate_keys']} duplicated keys, "
+                  f"{'would delete' if args.dry_run else 'deleted'} {report['duplicates_deleted']} rows "
+                  f"({report['duration_seconds']}s)")
+        client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,362 @@
+"""
+Montra Feed Store
+Data-access layer for Montra telemetry rows, so read endpoints do not depend
+on how the samples are laid out in MongoDB.
+
+Two layouts are available, selected with ``MONTRA_FEED_STORE``:
+
+* ``documents`` (default): one ``montra_feed_data`` document per sample.
+* ``buckets``: one ``montra_feed_buckets`` document per vehicle, date and
+  hour of ``feed_ts``. Values that are the same for every sample in the bucket
+  (vehicle id, registration, filename, import metadata, ...) are stored once,
+  and every other field is stored as a column array. Rows without a
+  timestamp go to hour -1. A bucket holds at most ``BUCKET_MAX_ROWS``
+  samples; larger hours continue in the next ``seq``.
+
+Both stores return the same row dicts (``montra_feed_data`` documents without
+``_id``), in time order.
+
+In bucket mode, imports still write ``montra_feed_data``, because the feed
+database, download and analytics cache read it, and also write the buckets.
+``python montra_feed_store.py backfill`` builds buckets for data imported
+earlier. Writing buckets is idempotent: a vehicle-day is merged by its natural
+key ``feed_ts`` and rewritten.
+"""
+
+import logging
+import os
+from itertools import groupby, repeat
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import DeleteMany, InsertOne
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_COLLECTION = "montra_feed_buckets"
+BUCKET_MAX_ROWS = 5000
+NO_TIMESTAMP_HOUR = -1
+
+FEED_STORE = os.environ.get("MONTRA_FEED_STORE", "documents").lower()
+
+CONSTANT = "c"
+COLUMN = "v"
+
+
+# ==================== BUCKET ENCODING ====================
+
+def _is_constant(values: List) -> bool:
+    first = values[0]
+    # NaN never equals itself, so a NaN column stays columnar
+    return all(value == first for value in values)
+
+
+def encode_bucket(rows: List[Dict], vehicle_id: str, date: str, hour: int, seq: int) -> Dict:
+    """One bucket document for rows of the same vehicle, date and hour"""
+    fields = [field for field in rows[0] if field != "_id"]
+    kinds, values = [], []
+    for field in fields:
+        column = [row.get(field) for row in rows]
+        if _is_constant(column):
+            kinds.append(CONSTANT)
+            values.append(column[0])
+        else:
+            kinds.append(COLUMN)
+            values.append(column)
+    timestamps = [row["feed_ts"] for row in rows if row.get("feed_ts") is not None]
+    return {
+        "_id": f"{vehicle_id}|{date}|{hour:02d}|{seq}",
+        "vehicle_id": vehicle_id,
+        "date": date,
+        "hour": hour,
+        "seq": seq,
+        "count": len(rows),
+        "start": timestamps[0] if timestamps else None,
+        "end": timestamps[-1] if timestamps else None,
+        "fields": fields,
+        "kinds": kinds,
+        "values": values,
+    }
+
+
+def decode_bucket(bucket: Dict, fields: Optional[List[str]] = None) -> List[Dict]:
+    """Rows of a bucket, as they would be stored in montra_feed_data (optionally only some fields)"""
+    count = bucket["count"]
+    wanted = None if fields is None else set(fields)
+    names, columns = [], []
+    for name, kind, value in zip(bucket["fields"], bucket["kinds"], bucket["values"]):
+        if wanted is not None and name not in wanted:
+            continue
+        names.append(name)
+        columns.append(value if kind == COLUMN else repeat(value, count))
+    if not columns:
+        return [{} for _ in range(count)]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _row_hour(row: Dict) -> int:
+    ts = row.get("feed_ts")
+    return ts.hour if ts is not None else NO_TIMESTAMP_HOUR
+
+
+def _time_order(row: Dict):
+    ts = row.get("feed_ts")
+    return (ts is not None, ts if ts is not None else 0)
+
+
+def build_buckets(rows: List[Dict]) -> List[Dict]:
+    """Bucket documents for rows of one vehicle-day"""
+    buckets = []
+    ordered = sorted(rows, key=_time_order)
+    for hour, hour_rows in groupby(ordered, key=_row_hour):
+        hour_rows = list(hour_rows)
+        for seq, start in enumerate(range(0, len(hour_rows), BUCKET_MAX_ROWS)):
+            chunk = hour_rows[start:start + BUCKET_MAX_ROWS]
+            buckets.append(encode_bucket(chunk, chunk[0]["vehicle_id"], chunk[0]["date"], hour, seq))
+    return buckets
+
+
+def merge_rows(existing: List[Dict], new: List[Dict]) -> Tuple[List[Dict], int, int]:
+    """
+    Add new rows to a vehicle-day, skipping timestamps it already has.
+    Returns (merged rows, inserted, duplicates skipped).
+    """
+    seen = {row["feed_ts"] for row in existing if row.get("feed_ts") is not None}
+    merged = list(existing)
+    inserted = duplicates = 0
+    for row in new:
+        ts = row.get("feed_ts")
+        if ts is not None:
+            if ts in seen:
+                duplicates += 1
+                continue
+            seen.add(ts)
+        merged.append({field: value for field, value in row.items() if field != "_id"})
+        inserted += 1
+    return merged, inserted, duplicates
+
+
+def _day_groups(docs: List[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+    groups = {}
+    for doc in docs:
+        groups.setdefault((doc["vehicle_id"], doc["date"]), []).append(doc)
+    return groups
+
+
+def _day_rewrite(vehicle_id: str, date: str, rows: List[Dict]) -> List:
+    ops = [DeleteMany({"vehicle_id": vehicle_id, "date": date})]
+    ops.extend(InsertOne(bucket) for bucket in build_buckets(rows))
+    return ops
+
+
+_BUCKET_SORT = [("date", 1), ("hour", 1), ("seq", 1)]
+
+
+async def write_feed_buckets(db, docs: List[Dict]) -> Tuple[int, int]:
+    """Merge feed rows into their vehicle-day buckets. Returns (inserted, duplicates)."""
+    total_inserted = total_duplicates = 0
+    for (vehicle_id, date), rows in _day_groups(docs).items():
+        existing = []
+        async for bucket in db[BUCKETS_COLLECTION].find({"vehicle_id": vehicle_id, "date": date}).sort(_BUCKET_SORT):
+            existing.extend(decode_bucket(bucket))
+        merged, inserted, duplicates = merge_rows(existing, rows)
+        total_inserted += inserted
+        total_duplicates += duplicates
+        if inserted:
+            await db[BUCKETS_COLLECTION].bulk_write(_day_rewrite(vehicle_id, date, merged), ordered=True)
+    return total_inserted, total_duplicates
+
+
+def write_feed_buckets_sync(db, docs: List[Dict]) -> Tuple[int, int]:
+    """pymongo counterpart of write_feed_buckets for ingestion worker processes"""
+    total_inserted = total_duplicates = 0
+    for (vehicle_id, date), rows in _day_groups(docs).items():
+        existing = []
+        for bucket in db[BUCKETS_COLLECTION].find({"vehicle_id": vehicle_id, "date": date}).sort(_BUCKET_SORT):
+            existing.extend(decode_bucket(bucket))
+        merged, inserted, duplicates = merge_rows(existing, rows)
+        total_inserted += inserted
+        total_duplicates += duplicates
+        if inserted:
+            db[BUCKETS_COLLECTION].bulk_write(_day_rewrite(vehicle_id, date, merged), ordered=True)
+    return total_inserted, total_duplicates
+
+
+async def delete_feed_buckets(db, vehicle_id: str, date: str) -> int:
+    result = await db[BUCKETS_COLLECTION].delete_many({"vehicle_id": vehicle_id, "date": date})
+    return result.deleted_count
+
+
+async def ensure_feed_bucket_indexes(db) -> None:
+    await db[BUCKETS_COLLECTION].create_index(
+        [("vehicle_id", 1), ("date", 1), ("hour", 1), ("seq", 1)],
+        name="idx_vehicle_date_hour_seq"
+    )
+
+
+# ==================== STORES ====================
+
+class DocumentFeedStore:
+    """One montra_feed_data document per sample"""
+
+    name = "documents"
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def _projection(fields: Optional[List[str]]) -> Dict:
+        projection = {"_id": 0}
+        if fields:
+            projection.update({field: 1 for field in fields})
+        return projection
+
+    async def day_rows(
+        self, vehicle_id: str, date: str, limit: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        query = {"vehicle_id": vehicle_id, "date": date}
+        projection = self._projection(fields)
+        try:
+            cursor = self.db.montra_feed_data.find(query, projection).hint("idx_vehicle_date").sort("Date", 1)
+            if limit:
+                cursor = cursor.limit(limit)
+            return await cursor.to_list(length=limit)
+        except Exception as hint_error:
+            logger.warning(f"Index not found, using query without hint: {str(hint_error)}")
+            cursor = self.db.montra_feed_data.find(query, projection).sort("Date", 1)
+            if limit:
+                cursor = cursor.limit(limit)
+            return await cursor.to_list(length=limit)
+
+    async def range_rows(
+        self, vehicle_id: str, start_date: str, end_date: str,
+        limit: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        query = {"vehicle_id": vehicle_id, "date": {"$gte": start_date, "$lte": end_date}}
+        cursor = self.db.montra_feed_data.find(query, self._projection(fields)).sort("date", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def vehicles_range_rows(
+        self, vehicle_ids: List[str], start_date: str, end_date: str, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Rows of several vehicles in one query, ordered by vehicle and date"""
+        query = {"vehicle_id": {"$in": vehicle_ids}, "date": {"$gte": start_date, "$lte": end_date}}
+        cursor = self.db.montra_feed_data.find(query, self._projection(fields)).sort([("vehicle_id", 1), ("date", 1)])
+        return await cursor.to_list(length=None)
+
+
+class BucketFeedStore:
+    """Columnar montra_feed_buckets documents per vehicle, date and hour"""
+
+    name = "buckets"
+
+    def __init__(self, db):
+        self.db = db
+
+    async def _rows(
+        self, query: Dict, limit: Optional[int], fields: Optional[List[str]], sort: List = _BUCKET_SORT
+    ) -> List[Dict]:
+        rows = []
+        async for bucket in self.db[BUCKETS_COLLECTION].find(query, {"_id": 0}).sort(sort):
+            rows.extend(decode_bucket(bucket, fields))
+            if limit and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    async def day_rows(
+        self, vehicle_id: str, date: str, limit: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        return await self._rows({"vehicle_id": vehicle_id, "date": date}, limit, fields)
+
+    async def range_rows(
+        self, vehicle_id: str, start_date: str, end_date: str,
+        limit: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        query = {"vehicle_id": vehicle_id, "date": {"$gte": start_date, "$lte": end_date}}
+        return await self._rows(query, limit, fields)
+
+    async def vehicles_range_rows(
+        self, vehicle_ids: List[str], start_date: str, end_date: str, fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        query = {"vehicle_id": {"$in": vehicle_ids}, "date": {"$gte": start_date, "$lte": end_date}}
+        return await self._rows(query, None, fields, sort=[("vehicle_id", 1)] + _BUCKET_SORT)
+
+
+FEED_STORES = {store.name: store for store in (DocumentFeedStore, BucketFeedStore)}
+
+
+def get_feed_store(db, name: Optional[str] = None):
+    """Store selected by name or MONTRA_FEED_STORE (unknown names fall back to documents)"""
+    store = FEED_STORES.get((name or FEED_STORE).lower())
+    if store is None:
+        logger.error(f"Unknown MONTRA_FEED_STORE {name or FEED_STORE!r}, using documents")
+        store = DocumentFeedStore
+    return store(db)
+
+
+def buckets_enabled() -> bool:
+    return FEED_STORE == BucketFeedStore.name
+
+
+# ==================== BACKFILL ====================
+
+async def backfill_feed_buckets(db, vehicle_id: Optional[str] = None, force: bool = False) -> Dict:
+    """
+    Build buckets from montra_feed_data, one vehicle-day at a time. Days that
+    already have buckets are skipped unless force is set.
+    """
+    match = {"vehicle_id": vehicle_id} if vehicle_id else {}
+    days = await db.montra_feed_data.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"vehicle_id": "$vehicle_id", "date": "$date"}}},
+        {"$sort": {"_id.vehicle_id": 1, "_id.date": 1}},
+    ], allowDiskUse=True).to_list(length=None)
+
+    built = skipped = rows_total = 0
+    for day in days:
+        key = day["_id"]
+        if not key.get("vehicle_id") or not key.get("date"):
+            continue
+        if not force and await db[BUCKETS_COLLECTION].find_one({"vehicle_id": key["vehicle_id"], "date": key["date"]}, {"_id": 1}):
+            skipped += 1
+            continue
+        rows = await db.montra_feed_data.find(
+            {"vehicle_id": key["vehicle_id"], "date": key["date"]}, {"_id": 0}
+        ).sort([("feed_ts", 1), ("Date", 1)]).to_list(length=None)
+        if force:
+            await delete_feed_buckets(db, key["vehicle_id"], key["date"])
+        inserted, _ = await write_feed_buckets(db, rows)
+        rows_total += inserted
+        built += 1
+        if built % 100 == 0:
+            logger.info(f"Feed bucket backfill: {built} vehicle-days, {rows_total} rows")
+
+    return {"success": True, "vehicle_days": len(days), "built": built, "skipped": skipped, "rows": rows_total}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Montra feed bucket maintenance")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--vehicle", default=None, help="Only this vehicle id")
+    parser.add_argument("--force", action="store_true", help="Rebuild days that already have buckets")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+        await ensure_feed_bucket_indexes(database)
+        report = await backfill_feed_buckets(database, vehicle_id=args.vehicle, force=args.force)
+        print(f"Built buckets for {report['built']} of {report['vehicle_days']} vehicle-days "
+              f"({report['rows']} rows, {report['skipped']} already bucketed)")
+        client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+"""
+Telecaller Performance Tracking
+Aggregation-backed per-telecaller, per-day lead metrics with a cache for
+closed days.
+
+Leads are bucketed by their import day (``import_date``, indexed; a date
+string, ISO string or datetime, matched by day whatever the type). Days before
+today never change except when a lead imported on that day is modified, so
+their (day, telecaller) rows are stored in ``performance_tracking_cache`` and
+only recomputed when a lead from that day has a newer ``last_modified``.
+Deleted leads leave no ``last_modified`` behind, so the delete endpoints
+record their import days with ``mark_leads_removed`` and a backup rollback
+drops the cache with ``invalidate_cache``. Today's rows are always computed
+live; "today" is the UTC day, like the stored import dates.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "performance_tracking_cache"
+META_ID = "meta"
+
+# (counter, regex on lower-cased status) - first match wins, like the old if/elif chain
+STATUS_BUCKETS = [
+    ("contacted", "contact"),
+    ("qualified", "interested|qualified"),
+    ("onboarded", "onboard"),
+    ("rejected", "reject|not interested"),
+]
+
+# (counter, regex on lower-cased lead_stage)
+STAGE_BUCKETS = [
+    ("new", "new"),
+    ("contacted", "contacted"),
+    ("qualified", "qualified"),
+    ("assigned", "assigned"),
+    ("in_progress", "progress"),
+]
+
+COUNTERS = ["total_leads"] + [name for name, _ in STATUS_BUCKETS] + [f"stage_{name}" for name, _ in STAGE_BUCKETS]
+
+
+def _switch(field: str, buckets) -> Dict:
+    return {"$switch": {
+        "branches": [
+            {"case": {"$regexMatch": {"input": field, "regex": pattern}}, "then": name}
+            for name, pattern in buckets
+        ],
+        "default": None
+    }}
+
+
+def _day_expr() -> Dict:
+    """YYYY-MM-DD of import_date, which is stored as a date string, ISO string or datetime"""
+    return {"$cond": [
+        {"$eq": [{"$type": "$import_date"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": "$import_date"}},
+        {"$substrCP": [{"$toString": {"$ifNull": ["$import_date", ""]}}, 0, 10]}
+    ]}
+
+
+def _import_day_match(start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+    """
+    Leads imported on days in [start, end). A range on a string only matches
+    strings, so datetime import dates get the same range as datetimes (UTC
+    midnight, the day _day_expr gives them).
+    """
+    as_string, as_datetime = {}, {}
+    if start:
+        as_string["$gte"], as_datetime["$gte"] = start, datetime.fromisoformat(start)
+    if end:
+        as_string["$lt"], as_datetime["$lt"] = end, datetime.fromisoformat(end)
+    return {"$or": [{"import_date": as_string}, {"import_date": as_datetime}]}
+
+
+def build_pipeline(match: Dict, days: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Group leads matching ``match`` into one row per (day, telecaller)"""
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "day": _day_expr(),
+            "telecaller": {"$ifNull": ["$assigned_telecaller", "Unassigned"]},
+            "status": {"$toLower": {"$ifNull": ["$status", "New"]}},
+            "lead_stage": {"$toLower": {"$ifNull": ["$lead_stage", "New"]}},
+        }},
+    ]
+    if days is not None:
+        pipeline.append({"$match": {"day": {"$in": sorted(days)}}})
+    pipeline.append({"$project": {
+        "day": 1,
+        "telecaller": 1,
+        "status_bucket": _switch("$status", STATUS_BUCKETS),
+        "stage_bucket": _switch("$lead_stage", STAGE_BUCKETS),
+    }})
+
+    group = {"_id": {"day": "$day", "telecaller": "$telecaller"}, "total_leads": {"$sum": 1}}
+    for name, _ in STATUS_BUCKETS:
+        group[name] = {"$sum": {"$cond": [{"$eq": ["$status_bucket", name]}, 1, 0]}}
+    for name, _ in STAGE_BUCKETS:
+        group[f"stage_{name}"] = {"$sum": {"$cond": [{"$eq": ["$stage_bucket", name]}, 1, 0]}}
+    pipeline.append({"$group": group})
+    return pipeline
+
+
+def _utc_today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _import_day(import_date) -> Optional[str]:
+    """Python side of _day_expr"""
+    if isinstance(import_date, datetime):
+        if import_date.tzinfo is not None:
+            import_date = import_date.astimezone(timezone.utc)
+        return import_date.strftime("%Y-%m-%d")
+    if not import_date:
+        return None
+    return str(import_date)[:10]
+
+
+async def mark_leads_removed(db, leads: Iterable[Dict]) -> None:
+    """Queue the import days of deleted leads for the next refresh"""
+    days = sorted({day for day in (_import_day(lead.get("import_date")) for lead in leads) if day})
+    if days:
+        # No meta doc means the next refresh is a full rebuild anyway
+        await db[CACHE_COLLECTION].update_one({"_id": META_ID}, {"$addToSet": {"dirty_days": {"$each": days}}})
+
+
+async def invalidate_cache(db) -> None:
+    """Make the next refresh rebuild every closed day"""
+    await db[CACHE_COLLECTION].delete_one({"_id": META_ID})
+
+
+async def _aggregate_rows(db, match: Dict, days: Optional[Iterable[str]] = None) -> List[Dict]:
+    rows = []
+    async for row in db.driver_leads.aggregate(build_pipeline(match, days), allowDiskUse=True):
+        key = row.pop("_id")
+        row.update(key)
+        rows.append(row)
+    return rows
+
+
+async def _dirty_days(db, since_iso: str, today: str) -> set:
+    """Closed import days that contain a lead modified since ``since_iso``"""
+    since_dt = datetime.fromisoformat(since_iso)
+    pipeline = [
+        {"$match": {
+            "$or": [{"last_modified": {"$gte": since_iso}}, {"last_modified": {"$gte": since_dt}}]
+        }},
+        {"$group": {"_id": _day_expr()}},
+    ]
+    days = set()
+    async for row in db.driver_leads.aggregate(pipeline):
+        if row["_id"] and row["_id"] < today:
+            days.add(row["_id"])
+    return days
+
+
+async def _store_days(db, days: set, rows: List[Dict], now_iso: str) -> None:
+    operations = []
+    doc_ids = []
+    for row in rows:
+        doc_id = f"{row['day']}|{row['telecaller']}"
+        doc_ids.append(doc_id)
+        operations.append(ReplaceOne(
+            {"_id": doc_id},
+            {**row, "kind": "day", "computed_at": now_iso},
+            upsert=True
+        ))
+    if operations:
+        await db[CACHE_COLLECTION].bulk_write(operations, ordered=False)
+    # Drop telecallers that no longer have leads on a recomputed day
+    await db[CACHE_COLLECTION].delete_many({
+        "kind": "day",
+        "day": {"$in": sorted(days)},
+        "_id": {"$nin": doc_ids}
+    })
+
+
+async def refresh_closed_days(db, today: Optional[str] = None, full: bool = False) -> Dict:
+    """Bring the closed-day cache up to date and return refresh statistics"""
+    today = today or _utc_today()
+    started_iso = datetime.now(timezone.utc).isoformat()
+    meta = await db[CACHE_COLLECTION].find_one({"_id": META_ID})
+    # Days of deleted leads; a full rebuild covers them too
+    removed_days = (meta or {}).get("dirty_days", [])
+
+    if meta is None or full:
+        rows = await _aggregate_rows(db, _import_day_match(end=today))
+        await db[CACHE_COLLECTION].delete_many({"kind": "day"})
+        days = {row["day"] for row in rows}
+        await _store_days(db, days, rows, started_iso)
+        stats = {"mode": "full", "days_recomputed": len(days)}
+    else:
+        days = await _dirty_days(db, meta["checked_at"], today)
+        days.update(day for day in removed_days if day < today)
+        closed_through = meta.get("closed_through")
+        if closed_through and closed_through < today:
+            # Days that closed since the last refresh (yesterday, after midnight)
+            day = date.fromisoformat(closed_through) + timedelta(days=1)
+            while day.isoformat() < today:
+                days.add(day.isoformat())
+                day += timedelta(days=1)
+        rows = []
+        if days:
+            rows = await _aggregate_rows(db, _import_day_match(min(days), today), days)
+            await _store_days(db, days, rows, started_iso)
+        stats = {"mode": "incremental", "days_recomputed": len(days)}
+
+    closed_through = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+    update = {"$set": {"closed_through": closed_through, "checked_at": started_iso}}
+    if removed_days:
+        # Only the days read above; deletes made during this refresh stay queued
+        update["$pullAll"] = {"dirty_days": removed_days}
+    await db[CACHE_COLLECTION].update_one({"_id": META_ID}, update, upsert=True)
+    return stats
+
+
+def summarize(rows: Iterable[Dict]) -> Dict:
+    """Fold (day, telecaller) rows into the performance tracking response"""
+    per_telecaller = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in rows:
+        totals = per_telecaller[row["telecaller"]]
+        for counter in COUNTERS:
+            totals[counter] += row.get(counter, 0)
+
+    telecallers = []
+    for telecaller, totals in per_telecaller.items():
+        total_leads = totals["total_leads"]
+        telecallers.append({
+            "name": telecaller,
+            "total_leads": total_leads,
+            "contacted": totals["contacted"],
+            "qualified": totals["qualified"],
+            "onboarded": totals["onboarded"],
+            "rejected": totals["rejected"],
+            "in_progress": 0,
+            "conversion_rate": round(totals["onboarded"] / total_leads * 100, 2) if total_leads else 0,
+            "stages": {name: totals[f"stage_{name}"] for name, _ in STAGE_BUCKETS},
+        })
+
+    total_leads = sum(t["total_leads"] for t in telecallers)
+    total_onboarded = sum(t["onboarded"] for t in telecallers)
+    return {
+        "telecallers": telecallers,
+        "overall": {
+            "total_leads": total_leads,
+            "total_contacted": sum(t["contacted"] for t in telecallers),
+            "total_onboarded": total_onboarded,
+            "conversion_rate": round(total_onboarded / total_leads * 100, 2) if total_leads else 0
+        }
+    }
+
+
+async def get_performance_metrics(
+    db,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    refresh: bool = False,
+    include_daily: bool = False
+) -> Dict:
+    """Closed days from the cache plus today computed live"""
+    today = _utc_today()
+    cache_stats = await refresh_closed_days(db, today, full=refresh)
+
+    day_filter = {}
+    if start_date:
+        day_filter["$gte"] = start_date
+    if end_date:
+        day_filter["$lte"] = end_date
+    cache_query = {"kind": "day"}
+    if day_filter:
+        cache_query["day"] = day_filter
+    rows = await db[CACHE_COLLECTION].find(cache_query, {"_id": 0, "kind": 0, "computed_at": 0}).to_list(length=None)
+
+    if (not end_date or end_date >= today) and (not start_date or start_date <= today):
+        # Leads without an import date cannot be cached by day, so they are counted live too
+        rows.extend(await _aggregate_rows(db, {"$or": _import_day_match(start=today)["$or"] + [{"import_date": None}]}))
+
+    result = summarize(rows)
+    result["cache"] = cache_stats
+    if include_daily:
+        result["daily"] = sorted(rows, key=lambda r: (r["day"], r["telecaller"]))
+    return result
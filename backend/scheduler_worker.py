@@ -0,0 +1,216 @@
+"""
+Scheduler Worker
+Runs the periodic jobs (daily Slack report, rollup reconciliation) in a
+dedicated process instead of inside the uvicorn web server.
+
+Usage:
+    cd /app/backend
+    python scheduler_worker.py
+
+Several worker (or web) instances may run at the same time: a Mongo-based
+leader lease in ``scheduler_leases`` makes sure only the current leader runs
+jobs. Each run is recorded in ``scheduler_job_runs`` with its duration and
+outcome, see GET /api/scheduler/job-runs.
+
+By default (SCHEDULER_MODE=embedded) the web process runs the same scheduler
+too, so deployments without a worker keep their jobs; the lease still
+guarantees a single run per job across web and worker instances. Set
+SCHEDULER_MODE=worker on the web process once a scheduler worker is running
+to keep jobs out of the web process entirely; the Procfile does this for its
+web entry, since it also starts the worker.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LEASES_COLLECTION = "scheduler_leases"
+JOB_RUNS_COLLECTION = "scheduler_job_runs"
+LEADER_LEASE = "scheduler_leader"
+
+SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'embedded').lower()
+LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', '60'))
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+# ==================== LEADER LEASE ====================
+
+async def acquire_lease(db, name: str, owner: str = INSTANCE_ID, ttl_seconds: int = LEASE_SECONDS) -> bool:
+    """
+    Acquire or renew a lease. Succeeds if the lease is free, expired or
+    already held by ``owner``; the unique _id makes concurrent takeovers safe.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        lease = await db[LEASES_COLLECTION].find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {
+                "$set": {
+                    "owner": owner,
+                    "expires_at": now + timedelta(seconds=ttl_seconds),
+                    "renewed_at": now
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another instance holds a live lease
+        return False
+    return bool(lease) and lease.get("owner") == owner
+
+
+async def release_lease(db, name: str, owner: str = INSTANCE_ID) -> None:
+    await db[LEASES_COLLECTION].delete_one({"_id": name, "owner": owner})
+
+
+# ==================== JOB RUNS ====================
+
+async def run_recorded_job(db, job_id: str, func: Callable[[], Awaitable], owner: str = INSTANCE_ID) -> Optional[Dict]:
+    """Run a job if this instance is the leader and record the run"""
+    if not await acquire_lease(db, LEADER_LEASE, owner):
+        logger.info(f"Skipping job '{job_id}' - another scheduler instance holds the lease")
+        return None
+
+    run = {
+        "id": str(uuid.uuid4()),
+        "job_id": job_id,
+        "owner": owner,
+        "status": "running",
+        "started_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db[JOB_RUNS_COLLECTION].insert_one(dict(run))
+
+    start = time.perf_counter()
+    try:
+        result = await func()
+        run["status"] = "success"
+        if isinstance(result, dict):
+            run["result"] = {k: v for k, v in result.items() if isinstance(v, (str, int, float, bool))}
+    except Exception as e:
+        logger.error(f"Scheduled job '{job_id}' failed: {str(e)}")
+        run["status"] = "failed"
+        run["error"] = str(e)
+
+    run["finished_at"] = datetime.now(timezone.utc).isoformat()
+    run["duration_seconds"] = round(time.perf_counter() - start, 3)
+    await db[JOB_RUNS_COLLECTION].update_one({"id": run["id"]}, {"$set": run})
+    logger.info(f"Scheduled job '{job_id}' {run['status']} in {run['duration_seconds']}s")
+    return run
+
+
+async def get_job_runs(db, job_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
+    query = {"job_id": job_id} if job_id else {}
+    return await db[JOB_RUNS_COLLECTION].find(query, {"_id": 0}).sort("started_at", -1).to_list(limit)
+
+
+# ==================== SCHEDULER ====================
+
+def create_scheduler(db, jobs: List[Dict]) -> AsyncIOScheduler:
+    """
+    Build an AsyncIOScheduler for ``jobs`` = [{"id", "func", "trigger"}].
+    Every job runs through the leader lease, and a heartbeat keeps the
+    lease renewed while this instance is alive.
+    """
+    scheduler = AsyncIOScheduler()
+
+    async def heartbeat():
+        try:
+            await acquire_lease(db, LEADER_LEASE)
+        except Exception as e:
+            logger.error(f"Scheduler lease heartbeat failed: {str(e)}")
+
+    scheduler.add_job(
+        heartbeat,
+        IntervalTrigger(seconds=max(LEASE_SECONDS // 3, 5)),
+        id="scheduler_lease_heartbeat",
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True
+    )
+
+    for job in jobs:
+        scheduler.add_job(
+            run_recorded_job,
+            job["trigger"],
+            args=[db, job["id"], job["func"]],
+            id=job["id"],
+            replace_existing=True,
+            misfire_grace_time=600,
+            coalesce=True
+        )
+    return scheduler
+
+
+async def ensure_scheduler_indexes(db) -> None:
+    await db[JOB_RUNS_COLLECTION].create_index(
+        [("job_id", 1), ("started_at", -1)],
+        name="idx_job_runs_job_started"
+    )
+
+
+def default_jobs(db, send_daily_slack_report_job) -> List[Dict]:
+    """Jobs shared by the worker and the embedded web-process scheduler"""
+    from telecaller_rollups import reconcile_rollups
+    from charging_sessions import refresh_with_lease as refresh_charging_sessions
+
+    return [
+        {
+            "id": "daily_slack_report",
+            "func": send_daily_slack_report_job,
+            "trigger": CronTrigger(hour=20, minute=0)  # 8 PM every day
+        },
+        {
+            "id": "telecaller_rollups_reconcile",
+            "func": lambda: reconcile_rollups(db, repair=True),
+            "trigger": CronTrigger(hour=3, minute=0)  # 3 AM every day
+        },
+        {
+            # Imports refresh sessions themselves; this catches up after failed runs
+            "id": "charging_sessions_refresh",
+            "func": lambda: refresh_charging_sessions(db),
+            "trigger": IntervalTrigger(minutes=30)
+        },
+    ]
+
+
+async def main():
+    # Reuse the web app's configuration, database handle and job functions
+    from server import db, client, send_daily_slack_report_job
+
+    await ensure_scheduler_indexes(db)
+    scheduler = create_scheduler(db, default_jobs(db, send_daily_slack_report_job))
+    scheduler.start()
+    logger.info(f"Scheduler worker {INSTANCE_ID} started")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    await stop_event.wait()
+
+    scheduler.shutdown(wait=False)
+    await release_lease(db, LEADER_LEASE)
+    client.close()
+    logger.info(f"Scheduler worker {INSTANCE_ID} stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
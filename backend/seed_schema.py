@@ -1,6 +1,5 @@
 import os
 from pymongo import MongoClient
-from datetime import datetime
 
 print("🚀 Running schema synchronization...")
 
@@ -61,7 +60,12 @@ schema = {
         "Battery Soc(%)": None,
         "SOH": None,
         "Battery Pack Voltage": None,
-        "Vehicle Status": None
+        "Vehicle Status": None,
+        "feed_ts": None,
+        "soc_percent": None,
+        "odometer_km": None,
+        "speed_kmph": None,
+        "schema_version": None
     },
     "payment_records": {
         "driver": None,
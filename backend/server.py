@@ -4,6 +4,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, InsertOne, DeleteMany
 import os
 import logging
 from pathlib import Path
@@ -16,14 +17,15 @@ import jwt
 import secrets
 import string
 import base64
+import json
+import hashlib
 import googlemaps
 import requests
 import asyncio
+import zipfile
 import pandas as pd
 import numpy as np
 import httpx
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 
 # Import hotspot optimizer
 from hotspot_optimizer import optimize_hotspots, TIME_SLOTS
@@ -33,10 +35,35 @@ load_dotenv(ROOT_DIR / '.env')
 
 # Import after loading .env so environment variables are available
 from sheets_multi_sync import (
-    sync_user_to_sheets, bulk_sync_users_to_sheets, delete_user_from_sheets,
-    sync_all_records, get_all_records, sync_single_record, delete_record,
+    bulk_sync_users_to_sheets, get_all_records,
     get_last_sync_time, update_last_sync_time
 )
+from sheets_client import get_sheets_client, close_sheets_client
+from mode_mapping import get_mode_mapping, mode_mapping_cache
+from montra_feed_import import shutdown_ingest_pool
+from montra_feed_store import (
+    get_feed_store, buckets_enabled, write_feed_buckets, delete_feed_buckets, ensure_feed_bucket_indexes
+)
+from vehicle_day_summary import (
+    SUMMARY_COLLECTION, summarize_imported, delete_day_summary, get_day_summaries,
+    rebuild_with_lease, backfill_if_empty, ensure_day_summary_indexes
+)
+from charging_sessions import (
+    refresh_with_lease as refresh_charging_sessions_with_lease, get_charging_sessions, ensure_charging_session_indexes
+)
+from sheets_delta_sync import sync_tab, record_tombstones, ensure_delta_sync_indexes
+from performance_tracking import (
+    mark_leads_removed as mark_performance_days_dirty, invalidate_cache as invalidate_performance_cache
+)
+from sheets_outbox import (
+    enqueue_sheets_sync, enqueue_sheets_delete, run_flusher as run_sheets_outbox_flusher,
+    get_outbox_status, ensure_outbox_indexes
+)
+from telecaller_rollups import (
+    ROLLUP_PROJECTION, ALL_TIME_KEY, record_lead_transition, record_lead_transitions,
+    record_leads_inserted, record_leads_deleted, record_event, get_rollup,
+    get_rollups_for_range, reconcile_rollups, rebuild_if_outdated as rebuild_rollups_if_outdated
+)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
@@ -184,37 +211,12 @@ def generate_temporary_password(length: int = 12) -> str:
 
 
 def load_mode_mapping_tables():
-    """Load Model Mapping and Ride Mode Mapping from Excel file"""
-    import pandas as pd
-    
-    mapping_file_path = "/app/backend/uploaded_files/mode_details.xlsx"
-    
-    try:
-        # Read Model Mapping
-        model_mapping = pd.read_excel(mapping_file_path, sheet_name='Model Mapping')
-        model_dict = {}
-        for _, row in model_mapping.iterrows():
-            vehicle_num = str(row['Vehicle Number']).strip()
-            model = str(row['Model']).strip()
-            model_dict[vehicle_num] = model
-        
-        # Read Ride Mode Mapping
-        ride_mode_mapping = pd.read_excel(mapping_file_path, sheet_name='Ride Mode Mapping')
-        mode_dict = {}
-        for _, row in ride_mode_mapping.iterrows():
-            concat_key = str(row['Vehicle-Mode Concatenation']).strip()
-            mode_name = str(row['Mode Name']).strip()
-            mode_type = str(row['Mode Type']).strip()
-            mode_dict[concat_key] = {
-                'mode_name': mode_name,
-                'mode_type': mode_type
-            }
-        
-        logger.info(f"Loaded {len(model_dict)} vehicle models and {len(mode_dict)} ride modes")
-        return model_dict, mode_dict
-    except Exception as e:
-        logger.error(f"Error loading mode mapping tables: {str(e)}")
-        return {}, {}
+    """
+    Model Mapping and Ride Mode Mapping dicts from mode_details.xlsx.
+    Served from the in-process cache, which re-reads the file only when it changes.
+    """
+    mapping = get_mode_mapping()
+    return mapping.model_dict, mapping.mode_dict
 
 
 def enrich_with_mode_data(vehicle_id: str, ride_mode: str, model_dict: dict, mode_dict: dict):
@@ -280,7 +282,7 @@ async def initialize_master_admin():
         logger.info("Master admin account created")
         
         # Sync to Google Sheets
-        sync_user_to_sheets(master_admin_data)
+        await enqueue_sheets_sync(db, 'users', [master_admin_data])
 
 
 # ==================== Auth Routes ====================
@@ -320,7 +322,7 @@ async def register(user_data: UserCreate):
     await db.users.insert_one(user_dict)
     
     # Sync to Google Sheets
-    sync_user_to_sheets(user_dict)
+    await enqueue_sheets_sync(db, 'users', [user_dict])
     
     # If registering as telecaller, automatically create telecaller profile
     if user_data.account_type == "telecaller":
@@ -613,7 +615,7 @@ async def create_user(user_data: UserCreate, current_user: User = Depends(get_cu
             logger.info(f"Auto-created telecaller profile for {user_data.email}")
     
     # Sync to Google Sheets
-    sync_user_to_sheets(user_dict)
+    await enqueue_sheets_sync(db, 'users', [user_dict])
     
     return {"message": "User created successfully", "user": user}
 
@@ -651,7 +653,7 @@ async def approve_user(approval: UserApproval, current_user: User = Depends(get_
     
     # Sync to Google Sheets
     user['status'] = 'active'
-    sync_user_to_sheets(user)
+    await enqueue_sheets_sync(db, 'users', [user])
     
     return {"message": "User approved successfully"}
 
@@ -690,7 +692,7 @@ async def reject_user(approval: UserApproval, current_user: User = Depends(get_c
     
     # Sync to Google Sheets
     user['status'] = 'rejected'
-    sync_user_to_sheets(user)
+    await enqueue_sheets_sync(db, 'users', [user])
     
     return {"message": "User rejected"}
 
@@ -760,7 +762,7 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
     await db.users.delete_one({"id": user_id})
     
     # Update Google Sheets - remove the row
-    delete_user_from_sheets(user_to_delete.get('email'))
+    await enqueue_sheets_delete(db, 'users', [user_to_delete.get('email')])
     
     return {"message": "User deleted successfully"}
 
@@ -849,7 +851,7 @@ async def change_user_account_type(
     
     # Update Google Sheets
     user_to_update['account_type'] = account_change.new_account_type
-    sync_user_to_sheets(user_to_update)
+    await enqueue_sheets_sync(db, 'users', [user_to_update])
     
     return {
         "message": "Account type changed successfully",
@@ -1434,8 +1436,9 @@ async def create_payment(payment_data: PaymentRecordCreate, current_user: User =
     payment_dict['date'] = payment_dict['date'].isoformat()
     payment_dict['created_at'] = payment_dict['created_at'].isoformat()
     
+    payment_dict['last_modified'] = datetime.now(timezone.utc).isoformat()
     await db.payment_reconciliation.insert_one(payment_dict)
-    sync_single_record('payment_reconciliation', payment_dict)
+    await enqueue_sheets_sync(db, 'payment_reconciliation', [payment_dict])
     
     return {"message": "Payment record created", "payment": payment}
 
@@ -1461,12 +1464,14 @@ async def get_payments(current_user: User = Depends(get_current_user)):
 
 
 @api_router.post("/payment-reconciliation/sync")
-async def sync_payments(current_user: User = Depends(get_current_user)):
-    """Sync all payments to Google Sheets"""
-    payments = await db.payment_reconciliation.find({}, {"_id": 0}).to_list(1000)
-    success = sync_all_records('payment_reconciliation', payments)
-    if success:
-        return {"message": "Payments synced successfully"}
+async def sync_payments(
+    full: bool = Query(False, description="Resend every record instead of only changes since the last sync"),
+    current_user: User = Depends(get_current_user)
+):
+    """Sync payments changed since the last acknowledged sync to Google Sheets (full=true resends all)"""
+    result = await sync_tab(db, 'payment_reconciliation', get_sheets_client(), full=full)
+    if result["success"]:
+        return {"message": "Payments synced successfully", **result}
     raise HTTPException(status_code=500, detail="Failed to sync payments")
 
 
@@ -1479,8 +1484,9 @@ async def create_driver(driver_data: DriverRecordCreate, current_user: User = De
     driver_dict['date'] = driver_dict['date'].isoformat()
     driver_dict['created_at'] = driver_dict['created_at'].isoformat()
     
+    driver_dict['last_modified'] = datetime.now(timezone.utc).isoformat()
     await db.driver_onboarding.insert_one(driver_dict)
-    sync_single_record('driver_onboarding', driver_dict)
+    await enqueue_sheets_sync(db, 'driver_onboarding', [driver_dict])
     
     return {"message": "Driver record created", "driver": driver}
 
@@ -1498,12 +1504,14 @@ async def get_drivers(current_user: User = Depends(get_current_user)):
 
 
 @api_router.post("/driver-onboarding/sync")
-async def sync_drivers(current_user: User = Depends(get_current_user)):
-    """Sync all drivers to Google Sheets"""
-    drivers = await db.driver_onboarding.find({}, {"_id": 0}).to_list(1000)
-    success = sync_all_records('driver_onboarding', drivers)
-    if success:
-        return {"message": "Drivers synced successfully"}
+async def sync_drivers(
+    full: bool = Query(False, description="Resend every record instead of only changes since the last sync"),
+    current_user: User = Depends(get_current_user)
+):
+    """Sync drivers changed since the last acknowledged sync to Google Sheets (full=true resends all)"""
+    result = await sync_tab(db, 'driver_onboarding', get_sheets_client(), full=full)
+    if result["success"]:
+        return {"message": "Drivers synced successfully", **result}
     raise HTTPException(status_code=500, detail="Failed to sync drivers")
 
 
@@ -1896,12 +1904,10 @@ async def import_leads(
                 if non_duplicates:
                     await db.driver_leads.insert_many(non_duplicates)
                     logger.info(f"Imported {len(non_duplicates)} new leads to database")
+                    await record_leads_inserted(db, non_duplicates)
                     
-                    # Sync to Google Sheets
-                    try:
-                        sync_all_records('leads', non_duplicates)
-                    except Exception as sync_error:
-                        logger.warning(f"Google Sheets sync failed: {str(sync_error)}")
+                    # Queue for Google Sheets sync
+                    await enqueue_sheets_sync(db, 'leads', non_duplicates)
                 
                 return {
                     "success": True,
@@ -1917,12 +1923,10 @@ async def import_leads(
                 # No duplicates, insert all leads
                 await db.driver_leads.insert_many(leads)
                 logger.info(f"Imported {len(leads)} leads to database (no duplicates)")
+                await record_leads_inserted(db, leads)
                 
-                # Sync to Google Sheets
-                try:
-                    sync_all_records('leads', leads)
-                except Exception as sync_error:
-                    logger.warning(f"Google Sheets sync failed: {str(sync_error)}")
+                # Queue for Google Sheets sync
+                await enqueue_sheets_sync(db, 'leads', leads)
                 
                 return {
                     "success": True,
@@ -2045,6 +2049,7 @@ async def create_single_lead(
             "import_date": datetime.now(timezone.utc).strftime('%Y-%m-%d'),
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc),
+            "last_modified": datetime.now(timezone.utc).isoformat(),
             "remarks": "",
             "remarks_history": [],
             "status_history": [{
@@ -2061,12 +2066,20 @@ async def create_single_lead(
                 {"phone_number": normalized_phone},
                 {"$set": lead_data}
             )
+            await record_lead_transition(db, existing_lead, {**existing_lead, **lead_data})
+            # The replaced lead takes the new ID, so the sheet row moves with it
+            await enqueue_sheets_delete(db, 'leads', [existing_lead.get("id")])
+            await record_tombstones(db, 'leads', [existing_lead.get("id")])
             message = "Lead updated successfully (replaced existing)"
         else:
             # Insert new lead
             await db.driver_leads.insert_one(lead_data)
+            await record_leads_inserted(db, [lead_data])
             message = "Lead created successfully"
         
+        # Queue for Google Sheets sync
+        await enqueue_sheets_sync(db, 'leads', [lead_data])
+        
         return {
             "success": True,
             "message": message,
@@ -2707,9 +2720,13 @@ async def bulk_import_leads(
         updated_count = 0
         if existing_leads_to_update:
             logger.info(f"Updating {len(existing_leads_to_update)} existing leads...")
+            current_leads_by_id = {lead.get('id'): lead for lead in current_leads}
+            rollup_transitions = []
+            updated_leads = []
             for lead_data in existing_leads_to_update:
                 lead_dict = clean_lead_data(lead_data)
                 lead_id = lead_dict['id']
+                lead_dict['last_modified'] = datetime.now(timezone.utc).isoformat()
                 
                 # Update the lead (overwrite all fields)
                 await leads_collection.update_one(
@@ -2717,7 +2734,12 @@ async def bulk_import_leads(
                     {"$set": lead_dict}
                 )
                 updated_count += 1
+                previous = current_leads_by_id.get(lead_id)
+                rollup_transitions.append((previous, {**(previous or {}), **lead_dict}))
+                updated_leads.append({**(previous or {}), **lead_dict})
             
+            await record_lead_transitions(db, rollup_transitions)
+            await enqueue_sheets_sync(db, 'leads', updated_leads)
             logger.info(f"Updated {updated_count} existing leads")
         
         # Step 9: INSERT new leads
@@ -2725,9 +2747,14 @@ async def bulk_import_leads(
         if new_leads:
             leads_to_insert = [clean_lead_data(lead.to_dict() if isinstance(lead, pd.Series) else lead) for lead in new_leads]
             logger.info(f"Inserting {len(leads_to_insert)} new leads...")
+            now_iso = datetime.now(timezone.utc).isoformat()
+            for lead_dict in leads_to_insert:
+                lead_dict['last_modified'] = now_iso
             
             insert_result = await leads_collection.insert_many(leads_to_insert)
             inserted_count = len(insert_result.inserted_ids)
+            await record_leads_inserted(db, leads_to_insert)
+            await enqueue_sheets_sync(db, 'leads', leads_to_insert)
             logger.info(f"Inserted {inserted_count} new leads")
         
         # Telecaller assignments are stored directly in leads, no separate profile update needed
@@ -2913,11 +2940,13 @@ async def rollback_to_backup(
         backup_df = pd.read_excel(backup_file_path)
         restore_leads = backup_df.to_dict('records')
         
-        # Clean up NaN values
+        # Clean up NaN values; restored leads count as modified for the sheets delta sync
+        restored_at = datetime.now(timezone.utc).isoformat()
         for lead in restore_leads:
             for key, value in list(lead.items()):
                 if pd.isna(value):
                     lead[key] = None
+            lead["last_modified"] = restored_at
         
         # Step 3: DELETE all current leads
         delete_result = await leads_collection.delete_many({})
@@ -2932,6 +2961,23 @@ async def rollback_to_backup(
         else:
             restored_count = 0
         
+        # Leads that are not in the backup are removed from the sheet on the next delta sync
+        restored_ids = {str(lead.get("id")) for lead in restore_leads}
+        await record_tombstones(
+            db, 'leads', [lead.get("id") for lead in current_leads if str(lead.get("id")) not in restored_ids]
+        )
+        
+        # The whole collection was replaced, so rebuild the telecaller rollups
+        try:
+            await reconcile_rollups(db, repair=True)
+        except Exception as e:
+            logger.error(f"Failed to rebuild telecaller rollups after rollback: {str(e)}")
+        # Restored leads keep their import dates, so every closed day may have changed
+        try:
+            await invalidate_performance_cache(db)
+        except Exception as e:
+            logger.error(f"Failed to invalidate performance tracking cache after rollback: {str(e)}")
+        
         return {
             "success": True,
             "message": f"Successfully rolled back to {filename}",
@@ -3203,7 +3249,10 @@ async def add_remark(
         # Add remark to lead (push to remarks array)
         await db.driver_leads.update_one(
             {"id": lead_id},
-            {"$push": {"remarks": new_remark}}
+            {
+                "$push": {"remarks": new_remark},
+                "$set": {"last_modified": datetime.now(timezone.utc).isoformat()}
+            }
         )
         
         logger.info(f"Added remark to lead {lead_id} by {current_user.email}")
@@ -3320,78 +3369,43 @@ async def get_unique_sources(current_user: User = Depends(get_current_user)):
 
 
 @api_router.post("/driver-onboarding/sync-leads")
-async def sync_leads_to_sheets(current_user: User = Depends(get_current_user)):
-    """Sync all leads to Google Sheets with batch processing to avoid timeouts"""
+async def sync_leads_to_sheets(
+    full: bool = Query(False, description="Resend every lead instead of only changes since the last sync"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sync leads to Google Sheets.
+    By default only leads modified (and deleted) since the last acknowledged
+    sync are sent; full=true forces a complete resync.
+    """
     try:
-        # Get all leads from database (no limit)
-        leads = await db.driver_leads.find({}, {"_id": 0}).to_list(length=None)
-        
-        if not leads:
-            return {"message": "No leads to sync", "count": 0}
-        
-        # Get Google Sheets Web App URL
-        web_app_url = os.environ.get('GOOGLE_SHEETS_WEB_APP_URL')
-        
-        if not web_app_url:
+        if not os.environ.get('GOOGLE_SHEETS_WEB_APP_URL'):
             raise HTTPException(status_code=500, detail="GOOGLE_SHEETS_WEB_APP_URL not configured")
         
-        # BATCH PROCESSING to avoid timeout
-        BATCH_SIZE = 500  # Sync 500 leads at a time
-        total_leads = len(leads)
-        total_updated = 0
-        total_created = 0
+        result = await sync_tab(db, 'leads', get_sheets_client(), full=full)
         
-        import requests
-        
-        # Process in batches
-        for i in range(0, total_leads, BATCH_SIZE):
-            batch = leads[i:i + BATCH_SIZE]
-            batch_num = (i // BATCH_SIZE) + 1
-            total_batches = (total_leads + BATCH_SIZE - 1) // BATCH_SIZE
-            
-            logger.info(f"Syncing batch {batch_num}/{total_batches} ({len(batch)} leads)")
-            
-            # Prepare payload for Google Sheets
-            payload = {
-                "action": "sync_from_app",
-                "leads": batch
-            }
-            
-            # Send batch to Google Sheets Web App with longer timeout
-            response = requests.post(
-                web_app_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=60  # Increased timeout to 60 seconds per batch
+        if not result["success"]:
+            failed = result["failed_batches"]
+            raise HTTPException(
+                status_code=500,
+                detail=f"Google Sheets sync incomplete: {len(failed)} of {result['batches']} batches and "
+                       f"{len(result['failed_deletes'])} deletes failed; the next sync will retry them"
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    total_updated += result.get('updated', 0)
-                    total_created += result.get('created', 0)
-                    logger.info(f"Batch {batch_num} synced: {result.get('updated', 0)} updated, {result.get('created', 0)} created")
-                else:
-                    logger.error(f"Batch {batch_num} failed: {result.get('message', 'Unknown error')}")
-                    raise HTTPException(status_code=500, detail=f"Batch {batch_num} sync failed: {result.get('message', 'Unknown error')}")
-            else:
-                logger.error(f"Batch {batch_num} API error: {response.status_code}")
-                raise HTTPException(status_code=500, detail=f"Batch {batch_num} API error: {response.status_code}")
+        
+        if result["records_sent"] == 0 and result["deletes_sent"] == 0:
+            message = "Google Sheets is already up to date"
+        else:
+            message = (f"Synced {result['records_sent']} leads and {result['deletes_sent']} deletions "
+                       f"to Google Sheets ({result['mode']} sync, {result['batches']} batches)")
         
         return {
-            "success": True,
-            "message": f"Successfully synced {total_leads} leads to Google Sheets in {total_batches} batches",
-            "total_leads": total_leads,
-            "updated": total_updated,
-            "created": total_created,
-            "batches": total_batches
+            "message": message,
+            "total_leads": result["records_sent"],
+            **result
         }
-            
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=504, detail="Google Sheets sync timed out. Please try again or reduce batch size.")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to connect to Google Sheets: {str(e)}")
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Sync error: {str(e)}")
         import traceback
@@ -3414,10 +3428,19 @@ async def bulk_update_lead_status(bulk_data: BulkLeadStatusUpdate, current_user:
     if not bulk_data.lead_ids or len(bulk_data.lead_ids) == 0:
         raise HTTPException(status_code=400, detail="No leads selected for update")
     
+    # Capture previous state for the telecaller rollups
+    previous_leads = await db.driver_leads.find(
+        {"id": {"$in": bulk_data.lead_ids}},
+        ROLLUP_PROJECTION
+    ).to_list(length=None)
+    
     # Update all matching leads
     result = await db.driver_leads.update_many(
         {"id": {"$in": bulk_data.lead_ids}},
-        {"$set": {"status": bulk_data.status}}
+        {"$set": {"status": bulk_data.status, "last_modified": datetime.now(timezone.utc).isoformat()}}
+    )
+    await record_lead_transitions(
+        db, ((lead, {**lead, "status": bulk_data.status}) for lead in previous_leads)
     )
     
     print(f"MongoDB update result: matched={result.matched_count}, modified={result.modified_count}")
@@ -3434,12 +3457,8 @@ async def bulk_update_lead_status(bulk_data: BulkLeadStatusUpdate, current_user:
         print("ERROR: No leads found - raising 404")
         raise HTTPException(status_code=404, detail="Could not find any leads with the provided IDs")
     
-    # Sync all to Google Sheets
-    try:
-        sync_all_records('leads', updated_leads)
-    except Exception as e:
-        logger.error(f"Failed to sync to Google Sheets: {str(e)}")
-        # Don't fail the whole operation if sheets sync fails
+    # Queue for Google Sheets sync (never fails the operation)
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     # Return success message
     count = len(updated_leads)
@@ -3494,6 +3513,12 @@ async def bulk_assign_telecaller(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Expected YYYY-MM-DD")
     
+    # Capture previous state for the telecaller rollups
+    previous_leads = await db.driver_leads.find(
+        {"id": {"$in": lead_ids}},
+        ROLLUP_PROJECTION
+    ).to_list(length=None)
+    
     # Update all matching leads with assigned telecaller and assignment date
     result = await db.driver_leads.update_many(
         {"id": {"$in": lead_ids}},
@@ -3501,7 +3526,8 @@ async def bulk_assign_telecaller(
             "$set": {
                 "assigned_telecaller": telecaller_email,
                 "assigned_telecaller_name": telecaller_name,
-                "assigned_date": assignment_date_iso
+                "assigned_date": assignment_date_iso,
+                "last_modified": datetime.now(timezone.utc).isoformat()
             }
         }
     )
@@ -3512,11 +3538,13 @@ async def bulk_assign_telecaller(
         {"_id": 0}
     ).to_list(length=None)
     
-    # Sync to Google Sheets
-    try:
-        sync_all_records('leads', updated_leads)
-    except Exception as e:
-        logger.error(f"Failed to sync to Google Sheets: {str(e)}")
+    updated_by_id = {lead.get("id"): lead for lead in updated_leads}
+    await record_lead_transitions(
+        db, ((lead, updated_by_id.get(lead.get("id"))) for lead in previous_leads)
+    )
+    
+    # Queue for Google Sheets sync
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     logger.info(f"Assigned {result.modified_count} leads to {telecaller_name} ({telecaller_email}) for date {assignment_date}")
     
@@ -3557,12 +3585,19 @@ async def reassign_leads_to_date(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
         
+        # Capture previous state for the telecaller rollups (they are keyed by assigned day)
+        previous_leads = await db.driver_leads.find(
+            {"id": {"$in": lead_ids}},
+            ROLLUP_PROJECTION
+        ).to_list(length=None)
+        
         # Update all matching leads with new assigned date
         result = await db.driver_leads.update_many(
             {"id": {"$in": lead_ids}},
             {
                 "$set": {
-                    "assigned_date": new_date_iso
+                    "assigned_date": new_date_iso,
+                    "last_modified": datetime.now(timezone.utc).isoformat()
                 }
             }
         )
@@ -3573,11 +3608,13 @@ async def reassign_leads_to_date(
             {"_id": 0}
         ).to_list(length=None)
         
-        # Sync to Google Sheets
-        try:
-            sync_all_records('leads', updated_leads)
-        except Exception as e:
-            logger.error(f"Failed to sync to Google Sheets: {str(e)}")
+        updated_by_id = {lead.get("id"): lead for lead in updated_leads}
+        await record_lead_transitions(
+            db, ((lead, updated_by_id.get(lead.get("id"))) for lead in previous_leads)
+        )
+        
+        # Queue for Google Sheets sync
+        await enqueue_sheets_sync(db, 'leads', updated_leads)
         
         logger.info(f"Reassigned {result.modified_count} leads to date {new_date}")
         
@@ -3604,10 +3641,19 @@ async def bulk_update_lead_status(bulk_data: BulkLeadStatusUpdate, current_user:
     if not bulk_data.lead_ids or len(bulk_data.lead_ids) == 0:
         raise HTTPException(status_code=400, detail="No leads selected for update")
     
+    # Capture previous state for the telecaller rollups
+    previous_leads = await db.driver_leads.find(
+        {"id": {"$in": bulk_data.lead_ids}},
+        ROLLUP_PROJECTION
+    ).to_list(length=None)
+    
     # Update all matching leads
     result = await db.driver_leads.update_many(
         {"id": {"$in": bulk_data.lead_ids}},
-        {"$set": {"status": bulk_data.status}}
+        {"$set": {"status": bulk_data.status, "last_modified": datetime.now(timezone.utc).isoformat()}}
+    )
+    await record_lead_transitions(
+        db, ((lead, {**lead, "status": bulk_data.status}) for lead in previous_leads)
     )
     
     print(f"MongoDB update result: matched={result.matched_count}, modified={result.modified_count}")
@@ -3624,12 +3670,8 @@ async def bulk_update_lead_status(bulk_data: BulkLeadStatusUpdate, current_user:
         print("ERROR: No leads found - raising 404")
         raise HTTPException(status_code=404, detail="Could not find any leads with the provided IDs")
     
-    # Sync all to Google Sheets
-    try:
-        sync_all_records('leads', updated_leads)
-    except Exception as e:
-        logger.error(f"Failed to sync to Google Sheets: {str(e)}")
-        # Don't fail the whole operation if sheets sync fails
+    # Queue for Google Sheets sync (never fails the operation)
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     # Return success message
     count = len(updated_leads)
@@ -3739,6 +3781,7 @@ async def update_lead(lead_id: str, lead_data: DriverLeadUpdate, current_user: U
     
     # Fetch and return the updated lead
     updated_lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
+    await record_lead_transition(db, lead, updated_lead)
     
     return {"success": True, "lead": updated_lead}
     
@@ -3788,6 +3831,10 @@ async def mark_call_done(lead_id: str, current_user: User = Depends(get_current_
             }
         }
     )
+    await record_lead_transition(
+        db, lead, {**lead, "last_called": current_time, "last_called_by": current_user.email}
+    )
+    await record_event(db, current_user.email, current_time, "calls_made")
     
     return {
         "success": True,
@@ -3864,6 +3911,10 @@ async def mark_lead_as_called(lead_id: str, current_user: User = Depends(get_cur
             }
         }
     )
+    await record_lead_transition(
+        db, lead, {**lead, "last_called": current_time_iso, "last_called_by": current_user.email}
+    )
+    await record_event(db, current_user.email, current_time_iso, "calls_made")
     
     logger.info(f"Lead {lead_id} marked as called by {current_user.email} at {current_time_iso}")
     
@@ -3956,6 +4007,10 @@ async def mark_lead_as_no_response(lead_id: str, current_user: User = Depends(ge
             }
         }
     )
+    await record_lead_transition(db, lead, {
+        **lead, "status": "RNR", "last_no_response": current_time_iso, "last_no_response_by": current_user.email
+    })
+    await record_event(db, current_user.email, current_time_iso, "no_responses")
     
     logger.info(f"Lead {lead_id} marked as no response by {current_user.email} at {current_time_iso}")
     
@@ -3983,6 +4038,36 @@ async def get_telecaller_summary(
     if not telecaller:
         telecaller = current_user.email
     
+    # Unfiltered summaries are served from the incrementally maintained rollups
+    if not (start_date and end_date) and not source:
+        lifetime = await get_rollup(db, telecaller, ALL_TIME_KEY)
+        today_rollup = await get_rollup(db, telecaller, date.today().isoformat())
+        total_leads = lifetime.get("total_leads", 0)
+        # Assigned leads whose last call was today, as the query below counts them
+        calls_today = today_rollup.get("leads_last_called", 0)
+        stage_breakdown = {
+            stage: {
+                "total": counts.get("total", 0),
+                "statuses": {status: count for status, count in counts.get("statuses", {}).items() if count}
+            }
+            for stage, counts in lifetime.get("stages", {}).items()
+            if counts.get("total", 0)
+        }
+        sorted_stages = sorted(
+            stage_breakdown.keys(),
+            key=lambda x: (0 if x.startswith("S") else 1, x)
+        )
+        return {
+            "success": True,
+            "telecaller": telecaller,
+            "total_leads": total_leads,
+            "calls_made_today": calls_today,
+            "calls_pending": max(total_leads - calls_today, 0),
+            "stage_breakdown": {stage: stage_breakdown[stage] for stage in sorted_stages},
+            "start_date": start_date,
+            "end_date": end_date
+        }
+    
     # Build query
     query = {"assigned_telecaller": telecaller}
     
@@ -4531,56 +4616,37 @@ async def get_telecaller_daily_summary(
             {"_id": 0, "email": 1, "first_name": 1, "last_name": 1}
         ).to_list(1000)
         
+        # Sum the per-day rollup documents in range (one document per telecaller per day)
+        if date_filter:
+            rollups = await get_rollups_for_range(db, start_date, end_date)
+        else:
+            rollups = await db.telecaller_daily_rollups.find(
+                {"date": ALL_TIME_KEY}, {"_id": 0}
+            ).to_list(length=None)
+        
+        counter_fields = ["total_leads", "leads_called", "leads_no_response", "highly_interested", "not_interested", "callbacks"]
+        totals = defaultdict(lambda: dict.fromkeys(counter_fields, 0))
+        for rollup in rollups:
+            for field in counter_fields:
+                totals[rollup["telecaller"]][field] += rollup.get(field, 0)
+        
         summaries = []
         
         for tc in telecallers:
             tc_email = tc.get("email")
             tc_name = f"{tc.get('first_name', '')} {tc.get('last_name', '')}".strip() or tc_email.split('@')[0]
-            
-            # Build query for assigned leads
-            query = {"assigned_telecaller": tc_email}
-            if date_filter:
-                query["assigned_date"] = date_filter
-            
-            # Get all leads for this telecaller
-            leads = await db.driver_leads.find(query, {"_id": 0}).to_list(10000)
-            
-            # Count statuses
-            total_leads = len(leads)
-            calls_done = 0
-            no_response = 0
-            highly_interested = 0
-            not_interested = 0
-            callbacks = 0
-            
-            for lead in leads:
-                status = (lead.get("status") or "").lower()
-                
-                # Check if called
-                if lead.get("last_called") and lead.get("last_called_by") == tc_email:
-                    calls_done += 1
-                
-                # Check no response
-                if lead.get("last_no_response") and lead.get("last_no_response_by") == tc_email:
-                    no_response += 1
-                
-                # Status-based counts
-                if "highly interested" in status:
-                    highly_interested += 1
-                elif "not interested" in status:
-                    not_interested += 1
-                elif "call back" in status or "callback" in status:
-                    callbacks += 1
+            counts = totals[tc_email]
             
             summaries.append({
                 "telecaller_email": tc_email,
                 "telecaller_name": tc_name,
-                "total_leads": total_leads,
-                "calls_done": calls_done,
-                "no_response": no_response,
-                "highly_interested": highly_interested,
-                "not_interested": not_interested,
-                "callbacks": callbacks
+                "total_leads": counts["total_leads"],
+                # Leads last called / marked no-response by this telecaller, one per lead
+                "calls_done": counts["leads_called"],
+                "no_response": counts["leads_no_response"],
+                "highly_interested": counts["highly_interested"],
+                "not_interested": counts["not_interested"],
+                "callbacks": counts["callbacks"]
             })
         
         # Sort by total leads descending
@@ -4598,6 +4664,24 @@ async def get_telecaller_daily_summary(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.post("/telecaller-desk/rollups/reconcile")
+async def reconcile_telecaller_rollups(
+    repair: bool = Query(True, description="Replace drifted rollup documents with rebuilt counters"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rebuild the telecaller rollup counters from driver_leads and report any drift
+    """
+    if current_user.account_type not in ["admin", "master_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can reconcile telecaller rollups")
+    
+    try:
+        return await reconcile_rollups(db, repair=repair)
+    except Exception as e:
+        logger.error(f"Error reconciling telecaller rollups: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_router.post("/telecaller-desk/send-slack-report")
 async def send_telecaller_slack_report(
     request: Request,
@@ -4783,42 +4867,101 @@ async def get_lead(lead_id: str, current_user: User = Depends(get_current_user))
         raise HTTPException(status_code=500, detail=f"Failed to fetch lead: {str(e)}")
 
 
+def encode_keyset_cursor(*values) -> str:
+    """Opaque cursor for keyset pagination"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_keyset_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def get_no_response_page(telecaller_email: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    One page of no-response leads for a telecaller, newest first.
+    Keyset pagination on (last_no_response, id) so deep pages stay cheap.
+    """
+    query = {
+        "last_no_response": {"$exists": True, "$ne": None},
+        "last_no_response_by": None if telecaller_email == "Unknown" else telecaller_email
+    }
+    if cursor:
+        last_ts, last_id = decode_keyset_cursor(cursor)
+        query["$or"] = [
+            {"last_no_response": {"$lt": last_ts}},
+            {"last_no_response": last_ts, "id": {"$lt": last_id}}
+        ]
+    
+    leads = await db.driver_leads.find(query, {"_id": 0}).sort(
+        [("last_no_response", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    
+    next_cursor = None
+    if len(leads) > limit:
+        leads = leads[:limit]
+        next_cursor = encode_keyset_cursor(leads[-1].get("last_no_response"), leads[-1].get("id"))
+    
+    return {"leads": leads, "next_cursor": next_cursor}
+
+
 @api_router.get("/driver-onboarding/no-response-leads")
-async def get_no_response_leads(current_user: User = Depends(get_current_user)):
+async def get_no_response_leads(
+    counts_only: bool = Query(False, description="Return only per-telecaller counts, no lead documents"),
+    telecaller: str = Query(None, description="Return one page of leads for this telecaller only"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Leads per page"),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get all leads that have been marked as 'No Response', grouped by telecaller
+    Get leads that have been marked as 'No Response', grouped by telecaller.
+    Groups are counted by an aggregation; each group's leads are paginated
+    with keyset cursors (first page inline, further pages via telecaller + cursor).
     """
     try:
-        # Fetch all leads that have last_no_response field
-        leads = await db.driver_leads.find(
-            {"last_no_response": {"$exists": True, "$ne": None}},
-            {"_id": 0}
-        ).to_list(length=50000)
+        # Single group page
+        if telecaller:
+            page = await get_no_response_page(telecaller, limit, cursor)
+            return {
+                "success": True,
+                "telecaller_email": telecaller,
+                **page
+            }
         
-        logger.info(f"Found {len(leads)} leads with no response status")
+        # Group counts computed server-side
+        groups = await db.driver_leads.aggregate([
+            {"$match": {"last_no_response": {"$exists": True, "$ne": None}}},
+            {"$group": {
+                "_id": {"$ifNull": ["$last_no_response_by", "Unknown"]},
+                "count": {"$sum": 1},
+                "latest_no_response": {"$max": "$last_no_response"}
+            }},
+            {"$sort": {"count": -1}}
+        ]).to_list(length=None)
         
-        # Group leads by telecaller (last_no_response_by)
-        grouped_by_telecaller = {}
-        total_count = 0
+        telecaller_groups = [
+            {
+                "telecaller_email": group["_id"],
+                "telecaller_name": group["_id"].split('@')[0] if '@' in group["_id"] else group["_id"],
+                "count": group["count"],
+                "latest_no_response": group["latest_no_response"]
+            }
+            for group in groups
+        ]
+        total_count = sum(group["count"] for group in telecaller_groups)
         
-        for lead in leads:
-            telecaller_email = lead.get("last_no_response_by", "Unknown")
-            
-            if telecaller_email not in grouped_by_telecaller:
-                grouped_by_telecaller[telecaller_email] = {
-                    "telecaller_email": telecaller_email,
-                    "telecaller_name": telecaller_email.split('@')[0] if '@' in telecaller_email else telecaller_email,
-                    "leads": [],
-                    "count": 0
-                }
-            
-            grouped_by_telecaller[telecaller_email]["leads"].append(lead)
-            grouped_by_telecaller[telecaller_email]["count"] += 1
-            total_count += 1
+        if not counts_only:
+            # First page of every group, fetched concurrently
+            pages = await asyncio.gather(*[
+                get_no_response_page(group["telecaller_email"], limit)
+                for group in telecaller_groups
+            ])
+            for group, page in zip(telecaller_groups, pages):
+                group.update(page)
         
-        # Convert to list and sort by count (descending)
-        telecaller_groups = list(grouped_by_telecaller.values())
-        telecaller_groups.sort(key=lambda x: x["count"], reverse=True)
+        logger.info(f"Found {total_count} leads with no response status in {len(telecaller_groups)} groups")
         
         return {
             "success": True,
@@ -4826,6 +4969,8 @@ async def get_no_response_leads(current_user: User = Depends(get_current_user)):
             "telecaller_groups": telecaller_groups
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching no response leads: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch no response leads: {str(e)}")
@@ -4852,9 +4997,10 @@ async def update_lead_status(lead_id: str, status_data: LeadStatusUpdate, curren
     
     # Get updated lead for sync
     updated_lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
+    await record_lead_transition(db, lead, updated_lead)
     
     # Sync to Google Sheets
-    sync_single_record('leads', updated_lead)
+    await enqueue_sheets_sync(db, 'leads', [updated_lead])
     
     return {"message": "Lead status updated successfully", "lead": updated_lead}
 
@@ -4957,15 +5103,17 @@ async def sync_driver_stage(lead_id: str, current_user: User = Depends(get_curre
         {"id": lead_id},
         {"$set": {
             "stage": new_stage,
-            "status": new_status
+            "status": new_status,
+            "last_modified": datetime.now(timezone.utc).isoformat()
         }}
     )
     
     # Get updated lead for sync
     updated_lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
+    await record_lead_transition(db, lead, updated_lead)
     
     # Sync to Google Sheets
-    sync_single_record('leads', updated_lead)
+    await enqueue_sheets_sync(db, 'leads', [updated_lead])
     
     return {
         "success": True,
@@ -4992,13 +5140,12 @@ async def delete_lead(lead_id: str, current_user: User = Depends(get_current_use
     
     # Delete from MongoDB
     await db.driver_leads.delete_one({"id": lead_id})
+    await record_leads_deleted(db, [lead])
+    await mark_performance_days_dirty(db, [lead])
     
-    # Delete from Google Sheets
-    try:
-        delete_record('leads', lead_id)
-    except Exception as e:
-        logger.error(f"Failed to delete from Google Sheets: {str(e)}")
-        # Don't fail the whole operation if sheets delete fails
+    # Queue the Google Sheets row deletion
+    await enqueue_sheets_delete(db, 'leads', [lead_id])
+    await record_tombstones(db, 'leads', [lead_id])
     
     return {"message": "Lead deleted successfully"}
 
@@ -5224,6 +5371,12 @@ async def assign_leads_to_telecaller(
     if not telecaller:
         raise HTTPException(status_code=404, detail="Telecaller not found")
     
+    # Capture previous state for the telecaller rollups
+    previous_leads = await db.driver_leads.find(
+        {"id": {"$in": assignment.lead_ids}},
+        ROLLUP_PROJECTION
+    ).to_list(length=None)
+    
     # Update leads with assigned telecaller
     result = await db.driver_leads.update_many(
         {"id": {"$in": assignment.lead_ids}},
@@ -5239,11 +5392,15 @@ async def assign_leads_to_telecaller(
         {"$inc": {"total_assigned_leads": result.modified_count}}
     )
     
-    # Sync updated leads to Google Sheets
-    for lead_id in assignment.lead_ids:
-        lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
-        if lead:
-            sync_single_record('leads', lead)
+    # Queue updated leads for Google Sheets sync
+    updated_leads = await db.driver_leads.find(
+        {"id": {"$in": assignment.lead_ids}}, {"_id": 0}
+    ).to_list(length=None)
+    updated_by_id = {lead.get("id"): lead for lead in updated_leads}
+    await record_lead_transitions(
+        db, ((lead, updated_by_id.get(lead.get("id"))) for lead in previous_leads)
+    )
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     return {
         "message": f"Successfully assigned {result.modified_count} leads to {telecaller['name']}",
@@ -5270,7 +5427,7 @@ async def reassign_leads_to_telecaller(
     # Get current assignments to update stats
     leads_to_reassign = await db.driver_leads.find(
         {"id": {"$in": reassignment.lead_ids}},
-        {"_id": 0, "id": 1, "assigned_telecaller": 1}
+        ROLLUP_PROJECTION
     ).to_list(length=None)
     
     # Count leads by current telecaller
@@ -5302,11 +5459,15 @@ async def reassign_leads_to_telecaller(
         {"$inc": {"total_assigned_leads": result.modified_count}}
     )
     
-    # Sync updated leads to Google Sheets
-    for lead_id in reassignment.lead_ids:
-        lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
-        if lead:
-            sync_single_record('leads', lead)
+    # Queue updated leads for Google Sheets sync
+    updated_leads = await db.driver_leads.find(
+        {"id": {"$in": reassignment.lead_ids}}, {"_id": 0}
+    ).to_list(length=None)
+    updated_by_id = {lead.get("id"): lead for lead in updated_leads}
+    await record_lead_transitions(
+        db, ((lead, updated_by_id.get(lead.get("id"))) for lead in leads_to_reassign)
+    )
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     return {
         "success": True,
@@ -5329,7 +5490,7 @@ async def deassign_leads_from_telecaller(
     # Get current assignments to update stats
     leads_to_deassign = await db.driver_leads.find(
         {"id": {"$in": deassignment.lead_ids}},
-        {"_id": 0, "id": 1, "assigned_telecaller": 1}
+        ROLLUP_PROJECTION
     ).to_list(length=None)
     
     # Count leads by current telecaller
@@ -5355,11 +5516,15 @@ async def deassign_leads_from_telecaller(
             {"$inc": {"total_assigned_leads": -count}}
         )
     
-    # Sync updated leads to Google Sheets
-    for lead_id in deassignment.lead_ids:
-        lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
-        if lead:
-            sync_single_record('leads', lead)
+    # Queue updated leads for Google Sheets sync
+    updated_leads = await db.driver_leads.find(
+        {"id": {"$in": deassignment.lead_ids}}, {"_id": 0}
+    ).to_list(length=None)
+    updated_by_id = {lead.get("id"): lead for lead in updated_leads}
+    await record_lead_transitions(
+        db, ((lead, updated_by_id.get(lead.get("id"))) for lead in leads_to_deassign)
+    )
+    await enqueue_sheets_sync(db, 'leads', updated_leads)
     
     return {
         "success": True,
@@ -5386,10 +5551,11 @@ async def sync_assignments_from_sheets(current_user: User = Depends(get_current_
         telecaller_map_by_name = {t['name'].lower(): t for t in all_telecallers}
         
         updated_count = 0
+        rollup_transitions = []
         
         for lead in all_leads:
             # Check if assigned_telecaller is set and different from current
-            assigned_telecaller = lead.get('assigned_telecaller', '').strip()
+            assigned_telecaller = (lead.get('assigned_telecaller') or '').strip()
             
             if assigned_telecaller:
                 # Try to match by email or name
@@ -5409,6 +5575,10 @@ async def sync_assignments_from_sheets(current_user: User = Depends(get_current_
                         }}
                     )
                     updated_count += 1
+                    # A name in assigned_telecaller becomes the email the rollups are keyed by
+                    rollup_transitions.append((lead, {**lead, "assigned_telecaller": telecaller['email']}))
+        
+        await record_lead_transitions(db, rollup_transitions)
         
         return {
             "success": True,
@@ -5451,17 +5621,24 @@ async def bulk_delete_leads(bulk_data: BulkLeadDelete, current_user: User = Depe
     if not bulk_data.lead_ids or len(bulk_data.lead_ids) == 0:
         raise HTTPException(status_code=400, detail="No leads selected for deletion")
     
+    # Capture deleted leads for the telecaller rollups and the performance cache
+    deleted_leads = await db.driver_leads.find(
+        {"id": {"$in": bulk_data.lead_ids}},
+        {**ROLLUP_PROJECTION, "import_date": 1}
+    ).to_list(length=None)
+    
     # Delete from MongoDB first (fast operation)
     result = await db.driver_leads.delete_many(
         {"id": {"$in": bulk_data.lead_ids}}
     )
+    await record_leads_deleted(db, deleted_leads)
+    await mark_performance_days_dirty(db, deleted_leads)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="No leads found to delete")
     
-    # Return immediately, sync will happen in background
-    # Note: We just update the sync time marker, the actual Google Sheets
-    # will be synced on next manual sync or when leads are updated
+    # Return immediately; the sheet rows are removed by the next delta sync
+    await record_tombstones(db, 'leads', [lead["id"] for lead in deleted_leads])
     try:
         update_last_sync_time('leads')
         logger.info(f"Bulk delete: Deleted {result.deleted_count} leads from database")
@@ -5481,89 +5658,74 @@ async def test_bulk_endpoint(current_user: User = Depends(get_current_user)):
 
 
 @api_router.get("/driver-onboarding/performance-tracking")
-async def get_performance_tracking(current_user: User = Depends(get_current_user)):
-    """Get telecaller performance metrics"""
+async def get_performance_tracking(
+    start_date: str = Query(None, description="Import date from (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Import date to (YYYY-MM-DD)"),
+    refresh: bool = Query(False, description="Rebuild the closed-day cache from scratch"),
+    include_daily: bool = Query(False, description="Include per-day, per-telecaller rows"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get telecaller performance metrics
+    Closed days are served from performance_tracking_cache, today is aggregated live
+    """
     try:
-        # Get all leads (no limit)
-        all_leads = await db.driver_leads.find({}, {"_id": 0}).to_list(length=None)
-        
-        # Group by telecaller
-        telecaller_stats = {}
-        
-        for lead in all_leads:
-            telecaller = lead.get("assigned_telecaller", "Unassigned")
-            
-            if telecaller not in telecaller_stats:
-                telecaller_stats[telecaller] = {
-                    "name": telecaller,
-                    "total_leads": 0,
-                    "contacted": 0,
-                    "qualified": 0,
-                    "onboarded": 0,
-                    "rejected": 0,
-                    "in_progress": 0,
-                    "conversion_rate": 0,
-                    "stages": {
-                        "new": 0,
-                        "contacted": 0,
-                        "qualified": 0,
-                        "assigned": 0,
-                        "in_progress": 0
-                    }
-                }
-            
-            stats = telecaller_stats[telecaller]
-            stats["total_leads"] += 1
-            
-            # Count by status
-            status = lead.get("status", "New").lower()
-            if "contact" in status:
-                stats["contacted"] += 1
-            elif "interested" in status or "qualified" in status:
-                stats["qualified"] += 1
-            elif "onboard" in status:
-                stats["onboarded"] += 1
-            elif "reject" in status or "not interested" in status:
-                stats["rejected"] += 1
-            
-            # Count by lead stage
-            lead_stage = lead.get("lead_stage", "New").lower()
-            if "new" in lead_stage:
-                stats["stages"]["new"] += 1
-            elif "contacted" in lead_stage:
-                stats["stages"]["contacted"] += 1
-            elif "qualified" in lead_stage:
-                stats["stages"]["qualified"] += 1
-            elif "assigned" in lead_stage:
-                stats["stages"]["assigned"] += 1
-            elif "progress" in lead_stage:
-                stats["stages"]["in_progress"] += 1
-        
-        # Calculate conversion rates
-        for telecaller, stats in telecaller_stats.items():
-            if stats["total_leads"] > 0:
-                stats["conversion_rate"] = round((stats["onboarded"] / stats["total_leads"]) * 100, 2)
-        
-        # Overall stats
-        total_leads = len(all_leads)
-        total_contacted = sum(s["contacted"] for s in telecaller_stats.values())
-        total_onboarded = sum(s["onboarded"] for s in telecaller_stats.values())
-        overall_conversion = round((total_onboarded / total_leads * 100), 2) if total_leads > 0 else 0
-        
-        return {
-            "telecallers": list(telecaller_stats.values()),
-            "overall": {
-                "total_leads": total_leads,
-                "total_contacted": total_contacted,
-                "total_onboarded": total_onboarded,
-                "conversion_rate": overall_conversion
-            }
-        }
+        from performance_tracking import get_performance_metrics
+        return await get_performance_metrics(
+            db,
+            start_date=start_date,
+            end_date=end_date,
+            refresh=refresh,
+            include_daily=include_daily
+        )
     except Exception as e:
         logger.error(f"Performance tracking error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get performance data: {str(e)}")
 
 
+def build_sheet_lead(lead: dict) -> dict:
+    """Sheet-managed lead fields from a Google Sheets row"""
+    return {
+        "id": lead['id'],
+        "name": lead.get('name', ''),
+        "phone_number": lead.get('phone_number', ''),
+        "vehicle": lead.get('vehicle'),
+        "driving_license": lead.get('driving_license'),
+        "experience": lead.get('experience'),
+        "interested_ev": lead.get('interested_ev'),
+        "monthly_salary": lead.get('monthly_salary'),
+        "residing_chennai": lead.get('residing_chennai'),
+        "current_location": lead.get('current_location'),
+        "lead_source": lead.get('lead_source'),
+        "stage": lead.get('stage', 'New'),
+        "status": lead.get('status', 'New'),
+        "assigned_telecaller": lead.get('assigned_telecaller'),
+        "telecaller_notes": lead.get('telecaller_notes'),
+        "notes": lead.get('notes'),
+        "import_date": lead.get('import_date', ''),
+        "created_at": lead.get('created_at', ''),
+        # New document fields
+        "dl_no": lead.get('dl_no'),
+        "badge_no": lead.get('badge_no'),
+        "aadhar_card": lead.get('aadhar_card'),
+        "pan_card": lead.get('pan_card'),
+        "gas_bill": lead.get('gas_bill'),
+        "bank_passbook": lead.get('bank_passbook'),
+        # Shift fields
+        "preferred_shift": lead.get('preferred_shift'),
+        "allotted_shift": lead.get('allotted_shift'),
+        # Vehicle assignment
+        "default_vehicle": lead.get('default_vehicle'),
+        # End date
+        "end_date": lead.get('end_date')
+    }
+
+
+def sheet_lead_hash(lead_data: dict) -> str:
+    """Content hash of the sheet-managed fields, stored on the lead as sheet_hash"""
+    return hashlib.sha1(json.dumps(lead_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
 @api_router.post("/driver-onboarding/webhook/sync-from-sheets")
 async def sync_from_google_sheets(request: Request):
     """
@@ -5572,9 +5734,11 @@ async def sync_from_google_sheets(request: Request):
     
     SYNC STRATEGY:
     - Uses ID as unique identifier (not phone number)
-    - If ID exists in DB → UPDATE the lead
+    - Rows whose content hash matches the lead's stored sheet_hash are skipped
+    - If ID exists in DB and the row changed → UPDATE the lead
     - If ID doesn't exist in DB → CREATE new lead with that ID
     - If lead exists in DB but NOT in sheets → DELETE from DB
+    - All writes go out in one unordered bulk_write
     
     Expected payload: {
         "action": "sync_from_sheets",
@@ -5590,115 +5754,100 @@ async def sync_from_google_sheets(request: Request):
         
         leads_data = body.get('leads', [])
         
-        # Get all IDs from Google Sheets (filter out empty rows)
-        sheet_lead_ids = set()
-        valid_leads = []
+        # Sheet rows by ID (filter out empty rows; a repeated ID keeps the last row)
+        sheet_leads = {}
         
         for lead in leads_data:
             # Skip empty rows (no phone number means empty row)
             if not lead.get('phone_number') or lead.get('phone_number') == '':
                 continue
             
-            lead_id = lead.get('id', '').strip()
+            lead_id = str(lead.get('id') or '').strip()
             
             # Generate ID if not present
             if not lead_id:
                 lead_id = str(uuid.uuid4())
-                lead['id'] = lead_id
+            lead['id'] = lead_id
             
-            sheet_lead_ids.add(lead_id)
-            valid_leads.append(lead)
-        
-        # Get all existing leads from database
-        existing_leads = await db.driver_leads.find().to_list(length=None)
-        db_lead_ids = {lead['id'] for lead in existing_leads}
+            lead_data = build_sheet_lead(lead)
+            sheet_leads[lead_id] = (lead_data, sheet_lead_hash(lead_data))
         
-        created_count = 0
-        updated_count = 0
-        deleted_count = 0
+        # Only (id, hash) of existing leads is needed to find changed rows
+        db_hashes = {}
+        async for doc in db.driver_leads.find({}, {"_id": 0, "id": 1, "sheet_hash": 1}):
+            db_hashes[doc.get('id')] = doc.get('sheet_hash')
         
-        # Process each lead from sheets
-        for lead in valid_leads:
-            lead_id = lead['id']
-            
-            # Check if lead exists by ID
-            existing_lead = await db.driver_leads.find_one({"id": lead_id})
-            
-            # Prepare lead data with all fields (including new document fields)
-            lead_data = {
-                "id": lead_id,
-                "name": lead.get('name', ''),
-                "phone_number": lead.get('phone_number', ''),
-                "vehicle": lead.get('vehicle'),
-                "driving_license": lead.get('driving_license'),
-                "experience": lead.get('experience'),
-                "interested_ev": lead.get('interested_ev'),
-                "monthly_salary": lead.get('monthly_salary'),
-                "residing_chennai": lead.get('residing_chennai'),
-                "current_location": lead.get('current_location'),
-                "lead_source": lead.get('lead_source'),
-                "stage": lead.get('stage', 'New'),
-                "status": lead.get('status', 'New'),
-                "assigned_telecaller": lead.get('assigned_telecaller'),
-                "telecaller_notes": lead.get('telecaller_notes'),
-                "notes": lead.get('notes'),
-                "import_date": lead.get('import_date', ''),
-                "created_at": lead.get('created_at', ''),
-                # New document fields
-                "dl_no": lead.get('dl_no'),
-                "badge_no": lead.get('badge_no'),
-                "aadhar_card": lead.get('aadhar_card'),
-                "pan_card": lead.get('pan_card'),
-                "gas_bill": lead.get('gas_bill'),
-                "bank_passbook": lead.get('bank_passbook'),
-                # Shift fields
-                "preferred_shift": lead.get('preferred_shift'),
-                "allotted_shift": lead.get('allotted_shift'),
-                # Vehicle assignment
-                "default_vehicle": lead.get('default_vehicle'),
-                # End date
-                "end_date": lead.get('end_date')
-            }
-            
-            if existing_lead:
-                # Update existing lead (overwrite with sheet data)
-                await db.driver_leads.update_one(
-                    {"id": lead_id},
-                    {"$set": lead_data}
-                )
-                updated_count += 1
-                logger.info(f"Updated lead: {lead_id} - {lead_data['name']}")
-            else:
-                # Create new lead with the ID from sheets
-                # Add timestamps if not present
-                if not lead_data['import_date']:
-                    lead_data['import_date'] = datetime.now(timezone.utc).isoformat()
-                if not lead_data['created_at']:
-                    lead_data['created_at'] = datetime.now(timezone.utc).isoformat()
-                
-                await db.driver_leads.insert_one(lead_data)
-                created_count += 1
-                logger.info(f"Created new lead: {lead_id} - {lead_data['name']}")
+        changed_ids = [
+            lead_id for lead_id, (_, row_hash) in sheet_leads.items()
+            if lead_id in db_hashes and db_hashes[lead_id] != row_hash
+        ]
+        new_ids = [lead_id for lead_id in sheet_leads if lead_id not in db_hashes]
+        leads_to_delete = [lead_id for lead_id in db_hashes if lead_id not in sheet_leads]
+        unchanged_count = len(sheet_leads) - len(changed_ids) - len(new_ids)
+        
+        # Previous state of touched leads for the telecaller rollups
+        previous_by_id = {}
+        if changed_ids or leads_to_delete:
+            async for doc in db.driver_leads.find(
+                {"id": {"$in": changed_ids + leads_to_delete}}, ROLLUP_PROJECTION
+            ):
+                previous_by_id[doc['id']] = doc
+        
+        now_iso = datetime.now(timezone.utc).isoformat()
+        operations = []
+        transitions = []
+        
+        for lead_id in changed_ids:
+            lead_data, row_hash = sheet_leads[lead_id]
+            # Update existing lead (overwrite with sheet data)
+            operations.append(UpdateOne(
+                {"id": lead_id},
+                {"$set": {**lead_data, "sheet_hash": row_hash, "last_modified": now_iso}}
+            ))
+            previous = previous_by_id.get(lead_id)
+            transitions.append((previous, {**(previous or {}), **lead_data}))
+        
+        for lead_id in new_ids:
+            lead_data, row_hash = sheet_leads[lead_id]
+            # Create new lead with the ID from sheets, adding timestamps if not present
+            new_lead = {**lead_data, "sheet_hash": row_hash, "last_modified": now_iso}
+            if not new_lead['import_date']:
+                new_lead['import_date'] = now_iso
+            if not new_lead['created_at']:
+                new_lead['created_at'] = now_iso
+            operations.append(InsertOne(new_lead))
+            transitions.append((None, new_lead))
         
         # Delete leads that exist in DB but NOT in Google Sheets
-        leads_to_delete = db_lead_ids - sheet_lead_ids
-        
         if leads_to_delete:
-            delete_result = await db.driver_leads.delete_many({
-                "id": {"$in": list(leads_to_delete)}
-            })
-            deleted_count = delete_result.deleted_count
-            logger.info(f"Deleted {deleted_count} leads that were removed from Google Sheets")
+            operations.append(DeleteMany({"id": {"$in": leads_to_delete}}))
+            transitions.extend((previous_by_id.get(lead_id), None) for lead_id in leads_to_delete)
+        
+        created_count = updated_count = deleted_count = 0
+        if operations:
+            result = await db.driver_leads.bulk_write(operations, ordered=False)
+            created_count = result.inserted_count
+            updated_count = result.modified_count
+            deleted_count = result.deleted_count
+            await record_lead_transitions(db, transitions)
+        
+        logger.info(
+            f"Sheets webhook: {unchanged_count} unchanged, {updated_count} updated, "
+            f"{created_count} created, {deleted_count} deleted"
+        )
         
         return {
             "success": True,
-            "message": f"Synced {len(valid_leads)} leads from Google Sheets",
+            "message": f"Synced {len(sheet_leads)} leads from Google Sheets",
+            "unchanged": unchanged_count,
             "created": created_count,
             "updated": updated_count,
             "deleted": deleted_count,
             "total_processed": created_count + updated_count + deleted_count
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Sync from sheets error: {str(e)}")
         import traceback
@@ -5778,14 +5927,15 @@ async def update_call_status(
     
     await db.driver_leads.update_one(
         {"id": lead_id},
-        {"$set": {"status": new_status}}
+        {"$set": {"status": new_status, "last_modified": datetime.now(timezone.utc).isoformat()}}
     )
     
     # Get updated lead for sync
     updated_lead = await db.driver_leads.find_one({"id": lead_id}, {"_id": 0})
+    await record_lead_transition(db, lead, updated_lead)
     
     # Sync to Google Sheets
-    sync_single_record('leads', updated_lead)
+    await enqueue_sheets_sync(db, 'leads', [updated_lead])
     
     return {"message": "Call status updated successfully", "lead": updated_lead}
 
@@ -5801,8 +5951,9 @@ async def create_telecaller_task(task_data: TelecallerTaskCreate, current_user:
     if task_dict.get('scheduled_time'):
         task_dict['scheduled_time'] = task_dict['scheduled_time'].isoformat()
     
+    task_dict['last_modified'] = datetime.now(timezone.utc).isoformat()
     await db.telecaller_queue.insert_one(task_dict)
-    sync_single_record('telecaller_queue', task_dict)
+    await enqueue_sheets_sync(db, 'telecaller_queue', [task_dict])
     
     return {"message": "Telecaller task created", "task": task}
 
@@ -5822,70 +5973,50 @@ async def get_telecaller_tasks(current_user: User = Depends(get_current_user)):
 # ==================== MONTRA VEHICLE INSIGHTS ====================
 
 @api_router.post("/montra-vehicle/import-feed")
-async def import_montra_feed(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    """Import Montra vehicle feed data and sync to Google Sheets"""
+async def import_montra_feed(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Import a Montra vehicle feed file (one vehicle, one day) into montra_feed_data"""
     try:
-        import re
+        from montra_feed_import import (
+            FeedFileError, parse_feed_filename, read_feed_frame, prepare_feed_frame,
+            build_feed_documents, insert_feed_documents, content_hash, feed_file_record
+        )
         
-        # Get filename without extension
         filename = file.filename
         logger.info(f"Importing Montra feed from file: {filename}")
         
-        # Extract vehicle ID, day, month, and year from filename
         # Expected format: "P60G2512500002032 - 01 Sep 2025.csv"
-        filename_pattern = r"^([A-Z0-9]+)\s*-\s*(\d{2})\s+([A-Za-z]+)\s+(\d{4})\.(csv|xlsx)$"
-        match = re.match(filename_pattern, filename)
-        
-        if not match:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid filename format. Expected: 'VEHICLE_ID - DD MMM YYYY.csv'. Got: {filename}"
-            )
-        
-        vehicle_id = match.group(1)
-        day = match.group(2)
-        month = match.group(3)
-        year = match.group(4)
-        separator = "-"
-        
-        logger.info(f"Extracted from filename - Vehicle ID: {vehicle_id}, Day: {day}, Month: {month}, Year: {year}")
-        
-        # Read file content
-        content = await file.read()
-        
-        # Parse based on file type
-        file_extension = filename.split('.')[-1].lower()
-        
-        if file_extension == 'csv':
-            import io
-            df = pd.read_csv(io.BytesIO(content))
-        elif file_extension == 'xlsx':
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format")
-        
-        logger.info(f"Parsed file with {len(df)} rows and {len(df.columns)} columns")
-        
-        # CRITICAL: Sort data by time column (Column A - Date/Time) chronologically
-        # This ensures battery consumption calculations are accurate
-        time_col = df.columns[0]  # First column should be Date or Time
-        logger.info(f"Sorting data by time column: {time_col}")
+        try:
+            meta = parse_feed_filename(filename)
+            content = await file.read()
+        except FeedFileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # The exact same file was imported before: nothing to do
+        file_hash = content_hash(content)
+        previous = await db.feed_files.find_one({"content_hash": file_hash}, {"_id": 0})
+        if previous:
+            logger.info(f"{filename} already imported as {previous['filename']} at {previous['imported_at']}")
+            return {
+                "message": f"{filename} was already imported on {previous['imported_at']}",
+                "rows": 0,
+                "duplicates_skipped": previous.get("rows", 0),
+                "vehicle_id": meta["vehicle_id"],
+                "date": f"{meta['day']} {meta['month']}",
+                "already_imported": True,
+                "synced_to_database": True
+            }
         
         try:
-            # Convert to datetime and sort
-            df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
-            df = df.sort_values(by=time_col)
-            df = df.reset_index(drop=True)
-            logger.info(f"Data sorted successfully from {df[time_col].min()} to {df[time_col].max()}")
-        except Exception as sort_error:
-            logger.warning(f"Could not sort by time column: {sort_error}. Proceeding with original order.")
-        
-        # Verify we have the expected columns (A to U = 21 columns)
-        if len(df.columns) != 21:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Expected 21 columns (A-U), but found {len(df.columns)} columns"
-            )
+            df = prepare_feed_frame(read_feed_frame(content, meta["extension"]))
+        except FeedFileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        vehicle_id = meta["vehicle_id"]
+        logger.info(f"Parsed {filename}: vehicle {vehicle_id}, {meta['iso_date']}, {len(df)} rows")
         
         # Look up registration number from vehicle mapping
         vehicle_mapping = await db.vehicle_mapping.find_one(
@@ -5896,84 +6027,32 @@ async def import_montra_feed(file: UploadFile = File(...), current_user: User =
         
         logger.info(f"Vehicle {vehicle_id} → Registration: {registration_number if registration_number else 'Not found'}")
         
-        # Prepare data for Google Sheets
-        # Sheet columns: D to X (CSV columns A to U)
-        # Additional columns: Y (vehicle_id), Z (separator), AA (day), AB (month), AC (registration_number)
-        
-        rows_to_import = []
-        for idx, row in df.iterrows():
-            # Convert row to list and add filename data
-            row_data = row.tolist()
-            # Add vehicle_id, separator, day, month, registration_number
-            row_data.extend([vehicle_id, separator, day, month, registration_number])
-            rows_to_import.append(row_data)
-        
-        logger.info(f"Prepared {len(rows_to_import)} rows for import")
-        
-        # Load mode mapping tables
-        model_dict, mode_dict = load_mode_mapping_tables()
-        
-        # Also save to MongoDB for analytics queries
-        montra_docs = []
-        headers = df.columns.tolist() + ['Vehicle ID', 'Separator', 'Day', 'Month', 'Registration Number']
-        
-        # Parse the date properly for ISO format storage
-        from datetime import datetime as dt_obj
-        try:
-            # Convert "01 Sep 2025" to ISO date "2025-09-01"
-            date_str = f"{day} {month} {year}"
-            parsed_date = dt_obj.strptime(date_str, "%d %b %Y")
-            iso_date = parsed_date.strftime("%Y-%m-%d")
-        except:
-            # Fallback if parsing fails
-            iso_date = f"{year}-01-01"
-            logger.warning(f"Could not parse date '{day} {month} {year}', using fallback: {iso_date}")
-        
-        for row_data in rows_to_import:
-            doc = {
-                "vehicle_id": vehicle_id,
-                "date": iso_date,  # Store in ISO format for easy querying
-                "date_display": f"{day} {month} {year}",  # Keep original for display
-                "day": day,
-                "month": month,
-                "year": year,
-                "registration_number": registration_number,
-                "filename": filename,
-                "imported_at": datetime.now(timezone.utc).isoformat()
-            }
-            # Map all columns to document
-            for i, header in enumerate(headers):
-                if i < len(row_data):
-                    doc[header] = row_data[i]
-            
-            # Enrich with Mode Name and Mode Type
-            ride_mode = doc.get("Ride Mode", "")
-            if ride_mode:
-                mode_name, mode_type = enrich_with_mode_data(
-                    registration_number if registration_number else vehicle_id,
-                    str(ride_mode),
-                    model_dict,
-                    mode_dict
-                )
-                doc["mode_name"] = mode_name
-                doc["mode_type"] = mode_type
-            else:
-                doc["mode_name"] = "Unknown"
-                doc["mode_type"] = "Unknown"
-            
-            montra_docs.append(doc)
+        # Normalization and mode enrichment are vectorized over the whole frame
+        mapping = get_mode_mapping()
+        montra_docs = build_feed_documents(
+            df, meta, filename, registration_number,
+            mapping.model_dict, mapping.mode_dict, mapping.mode_table
+        )
         
-        # Save to MongoDB
-        if montra_docs:
-            await db.montra_feed_data.insert_many(montra_docs)
-            logger.info(f"Saved {len(montra_docs)} rows to MongoDB")
+        # Rows already present (same vehicle and timestamp) are skipped
+        inserted, duplicates = await insert_feed_documents(db.montra_feed_data, montra_docs)
+        if buckets_enabled():
+            await write_feed_buckets(db, montra_docs)
+        await summarize_imported(db, montra_docs)
+        await db.feed_files.update_one(
+            {"content_hash": file_hash},
+            {"$setOnInsert": feed_file_record(meta, filename, file_hash, len(content), inserted, duplicates)},
+            upsert=True
+        )
+        logger.info(f"Successfully imported {inserted} rows from {filename} to database ({duplicates} duplicates skipped)")
+        background_tasks.add_task(refresh_charging_sessions_with_lease, db)
         
-        logger.info(f"Successfully imported {len(rows_to_import)} rows to database")
         return {
-            "message": f"Successfully imported {len(rows_to_import)} rows from {filename}",
-            "rows": len(rows_to_import),
+            "message": f"Successfully imported {inserted} rows from {filename}",
+            "rows": inserted,
+            "duplicates_skipped": duplicates,
             "vehicle_id": vehicle_id,
-            "date": f"{day} {month}",
+            "date": f"{meta['day']} {meta['month']}",
             "synced_to_database": True
         }
             
@@ -5984,6 +6063,156 @@ async def import_montra_feed(file: UploadFile = File(...), current_user: User =
         raise HTTPException(status_code=500, detail=f"Failed to import feed: {str(e)}")
 
 
+@api_router.post("/montra-vehicle/import-feed-batch")
+async def import_montra_feed_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import many Montra feed files at once (individual CSV/XLSX files and/or ZIP
+    archives of them). Files are parsed and inserted in parallel worker
+    processes; the response has one result per file.
+    """
+    try:
+        from montra_feed_import import (
+            FEED_FILENAME_PATTERN, expand_feed_uploads, get_ingest_pool, ingest_feed_file
+        )
+        
+        started = datetime.now(timezone.utc)
+        uploads = [(file.filename, await file.read()) for file in files]
+        try:
+            feed_files, skipped = expand_feed_uploads(uploads)
+        except zipfile.BadZipFile as e:
+            raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {str(e)}")
+        
+        if not feed_files:
+            raise HTTPException(status_code=400, detail="No CSV or XLSX feed files found in the upload")
+        
+        # Registration numbers for every vehicle in the batch with one query
+        file_vehicle_ids = {}
+        for filename, _ in feed_files:
+            match = FEED_FILENAME_PATTERN.match(filename)
+            file_vehicle_ids[filename] = match.group(1) if match else None
+        vehicle_ids = {vehicle_id for vehicle_id in file_vehicle_ids.values() if vehicle_id}
+        registrations = {
+            mapping["vehicle_id"]: mapping.get("registration_number", "")
+            async for mapping in db.vehicle_mapping.find(
+                {"vehicle_id": {"$in": list(vehicle_ids)}},
+                {"_id": 0, "vehicle_id": 1, "registration_number": 1}
+            )
+        }
+        
+        mapping = get_mode_mapping()
+        loop = asyncio.get_running_loop()
+        pool = get_ingest_pool()
+        
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                pool, ingest_feed_file, filename, content,
+                registrations.get(file_vehicle_ids[filename], ""),
+                mapping.model_dict, mapping.mode_dict
+            )
+            for filename, content in feed_files
+        ])
+        
+        succeeded = [r for r in results if r["success"]]
+        total_rows = sum(r["inserted"] for r in succeeded)
+        already_imported = sum(1 for r in succeeded if r.get("already_imported"))
+        duration = round((datetime.now(timezone.utc) - started).total_seconds(), 2)
+        logger.info(
+            f"Montra batch import: {len(succeeded)}/{len(results)} files, {total_rows} rows in {duration}s"
+        )
+        if succeeded:
+            background_tasks.add_task(refresh_charging_sessions_with_lease, db)
+        
+        return {
+            "success": len(succeeded) == len(results),
+            "message": f"Imported {total_rows} rows from {len(succeeded)} of {len(results)} files",
+            "files_total": len(results),
+            "files_imported": len(succeeded),
+            "files_failed": len(results) - len(succeeded),
+            "files_already_imported": already_imported,
+            "rows_imported": total_rows,
+            "duplicates_skipped": sum(r["duplicates_skipped"] for r in succeeded),
+            "skipped_entries": skipped,
+            "duration_seconds": duration,
+            "results": results
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing Montra feed batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to import feed batch: {str(e)}")
+
+
+@api_router.post("/montra-vehicle/dedupe-feed")
+async def dedupe_montra_feed(dry_run: bool = True, current_user: User = Depends(get_current_user)):
+    """
+    Remove duplicate Montra feed rows (same vehicle and timestamp) left by
+    repeated imports, then create the unique natural-key index. Dry run by default.
+    """
+    if current_user.account_type not in ["master_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can deduplicate feed data")
+    
+    try:
+        from montra_feed_import import dedupe_feed_data
+        return await dedupe_feed_data(db, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Error deduplicating Montra feed data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to deduplicate feed data: {str(e)}")
+
+
+@api_router.post("/montra-vehicle/canonicalize-feed")
+async def canonicalize_montra_feed(background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    """
+    Add the canonical typed telemetry fields (soc_percent, odometer_km,
+    speed_kmph) to Montra feed rows imported before they existed. Runs in
+    the background; safe to start again. Admin only.
+    """
+    if current_user.account_type not in ["master_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can convert feed data")
+
+    from montra_feed_import import canonicalize_feed_data
+
+    async def run():
+        try:
+            await canonicalize_feed_data(db)
+        except Exception as e:
+            logger.error(f"Error canonicalizing Montra feed data: {str(e)}")
+
+    background_tasks.add_task(run)
+    return {
+        "success": True,
+        "message": "Conversion of Montra feed data to the canonical telemetry schema started in background"
+    }
+
+
+@api_router.post("/montra-vehicle/day-summary/rebuild")
+async def rebuild_vehicle_day_summaries(
+    background_tasks: BackgroundTasks,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Recompute vehicle day summaries from montra_feed_data in the background
+    (all data by default, or a date range / vehicle). Admin only.
+    """
+    if current_user.account_type not in ["master_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can rebuild vehicle day summaries")
+    
+    background_tasks.add_task(
+        rebuild_with_lease, db, start_date=start_date, end_date=end_date, vehicle_id=vehicle_id
+    )
+    return {
+        "success": True,
+        "message": "Vehicle day summary rebuild started in background"
+    }
+
+
 @api_router.post("/montra-vehicle/fix-date-format")
 async def fix_montra_date_format(current_user: User = Depends(get_current_user)):
     """Fix date format in existing Montra feed data from 'DD MMM' to ISO 'YYYY-MM-DD' format"""
@@ -6063,62 +6292,61 @@ async def fix_montra_date_format(current_user: User = Depends(get_current_user))
 
 
 @api_router.post("/montra-vehicle/enrich-existing-data")
-async def enrich_existing_montra_data(current_user: User = Depends(get_current_user)):
-    """Re-process all existing Montra feed data to add Mode Name and Mode Type"""
+async def enrich_existing_montra_data(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Re-process all existing Montra feed data to add Mode Name and Mode Type.
+    Runs in the background, one update per (vehicle, registration, Ride Mode)
+    group; see /montra-vehicle/enrich-existing-data/status for progress.
+    """
     try:
+        from mode_enrichment import enrich_with_lease
+        
         # Load mode mapping tables
-        model_dict, mode_dict = load_mode_mapping_tables()
+        mapping = get_mode_mapping()
+        model_dict, mode_dict = mapping.model_dict, mapping.mode_dict
         
         if not model_dict or not mode_dict:
             raise HTTPException(status_code=400, detail="Mode mapping tables not available. Please upload Mode Details.xlsx")
         
-        # Get all records
-        all_records = await db.montra_feed_data.find({}).to_list(100000)
-        
-        logger.info(f"Processing {len(all_records)} existing records for mode enrichment")
-        
-        updated_count = 0
-        for record in all_records:
-            vehicle_id = record.get("vehicle_id")
-            registration = record.get("registration_number")
-            ride_mode = record.get("Ride Mode")
-            
-            if not ride_mode:
-                continue
-            
-            # Use registration number if available, otherwise vehicle ID
-            lookup_id = registration if registration else vehicle_id
-            
-            mode_name, mode_type = enrich_with_mode_data(
-                lookup_id,
-                str(ride_mode),
-                model_dict,
-                mode_dict
-            )
-            
-            # Update record in MongoDB
-            await db.montra_feed_data.update_one(
-                {"_id": record["_id"]},
-                {"$set": {
-                    "mode_name": mode_name,
-                    "mode_type": mode_type
-                }}
-            )
-            updated_count += 1
+        def resolve(lookup_id: str, ride_mode: str):
+            return enrich_with_mode_data(lookup_id, ride_mode, model_dict, mode_dict)
         
-        logger.info(f"Successfully enriched {updated_count} records")
+        background_tasks.add_task(enrich_with_lease, db, resolve, mapping.fingerprint)
+        logger.info("Mode enrichment of existing Montra feed data started in background")
         
         return {
             "success": True,
-            "message": f"Successfully enriched {updated_count} records with mode data",
-            "updated_count": updated_count
+            "message": "Mode enrichment started in background. See /montra-vehicle/enrich-existing-data/status for progress."
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error enriching existing data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to enrich data: {str(e)}")
 
 
+@api_router.get("/montra-vehicle/enrich-existing-data/status")
+async def get_montra_enrichment_status(current_user: User = Depends(get_current_user)):
+    """Progress of the current (or last) mode enrichment run"""
+    try:
+        from mode_enrichment import get_enrichment_state
+        
+        state = await get_enrichment_state(db)
+        if not state:
+            return {"success": True, "state": None, "message": "Mode enrichment has not been run yet"}
+        
+        groups_total = state.get("groups_total") or 0
+        state["progress_percentage"] = int(state.get("groups_done", 0) * 100 / groups_total) if groups_total else 100
+        return {"success": True, "state": state}
+    except Exception as e:
+        logger.error(f"Error fetching mode enrichment status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch mode enrichment status")
+
+
 @api_router.get("/montra-vehicle/download-mode-mapping")
 async def download_mode_mapping(current_user: User = Depends(get_current_user)):
     """Download the current Mode Details.xlsx mapping file"""
@@ -6180,11 +6408,14 @@ async def upload_mode_mapping(file: UploadFile = File(...), current_user: User =
             f.write(content)
         
         logger.info(f"Updated mode mapping file: {file.filename}")
+        mapping = get_mode_mapping(force=True)
         
         return {
             "success": True,
             "message": "Mode mapping file updated successfully",
-            "filename": file.filename
+            "filename": file.filename,
+            "vehicle_models": len(mapping.model_dict),
+            "ride_modes": len(mapping.mode_dict)
         }
         
     except HTTPException:
@@ -6194,13 +6425,25 @@ async def upload_mode_mapping(file: UploadFile = File(...), current_user: User =
         raise HTTPException(status_code=500, detail=f"Failed to upload mapping file: {str(e)}")
 
 
+@api_router.post("/montra-vehicle/mode-mapping/reload")
+async def reload_mode_mapping(current_user: User = Depends(get_current_user)):
+    """Force a re-read of mode_details.xlsx into the in-process mapping cache"""
+    if current_user.account_type not in ["admin", "master_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can reload the mode mapping")
+    
+    get_mode_mapping(force=True)
+    return {"success": True, **mode_mapping_cache.status()}
+
+
 @api_router.post("/telecaller-queue/sync")
-async def sync_telecaller_queue(current_user: User = Depends(get_current_user)):
-    """Sync all telecaller tasks to Google Sheets"""
-    tasks = await db.telecaller_queue.find({}, {"_id": 0}).to_list(1000)
-    success = sync_all_records('telecaller_queue', tasks)
-    if success:
-        return {"message": "Telecaller queue synced successfully"}
+async def sync_telecaller_queue(
+    full: bool = Query(False, description="Resend every record instead of only changes since the last sync"),
+    current_user: User = Depends(get_current_user)
+):
+    """Sync telecaller queue changed since the last acknowledged sync to Google Sheets (full=true resends all)"""
+    result = await sync_tab(db, 'telecaller_queue', get_sheets_client(), full=full)
+    if result["success"]:
+        return {"message": "Telecaller queue synced successfully", **result}
     raise HTTPException(status_code=500, detail="Failed to sync telecaller queue")
 
 
@@ -6531,39 +6774,31 @@ async def bulk_delete_files(file_ids: list, current_user: User = Depends(get_cur
 async def get_battery_consumption_data(
     vehicle_id: str = Query(...),
     date: str = Query(...),
+    points: Optional[int] = Query(None, ge=3, le=5000),
+    method: str = Query("lttb"),
     current_user: User = Depends(get_current_user)
 ):
-    """Get battery consumption data for a specific vehicle and date from MongoDB - OPTIMIZED"""
+    """
+    Get battery consumption data for a specific vehicle and date from MongoDB - OPTIMIZED
+    
+    Without ``points``, returns up to 2000 full rows (raw view / CSV). With
+    ``points``, returns the whole day downsampled to at most that many rows,
+    shared between the chart series (SOC, speed, distance) and projected to
+    the chart fields.
+    """
     try:
-        logger.info(f"Fetching battery data for vehicle {vehicle_id} on {date}")
-        
-        # Query MongoDB for matching data with compound index (vehicle_id + date)
-        query = {
-            "vehicle_id": vehicle_id,
-            "date": date
-        }
+        from telemetry_downsample import CHART_FIELDS, METHODS, downsample_rows
         
-        # Use projection to only fetch required fields (reduces data transfer)
-        # Exclude unnecessary fields to reduce payload size
-        projection = {
-            "_id": 0  # Already excluding MongoDB ID
-            # Include all other fields by default
-        }
+        logger.info(f"Fetching battery data for vehicle {vehicle_id} on {date}")
+        if method not in METHODS:
+            raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(METHODS)}")
         
-        # Check if index exists before using hint
-        try:
-            # Try to use index for fastest retrieval
-            results = await db.montra_feed_data.find(
-                query, 
-                projection
-            ).hint("idx_vehicle_date").sort("Date", 1).limit(2000).to_list(2000)
-        except Exception as hint_error:
-            # If index doesn't exist, fall back to query without hint
-            logger.warning(f"Index not found, using query without hint: {str(hint_error)}")
-            results = await db.montra_feed_data.find(
-                query, 
-                projection
-            ).sort("Date", 1).limit(2000).to_list(2000)
+        # Per-sample documents or hourly buckets, depending on MONTRA_FEED_STORE
+        feed_store = get_feed_store(db)
+        if points:
+            results = await feed_store.day_rows(vehicle_id, date, fields=CHART_FIELDS)
+        else:
+            results = await feed_store.day_rows(vehicle_id, date, limit=2000)
         
         if not results:
             logger.warning(f"No data found for vehicle {vehicle_id} on {date}")
@@ -6572,7 +6807,22 @@ async def get_battery_consumption_data(
                 detail=f"No data found for vehicle {vehicle_id} on {date}. Please import the feed data first."
             )
         
-        logger.info(f"Retrieved {len(results)} rows for vehicle {vehicle_id} (optimized with index)")
+        if points:
+            raw_count = len(results)
+            results = downsample_rows(results, points, method)
+            logger.info(f"Downsampled {raw_count} rows to {len(results)} ({method}) for vehicle {vehicle_id}")
+            return {
+                "success": True,
+                "vehicle_id": vehicle_id,
+                "date": date,
+                "data": results,
+                "count": len(results),
+                "raw_count": raw_count,
+                "downsampled": len(results) < raw_count,
+                "method": method
+            }
+        
+        logger.info(f"Retrieved {len(results)} rows for vehicle {vehicle_id} from {feed_store.name} store")
         
         return {
             "success": True,
@@ -6613,46 +6863,25 @@ async def get_vehicles_list(current_user: User = Depends(get_current_user)):
 
 
 @api_router.get("/montra-vehicle/feed-database")
-async def get_montra_feed_database(current_user: User = Depends(get_current_user)):
-    """Get all montra feed entries with file information for database management"""
+async def get_montra_feed_database(
+    skip: int = Query(0, ge=0, description="Number of files to skip"),
+    limit: int = Query(1000, ge=1, le=5000, description="Number of files to return"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get imported montra feed files (from the feed_files manifest) for database management"""
     try:
-        # Aggregate to get unique files with their data counts, grouped by month
-        pipeline = [
-            {
-                "$group": {
-                    "_id": {
-                        "vehicle_id": "$vehicle_id",
-                        "date": "$date",
-                        "filename": {"$ifNull": ["$filename", "Unknown"]},
-                        "month": "$month",
-                        "year": {"$ifNull": ["$year", "2024"]}  # Default to 2024 if year is missing
-                    },
-                    "count": {"$sum": 1},
-                    "first_entry": {"$first": "$$ROOT"}
-                }
-            },
-            {
-                "$project": {
-                    "vehicle_id": "$_id.vehicle_id",
-                    "date": "$_id.date", 
-                    "filename": "$_id.filename",
-                    "month": "$_id.month",
-                    "year": "$_id.year",
-                    "month_year": {"$concat": ["$_id.month", " ", {"$toString": "$_id.year"}]},
-                    "record_count": "$count",
-                    "uploaded_at": "$first_entry.imported_at",
-                    "file_size": "$first_entry.file_size"
-                }
-            },
-            {"$sort": {"uploaded_at": -1}}
-        ]
+        from montra_feed_import import list_feed_files
         
-        results = await db.montra_feed_data.aggregate(pipeline).to_list(1000)
+        files, total = await list_feed_files(db, skip, limit)
         
         return {
             "success": True,
-            "files": results,
-            "count": len(results)
+            "files": files,
+            "count": len(files),
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "has_more": skip + len(files) < total
         }
     except Exception as e:
         logger.error(f"Error fetching montra feed database: {str(e)}")
@@ -6662,14 +6891,19 @@ async def get_montra_feed_database(current_user: User = Depends(get_current_user
 @api_router.delete("/montra-vehicle/feed-database")
 async def delete_montra_feed_files(
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Delete selected montra feed files from database
     
     Args:
-        request: Request containing file_identifiers in JSON body
+        request: Request containing file_identifiers in JSON body; each is a
+            feed_files manifest id ({"id": ...}) or, from older clients,
+            {"vehicle_id": ..., "date": ...}
     """
     try:
+        from montra_feed_import import resolve_feed_files
+        
         # Parse JSON body
         body = await request.json()
         file_identifiers = body if isinstance(body, list) else body.get("file_identifiers", [])
@@ -6677,29 +6911,41 @@ async def delete_montra_feed_files(
         if not file_identifiers:
             raise HTTPException(status_code=400, detail="No files specified for deletion")
         
-        deleted_count = 0
-        failed_deletions = []
+        records, not_found = await resolve_feed_files(db, file_identifiers)
+        failed_deletions = [{
+            "filename": file_info.get("filename", f"{file_info.get('vehicle_id', 'Unknown')}-{file_info.get('date', 'Unknown')}"),
+            "error": "Not found in the feed file manifest"
+        } for file_info in not_found]
         
-        for file_info in file_identifiers:
+        # Feed rows are stored per vehicle-day, so a file is removed with its whole vehicle-day
+        vehicle_days = {}
+        for record in records:
+            vehicle_days.setdefault((record["vehicle_id"], record["date"]), record.get("filename"))
+        
+        deleted_count = 0
+        for (vehicle_id, date), filename in vehicle_days.items():
             try:
-                # Use vehicle_id and date as primary identifiers since filename might be null in older records
-                query = {
-                    "vehicle_id": file_info["vehicle_id"],
-                    "date": file_info["date"]
-                }
-                
+                query = {"vehicle_id": vehicle_id, "date": date}
                 result = await db.montra_feed_data.delete_many(query)
                 deleted_count += result.deleted_count
+                # Otherwise re-uploading the same file would be skipped as already imported
+                await db.feed_files.delete_many(query)
+                await delete_feed_buckets(db, vehicle_id, date)
+                await delete_day_summary(db, vehicle_id, date)
                 
-                logger.info(f"Deleted {result.deleted_count} records for vehicle {file_info['vehicle_id']} date {file_info['date']}")
+                logger.info(f"Deleted {result.deleted_count} records for vehicle {vehicle_id} date {date}")
                 
             except Exception as e:
-                logger.error(f"Error deleting records for {file_info.get('vehicle_id', 'Unknown')}: {str(e)}")
+                logger.error(f"Error deleting records for {vehicle_id}: {str(e)}")
                 failed_deletions.append({
-                    "filename": file_info.get("filename", f"{file_info.get('vehicle_id', 'Unknown')}-{file_info.get('date', 'Unknown')}"),
+                    "filename": filename or f"{vehicle_id}-{date}",
                     "error": str(e)
                 })
         
+        if vehicle_days:
+            # Sessions of the deleted days (and the neighbouring days they ran into)
+            background_tasks.add_task(refresh_charging_sessions_with_lease, db)
+        
         if failed_deletions:
             return {
                 "success": False,
@@ -6728,64 +6974,41 @@ async def download_montra_feed_data(
 ):
     """Download selected montra feed files as CSV
     
+    The CSV is streamed from the database cursors as it is written, so memory
+    use stays constant and the first bytes are sent right away.
+    
     Args:
-        request: Request containing files list in JSON body
+        request: Request containing files list in JSON body, and optionally
+            "compression": "gzip" for a .csv.gz download
     """
     try:
-        from fastapi.responses import StreamingResponse
-        import csv
-        from io import StringIO
+        from feed_export import COMPRESSIONS, export_fieldnames, stream_feed_csv, vehicle_day_keys
         
         # Parse JSON body
         body = await request.json()
         files = body.get("files", [])
+        compression = body.get("compression")
         
         if not files:
             raise HTTPException(status_code=400, detail="No files specified for download")
+        if compression and compression not in COMPRESSIONS:
+            raise HTTPException(status_code=400, detail=f"compression must be one of {', '.join(COMPRESSIONS)}")
         
-        # Collect all records
-        all_records = []
-        
-        for file_info in files:
-            query = {
-                "vehicle_id": file_info["vehicle_id"],
-                "date": file_info["date"]
-            }
-            
-            records = await db.montra_feed_data.find(query).to_list(None)
-            all_records.extend(records)
-        
-        if not all_records:
-            raise HTTPException(status_code=404, detail="No data found for selected files")
-        
-        # Create CSV
-        output = StringIO()
+        vehicle_days = vehicle_day_keys(files)
         
-        # Get all unique field names
-        fieldnames = set()
-        for record in all_records:
-            fieldnames.update(record.keys())
-        
-        # Remove MongoDB _id field
-        fieldnames.discard('_id')
-        fieldnames = sorted(fieldnames)
-        
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for record in all_records:
-            # Remove _id
-            if '_id' in record:
-                del record['_id']
-            writer.writerow(record)
+        # Column names of all selected rows, computed by the database
+        fieldnames = await export_fieldnames(db, vehicle_days)
+        if not fieldnames:
+            raise HTTPException(status_code=404, detail="No data found for selected files")
         
-        # Return as downloadable file
-        output.seek(0)
+        filename = f"montra_feed_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        if compression == "gzip":
+            filename += ".gz"
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
+            stream_feed_csv(db, vehicle_days, fieldnames, compression),
+            media_type="application/gzip" if compression == "gzip" else "text/csv",
             headers={
-                "Content-Disposition": f"attachment; filename=montra_feed_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                "Content-Disposition": f"attachment; filename={filename}"
             }
         )
         
@@ -6808,8 +7031,7 @@ async def get_battery_milestones(
     Returns time and km when battery hits 80%, 50%, 30%, 20%, plus derived mileage and mid-day charging.
     """
     try:
-        from datetime import datetime, time as dt_time
-        import pandas as pd
+        from battery_milestones import iso_date_range
         
         data = await request.json()
         vehicle_ids = data.get("vehicle_ids", [])
@@ -6819,177 +7041,19 @@ async def get_battery_milestones(
         if not vehicle_ids or not start_date or not end_date:
             raise HTTPException(status_code=400, detail="vehicle_ids, start_date, and end_date are required")
         
-        results = []
-        
-        for vehicle_id in vehicle_ids:
-            # Query data for this vehicle in date range
-            query = {
-                "vehicle_id": vehicle_id,
-                "date": {"$gte": start_date, "$lte": end_date}
-            }
-            
-            # Get all records for this vehicle in the date range, grouped by date
-            records = await db.montra_feed_data.find(query).sort("date", 1).to_list(10000)
-            
-            # Group by date
-            date_groups = {}
-            for record in records:
-                date_key = record.get("date")
-                if date_key not in date_groups:
-                    date_groups[date_key] = []
-                date_groups[date_key].append(record)
-            
-            # Analyze each date
-            for date_str, day_records in date_groups.items():
-                try:
-                    # Sort records by time
-                    day_records.sort(key=lambda x: x.get("time", "00:00:00"))
-                    
-                    # Skip if insufficient data
-                    if len(day_records) < 5:
-                        continue
-                    
-                    analysis = {
-                        "date": date_str,
-                        "vehicle": vehicle_id,
-                        "charge_at_6am": None,
-                        "time_at_80": None,
-                        "km_at_80": None,
-                        "time_at_50": None,
-                        "km_at_50": None,
-                        "time_at_30": None,
-                        "time_at_20": None,
-                        "km_at_20": None,
-                        "derived_mileage": None,
-                        "midday_charge": None
-                    }
-                    
-                    # Find charge at 6AM (or closest time before 7AM)
-                    charge_at_6am = None
-                    for record in day_records:
-                        record_time_str = record.get("time", "00:00:00")
-                        try:
-                            record_time = datetime.strptime(record_time_str, "%H:%M:%S").time()
-                            if record_time <= dt_time(7, 0):
-                                battery_pct = record.get("battery_soc_percentage")
-                                if battery_pct is not None:
-                                    charge_at_6am = battery_pct
-                        except:
-                            pass
-                    
-                    # Skip this day if no 6AM charge found
-                    if charge_at_6am is None:
-                        continue
-                    
-                    analysis["charge_at_6am"] = f"{charge_at_6am}%"
-                    
-                    # Find milestones (80%, 50%, 30%, 20%) - first occurrence during driving
-                    milestones = {80: False, 50: False, 30: False, 20: False}
-                    prev_battery = None
-                    has_any_milestone = False
-                    
-                    for record in day_records:
-                        battery_pct = record.get("battery_soc_percentage")
-                        km = record.get("km")
-                        record_time = record.get("time")
-                        
-                        if battery_pct is None:
-                            continue
-                        
-                        # Check if battery is decreasing (driving, not charging)
-                        is_driving = prev_battery is not None and battery_pct < prev_battery
-                        
-                        if is_driving or prev_battery is None:
-                            # Check each milestone
-                            for milestone in [80, 50, 30, 20]:
-                                if not milestones[milestone]:
-                                    if battery_pct <= milestone:
-                                        milestones[milestone] = True
-                                        has_any_milestone = True
-                                        if milestone == 80:
-                                            analysis["time_at_80"] = record_time
-                                            if km:
-                                                analysis["km_at_80"] = km
-                                        elif milestone == 50:
-                                            analysis["time_at_50"] = record_time
-                                            if km:
-                                                analysis["km_at_50"] = km
-                                        elif milestone == 30:
-                                            analysis["time_at_30"] = record_time
-                                        elif milestone == 20:
-                                            analysis["time_at_20"] = record_time
-                                            if km:
-                                                analysis["km_at_20"] = km
-                        
-                        prev_battery = battery_pct
-                    
-                    # Skip if no meaningful milestones reached
-                    if not has_any_milestone:
-                        continue
-                    
-                    # Calculate derived mileage (km per % charge drop during driving periods)
-                    # Only consider periods where battery is decreasing (driving)
-                    driving_segments = []
-                    prev_record = None
-                    
-                    for record in day_records:
-                        battery_pct = record.get("battery_soc_percentage")
-                        km = record.get("km")
-                        
-                        if prev_record and battery_pct is not None and km is not None:
-                            prev_battery_pct = prev_record.get("battery_soc_percentage")
-                            prev_km = prev_record.get("km")
-                            
-                            if prev_battery_pct and prev_km:
-                                # Check if driving (battery decreasing)
-                                if battery_pct < prev_battery_pct:
-                                    charge_drop = prev_battery_pct - battery_pct
-                                    km_traveled = km - prev_km
-                                    
-                                    # Only include reasonable values
-                                    if charge_drop > 0 and km_traveled > 0 and charge_drop < 50 and km_traveled < 100:
-                                        efficiency = km_traveled / charge_drop
-                                        driving_segments.append(efficiency)
-                        
-                        prev_record = record
-                    
-                    if driving_segments:
-                        avg_mileage = sum(driving_segments) / len(driving_segments)
-                        analysis["derived_mileage"] = f"{avg_mileage:.2f}"
-                    
-                    # Calculate mid-day charge (7AM to 7PM)
-                    total_midday_charge = 0
-                    prev_battery_midday = None
-                    
-                    for record in day_records:
-                        record_time_str = record.get("time", "00:00:00")
-                        battery_pct = record.get("battery_soc_percentage")
-                        
-                        try:
-                            record_time = datetime.strptime(record_time_str, "%H:%M:%S").time()
-                            
-                            # Check if between 7AM and 7PM
-                            if dt_time(7, 0) <= record_time <= dt_time(19, 0):
-                                if battery_pct is not None and prev_battery_midday is not None:
-                                    # If battery increased (charging)
-                                    if battery_pct > prev_battery_midday:
-                                        charge_added = battery_pct - prev_battery_midday
-                                        # Only add if reasonable increase (not data error)
-                                        if charge_added < 50:
-                                            total_midday_charge += charge_added
-                                
-                                prev_battery_midday = battery_pct
-                        except:
-                            pass
-                    
-                    if total_midday_charge > 0:
-                        analysis["midday_charge"] = f"{total_midday_charge:.1f}%"
-                    
-                    results.append(analysis)
-                    
-                except Exception as e:
-                    logger.error(f"Error analyzing date {date_str} for vehicle {vehicle_id}: {str(e)}")
-                    continue
+        # Milestones are computed per vehicle-day at import time (vehicle_day_summary)
+        start_iso, end_iso = iso_date_range(start_date, end_date, int(data["year"]) if data.get("year") else None)
+        summaries = await get_day_summaries(
+            db, start_iso, end_iso, vehicle_ids=vehicle_ids,
+            query={"milestones": {"$ne": None}},
+            projection={"_id": 0, "vehicle_id": 1, "date": 1, "milestones": 1}
+        )
+        vehicle_rank = {vehicle_id: rank for rank, vehicle_id in enumerate(vehicle_ids)}
+        summaries.sort(key=lambda summary: (vehicle_rank.get(summary["vehicle_id"], len(vehicle_rank)), summary["date"]))
+        results = [summary["milestones"] for summary in summaries]
+        logger.info(
+            f"Battery milestones: {len(vehicle_ids)} vehicles, {start_iso} to {end_iso} -> {len(results)} vehicle-days"
+        )
         
         return {
             "success": True,
@@ -7005,32 +7069,115 @@ async def get_battery_milestones(
 
 
 @api_router.post("/montra-vehicle/refresh-analytics-cache")
-async def refresh_analytics_cache(current_user: User = Depends(get_current_user)):
-    """Manually trigger analytics cache refresh (admin only)"""
+async def refresh_analytics_cache(
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Manually trigger analytics cache refresh (admin only)
+    
+    Only vehicle-days imported or deleted since the last refresh are recomputed,
+    unless full=true.
+    """
     if current_user.account_type not in ["master_admin", "admin"]:
         raise HTTPException(status_code=403, detail="Only admins can refresh analytics cache")
     
     try:
-        import subprocess
+        from analytics_cache import refresh_with_lease
         
-        logger.info(f"Manual cache refresh triggered by {current_user.email}")
-        
-        # Run the cache computation script in background
-        subprocess.Popen(
-            ["python", "/app/backend/analytics_cache.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        logger.info(f"Manual cache refresh triggered by {current_user.email} (full={full})")
+        background_tasks.add_task(refresh_with_lease, db, full=full)
         
         return {
             "success": True,
-            "message": "Analytics cache refresh started in background. This may take 1-2 minutes."
+            "message": "Analytics cache refresh started in background. See /montra-vehicle/analytics-cache/status for the run statistics."
         }
     except Exception as e:
         logger.error(f"Failed to trigger cache refresh: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to trigger cache refresh: {str(e)}")
 
 
+@api_router.get("/montra-vehicle/analytics-cache/status")
+async def get_analytics_cache_status(current_user: User = Depends(get_current_user)):
+    """Statistics of the last analytics cache refresh"""
+    try:
+        from analytics_cache import CACHE_COLLECTION, STATE_CACHE_TYPE
+        
+        state = await db[CACHE_COLLECTION].find_one({"cache_type": STATE_CACHE_TYPE}, {"_id": 0})
+        if not state:
+            return {"success": True, "last_run": None, "message": "The analytics cache has not been refreshed yet"}
+        return {
+            "success": True,
+            "checkpoint": state.get("checkpoint"),
+            "last_run": state.get("last_run")
+        }
+    except Exception as e:
+        logger.error(f"Error fetching analytics cache status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch analytics cache status")
+
+
+@api_router.get("/montra-vehicle/charging-sessions")
+async def get_montra_charging_sessions(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vehicle_ids: Optional[str] = Query(None, description="Comma-separated vehicle IDs (all vehicles by default)"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Charging sessions starting between start_date and end_date (YYYY-MM-DD),
+    extracted from the feed data after each import
+    """
+    try:
+        vehicles = [v.strip() for v in vehicle_ids.split(",") if v.strip()] if vehicle_ids else None
+        sessions = await get_charging_sessions(db, start_date, end_date, vehicles)
+        return {
+            "success": True,
+            "sessions": sessions,
+            "count": len(sessions),
+            "total_soc_added": round(sum(s["soc_added"] for s in sessions), 1),
+            "total_energy_kwh": round(sum(s["energy_kwh"] for s in sessions), 2)
+        }
+    except Exception as e:
+        logger.error(f"Error fetching charging sessions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch charging sessions")
+
+
+@api_router.get("/montra-vehicle/charging-sessions/status")
+async def get_montra_charging_sessions_status(current_user: User = Depends(get_current_user)):
+    """Statistics of the last charging session refresh"""
+    try:
+        from charging_sessions import STATE_COLLECTION, STATE_ID
+        
+        state = await db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"_id": 0})
+        if not state:
+            return {"success": True, "last_run": None, "message": "Charging sessions have not been extracted yet"}
+        return {
+            "success": True,
+            "checkpoint": state.get("checkpoint"),
+            "last_run": state.get("last_run")
+        }
+    except Exception as e:
+        logger.error(f"Error fetching charging session status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch charging session status")
+
+
+@api_router.post("/montra-vehicle/charging-sessions/refresh")
+async def refresh_montra_charging_sessions(
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Re-extract charging sessions in the background (changed vehicle-days, or everything with full). Admin only."""
+    if current_user.account_type not in ["master_admin", "admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can refresh charging sessions")
+    
+    background_tasks.add_task(refresh_charging_sessions_with_lease, db, full=full)
+    return {
+        "success": True,
+        "message": "Charging session refresh started in background. See /montra-vehicle/charging-sessions/status for the run statistics."
+    }
+
+
 @api_router.get("/montra-vehicle/battery-audit")
 async def get_battery_charge_audit(
     current_user: User = Depends(get_current_user), 
@@ -7044,7 +7191,7 @@ async def get_battery_charge_audit(
     Supports custom date range filtering
     """
     try:
-        from datetime import datetime, time as dt_time, date, timedelta
+        from datetime import datetime, date, timedelta
         
         # If custom date range is provided, skip cache and compute live
         use_cache = not force_refresh and not start_date and not end_date
@@ -7069,9 +7216,9 @@ async def get_battery_charge_audit(
         logger.info("Computing battery audit data live")
         
         # Check if collection has data
-        sample_count = await db.montra_feed_data.count_documents({}, limit=1)
+        sample_count = await db[SUMMARY_COLLECTION].count_documents({}, limit=1)
         if sample_count == 0:
-            logger.warning("No montra_feed_data found in database")
+            logger.warning("No vehicle day summaries found in database")
             return {
                 "success": True,
                 "audit_results": [],
@@ -7093,54 +7240,18 @@ async def get_battery_charge_audit(
             # Default to today if no end_date provided
             end_date_filter = date.today().isoformat()
         
-        logger.info(f"Fetching records from {cutoff_date} to {end_date_filter}")
-        
-        # Use aggregation pipeline
-        pipeline = [
-            {"$match": {"date": {"$gte": cutoff_date, "$lte": end_date_filter}}},
-            {"$project": {
-                "_id": 0,
-                "vehicle_id": 1,
-                "registration_number": 1,
-                "date": 1,
-                "Date": 1,
-                "Battery Soc(%)": 1,
-                "Battery SOC(%)": 1,
-                "Odometer (km)": 1
-            }},
-            {"$sort": {"date": -1, "Date": 1}},
-            {"$limit": 50000}
-        ]
-        
-        cursor = db.montra_feed_data.aggregate(pipeline)
-        
-        # Group records by vehicle and date
-        vehicle_date_groups = {}
-        record_count = 0
+        logger.info(f"Composing battery audit from {cutoff_date} to {end_date_filter}")
         
-        async for record in cursor:
-            record_count += 1
-            vehicle_id = record.get("vehicle_id")
-            registration = record.get("registration_number")
-            date_val = record.get("date")
-            
-            if not vehicle_id or not date_val:
-                continue
-            
-            display_name = registration if registration else vehicle_id
-            
-            key = f"{vehicle_id}_{date_val}"
-            if key not in vehicle_date_groups:
-                vehicle_date_groups[key] = {
-                    "vehicle_id": vehicle_id,
-                    "display_name": display_name,
-                    "date": date_val,
-                    "records": []
-                }
-            vehicle_date_groups[key]["records"].append(record)
+        # Cached per vehicle-day; only missing or re-imported days are computed
+        from analytics_cache import compose_entries
+        audit_results, cache_stats = await compose_entries(db, "battery_audit", cutoff_date, end_date_filter)
+        logger.info(
+            f"Battery audit: {cache_stats['vehicle_days']} vehicle-days, "
+            f"{cache_stats['cached']} cached, {cache_stats['computed']} computed"
+        )
         
-        if record_count == 0:
-            logger.warning(f"No records found after {cutoff_date}")
+        if cache_stats["vehicle_days"] == 0:
+            logger.warning(f"No vehicle day summaries found after {cutoff_date}")
             return {
                 "success": True,
                 "audit_results": [],
@@ -7149,97 +7260,6 @@ async def get_battery_charge_audit(
                 "message": f"No data found in the last 30 days. Please import recent vehicle data."
             }
         
-        logger.info(f"Processed {record_count} records, grouped into {len(vehicle_date_groups)} vehicle-date combinations")
-        
-        audit_results = []
-        
-        # Analyze each vehicle-date combination
-        for key, group_data in vehicle_date_groups.items():
-            vehicle_id = group_data["vehicle_id"]
-            display_name = group_data["display_name"]
-            date = group_data["date"]
-            day_records = group_data["records"]
-            
-            # Sort records by timestamp
-            try:
-                day_records.sort(key=lambda x: datetime.fromisoformat(
-                    str(x.get("Date", "")).replace(' ', 'T')
-                ) if x.get("Date") else datetime.min)
-            except:
-                continue
-            
-            # Find readings at specific times
-            charge_6am = None
-            charge_12pm = None
-            charge_5pm = None
-            odometer_6am = None
-            odometer_12pm = None
-            odometer_5pm = None
-            
-            for record in day_records:
-                try:
-                    date_str = str(record.get("Date", ""))
-                    if not date_str:
-                        continue
-                        
-                    dt = datetime.fromisoformat(date_str.replace(' ', 'T'))
-                    record_time = dt.time()
-                    
-                    battery = float(record.get("Battery Soc(%)") or record.get("Battery SOC(%)") or 0)
-                    odometer = float(record.get("Odometer (km)") or 0)
-                    
-                    # Get closest reading to 6 AM (within 2 hour window: 5 AM - 7 AM)
-                    if dt_time(5, 0) <= record_time <= dt_time(7, 0) and charge_6am is None:
-                        charge_6am = battery
-                        odometer_6am = odometer
-                    
-                    # Get closest reading to 12 PM (within 2 hour window: 11 AM - 1 PM)
-                    if dt_time(11, 0) <= record_time <= dt_time(13, 0) and charge_12pm is None:
-                        charge_12pm = battery
-                        odometer_12pm = odometer
-                    
-                    # Get closest reading to 5 PM (within 2 hour window: 4 PM - 6 PM)
-                    if dt_time(16, 0) <= record_time <= dt_time(18, 0) and charge_5pm is None:
-                        charge_5pm = battery
-                        odometer_5pm = odometer
-                        
-                except:
-                    continue
-            
-            # Skip if we don't have all required readings
-            if charge_6am is None or charge_12pm is None or charge_5pm is None:
-                continue
-            if odometer_6am is None or odometer_12pm is None or odometer_5pm is None:
-                continue
-            
-            # Calculate distances
-            km_6am_12pm = odometer_12pm - odometer_6am
-            km_6am_5pm = odometer_5pm - odometer_6am
-            
-            # Calculate mileages (avoid division by zero)
-            charge_drop_6am_12pm = charge_6am - charge_12pm
-            charge_drop_6am_5pm = charge_6am - charge_5pm
-            
-            mileage_6am_12pm = (km_6am_12pm * 100 / charge_drop_6am_12pm) if charge_drop_6am_12pm > 0 else 0
-            mileage_6am_5pm = (km_6am_5pm * 100 / charge_drop_6am_5pm) if charge_drop_6am_5pm > 0 else 0
-            
-            # Flag if critical (12PM < 60% AND 5PM < 20%)
-            is_critical = (charge_12pm < 60 and charge_5pm < 20)
-            
-            audit_results.append({
-                "date": date,
-                "vehicle_name": display_name,
-                "vehicle_id": vehicle_id,
-                "charge_6am": round(charge_6am, 1),
-                "charge_12pm": round(charge_12pm, 1),
-                "charge_5pm": round(charge_5pm, 1),
-                "km_6am_12pm": round(km_6am_12pm, 2),
-                "km_6am_5pm": round(km_6am_5pm, 2),
-                "mileage_6am_12pm": round(mileage_6am_12pm, 2),
-                "mileage_6am_5pm": round(mileage_6am_5pm, 2),
-                "is_critical": is_critical
-            })
-        
         # Sort results by date (newest first) and vehicle
         audit_results.sort(key=lambda x: (x["date"], x["vehicle_name"]), reverse=True)
         
@@ -7275,7 +7295,7 @@ async def get_morning_charge_audit(
     print(f"🚨 MORNING AUDIT CALLED: start={start_date}, end={end_date}, force={force_refresh}")
     logger.info(f"🚨 MORNING AUDIT CALLED: start={start_date}, end={end_date}, force={force_refresh}")
     try:
-        from datetime import datetime, time as dt_time, date, timedelta
+        from datetime import datetime, date, timedelta
         
         # If custom date range is provided, skip cache and compute live
         use_cache = not force_refresh and not start_date and not end_date
@@ -7301,10 +7321,10 @@ async def get_morning_charge_audit(
         logger.info(f"🔍 MORNING AUDIT: Computing live with date range {start_date} to {end_date}")
         
         # Check if collection has data
-        sample_count = await db.montra_feed_data.count_documents({}, limit=1)
-        logger.info(f"🔍 MORNING AUDIT: Database has {sample_count} records")
+        sample_count = await db[SUMMARY_COLLECTION].count_documents({}, limit=1)
+        logger.info(f"🔍 MORNING AUDIT: Database has {sample_count} vehicle day summaries")
         if sample_count == 0:
-            logger.warning("No montra_feed_data found in database")
+            logger.warning("No vehicle day summaries found in database")
             return {
                 "success": True,
                 "audit_results": [],
@@ -7325,60 +7345,14 @@ async def get_morning_charge_audit(
             # Default to today if no end_date provided
             end_date_filter = date.today().isoformat()
         
-        logger.info(f"Fetching records from {cutoff_date} to {end_date_filter}")
+        logger.info(f"Composing morning charge audit from {cutoff_date} to {end_date_filter}")
         
-        # Use aggregation with filters and projection
-        pipeline = [
-            {"$match": {"date": {"$gte": cutoff_date, "$lte": end_date_filter}}},
-            {"$project": {
-                "_id": 0,
-                "vehicle_id": 1,
-                "Vehicle ID": 1,
-                "registration_number": 1,
-                "Registration Number": 1,
-                "date": 1,
-                "Date": 1,
-                "Portal Received Time": 1,
-                "time": 1,
-                "Time": 1,
-                "Battery Soc(%)": 1,
-                "Battery SOC(%)": 1,
-                "Battery %": 1,
-                "battery_soc_percentage": 1
-            }},
-            {"$sort": {"date": -1}},
-            {"$limit": 50000}
-        ]
-        
-        cursor = db.montra_feed_data.aggregate(pipeline)
-        
-        # Group records by vehicle and date
-        vehicle_date_groups = {}
-        record_count = 0
-        
-        async for record in cursor:
-            record_count += 1
-            vehicle_id = record.get("vehicle_id") or record.get("Vehicle ID")
-            registration = record.get("registration_number") or record.get("Registration Number")
-            date_val = record.get("date")
-            
-            if not vehicle_id or not date_val:
-                continue
-            
-            display_name = registration if registration else vehicle_id
-            
-            key = f"{vehicle_id}_{date_val}"
-            if key not in vehicle_date_groups:
-                vehicle_date_groups[key] = {
-                    "vehicle_id": vehicle_id,
-                    "display_name": display_name,
-                    "date": date_val,
-                    "records": []
-                }
-            vehicle_date_groups[key]["records"].append(record)
+        # Cached per vehicle-day; only missing or re-imported days are computed
+        from analytics_cache import compose_entries
+        audit_results, cache_stats = await compose_entries(db, "morning_charge_audit", cutoff_date, end_date_filter)
         
-        if record_count == 0:
-            logger.warning(f"No records found after {cutoff_date}")
+        if cache_stats["vehicle_days"] == 0:
+            logger.warning(f"No vehicle day summaries found after {cutoff_date}")
             return {
                 "success": True,
                 "audit_results": [],
@@ -7386,99 +7360,14 @@ async def get_morning_charge_audit(
                 "message": f"No data found in the last 30 days. Please import recent vehicle data."
             }
         
-        logger.info(f"Processed {record_count} records, grouped into {len(vehicle_date_groups)} vehicle-date combinations")
-        
-        audit_results = []
-        debug_6am_found = 0
-        debug_below_95 = 0
-        
-        # Analyze each vehicle-date combination
-        for key, group_data in vehicle_date_groups.items():
-            vehicle_id = group_data["vehicle_id"]
-            display_name = group_data["display_name"]
-            date = group_data["date"]
-            day_records = group_data["records"]
-            
-            # Sort records by time
-            try:
-                day_records.sort(key=lambda x: x.get("Portal Received Time", x.get("time", "00:00:00")) if x.get("Portal Received Time") or x.get("time") else "00:00:00")
-            except Exception as e:
-                logger.error(f"Error sorting records for {vehicle_id} on {date}: {str(e)}")
-                continue
-            
-            # Find battery charge at or closest to 6 AM
-            charge_at_6am = None
-            closest_time_to_6am = None
-            
-            for record in day_records:
-                battery_pct = (record.get("Battery Soc(%)") or 
-                              record.get("Battery SOC(%)") or  # NEW: Handle uppercase SOC
-                              record.get("Battery %") or 
-                              record.get("battery_soc_percentage") or 
-                              record.get("Battery") or
-                              record.get("battery") or
-                              record.get("SOC") or
-                              record.get("soc"))
-                
-                time_str = (record.get("Portal Received Time") or
-                           record.get("time") or 
-                           record.get("Time") or 
-                           record.get("Hour") or
-                           record.get("hour"))
-                
-                if battery_pct and time_str:
-                    try:
-                        if isinstance(time_str, str):
-                            try:
-                                dt = datetime.fromisoformat(time_str.replace(' ', 'T'))
-                                record_time = dt.time()
-                            except:
-                                time_part = time_str.split()[0] if ' ' in time_str else time_str
-                                try:
-                                    record_time = datetime.strptime(time_part, "%H:%M:%S").time()
-                                except:
-                                    continue
-                        else:
-                            continue
-                        
-                        # Look for records between 5:30 AM and 6:30 AM to get closest to 6 AM
-                        if dt_time(5, 30) <= record_time <= dt_time(6, 30):
-                            if battery_pct != '-':
-                                try:
-                                    battery_val = float(str(battery_pct))
-                                    
-                                    # Keep the record closest to 6:00 AM
-                                    target_time = dt_time(6, 0)
-                                    time_diff = abs((datetime.combine(datetime.today(), record_time) - 
-                                                   datetime.combine(datetime.today(), target_time)).total_seconds())
-                                    
-                                    if closest_time_to_6am is None or time_diff < closest_time_to_6am:
-                                        closest_time_to_6am = time_diff
-                                        charge_at_6am = battery_val
-                                        debug_6am_found += 1
-                                except:
-                                    pass
-                        elif record_time > dt_time(6, 30):
-                            # Stop looking once we're past 6:30 AM
-                            break
-                    except:
-                        continue
-            
-            # Add to results if charge at 6 AM is less than 95%
-            if charge_at_6am is not None and charge_at_6am < 95:
-                debug_below_95 += 1
-                audit_results.append({
-                    "date": date,
-                    "vehicle_name": display_name,
-                    "charge_at_6am": round(charge_at_6am, 1)
-                })
-                logger.info(f"Found low morning charge: {vehicle_id} on {date} - {charge_at_6am}%")
-        
         # Sort results by date and vehicle
         audit_results.sort(key=lambda x: (x["date"], x["vehicle_name"]))
         
         logger.info(f"Morning charge audit complete: Found {len(audit_results)} instances with charge < 95% at 6 AM")
-        logger.info(f"Debug: Total 6AM records found: {debug_6am_found}, Records below 95%: {debug_below_95}, Final results: {len(audit_results)}")
+        logger.info(
+            f"Debug: {cache_stats['vehicle_days']} vehicle-days ({cache_stats['cached']} cached, "
+            f"{cache_stats['computed']} computed), below 95%: {len(audit_results)}"
+        )
         
         return {
             "success": True,
@@ -9322,8 +9211,9 @@ async def create_vehicle(vehicle_data: VehicleRecordCreate, current_user: User =
     if vehicle_dict.get('last_service'):
         vehicle_dict['last_service'] = vehicle_dict['last_service'].isoformat()
     
+    vehicle_dict['last_modified'] = datetime.now(timezone.utc).isoformat()
     await db.montra_vehicle_insights.insert_one(vehicle_dict)
-    sync_single_record('montra_vehicle_insights', vehicle_dict)
+    await enqueue_sheets_sync(db, 'montra_vehicle_insights', [vehicle_dict])
     
     return {"message": "Vehicle record created", "vehicle": vehicle}
 
@@ -9343,12 +9233,14 @@ async def get_vehicles(current_user: User = Depends(get_current_user)):
 
 
 @api_router.post("/montra-vehicle-insights/sync")
-async def sync_vehicles(current_user: User = Depends(get_current_user)):
-    """Sync all vehicles to Google Sheets"""
-    vehicles = await db.montra_vehicle_insights.find({}, {"_id": 0}).to_list(1000)
-    success = sync_all_records('montra_vehicle_insights', vehicles)
-    if success:
-        return {"message": "Vehicles synced successfully"}
+async def sync_vehicles(
+    full: bool = Query(False, description="Resend every record instead of only changes since the last sync"),
+    current_user: User = Depends(get_current_user)
+):
+    """Sync vehicles changed since the last acknowledged sync to Google Sheets (full=true resends all)"""
+    result = await sync_tab(db, 'montra_vehicle_insights', get_sheets_client(), full=full)
+    if result["success"]:
+        return {"message": "Vehicles synced successfully", **result}
     raise HTTPException(status_code=500, detail="Failed to sync vehicles")
 
 
@@ -9647,21 +9539,101 @@ async def get_vehicle_document_file(
 
 # ==================== App Initialization ====================
 
+async def backfill_feed_history(db) -> None:
+    """
+    Summaries, feed_files manifest entries, then charging sessions, for feed
+    data imported before they existed
+    """
+    try:
+        from montra_feed_import import backfill_feed_manifest
+        await backfill_if_empty(db)
+        await backfill_feed_manifest(db)
+        # Full extraction on the first run, otherwise catches up from the import log
+        await refresh_charging_sessions_with_lease(db)
+    except Exception as e:
+        logger.error(f"Feed history backfill failed: {str(e)}")
+
+
 @app.on_event("startup")
 async def startup_event():
     await initialize_master_admin()
     logger.info("Application started")
     
-    # Initialize scheduler for daily Slack reports
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(
-        send_daily_slack_report_job,
-        CronTrigger(hour=20, minute=0),  # 8 PM every day
-        id="daily_slack_report",
-        replace_existing=True
+    # Scheduled jobs run in this process unless SCHEDULER_MODE=worker (a dedicated
+    # scheduler_worker.py is running); the leader lease keeps runs single either way
+    from scheduler_worker import SCHEDULER_MODE, create_scheduler, default_jobs, ensure_scheduler_indexes
+    if SCHEDULER_MODE == "embedded":
+        await ensure_scheduler_indexes(db)
+        scheduler = create_scheduler(db, default_jobs(db, send_daily_slack_report_job))
+        scheduler.start()
+        logger.info("Embedded scheduler started (daily Slack report at 8 PM)")
+    else:
+        logger.info("SCHEDULER_MODE=worker: scheduled jobs are handled by the scheduler worker process")
+        from scheduler_worker import LEASES_COLLECTION, LEADER_LEASE
+        lease = await db[LEASES_COLLECTION].find_one({"_id": LEADER_LEASE}, {"_id": 0, "expires_at": 1})
+        expires_at = lease.get("expires_at") if lease else None
+        if expires_at and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if not expires_at or expires_at < datetime.now(timezone.utc):
+            logger.warning(
+                "SCHEDULER_MODE=worker but no scheduler worker heartbeat was found - "
+                "scheduled jobs (daily Slack report, reconcile, charging sessions) will not run until one is started"
+            )
+    
+    # Google Sheets sync outbox flusher (one active flusher across workers via lease)
+    await ensure_outbox_indexes(db)
+    await ensure_delta_sync_indexes(db)
+    
+    # Partial on feed_ts, so legacy rows (no feed_ts) are outside it until the dedupe job
+    # backfills them; fails only if rows that already have feed_ts are duplicated
+    try:
+        from montra_feed_import import ensure_feed_indexes
+        await ensure_feed_indexes(db)
+    except Exception as e:
+        logger.error(f"Montra feed natural-key index not created, run the feed dedupe job: {str(e)}")
+    await ensure_feed_bucket_indexes(db)
+    await ensure_day_summary_indexes(db)
+    from analytics_cache import ensure_analytics_cache_indexes
+    await ensure_analytics_cache_indexes(db)
+    await ensure_charging_session_indexes(db)
+    # Existing feed data gets its summaries (and manifest entries) once, in the background
+    app.state.day_summary_backfill_task = asyncio.create_task(backfill_feed_history(db))
+    # Telecaller rollups are rebuilt once when a counter was added
+    app.state.rollup_rebuild_task = asyncio.create_task(rebuild_rollups_if_outdated(db))
+    
+    app.state.sheets_outbox_stop = asyncio.Event()
+    app.state.sheets_outbox_task = asyncio.create_task(
+        run_sheets_outbox_flusher(db, app.state.sheets_outbox_stop)
     )
-    scheduler.start()
-    logger.info("Daily Slack report scheduler started (8 PM)")
+
+
+@api_router.get("/sheets-outbox/status")
+async def get_sheets_outbox_status(current_user: User = Depends(get_current_user)):
+    """Google Sheets sync outbox depth, retries and lag of the oldest pending change"""
+    if current_user.account_type not in ["admin", "master_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can view the sync outbox")
+    
+    return {"success": True, **(await get_outbox_status(db))}
+
+
+@api_router.get("/scheduler/job-runs")
+async def get_scheduler_job_runs(
+    job_id: str = Query(None),
+    limit: int = Query(50, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Recent scheduled job runs with their duration and outcome"""
+    if current_user.account_type not in ["admin", "master_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can view scheduler history")
+    
+    from scheduler_worker import LEASES_COLLECTION, LEADER_LEASE, get_job_runs
+    lease = await db[LEASES_COLLECTION].find_one({"_id": LEADER_LEASE})
+    return {
+        "success": True,
+        "leader": lease.get("owner") if lease else None,
+        "lease_expires_at": lease["expires_at"].isoformat() if lease else None,
+        "runs": await get_job_runs(db, job_id, limit)
+    }
 
 
 async def send_daily_slack_report_job():
@@ -12382,7 +12354,8 @@ async def upload_driver_document(
             {'id': lead_id},
             {'$set': {
                 field_name: file_path,
-                f"{document_type}_document_uploaded_at": datetime.now(timezone.utc).isoformat()
+                f"{document_type}_document_uploaded_at": datetime.now(timezone.utc).isoformat(),
+                "last_modified": datetime.now(timezone.utc).isoformat()
             }}
         )
         
@@ -12533,10 +12506,13 @@ async def delete_driver_document(
         # Update lead record to remove document path and uploaded_at fields
         await leads_collection.update_one(
             {'id': lead_id},
-            {'$unset': {
-                field_name: "",
-                f"{document_type}_document_uploaded_at": ""
-            }}
+            {
+                '$unset': {
+                    field_name: "",
+                    f"{document_type}_document_uploaded_at": ""
+                },
+                '$set': {"last_modified": datetime.now(timezone.utc).isoformat()}
+            }
         )
         
         return {
@@ -12658,7 +12634,8 @@ async def scan_driver_document(
                 {'id': lead_id},
                 {'$set': {
                     field_name_to_update: extracted_text,
-                    f"{document_type}_scanned_at": datetime.now(timezone.utc).isoformat()
+                    f"{document_type}_scanned_at": datetime.now(timezone.utc).isoformat(),
+                    "last_modified": datetime.now(timezone.utc).isoformat()
                 }}
             )
         
@@ -12752,10 +12729,13 @@ async def delete_driver_document(
         # Remove document path from database
         await leads_collection.update_one(
             {'id': lead_id},
-            {'$unset': {
-                field_name: "",
-                f"{document_type}_document_uploaded_at": ""
-            }}
+            {
+                '$unset': {
+                    field_name: "",
+                    f"{document_type}_document_uploaded_at": ""
+                },
+                '$set': {"last_modified": datetime.now(timezone.utc).isoformat()}
+            }
         )
         
         return {
@@ -12913,7 +12893,7 @@ async def merge_sources(
         for variant in variants:
             result = await leads_collection.update_many(
                 {"source": variant},
-                {"$set": {"source": target_source}}
+                {"$set": {"source": target_source, "last_modified": datetime.now(timezone.utc).isoformat()}}
             )
             total_updated += result.modified_count
             logger.info(f"Merged source '{variant}' into '{target_source}': {result.modified_count} leads updated")
@@ -13174,10 +13154,13 @@ async def delete_documents(
                 # Update database
                 await leads_collection.update_one(
                     {'id': lead_id},
-                    {'$unset': {
-                        field_name: "",
-                        f"{document_type}_document_uploaded_at": ""
-                    }}
+                    {
+                        '$unset': {
+                            field_name: "",
+                            f"{document_type}_document_uploaded_at": ""
+                        },
+                        '$set': {"last_modified": datetime.now(timezone.utc).isoformat()}
+                    }
                 )
                 
                 deleted_count += 1
@@ -15816,18 +15799,23 @@ async def get_monthly_ride_tracking(
     """
     Get monthly ride tracking data for vehicles.
     Calculates total KM traveled based on odometer readings.
+    Optional "source": "summary" (default, vehicle day summaries) or "raw" (montra_feed_data).
     """
     try:
         from datetime import timedelta
+        from monthly_ride_tracking import SOURCES, fetch_ride_tracking
         
         vehicle_ids = data.get("vehicle_ids", [])
         start_date_str = data.get("start_date")
         end_date_str = data.get("end_date")
+        source = data.get("source", "summary")
         
         if not vehicle_ids:
             raise HTTPException(status_code=400, detail="No vehicles selected")
         if not start_date_str or not end_date_str:
             raise HTTPException(status_code=400, detail="Start and end dates are required")
+        if source not in SOURCES:
+            raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(SOURCES)}")
         
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
@@ -15840,84 +15828,46 @@ async def get_monthly_ride_tracking(
         
         vehicle_reg_map = {v["vehicle_id"]: v["registration_number"] for v in vehicles}
         
-        # Initialize results structure
-        vehicle_summary = {}
+        prev_start_str = (start_date - timedelta(days=30)).strftime("%Y-%m-%d")
+        prev_end_str = (end_date - timedelta(days=30)).strftime("%Y-%m-%d")
+        
+        # Both periods in one aggregation (vehicle day summaries unless source="raw")
+        tracking = await fetch_ride_tracking(
+            db, vehicle_ids, start_date_str, end_date_str, prev_start_str, prev_end_str, source
+        )
+        
+        # Daily data in date order, vehicles in the order they were selected
+        vehicle_rank = {vehicle_id: rank for rank, vehicle_id in enumerate(vehicle_ids)}
         daily_data = {}
         daily_totals = {}
+        for record in sorted(tracking["daily"], key=lambda r: (r["date"], vehicle_rank.get(r["vehicle_id"], 0))):
+            date_str = record["date"]
+            if date_str not in daily_data:
+                daily_data[date_str] = {"date": date_str, "vehicles": []}
+            daily_data[date_str]["vehicles"].append({
+                "vehicle_id": record["vehicle_id"],
+                "registration_number": vehicle_reg_map.get(record["vehicle_id"], record["vehicle_id"]),
+                "start_odometer": record["min_odometer"],
+                "end_odometer": record["max_odometer"],
+                "km_traveled": record["km_traveled"]
+            })
+            daily_totals[date_str] = daily_totals.get(date_str, 0) + record["km_traveled"]
         
-        # Process each vehicle
+        # Vehicle summary (selected vehicles without data count as 0 km)
+        totals = {v["_id"]: v for v in tracking["vehicles"]}
+        vehicle_summary = {}
         for vehicle_id in vehicle_ids:
-            reg_number = vehicle_reg_map.get(vehicle_id, vehicle_id)
-            
-            # Get odometer data for this vehicle in date range
-            pipeline = [
-                {
-                    "$match": {
-                        "vehicle_id": vehicle_id,
-                        "date": {
-                            "$gte": start_date_str,
-                            "$lte": end_date_str
-                        }
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$date",
-                        "min_odometer": {"$min": "$Odometer (km)"},
-                        "max_odometer": {"$max": "$Odometer (km)"},
-                        "first_odometer": {"$first": "$Odometer (km)"},
-                        "last_odometer": {"$last": "$Odometer (km)"}
-                    }
-                },
-                {
-                    "$sort": {"_id": 1}
-                }
-            ]
-            
-            daily_records = await db.montra_feed_data.aggregate(pipeline).to_list(100)
-            
-            # Calculate KM for each day
-            total_km = 0
-            daily_kms = []
-            
-            for record in daily_records:
-                date_str = record["_id"]
-                min_odo = record.get("min_odometer", 0) or 0
-                max_odo = record.get("max_odometer", 0) or 0
-                
-                # KM traveled = max odometer - min odometer for the day
-                km_traveled = max(0, max_odo - min_odo)
-                
-                total_km += km_traveled
-                daily_kms.append(km_traveled)
-                
-                # Store daily data
-                if date_str not in daily_data:
-                    daily_data[date_str] = {"date": date_str, "vehicles": []}
-                
-                daily_data[date_str]["vehicles"].append({
-                    "vehicle_id": vehicle_id,
-                    "registration_number": reg_number,
-                    "start_odometer": min_odo,
-                    "end_odometer": max_odo,
-                    "km_traveled": km_traveled
-                })
-                
-                # Update daily totals
-                if date_str not in daily_totals:
-                    daily_totals[date_str] = 0
-                daily_totals[date_str] += km_traveled
-            
-            # Calculate vehicle summary
-            days_active = len(daily_kms)
+            row = totals.get(vehicle_id, {})
+            total_km = row.get("total_km", 0)
+            days_active = row.get("days_active", 0)
             vehicle_summary[vehicle_id] = {
                 "vehicle_id": vehicle_id,
-                "registration_number": reg_number,
+                "registration_number": vehicle_reg_map.get(vehicle_id, vehicle_id),
                 "total_km": total_km,
                 "days_active": days_active,
                 "avg_km_per_day": total_km / days_active if days_active > 0 else 0,
-                "max_daily_km": max(daily_kms) if daily_kms else 0,
-                "min_daily_km": min(daily_kms) if daily_kms else 0
+                "max_daily_km": row.get("max_daily_km", 0),
+                "min_daily_km": row.get("min_daily_km", 0)
             }
         
         # Sort daily data by date
@@ -15934,51 +15884,15 @@ async def get_monthly_ride_tracking(
         total_km_all = sum(v["total_km"] for v in all_vehicle_summaries)
         total_days = len(daily_totals)
         
-        # Calculate previous month comparison
-        comparison = None
-        try:
-            prev_start = start_date - timedelta(days=30)
-            prev_end = end_date - timedelta(days=30)
-            prev_start_str = prev_start.strftime("%Y-%m-%d")
-            prev_end_str = prev_end.strftime("%Y-%m-%d")
-            
-            # Get previous month data
-            prev_pipeline = [
-                {
-                    "$match": {
-                        "vehicle_id": {"$in": vehicle_ids},
-                        "date": {
-                            "$gte": prev_start_str,
-                            "$lte": prev_end_str
-                        }
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": {"vehicle_id": "$vehicle_id", "date": "$date"},
-                        "min_odometer": {"$min": "$Odometer (km)"},
-                        "max_odometer": {"$max": "$Odometer (km)"}
-                    }
-                }
-            ]
-            
-            prev_records = await db.montra_feed_data.aggregate(prev_pipeline).to_list(1000)
-            prev_total_km = sum(
-                max(0, (r.get("max_odometer", 0) or 0) - (r.get("min_odometer", 0) or 0))
-                for r in prev_records
-            )
-            
-            km_change = total_km_all - prev_total_km
-            km_change_percent = (km_change / prev_total_km * 100) if prev_total_km > 0 else 0
-            
-            comparison = {
-                "previous_month_km": prev_total_km,
-                "current_month_km": total_km_all,
-                "km_change": km_change,
-                "km_change_percent": km_change_percent
-            }
-        except Exception as e:
-            logger.warning(f"Could not calculate comparison: {str(e)}")
+        # Previous month comparison (same aggregation)
+        prev_total_km = tracking["previous"][0]["total_km"] if tracking["previous"] else 0
+        km_change = total_km_all - prev_total_km
+        comparison = {
+            "previous_month_km": prev_total_km,
+            "current_month_km": total_km_all,
+            "km_change": km_change,
+            "km_change_percent": (km_change / prev_total_km * 100) if prev_total_km > 0 else 0
+        }
         
         return {
             "success": True,
@@ -16001,6 +15915,12 @@ async def get_monthly_ride_tracking(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    stop_event = getattr(app.state, "sheets_outbox_stop", None)
+    if stop_event:
+        stop_event.set()
+        await app.state.sheets_outbox_task
+    await close_sheets_client()
+    shutdown_ingest_pool()
     client.close()
     logger.info("Application shutdown")
 
@@ -0,0 +1,201 @@
+"""
+Async Google Sheets Web App Client
+Pooled httpx client for the Apps Script Web App with parallel batch upload.
+
+One ``httpx.AsyncClient`` is shared by the process so requests reuse TLS
+connections instead of opening a new one per call. ``upload_batches`` sends a
+large record list as several batches concurrently (bounded by
+``concurrency``), sizing each new batch from the response times observed so
+far, and retries failed batches with backoff.
+
+Request bodies can be gzip-compressed (GOOGLE_SHEETS_GZIP=true). This is off by
+default because Apps Script itself does not decode ``Content-Encoding: gzip``;
+enable it only when the endpoint (or a proxy in front of it) does.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_SHEETS_ENABLED = os.environ.get('GOOGLE_SHEETS_ENABLED', 'false').lower() == 'true'
+GOOGLE_SHEETS_WEB_APP_URL = os.environ.get('GOOGLE_SHEETS_WEB_APP_URL', '')
+
+CONCURRENCY = int(os.environ.get('GOOGLE_SHEETS_CONCURRENCY', '4'))
+GZIP_ENABLED = os.environ.get('GOOGLE_SHEETS_GZIP', 'false').lower() == 'true'
+GZIP_MIN_BYTES = 1024
+REQUEST_TIMEOUT_SECONDS = 60
+MAX_ATTEMPTS = 3
+
+
+class AdaptiveBatchSizer:
+    """
+    Picks the next batch size so a batch takes about ``target_seconds``.
+    The per-record cost is estimated from completed batches; failures and
+    timeouts halve the size.
+    """
+
+    def __init__(self, initial: int = 500, minimum: int = 50, maximum: int = 2000, target_seconds: float = 10.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.history: List[int] = []
+
+    def record(self, batch_size: int, seconds: float, success: bool) -> int:
+        if not success:
+            new_size = batch_size // 2
+        else:
+            ideal = self.target_seconds / max(seconds / max(batch_size, 1), 1e-6)
+            # Move halfway towards the ideal size to smooth out noisy responses
+            new_size = int((self.size + ideal) / 2)
+        self.size = max(self.minimum, min(self.maximum, new_size))
+        self.history.append(self.size)
+        return self.size
+
+
+class SheetsClient:
+    def __init__(
+        self,
+        url: str = None,
+        concurrency: int = CONCURRENCY,
+        gzip_enabled: bool = GZIP_ENABLED,
+        timeout: float = REQUEST_TIMEOUT_SECONDS
+    ):
+        self.url = url or GOOGLE_SHEETS_WEB_APP_URL
+        self.concurrency = max(1, concurrency)
+        self.gzip_enabled = gzip_enabled
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            # Apps Script answers POSTs with a redirect to the result
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concurrency * 2,
+                max_keepalive_connections=self.concurrency
+            )
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def encode(self, payload: Dict) -> tuple:
+        body = json.dumps(payload, default=str).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.gzip_enabled and len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    async def post(self, payload: Dict) -> Dict:
+        """POST a payload; always returns a dict with 'success'"""
+        if not self.url:
+            return {'success': False, 'message': 'Web App URL not configured'}
+
+        body, headers = self.encode(payload)
+        try:
+            response = await self.client.post(self.url, content=body, headers=headers)
+        except httpx.TimeoutException as e:
+            return {'success': False, 'message': f'Timeout: {e}', 'timeout': True}
+        except httpx.HTTPError as e:
+            return {'success': False, 'message': str(e)}
+
+        if response.status_code != 200:
+            return {'success': False, 'message': f'HTTP {response.status_code}'}
+        try:
+            return response.json()
+        except ValueError:
+            return {'success': False, 'message': 'Web App returned a non-JSON response'}
+
+    async def upload_batches(
+        self,
+        records: List[Dict],
+        make_payload: Callable[[List[Dict]], Dict],
+        sizer: Optional[AdaptiveBatchSizer] = None,
+        max_attempts: int = MAX_ATTEMPTS
+    ) -> Dict:
+        """
+        Upload ``records`` in concurrent batches. Each batch is built with
+        ``make_payload(batch)`` and must be safe to resend (an upsert).
+        """
+        sizer = sizer or AdaptiveBatchSizer()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+
+        async def send_batch(batch_num: int, batch: List[Dict]) -> Dict:
+            try:
+                result = {}
+                for attempt in range(1, max_attempts + 1):
+                    batch_started = time.perf_counter()
+                    result = await self.post(make_payload(batch))
+                    elapsed = time.perf_counter() - batch_started
+                    success = bool(result.get('success'))
+                    sizer.record(len(batch), elapsed, success)
+                    if success:
+                        logger.info(f"Sheets batch {batch_num} ({len(batch)} records) synced in {elapsed:.2f}s")
+                        return {"batch": batch_num, "records": len(batch), "success": True, "result": result}
+                    logger.warning(
+                        f"Sheets batch {batch_num} attempt {attempt}/{max_attempts} failed: {result.get('message')}"
+                    )
+                    if attempt < max_attempts:
+                        await asyncio.sleep(2 ** attempt)
+                return {"batch": batch_num, "records": len(batch), "success": False, "message": result.get('message')}
+            finally:
+                semaphore.release()
+
+        tasks = []
+        position = 0
+        while position < len(records):
+            # Wait for a free slot so the next batch is sized from the latest timings
+            await semaphore.acquire()
+            batch = records[position:position + sizer.size]
+            position += len(batch)
+            tasks.append(asyncio.create_task(send_batch(len(tasks) + 1, batch)))
+        batches = await asyncio.gather(*tasks)
+
+        failed = [b for b in batches if not b["success"]]
+        return {
+            "success": not failed,
+            "total_records": len(records),
+            "records_synced": sum(b["records"] for b in batches if b["success"]),
+            "batches": len(batches),
+            "failed_batches": [{"batch": b["batch"], "message": b["message"]} for b in failed],
+            "updated": sum(b["result"].get('updated', 0) for b in batches if b["success"]),
+            "created": sum(b["result"].get('created', 0) for b in batches if b["success"]),
+            "batch_sizes": [b["records"] for b in batches],
+            "duration_seconds": round(time.perf_counter() - started, 2),
+        }
+
+
+_client: Optional[SheetsClient] = None
+
+
+def get_sheets_client() -> SheetsClient:
+    """Process-wide client so connections are pooled across requests"""
+    global _client
+    if _client is None:
+        _client = SheetsClient()
+    return _client
+
+
+async def close_sheets_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def send_to_sheets_async(payload: Dict) -> Dict:
+    """Async counterpart of sheets_multi_sync.send_to_sheets"""
+    if not GOOGLE_SHEETS_ENABLED:
+        return {'success': False, 'message': 'Sync disabled'}
+    result = await get_sheets_client().post(payload)
+    if not result.get('success'):
+        logger.error(f"Sheets sync failed: {result.get('message')}")
+    return result
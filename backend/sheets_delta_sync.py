@@ -0,0 +1,195 @@
+"""
+Google Sheets Delta Sync
+Watermark-based "sync to sheets" that only sends what changed since the last
+acknowledged sync.
+
+Each tab has a watermark in ``sheets_sync_watermarks``. A delta sync sends the
+documents whose ``last_modified`` is newer than the watermark plus the
+tombstones of records deleted since then, and moves the watermark to the
+sync's start time only after the Web App has acknowledged every batch. A
+failed sync leaves the watermark alone, so the next run resends the same
+window (all sends are upserts/deletes by id, so resending is harmless).
+Every write to a source collection must therefore set ``last_modified``; a
+write that does not is never picked up by a delta sync.
+
+A full resync (``full=True``) sends every document and then sets the watermark.
+When a tab has no watermark yet, a delta sync runs as a full resync.
+
+Sources are ``leads`` (batched ``sync_from_app`` upserts) and the insert-only
+tabs of the multi-tab Web App (payment_reconciliation, driver_onboarding,
+telecaller_queue, montra_vehicle_insights). That Web App only upserts one
+record per request (``sync_single``) and its ``sync_all`` replaces the whole
+tab, so their delta syncs post each changed record and their full resyncs
+post one ``sync_all``. ``users`` is not a source: its many write paths do not
+stamp ``last_modified`` and it keeps its own bulk sync.
+
+``last_modified`` is stored as an ISO string (UTC, sometimes IST) or a
+datetime. Offsets east of UTC only make a string sort later, so comparing
+against a UTC watermark can resend a row but never skip one.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WATERMARKS_COLLECTION = "sheets_sync_watermarks"
+TOMBSTONES_COLLECTION = "sheets_tombstones"
+
+# Overlap with the previous window to absorb clock skew between app servers
+WATERMARK_OVERLAP = timedelta(seconds=60)
+TOMBSTONE_TTL_DAYS = 30
+
+
+def _multi_tab_source(tab: str) -> Dict:
+    return {
+        'collection': tab,
+        'record_payload': lambda record: {"action": "sync_single", "tab": tab, "record": record},
+        'full_payload': lambda records: {"action": "sync_all", "tab": tab, "records": records},
+    }
+
+
+# Tabs that support delta sync: source collection and either a batch upsert
+# payload or single-record upsert and whole-tab replace payloads
+TAB_SOURCES = {
+    'leads': {
+        'collection': 'driver_leads',
+        'payload': lambda batch: {"action": "sync_from_app", "leads": batch},
+    },
+    **{tab: _multi_tab_source(tab) for tab in [
+        'payment_reconciliation', 'driver_onboarding', 'telecaller_queue', 'montra_vehicle_insights'
+    ]},
+}
+
+
+async def record_tombstones(db, tab: str, record_ids: Iterable[str]) -> None:
+    """Remember deletions so the next delta sync removes the sheet rows. Never raises."""
+    try:
+        now = datetime.now(timezone.utc)
+        docs = [{"tab": tab, "record_id": str(record_id), "deleted_at": now} for record_id in record_ids if record_id]
+        if docs:
+            await db[TOMBSTONES_COLLECTION].insert_many(docs, ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to record Google Sheets tombstones for {tab}: {e}")
+
+
+async def get_watermark(db, tab: str) -> Optional[Dict]:
+    return await db[WATERMARKS_COLLECTION].find_one({"_id": tab})
+
+
+def modified_since(watermark_at: datetime) -> Dict:
+    return {"$or": [
+        {"last_modified": {"$gt": watermark_at.isoformat()}},
+        {"last_modified": {"$gt": watermark_at}},
+    ]}
+
+
+async def _send_deletes(client, tab: str, record_ids: List[str]) -> List[str]:
+    """Send delete_record for each id; returns ids that failed"""
+    semaphore = asyncio.Semaphore(client.concurrency)
+
+    async def send(record_id):
+        async with semaphore:
+            result = await client.post({"action": "delete_record", "tab": tab, "id": record_id})
+        return None if result.get('success') else record_id
+
+    return [record_id for record_id in await asyncio.gather(*[send(i) for i in record_ids]) if record_id]
+
+
+async def _send_records(client, source: Dict, records: List[Dict], full: bool) -> Dict:
+    """Upload for tabs without a batch upsert; same summary as upload_batches"""
+    if full:
+        result = await client.post(source['full_payload'](records))
+        failed = [] if result.get('success') else [{"records": len(records), "message": result.get('message')}]
+        return {"success": not failed, "updated": len(records) if not failed else 0, "created": 0,
+                "batches": 1, "failed_batches": failed}
+
+    semaphore = asyncio.Semaphore(client.concurrency)
+
+    async def send(record):
+        async with semaphore:
+            result = await client.post(source['record_payload'](record))
+        return None if result.get('success') else {"id": record.get("id"), "message": result.get('message')}
+
+    failed = [failure for failure in await asyncio.gather(*[send(record) for record in records]) if failure]
+    return {"success": not failed, "updated": len(records) - len(failed), "created": 0,
+            "batches": len(records), "failed_batches": failed}
+
+
+async def sync_tab(db, tab: str, client, full: bool = False) -> Dict:
+    """Delta (or full) sync of one tab through a SheetsClient"""
+    source = TAB_SOURCES[tab]
+    started_at = datetime.now(timezone.utc)
+    watermark = None if full else await get_watermark(db, tab)
+    mode = "delta" if watermark else "full"
+
+    query, tombstone_query = {}, {"tab": tab}
+    if watermark:
+        since = watermark["watermark_at"]
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        since -= WATERMARK_OVERLAP
+        query = modified_since(since)
+        tombstone_query["deleted_at"] = {"$gt": since}
+
+    records = await db[source['collection']].find(query, {"_id": 0}).to_list(length=None)
+    tombstones = await db[TOMBSTONES_COLLECTION].distinct("record_id", tombstone_query)
+    # A record that was deleted and re-created is upserted, not deleted
+    live_ids = {str(record.get("id")) for record in records}
+    deletes = [record_id for record_id in tombstones if record_id not in live_ids]
+
+    summary = {"success": True, "updated": 0, "created": 0, "batches": 0, "failed_batches": []}
+    if 'full_payload' in source and (records or mode == "full"):
+        # A full resync of an empty collection still clears the tab
+        summary = await _send_records(client, source, records, full=mode == "full")
+    elif records:
+        summary = await client.upload_batches(records, source['payload'])
+    failed_deletes = await _send_deletes(client, tab, deletes) if deletes else []
+
+    acknowledged = summary["success"] and not failed_deletes
+    if acknowledged:
+        await db[WATERMARKS_COLLECTION].update_one(
+            {"_id": tab},
+            {"$set": {
+                "watermark_at": started_at,
+                "watermark": started_at.isoformat(),
+                "mode": mode,
+                "records_sent": len(records),
+                "deletes_sent": len(deletes),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
+    else:
+        logger.error(
+            f"Sheets {mode} sync of {tab} not acknowledged "
+            f"({len(summary['failed_batches'])} failed batches, {len(failed_deletes)} failed deletes); "
+            f"watermark kept"
+        )
+
+    return {
+        "success": acknowledged,
+        "mode": mode,
+        "tab": tab,
+        "previous_watermark": watermark["watermark"] if watermark else None,
+        "watermark": started_at.isoformat() if acknowledged else (watermark["watermark"] if watermark else None),
+        "records_sent": len(records),
+        "deletes_sent": len(deletes) - len(failed_deletes),
+        "failed_deletes": failed_deletes[:50],
+        "updated": summary["updated"],
+        "created": summary["created"],
+        "batches": summary["batches"],
+        "failed_batches": summary["failed_batches"],
+        "duration_seconds": round((datetime.now(timezone.utc) - started_at).total_seconds(), 2),
+    }
+
+
+async def ensure_delta_sync_indexes(db) -> None:
+    await db[TOMBSTONES_COLLECTION].create_index([("tab", 1), ("deleted_at", 1)], name="idx_tab_deleted_at")
+    await db[TOMBSTONES_COLLECTION].create_index(
+        [("deleted_at", 1)],
+        name="idx_tombstone_ttl",
+        expireAfterSeconds=TOMBSTONE_TTL_DAYS * 24 * 3600
+    )
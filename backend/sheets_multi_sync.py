@@ -17,6 +17,10 @@ last_sync_time = None
 GOOGLE_SHEETS_ENABLED = os.environ.get('GOOGLE_SHEETS_ENABLED', 'false').lower() == 'true'
 GOOGLE_SHEETS_WEB_APP_URL = os.environ.get('GOOGLE_SHEETS_WEB_APP_URL', '')
 
+# Shared session so synchronous callers reuse connections to the Web App
+# (async callers use sheets_client.py)
+_session = requests.Session()
+
 # Tab mappings
 TABS = {
     'users': 'users',
@@ -46,7 +50,7 @@ def send_to_sheets(payload: Dict) -> Dict:
         return {'success': False, 'message': 'Web App URL not configured'}
     
     try:
-        response = requests.post(
+        response = _session.post(
             GOOGLE_SHEETS_WEB_APP_URL,
             json=payload,
             headers={'Content-Type': 'application/json'},
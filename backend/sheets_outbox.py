@@ -0,0 +1,290 @@
+"""
+Google Sheets Sync Outbox
+Durable, coalescing queue between app writes and the Apps Script Web App.
+
+Write paths call ``enqueue_sheets_sync`` / ``enqueue_sheets_delete`` instead of
+posting to Google inline. Each entry is keyed by (tab, record key), so repeated
+updates to the same record collapse into one pending entry holding the latest
+snapshot. A background flusher sends due entries in batches over the pooled
+async client (sheets_client.py), retries failures with exponential backoff
+and only removes an entry once the Web App has acknowledged the exact version
+it was sent.
+
+Collection ``sheets_outbox``::
+
+    {
+      "_id": "leads|<lead id>",
+      "tab": "leads",
+      "record_id": "<lead id>",
+      "op": "upsert" | "delete",
+      "record": {...},           # latest snapshot (None for deletes)
+      "version": 3,              # bumped on every enqueue
+      "enqueued_at": datetime,   # oldest unsent change, used for lag
+      "next_attempt_at": datetime,
+      "attempts": 0,
+      "last_error": None
+    }
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+import sheets_multi_sync
+from sheets_client import CONCURRENCY, send_to_sheets_async
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "sheets_outbox"
+FLUSHER_LEASE = "sheets_outbox_flusher"
+
+FLUSH_INTERVAL_SECONDS = float(os.environ.get('SHEETS_OUTBOX_FLUSH_INTERVAL', '5'))
+BATCH_SIZE = int(os.environ.get('SHEETS_OUTBOX_BATCH_SIZE', '200'))
+BASE_BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 15 * 60
+
+# Field that identifies a record within its tab (default: "id")
+KEY_FIELDS = {
+    'users': 'email',
+}
+
+# Tabs whose Web App handler accepts a batch upsert. Other tabs get one
+# 'sync_single' request per record ('sync_all' would replace the whole tab).
+BATCH_PAYLOADS = {
+    'leads': lambda records: {'action': 'sync_from_app', 'leads': records},
+}
+
+# Last flush statistics for the status endpoint (per process)
+flusher_state = {
+    "last_flush_at": None,
+    "last_sent": 0,
+    "last_failed": 0,
+    "total_sent": 0,
+    "total_failed": 0,
+}
+
+
+def sheets_sync_configured() -> bool:
+    return sheets_multi_sync.GOOGLE_SHEETS_ENABLED and bool(sheets_multi_sync.GOOGLE_SHEETS_WEB_APP_URL)
+
+
+def record_key(tab: str, record: Dict) -> Optional[str]:
+    value = record.get(KEY_FIELDS.get(tab, 'id')) or record.get('id')
+    return str(value) if value else None
+
+
+def to_json_safe(record: Dict) -> Dict:
+    """Drop Mongo's _id and stringify datetimes so the snapshot posts as JSON"""
+    return json.loads(json.dumps({k: v for k, v in record.items() if k != '_id'}, default=str))
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at MAX_BACKOFF_SECONDS"""
+    delay = min(BASE_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ==================== ENQUEUE ====================
+
+async def _enqueue(db, tab: str, entries: List[tuple]) -> int:
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"_id": f"{tab}|{key}"},
+            {
+                "$set": {"tab": tab, "record_id": key, "op": op, "record": record, "updated_at": now},
+                "$inc": {"version": 1},
+                "$setOnInsert": {"enqueued_at": now, "next_attempt_at": now, "attempts": 0}
+            },
+            upsert=True
+        )
+        for key, op, record in entries
+    ]
+    if operations:
+        await db[OUTBOX_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def enqueue_sheets_sync(db, tab: str, records: Iterable[Dict]) -> int:
+    """Queue the latest state of records for the given tab. Never raises."""
+    if not sheets_sync_configured():
+        return 0
+    try:
+        entries = []
+        for record in records:
+            if not record:
+                continue
+            key = record_key(tab, record)
+            if key:
+                entries.append((key, "upsert", to_json_safe(record)))
+        return await _enqueue(db, tab, entries)
+    except Exception as e:
+        logger.error(f"Failed to enqueue Google Sheets sync for {tab}: {e}")
+        return 0
+
+
+async def enqueue_sheets_delete(db, tab: str, record_ids: Iterable[str]) -> int:
+    """Queue row deletions for the given tab. Never raises."""
+    if not sheets_sync_configured():
+        return 0
+    try:
+        return await _enqueue(db, tab, [(str(record_id), "delete", None) for record_id in record_ids if record_id])
+    except Exception as e:
+        logger.error(f"Failed to enqueue Google Sheets delete for {tab}: {e}")
+        return 0
+
+
+# ==================== FLUSH ====================
+
+def build_payloads(tab: str, entries: List[Dict]) -> List[tuple]:
+    """[(payload, entries covered by it)] for one tab's due entries"""
+    payloads = []
+    upserts = [entry for entry in entries if entry["op"] == "upsert"]
+    deletes = [entry for entry in entries if entry["op"] == "delete"]
+
+    if tab in BATCH_PAYLOADS:
+        for i in range(0, len(upserts), BATCH_SIZE):
+            chunk = upserts[i:i + BATCH_SIZE]
+            payloads.append((BATCH_PAYLOADS[tab]([entry["record"] for entry in chunk]), chunk))
+    else:
+        for entry in upserts:
+            payloads.append(({'action': 'sync_single', 'tab': tab, 'record': entry["record"]}, [entry]))
+
+    for entry in deletes:
+        payloads.append(({'action': 'delete_record', 'tab': tab, 'id': entry["record_id"]}, [entry]))
+    return payloads
+
+
+async def flush_once(db, sender: Callable[[Dict], Dict] = None, limit: int = None) -> Dict:
+    """Send every due entry once. Returns counts of sent and failed entries."""
+    sender = sender or send_to_sheets_async
+    now = datetime.now(timezone.utc)
+    due = await db[OUTBOX_COLLECTION].find(
+        {"next_attempt_at": {"$lte": now}}
+    ).sort("enqueued_at", 1).to_list(limit or BATCH_SIZE * 10)
+
+    by_tab = defaultdict(list)
+    for entry in due:
+        by_tab[entry["tab"]].append(entry)
+
+    counts = {"sent": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def deliver(tab: str, payload: Dict, covered: List[Dict]) -> None:
+        async with semaphore:
+            try:
+                if asyncio.iscoroutinefunction(sender):
+                    result = await sender(payload)
+                else:
+                    # Blocking senders (requests) are kept off the event loop
+                    result = await asyncio.to_thread(sender, payload)
+                ok = bool(result and result.get('success'))
+                error = None if ok else (result or {}).get('message', 'Unknown error')
+            except Exception as e:
+                ok, error = False, str(e)
+
+        if ok:
+            # Only drop entries that were not re-enqueued while in flight
+            await db[OUTBOX_COLLECTION].bulk_write([
+                DeleteOne({"_id": entry["_id"], "version": entry["version"]}) for entry in covered
+            ], ordered=False)
+            counts["sent"] += len(covered)
+        else:
+            retry_at = datetime.now(timezone.utc)
+            await db[OUTBOX_COLLECTION].bulk_write([
+                UpdateOne(
+                    {"_id": entry["_id"]},
+                    {
+                        "$inc": {"attempts": 1},
+                        "$set": {
+                            "last_error": error,
+                            "next_attempt_at": retry_at + timedelta(
+                                seconds=backoff_seconds(entry.get("attempts", 0) + 1)
+                            )
+                        }
+                    }
+                ) for entry in covered
+            ], ordered=False)
+            counts["failed"] += len(covered)
+            logger.warning(f"Google Sheets outbox: {len(covered)} {tab} entr(ies) failed: {error}")
+
+    # Each record appears in exactly one payload, so payloads can go out in parallel
+    await asyncio.gather(*[
+        deliver(tab, payload, covered)
+        for tab, entries in by_tab.items()
+        for payload, covered in build_payloads(tab, entries)
+    ])
+
+    sent, failed = counts["sent"], counts["failed"]
+    flusher_state.update({
+        "last_flush_at": datetime.now(timezone.utc).isoformat(),
+        "last_sent": sent,
+        "last_failed": failed,
+        "total_sent": flusher_state["total_sent"] + sent,
+        "total_failed": flusher_state["total_failed"] + failed,
+    })
+    return {"due": len(due), "sent": sent, "failed": failed}
+
+
+async def run_flusher(db, stop_event: Optional[asyncio.Event] = None) -> None:
+    """Background loop; only the holder of the flusher lease sends"""
+    from scheduler_worker import acquire_lease
+
+    stop_event = stop_event or asyncio.Event()
+    lease_ttl = int(max(FLUSH_INTERVAL_SECONDS * 6, 30))
+    while not stop_event.is_set():
+        try:
+            if await acquire_lease(db, FLUSHER_LEASE, ttl_seconds=lease_ttl):
+                # Drain everything that is due before sleeping
+                while True:
+                    stats = await flush_once(db)
+                    if stats["due"] == 0 or stats["sent"] == 0:
+                        break
+        except Exception as e:
+            logger.error(f"Google Sheets outbox flusher error: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ==================== STATUS ====================
+
+async def get_outbox_status(db) -> Dict:
+    """Queue depth, due/failing entries and lag of the oldest unsent change"""
+    now = datetime.now(timezone.utc)
+    collection = db[OUTBOX_COLLECTION]
+    oldest = await collection.find_one({}, {"enqueued_at": 1}, sort=[("enqueued_at", 1)])
+
+    lag_seconds = 0
+    if oldest and oldest.get("enqueued_at"):
+        enqueued_at = oldest["enqueued_at"]
+        if enqueued_at.tzinfo is None:
+            enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+        lag_seconds = round((now - enqueued_at).total_seconds(), 1)
+
+    by_tab = await collection.aggregate([
+        {"$group": {"_id": "$tab", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+
+    return {
+        "enabled": sheets_sync_configured(),
+        "queue_depth": await collection.count_documents({}),
+        "due": await collection.count_documents({"next_attempt_at": {"$lte": now}}),
+        "retrying": await collection.count_documents({"attempts": {"$gt": 0}}),
+        "lag_seconds": lag_seconds,
+        "by_tab": {row["_id"]: row["count"] for row in by_tab},
+        "flusher": dict(flusher_state),
+    }
+
+
+async def ensure_outbox_indexes(db) -> None:
+    await db[OUTBOX_COLLECTION].create_index([("next_attempt_at", 1)], name="idx_next_attempt_at")
+    await db[OUTBOX_COLLECTION].create_index([("enqueued_at", 1)], name="idx_enqueued_at")
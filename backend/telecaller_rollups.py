@@ -0,0 +1,398 @@
+"""
+Telecaller Daily Rollups
+Incrementally maintained counters behind the telecaller dashboards.
+
+Every write path that changes a lead's status, stage, assignment or call state
+records the delta here with ``$inc`` so dashboards read a handful of small
+documents instead of rescanning ``driver_leads``. ``reconcile_rollups`` rebuilds
+the counters from scratch and reports (and optionally repairs) any drift.
+
+Document layout (collection ``telecaller_daily_rollups``)::
+
+    {
+      "_id": "<telecaller email>|<YYYY-MM-DD | all | undated>",
+      "telecaller": "<telecaller email>",
+      "date": "<YYYY-MM-DD | all | undated>",
+      "total_leads": 12,              # leads assigned for that day
+      "highly_interested": 3,
+      "not_interested": 2,
+      "callbacks": 1,
+      "conversions": 0,
+      "stages": {"S1 - Filtering": {"total": 10, "statuses": {"New": 7, ...}}},
+      "leads_called": 8,              # leads last called by their telecaller
+      "leads_no_response": 2,         # leads last marked no-response by their telecaller
+      "leads_last_called": 5,         # assigned leads whose last call was on that day
+      "calls_made": 25,               # call events made on that day
+      "no_responses": 4,              # no-response events marked on that day
+      "updated_at": "..."
+    }
+
+Lead state counters are keyed by the lead's assigned day, except
+``leads_last_called`` which is keyed by the day of the lead's last call and
+has no ``all`` total. Call/no-response events are keyed by the day they
+happened. The other counters are also added to the telecaller's ``all``
+document so lifetime totals are a single lookup.
+
+The dashboards count leads (``leads_*``), so calling the same lead twice
+counts once; the event counters count every call.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne, ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_COLLECTION = "telecaller_daily_rollups"
+STATE_COLLECTION = "telecaller_rollup_state"
+# Bump when a counter is added so existing documents are rebuilt once
+ROLLUP_VERSION = 2
+REBUILD_LEASE = "telecaller_rollups_rebuild"
+ALL_TIME_KEY = "all"
+UNDATED_KEY = "undated"
+
+# Only these lead fields are needed to compute a lead's contribution
+ROLLUP_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "assigned_telecaller": 1,
+    "assigned_date": 1,
+    "stage": 1,
+    "status": 1,
+    "last_called": 1,
+    "last_called_by": 1,
+    "last_no_response": 1,
+    "last_no_response_by": 1,
+}
+
+# Event counters and the lead history arrays they are rebuilt from
+EVENT_SOURCES = {
+    "calls_made": ("calling_history", "called_by"),
+    "no_responses": ("no_response_history", "marked_by"),
+}
+
+
+def day_key(value) -> Optional[str]:
+    """Return the YYYY-MM-DD day of an ISO timestamp/datetime as it was stored"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    text = str(value).strip()
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-":
+        return text[:10]
+    try:
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        return None
+
+
+def _safe_key(name: str) -> str:
+    """Mongo field names cannot contain dots or start with '$'"""
+    return str(name).replace(".", "_").lstrip("$") or "Unknown"
+
+
+def _status_counters(status: str) -> List[str]:
+    """Status buckets, matching the rules used by the daily summary"""
+    status_lower = status.lower()
+    counters = []
+    if "highly interested" in status_lower:
+        counters.append("highly_interested")
+    elif "not interested" in status_lower:
+        counters.append("not_interested")
+    elif "call back" in status_lower or "callback" in status_lower:
+        counters.append("callbacks")
+    if status == "DONE!" or "onboard" in status_lower:
+        counters.append("conversions")
+    return counters
+
+
+def lead_contribution(lead: Optional[Dict]) -> Optional[Dict]:
+    """What a lead adds to the rollups, or None if it is not assigned"""
+    if not lead or not lead.get("assigned_telecaller"):
+        return None
+    telecaller = lead["assigned_telecaller"]
+    return {
+        "telecaller": telecaller,
+        "date": day_key(lead.get("assigned_date")) or UNDATED_KEY,
+        "stage": _safe_key(lead.get("stage") or "Unknown"),
+        "status": lead.get("status") or "Unknown",
+        "called": bool(lead.get("last_called")) and lead.get("last_called_by") == telecaller,
+        "no_response": bool(lead.get("last_no_response")) and lead.get("last_no_response_by") == telecaller,
+        "last_called_day": day_key(lead.get("last_called")),
+    }
+
+
+class RollupDelta:
+    """Accumulates counter changes and applies them with one bulk_write"""
+
+    def __init__(self):
+        self.counters = defaultdict(lambda: defaultdict(int))
+
+    def _add(self, telecaller: str, date: str, field: str, amount: int):
+        self.counters[(telecaller, date)][field] += amount
+        self.counters[(telecaller, ALL_TIME_KEY)][field] += amount
+
+    def _add_day(self, telecaller: str, date: str, field: str, amount: int):
+        self.counters[(telecaller, date)][field] += amount
+
+    def add_lead(self, lead: Optional[Dict], sign: int = 1):
+        contribution = lead_contribution(lead)
+        if not contribution:
+            return
+        telecaller, date = contribution["telecaller"], contribution["date"]
+        stage, status = contribution["stage"], contribution["status"]
+        self._add(telecaller, date, "total_leads", sign)
+        self._add(telecaller, date, f"stages.{stage}.total", sign)
+        self._add(telecaller, date, f"stages.{stage}.statuses.{_safe_key(status)}", sign)
+        for counter in _status_counters(status):
+            self._add(telecaller, date, counter, sign)
+        if contribution["called"]:
+            self._add(telecaller, date, "leads_called", sign)
+        if contribution["no_response"]:
+            self._add(telecaller, date, "leads_no_response", sign)
+        if contribution["last_called_day"]:
+            self._add_day(telecaller, contribution["last_called_day"], "leads_last_called", sign)
+
+    def add_transition(self, before: Optional[Dict], after: Optional[Dict]):
+        if lead_contribution(before) == lead_contribution(after):
+            return
+        self.add_lead(before, -1)
+        self.add_lead(after, 1)
+
+    def add_event(self, telecaller: str, when, field: str, amount: int = 1):
+        date = day_key(when)
+        if telecaller and date:
+            self._add(telecaller, date, field, amount)
+
+    def non_zero(self) -> Dict:
+        result = {}
+        for key, fields in self.counters.items():
+            incs = {field: value for field, value in fields.items() if value}
+            if incs:
+                result[key] = incs
+        return result
+
+    async def apply(self, db) -> int:
+        operations = []
+        now = datetime.now(timezone.utc).isoformat()
+        for (telecaller, date), incs in self.non_zero().items():
+            operations.append(UpdateOne(
+                {"_id": f"{telecaller}|{date}"},
+                {
+                    "$inc": incs,
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"telecaller": telecaller, "date": date},
+                },
+                upsert=True
+            ))
+        if operations:
+            await db[ROLLUPS_COLLECTION].bulk_write(operations, ordered=False)
+        return len(operations)
+
+
+# ==================== WRITE PATH HOOKS ====================
+# Rollups must never fail the user's write, so errors are logged and left
+# for the reconciliation job to correct.
+
+async def record_lead_transitions(db, pairs: Iterable) -> None:
+    """Record (before, after) lead states. Use None for inserts/deletes."""
+    try:
+        delta = RollupDelta()
+        for before, after in pairs:
+            delta.add_transition(before, after)
+        await delta.apply(db)
+    except Exception as e:
+        logger.error(f"Failed to update telecaller rollups: {e}")
+
+
+async def record_lead_transition(db, before: Optional[Dict], after: Optional[Dict]) -> None:
+    await record_lead_transitions(db, [(before, after)])
+
+
+async def record_leads_inserted(db, leads: Iterable[Dict]) -> None:
+    await record_lead_transitions(db, ((None, lead) for lead in leads))
+
+
+async def record_leads_deleted(db, leads: Iterable[Dict]) -> None:
+    await record_lead_transitions(db, ((lead, None) for lead in leads))
+
+
+async def record_event(db, telecaller: str, when, field: str) -> None:
+    """Record a call/no-response event made by a telecaller"""
+    try:
+        delta = RollupDelta()
+        delta.add_event(telecaller, when, field)
+        await delta.apply(db)
+    except Exception as e:
+        logger.error(f"Failed to update telecaller rollups: {e}")
+
+
+# ==================== READS ====================
+
+async def get_rollup(db, telecaller: str, date: str) -> Dict:
+    """Single-document lookup; missing documents read as all-zero"""
+    doc = await db[ROLLUPS_COLLECTION].find_one({"_id": f"{telecaller}|{date}"}, {"_id": 0})
+    return doc or {"telecaller": telecaller, "date": date}
+
+
+async def get_rollups_for_range(db, start_date: Optional[str], end_date: Optional[str]) -> List[Dict]:
+    """All per-day rollup documents within an inclusive YYYY-MM-DD range"""
+    date_filter = {"$nin": [ALL_TIME_KEY, UNDATED_KEY]}
+    if start_date:
+        date_filter["$gte"] = start_date
+    if end_date:
+        date_filter["$lte"] = end_date
+    return await db[ROLLUPS_COLLECTION].find({"date": date_filter}, {"_id": 0}).to_list(length=None)
+
+
+# ==================== RECONCILIATION ====================
+
+def _flatten(doc: Dict, prefix: str = "") -> Dict[str, int]:
+    flat = {}
+    for key, value in doc.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def _unflatten(flat: Dict[str, int]) -> Dict:
+    doc = {}
+    for path, value in flat.items():
+        target = doc
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return doc
+
+
+async def compute_expected_rollups(db) -> RollupDelta:
+    """Rebuild every counter from driver_leads"""
+    projection = dict(ROLLUP_PROJECTION)
+    for history_field, _ in EVENT_SOURCES.values():
+        projection[history_field] = 1
+
+    expected = RollupDelta()
+    async for lead in db.driver_leads.find({}, projection):
+        expected.add_lead(lead)
+        for counter, (history_field, actor_field) in EVENT_SOURCES.items():
+            history = lead.get(history_field)
+            if not isinstance(history, list):
+                continue
+            for entry in history:
+                if isinstance(entry, dict):
+                    expected.add_event(entry.get(actor_field), entry.get("timestamp"), counter)
+    return expected
+
+
+async def reconcile_rollups(db, repair: bool = True) -> Dict:
+    """
+    Rebuild counters from scratch, compare with the stored documents and
+    report drift. With repair=True drifted documents are replaced.
+    """
+    started = datetime.now(timezone.utc)
+    expected = {
+        f"{telecaller}|{date}": {"telecaller": telecaller, "date": date, "counters": counters}
+        for (telecaller, date), counters in (await compute_expected_rollups(db)).non_zero().items()
+    }
+
+    stored = {}
+    async for doc in db[ROLLUPS_COLLECTION].find({}):
+        counters = {path: value for path, value in _flatten(doc).items() if value}
+        stored[doc["_id"]] = counters
+
+    drift = []
+    repairs = []
+    now = datetime.now(timezone.utc).isoformat()
+    for doc_id in sorted(set(expected) | set(stored)):
+        want = expected.get(doc_id, {}).get("counters", {})
+        have = stored.get(doc_id, {})
+        fields = sorted(path for path in set(want) | set(have) if want.get(path, 0) != have.get(path, 0))
+        if not fields:
+            continue
+        drift.append({
+            "id": doc_id,
+            "fields": {path: {"stored": have.get(path, 0), "expected": want.get(path, 0)} for path in fields}
+        })
+        if repair:
+            telecaller, _, date = doc_id.rpartition("|")
+            replacement = _unflatten(want)
+            replacement.update({"telecaller": telecaller, "date": date, "updated_at": now})
+            repairs.append(ReplaceOne({"_id": doc_id}, replacement, upsert=True))
+
+    if repairs:
+        await db[ROLLUPS_COLLECTION].bulk_write(repairs, ordered=False)
+
+    report = {
+        "success": True,
+        "documents_checked": len(set(expected) | set(stored)),
+        "drifted_documents": len(drift),
+        "repaired": len(repairs),
+        "drift": drift[:200],
+        "duration_seconds": round((datetime.now(timezone.utc) - started).total_seconds(), 2),
+    }
+    if drift:
+        logger.warning(f"Telecaller rollups drift: {len(drift)} document(s), repaired {len(repairs)}")
+    else:
+        logger.info(f"Telecaller rollups reconciled: no drift across {report['documents_checked']} documents")
+    return report
+
+
+async def rebuild_if_outdated(db) -> Optional[Dict]:
+    """Rebuild the counters once after ROLLUP_VERSION changes (one instance, via a lease)"""
+    from scheduler_worker import acquire_lease, release_lease
+
+    state = await db[STATE_COLLECTION].find_one({"_id": "version"})
+    if state and state.get("version") == ROLLUP_VERSION:
+        return None
+    if not await acquire_lease(db, REBUILD_LEASE, ttl_seconds=3600):
+        return None
+    try:
+        report = await reconcile_rollups(db, repair=True)
+        await db[STATE_COLLECTION].update_one(
+            {"_id": "version"},
+            {"$set": {"version": ROLLUP_VERSION, "rebuilt_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        return report
+    except Exception as e:
+        logger.error(f"Failed to rebuild telecaller rollups: {e}")
+        return None
+    finally:
+        await release_lease(db, REBUILD_LEASE)
+
+
+async def ensure_rollup_indexes(db) -> None:
+    await db[ROLLUPS_COLLECTION].create_index(
+        [("date", 1), ("telecaller", 1)],
+        name="idx_rollup_date_telecaller"
+    )
+
+
+if __name__ == "__main__":
+    import os
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+        await ensure_rollup_indexes(database)
+        report = await reconcile_rollups(database, repair=True)
+        print(f"Checked {report['documents_checked']} rollup documents, "
+              f"drift in {report['drifted_documents']}, repaired {report['repaired']} "
+              f"({report['duration_seconds']}s)")
+        client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Telemetry Downsampling
+Reduces a day of Montra telemetry to a fixed number of chart points, so the
+battery consumption chart payload does not grow with the sampling rate.
+
+Two methods, applied to each chart series (SOC, speed, distance) separately:
+
+* ``lttb``: Largest-Triangle-Three-Buckets. Keeps the first and last point
+  and, from each bucket in between, the point that forms the largest triangle
+  with the point kept from the previous bucket and the average of the next
+  bucket. This preserves the visual shape of the line.
+* ``minmax``: the minimum and maximum of each bucket. This preserves every
+  extreme value, such as SOC peaks and troughs.
+
+Each series with data gets an equal share of ``points`` and the indices
+selected for all series are merged, so the result has at most ``points``
+rows (fewer when series pick the same rows). Rows are original samples (never
+interpolated), with the same fields the chart already reads.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from telemetry_fields import (
+    ODOMETER_FIELDS, SOC_FIELDS, SPEED_FIELDS, TIME_FIELDS, datetime_column, numeric_column, present_field
+)
+
+CHART_SERIES = [SOC_FIELDS, SPEED_FIELDS, ODOMETER_FIELDS]
+CHART_FIELDS = TIME_FIELDS + [field for series in CHART_SERIES for field in series]
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the ``threshold`` points LTTB keeps from (x, y), x ascending"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 points between the fixed first and last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        px, py = x[previous], y[previous]
+        area = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the min and max of ``threshold // 2`` equal-count buckets plus the end points"""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = max(1, (threshold - 2) // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    selected = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            segment = y[start:end]
+            selected.append(start + int(np.argmin(segment)))
+            selected.append(start + int(np.argmax(segment)))
+    return np.unique(selected)
+
+
+def _time_axis(rows: List[Dict]) -> np.ndarray:
+    """Seconds since epoch per row (row position when no time field parses)"""
+    frame = pd.DataFrame.from_records(rows, columns=[field for field in TIME_FIELDS if present_field(rows, [field])])
+    values = datetime_column(frame, TIME_FIELDS)
+    if values.notna().any():
+        seconds = values.astype("int64").to_numpy(dtype=np.float64) / 1e9
+        seconds[values.isna().to_numpy()] = np.nan
+        return seconds
+    return np.arange(len(rows), dtype=np.float64)
+
+
+def downsample_rows(
+    rows: List[Dict],
+    points: int,
+    method: str = "lttb",
+    series: Sequence[Sequence[str]] = CHART_SERIES
+) -> List[Dict]:
+    """At most ``points`` original rows that carry the shape of every chart series, in time order"""
+    if points >= len(rows):
+        return rows
+    select = lttb_indices if method == "lttb" else minmax_indices
+
+    x = _time_axis(rows)
+    columns = []
+    for candidates in series:
+        fields = [field for field in candidates if present_field(rows, [field])]
+        if fields:
+            # The typed canonical field when present, otherwise the parsed header
+            columns.append(numeric_column(pd.DataFrame.from_records(rows, columns=fields), fields))
+
+    keep = set()
+    share = points // len(columns) if columns else 0
+    # Below 4 points a series has no shape to keep (and the selectors return every row)
+    if share >= 4:
+        for y in columns:
+            valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+            if len(valid):
+                keep.update(valid[select(x[valid], y[valid], share)].tolist())
+
+    if not keep:
+        # Nothing numeric to shape: evenly spaced rows
+        keep.update(np.linspace(0, len(rows) - 1, points).astype(np.int64).tolist())
+    return [rows[i] for i in sorted(keep)]
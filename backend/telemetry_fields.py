@@ -0,0 +1,122 @@
+"""
+Telemetry Fields
+The one place where Montra feed header aliases are resolved.
+
+Feed files have used different headers for the same signal over time
+("Battery Soc(%)" vs "Battery SOC(%)", a time column called "Date" or
+"Time", ...), and numbers arrive as strings. Imports therefore also store
+each signal once under a canonical, typed field (``soc_percent``,
+``odometer_km``, ``speed_kmph`` as floats, ``feed_ts`` as a BSON date), and
+mark the row with ``schema_version``; ``canonicalize_feed_data`` in
+montra_feed_import.py converts rows imported earlier.
+
+Each alias list below starts with the canonical field, followed by the source
+headers in priority order. Readers use the helpers here: a canonical column
+is taken as is, and the headers are only parsed for rows that lack it.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+TELEMETRY_SCHEMA_VERSION = 1
+
+# Canonical typed fields
+SOC = "soc_percent"
+ODOMETER = "odometer_km"
+SPEED = "speed_kmph"
+# The parsed time column A (natural key)
+TIME = "feed_ts"
+
+SOURCE_SOC_FIELDS = ["Battery Soc(%)", "Battery SOC(%)", "Battery %", "battery_soc_percentage"]
+SOURCE_SPEED_FIELDS = ["Speed (km/h)", "Speed(km/h)", "Speed"]
+# Same candidates (and order) as the battery consumption page
+SOURCE_ODOMETER_FIELDS = [
+    "Odometer (km)", "Odometer(km)", "Odometer",
+    "Distance (km)", "Distance(km)", "Distance",
+    "Total Distance (km)", "Total Distance",
+    "km",
+]
+
+SOC_FIELDS = [SOC] + SOURCE_SOC_FIELDS
+SPEED_FIELDS = [SPEED] + SOURCE_SPEED_FIELDS
+ODOMETER_FIELDS = [ODOMETER] + SOURCE_ODOMETER_FIELDS
+TIME_FIELDS = [TIME, "Date", "time", "Time", "Portal Received Time"]
+
+# Canonical numeric field -> the source headers it is resolved from
+CANONICAL_NUMERIC_FIELDS = {
+    SOC: SOURCE_SOC_FIELDS,
+    ODOMETER: SOURCE_ODOMETER_FIELDS,
+    SPEED: SOURCE_SPEED_FIELDS,
+}
+
+
+def first_value(row: Dict, aliases: Sequence[str]):
+    """Value of the first alias present (not None) in a row"""
+    for field in aliases:
+        value = row.get(field)
+        if value is not None:
+            return value
+    return None
+
+
+def present_field(rows: List[Dict], aliases: Sequence[str], sample: int = 50) -> Optional[str]:
+    """First alias that has a value in the first ``sample`` rows"""
+    for field in aliases:
+        if any(row.get(field) is not None for row in rows[:sample]):
+            return field
+    return None
+
+
+def numeric_column(frame: pd.DataFrame, aliases: Sequence[str]) -> np.ndarray:
+    """float64 values coalesced over the alias columns (NaN where none parses)"""
+    result = np.full(len(frame), np.nan)
+    for field in aliases:
+        missing = np.isnan(result)
+        if not missing.any():
+            break
+        if field in frame.columns:
+            column = frame[field]
+            if pd.api.types.is_numeric_dtype(column):
+                # Typed (canonical) values: no parsing
+                result[missing] = column.to_numpy(dtype=np.float64, na_value=np.nan)[missing]
+            else:
+                # Only the rows still without a value are parsed
+                values = pd.to_numeric(column[missing], errors="coerce")
+                result[missing] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return result
+
+
+def datetime_column(frame: pd.DataFrame, aliases: Sequence[str]) -> pd.Series:
+    """Timestamps coalesced over the alias columns (NaT where none parses)"""
+    result = pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns]")
+    for field in aliases:
+        if field in frame.columns and result.isna().any():
+            values = pd.to_datetime(frame[field], errors="coerce", format="mixed")
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                # Mixed time zones; feed times are naive local times
+                continue
+            if values.dt.tz is not None:
+                values = values.dt.tz_localize(None)
+            result = result.fillna(values.astype("datetime64[ns]"))
+    return result
+
+
+def canonical_values(frame: pd.DataFrame) -> Dict[str, list]:
+    """
+    Canonical numeric fields resolved from the source headers of a frame of
+    feed rows: a list of floats (None where no header parses) per field
+    """
+    result = {}
+    for field, aliases in CANONICAL_NUMERIC_FIELDS.items():
+        values = numeric_column(frame, aliases)
+        # NaN would defeat numeric filters and $min / $max on the server
+        result[field] = [None if np.isnan(v) else v for v in values.tolist()]
+    return result
+
+
+def seconds_of_day(timestamps: pd.Series) -> np.ndarray:
+    """Seconds since midnight per timestamp (NaN for NaT)"""
+    seconds = (timestamps - timestamps.dt.normalize()).dt.total_seconds()
+    return seconds.to_numpy(dtype=np.float64, na_value=np.nan)
@@ -0,0 +1,74 @@
+"""
+Telemetry Lookup
+Time lookups over one vehicle-day of telemetry with ``searchsorted``.
+
+The charge audits need the sample closest to a target time (6 AM), or the
+first sample inside a window (5-7 AM, 11 AM-1 PM, 4-6 PM). Scanning every
+record for every target is O(records x targets). Here the sample times are
+sorted once, and each target costs one binary search:
+O((records + targets) log records).
+
+Both helpers take sample times in ascending order with no NaN, and return
+positions in that array, or -1 where no sample qualifies. ``sorted_times``
+builds such an array from a column that may be unordered or partly missing,
+and maps positions back to the original rows.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def sorted_times(seconds: np.ndarray, mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (ascending times, row index of each) for the rows with a time (and
+    ``mask``). The sort is stable, so equal times keep their row order.
+    """
+    keep = ~np.isnan(seconds)
+    if mask is not None:
+        keep &= mask
+    rows = np.flatnonzero(keep)
+    order = np.argsort(seconds[rows], kind="stable")
+    return seconds[rows][order], rows[order]
+
+
+def nearest_index(times: np.ndarray, targets, tolerance: float = np.inf) -> np.ndarray:
+    """
+    Position of the sample closest to each target, at most ``tolerance`` away
+    (inclusive). A tie goes to the earlier sample, and among equal times to
+    the first one.
+    """
+    targets = np.atleast_1d(np.asarray(targets, dtype=np.float64))
+    found = np.full(len(targets), -1, dtype=np.int64)
+    if len(times) == 0:
+        return found
+
+    right = np.searchsorted(times, targets, side="left")
+    left = right - 1
+    has_left, has_right = left >= 0, right < len(times)
+    left_gap = np.where(has_left, targets - times[np.maximum(left, 0)], np.inf)
+    right_gap = np.where(has_right, times[np.minimum(right, len(times) - 1)] - targets, np.inf)
+
+    use_left = left_gap <= right_gap
+    # First of a run of equal times on the left side
+    left_first = np.searchsorted(times, times[np.maximum(left, 0)], side="left")
+    best = np.where(use_left, left_first, right)
+    gap = np.minimum(left_gap, right_gap)
+    ok = gap <= tolerance
+    found[ok] = best[ok]
+    return found
+
+
+def first_in_window(times: np.ndarray, starts, ends) -> np.ndarray:
+    """Position of the first sample with start <= time <= end, per window"""
+    starts = np.atleast_1d(np.asarray(starts, dtype=np.float64))
+    ends = np.atleast_1d(np.asarray(ends, dtype=np.float64))
+    found = np.full(len(starts), -1, dtype=np.int64)
+    if len(times) == 0:
+        return found
+
+    at = np.searchsorted(times, starts, side="left")
+    ok = at < len(times)
+    ok[ok] = times[at[ok]] <= ends[ok]
+    found[ok] = at[ok]
+    return found
@@ -0,0 +1,427 @@
+"""
+Vehicle Day Summary
+One ``vehicle_day_summary`` document per (vehicle_id, date) with the daily
+facts the Montra endpoints need, so they do not rescan raw telemetry:
+
+* file info: registration, filenames, row count, import time
+* time span: first and last timestamp
+* SOC and odometer: first / last / min / max, and km driven
+* charging: first and last SOC increase of the day, and total SOC added
+* battery audit readings: the first reading in the 6 AM, 12 PM and 5 PM
+  windows
+* morning charge: the reading closest to 6:00 AM between 5:30 and 6:30
+* the battery milestone row of the day (``battery_milestones``)
+
+Summaries are upserted when a feed file is imported. If the imported rows are
+the whole vehicle-day, they are summarized in memory; otherwise the day is
+re-read from montra_feed_data. ``rebuild_day_summaries`` (also
+``python vehicle_day_summary.py rebuild``) covers data imported earlier.
+
+Every summary write or delete also appends (vehicle_id, date, event, at) to
+``feed_import_log``, so derived caches can recompute only the vehicle-days
+that changed since their last run (``changed_days``).
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from battery_milestones import compute_milestones
+from telemetry_fields import (
+    ODOMETER_FIELDS, SOC_FIELDS, TIME_FIELDS, datetime_column, numeric_column, seconds_of_day
+)
+from telemetry_lookup import first_in_window, nearest_index, sorted_times
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLLECTION = "vehicle_day_summary"
+IMPORT_LOG_COLLECTION = "feed_import_log"
+IMPORT_LOG_TTL_DAYS = 90
+REBUILD_LEASE = "vehicle_day_summary_rebuild"
+REBUILD_LEASE_SECONDS = 6 * 3600
+
+# Battery audit windows: first reading between (start, end) seconds of day
+AUDIT_WINDOWS = {
+    "6am": (5 * 3600, 7 * 3600),
+    "12pm": (11 * 3600, 13 * 3600),
+    "5pm": (16 * 3600, 18 * 3600),
+}
+MORNING_TARGET = 6 * 3600
+# 5:30 - 6:30 AM
+MORNING_TOLERANCE = 1800
+# The morning audit has always read the portal time first
+MORNING_TIME_FIELDS = ["Portal Received Time", "time", "Time"] + TIME_FIELDS
+MORNING_SOC_FIELDS = SOC_FIELDS + ["Battery", "battery", "SOC", "soc"]
+MORNING_CHARGE_THRESHOLD = 95
+
+INFO_FIELDS = [
+    "vehicle_id", "date", "registration_number", "Registration Number",
+    "filename", "month", "year", "date_display", "imported_at",
+]
+# Projection for re-reading a vehicle-day from montra_feed_data
+SUMMARY_SOURCE_FIELDS = list(dict.fromkeys(INFO_FIELDS + MORNING_TIME_FIELDS + MORNING_SOC_FIELDS + ODOMETER_FIELDS))
+
+
+def _value(array: np.ndarray, index: int):
+    if index < 0 or np.isnan(array[index]):
+        return None
+    value = float(array[index])
+    return int(value) if value.is_integer() else value
+
+
+def _timestamp(values: pd.Series, index: int) -> Optional[datetime]:
+    if index < 0 or pd.isna(values.iloc[index]):
+        return None
+    return values.iloc[index].to_pydatetime()
+
+
+def _first_non_empty(frame: pd.DataFrame, fields: Iterable[str]):
+    for field in fields:
+        if field in frame.columns:
+            values = frame[field].dropna()
+            values = values[values.astype(str).str.strip() != ""]
+            if len(values):
+                value = values.iloc[0]
+                return value.item() if isinstance(value, np.generic) else value
+    return None
+
+
+def summarize_day(rows: List[Dict]) -> Optional[Dict]:
+    """Daily facts for the rows of one vehicle-day"""
+    if not rows:
+        return None
+    frame = pd.DataFrame.from_records(rows)
+    timestamps = datetime_column(frame, TIME_FIELDS)
+    # Time order; rows without a time keep their order at the end
+    order = np.lexsort((np.arange(len(frame)), timestamps.isna().to_numpy(), timestamps.fillna(pd.Timestamp.max).to_numpy()))
+    frame = frame.iloc[order].reset_index(drop=True)
+    timestamps = timestamps.iloc[order].reset_index(drop=True)
+
+    tod = seconds_of_day(timestamps)
+    soc = numeric_column(frame, SOC_FIELDS)
+    odometer = numeric_column(frame, ODOMETER_FIELDS)
+    has_soc, has_odometer = ~np.isnan(soc), ~np.isnan(odometer)
+    soc_idx, odometer_idx = np.flatnonzero(has_soc), np.flatnonzero(has_odometer)
+
+    # Charging: SOC increases between consecutive readings
+    rises = soc_idx[1:][np.diff(soc[soc_idx]) > 0] if len(soc_idx) > 1 else np.array([], dtype=np.int64)
+    steps = np.diff(soc[soc_idx]) if len(soc_idx) > 1 else np.array([])
+
+    # First reading with SOC and odometer in each audit window
+    times, time_rows = sorted_times(tod, has_soc & has_odometer)
+    windows = np.array(list(AUDIT_WINDOWS.values()), dtype=np.float64)
+    audit_readings = {}
+    for label, hit in zip(AUDIT_WINDOWS, first_in_window(times, windows[:, 0], windows[:, 1])):
+        row = time_rows[hit] if hit >= 0 else -1
+        audit_readings[label] = {
+            "soc": _value(soc, row),
+            "odometer": _value(odometer, row),
+            "at": _timestamp(timestamps, row),
+        } if row >= 0 else None
+
+    # Non-zero reading closest to 6:00 AM, within 30 minutes
+    morning_soc = numeric_column(frame, MORNING_SOC_FIELDS)
+    morning_times = datetime_column(frame, MORNING_TIME_FIELDS)
+    times, time_rows = sorted_times(seconds_of_day(morning_times), ~np.isnan(morning_soc) & (morning_soc != 0))
+    hit = nearest_index(times, MORNING_TARGET, MORNING_TOLERANCE)[0]
+    morning = time_rows[hit] if hit >= 0 else -1
+
+    info = {field: _first_non_empty(frame, [field]) for field in ("vehicle_id", "date", "month", "year", "date_display")}
+    filenames = sorted({str(name) for name in frame.get("filename", pd.Series(dtype=object)).dropna()})
+    imported = frame.get("imported_at", pd.Series(dtype=object)).dropna()
+    milestones = compute_milestones(rows)
+    valid_ts = timestamps.dropna()
+    min_odometer, max_odometer = (
+        (float(odometer[odometer_idx].min()), float(odometer[odometer_idx].max())) if len(odometer_idx) else (None, None)
+    )
+
+    return {
+        **info,
+        "registration_number": _first_non_empty(frame, ["registration_number", "Registration Number"]) or "",
+        "filenames": filenames,
+        "imported_at": max(str(value) for value in imported) if len(imported) else None,
+        "rows": len(frame),
+        "first_ts": valid_ts.min().to_pydatetime() if len(valid_ts) else None,
+        "last_ts": valid_ts.max().to_pydatetime() if len(valid_ts) else None,
+        "first_soc": _value(soc, soc_idx[0] if len(soc_idx) else -1),
+        "last_soc": _value(soc, soc_idx[-1] if len(soc_idx) else -1),
+        "min_soc": float(soc[soc_idx].min()) if len(soc_idx) else None,
+        "max_soc": float(soc[soc_idx].max()) if len(soc_idx) else None,
+        "first_odometer": _value(odometer, odometer_idx[0] if len(odometer_idx) else -1),
+        "last_odometer": _value(odometer, odometer_idx[-1] if len(odometer_idx) else -1),
+        "min_odometer": min_odometer,
+        "max_odometer": max_odometer,
+        "km_driven": max(0.0, max_odometer - min_odometer) if min_odometer is not None else None,
+        "charge_start": _timestamp(timestamps, rises[0]) if len(rises) else None,
+        "charge_end": _timestamp(timestamps, rises[-1]) if len(rises) else None,
+        "charge_added": float(steps[steps > 0].sum()) if len(steps) else 0.0,
+        "audit_readings": audit_readings,
+        "morning_soc": _value(morning_soc, morning),
+        "morning_at": _timestamp(morning_times, morning),
+        "milestones": milestones[0] if milestones else None,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def display_name(summary: Dict) -> str:
+    return summary.get("registration_number") or summary["vehicle_id"]
+
+
+def battery_audit_row(summary: Dict) -> Optional[Dict]:
+    """Battery audit entry of a vehicle-day; None unless it has 6 AM, 12 PM and 5 PM readings"""
+    readings = summary.get("audit_readings") or {}
+    at_6am, at_12pm, at_5pm = readings.get("6am"), readings.get("12pm"), readings.get("5pm")
+    if not (at_6am and at_12pm and at_5pm):
+        return None
+
+    km_6am_12pm = at_12pm["odometer"] - at_6am["odometer"]
+    km_6am_5pm = at_5pm["odometer"] - at_6am["odometer"]
+    charge_drop_6am_12pm = at_6am["soc"] - at_12pm["soc"]
+    charge_drop_6am_5pm = at_6am["soc"] - at_5pm["soc"]
+    mileage_6am_12pm = (km_6am_12pm * 100 / charge_drop_6am_12pm) if charge_drop_6am_12pm > 0 else 0
+    mileage_6am_5pm = (km_6am_5pm * 100 / charge_drop_6am_5pm) if charge_drop_6am_5pm > 0 else 0
+
+    return {
+        "date": summary["date"],
+        "vehicle_name": display_name(summary),
+        "vehicle_id": summary["vehicle_id"],
+        "charge_6am": round(at_6am["soc"], 1),
+        "charge_12pm": round(at_12pm["soc"], 1),
+        "charge_5pm": round(at_5pm["soc"], 1),
+        "km_6am_12pm": round(km_6am_12pm, 2),
+        "km_6am_5pm": round(km_6am_5pm, 2),
+        "mileage_6am_12pm": round(mileage_6am_12pm, 2),
+        "mileage_6am_5pm": round(mileage_6am_5pm, 2),
+        # Critical: 12 PM below 60% and 5 PM below 20%
+        "is_critical": at_12pm["soc"] < 60 and at_5pm["soc"] < 20
+    }
+
+
+def morning_audit_row(summary: Dict) -> Optional[Dict]:
+    """Morning charge audit entry of a vehicle-day; None unless 6 AM charge is below 95%"""
+    charge = summary.get("morning_soc")
+    if charge is None or charge >= MORNING_CHARGE_THRESHOLD:
+        return None
+    return {"date": summary["date"], "vehicle_name": display_name(summary), "charge_at_6am": round(charge, 1)}
+
+
+def _day_keys(docs: List[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+    groups = {}
+    for doc in docs:
+        if doc.get("vehicle_id") and doc.get("date"):
+            groups.setdefault((doc["vehicle_id"], doc["date"]), []).append(doc)
+    return groups
+
+
+def _source_projection() -> Dict:
+    return {"_id": 0, **{field: 1 for field in SUMMARY_SOURCE_FIELDS}}
+
+
+def _log_entries(keys: Iterable[Tuple[str, str]], event: str) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    return [{"vehicle_id": vehicle_id, "date": date, "event": event, "at": now} for vehicle_id, date in keys]
+
+
+async def refresh_day_summary(db, vehicle_id: str, date: str, log: bool = True) -> bool:
+    """Recompute one summary from montra_feed_data; removes it if the day has no rows"""
+    key = {"vehicle_id": vehicle_id, "date": date}
+    rows = await db.montra_feed_data.find(key, _source_projection()).to_list(length=None)
+    summary = summarize_day(rows)
+    if summary is None:
+        await db[SUMMARY_COLLECTION].delete_one(key)
+    else:
+        await db[SUMMARY_COLLECTION].replace_one(key, summary, upsert=True)
+    if log:
+        await db[IMPORT_LOG_COLLECTION].insert_many(
+            _log_entries([(vehicle_id, date)], "refresh" if summary else "delete")
+        )
+    return summary is not None
+
+
+async def summarize_imported(db, docs: List[Dict]) -> int:
+    """Upsert the summaries of the vehicle-days touched by an import"""
+    days = _day_keys(docs)
+    for (vehicle_id, date), day_docs in days.items():
+        key = {"vehicle_id": vehicle_id, "date": date}
+        if await db.montra_feed_data.count_documents(key) == len(day_docs):
+            await db[SUMMARY_COLLECTION].replace_one(key, summarize_day(day_docs), upsert=True)
+        else:
+            await refresh_day_summary(db, vehicle_id, date, log=False)
+    if days:
+        await db[IMPORT_LOG_COLLECTION].insert_many(_log_entries(days, "import"))
+    return len(days)
+
+
+def summarize_imported_sync(db, docs: List[Dict]) -> int:
+    """pymongo counterpart of summarize_imported for ingestion worker processes"""
+    days = _day_keys(docs)
+    for (vehicle_id, date), day_docs in days.items():
+        key = {"vehicle_id": vehicle_id, "date": date}
+        if db.montra_feed_data.count_documents(key) != len(day_docs):
+            day_docs = list(db.montra_feed_data.find(key, _source_projection()))
+        summary = summarize_day(day_docs)
+        if summary:
+            db[SUMMARY_COLLECTION].replace_one(key, summary, upsert=True)
+    if days:
+        db[IMPORT_LOG_COLLECTION].insert_many(_log_entries(days, "import"))
+    return len(days)
+
+
+async def delete_day_summary(db, vehicle_id: str, date: str) -> None:
+    await db[SUMMARY_COLLECTION].delete_one({"vehicle_id": vehicle_id, "date": date})
+    await db[IMPORT_LOG_COLLECTION].insert_many(_log_entries([(vehicle_id, date)], "delete"))
+
+
+async def changed_days(db, since: Optional[datetime] = None) -> Tuple[set, int]:
+    """((vehicle_id, date) pairs logged after ``since``, log entries read)"""
+    query = {"at": {"$gt": since}} if since else {}
+    keys, read = set(), 0
+    async for entry in db[IMPORT_LOG_COLLECTION].find(query, {"_id": 0, "vehicle_id": 1, "date": 1}):
+        read += 1
+        keys.add((entry["vehicle_id"], entry["date"]))
+    return keys, read
+
+
+async def get_day_summaries(
+    db,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vehicle_ids: Optional[List[str]] = None,
+    query: Optional[Dict] = None,
+    projection: Optional[Dict] = None
+) -> List[Dict]:
+    match = dict(query or {})
+    if start_date or end_date:
+        match["date"] = {}
+        if start_date:
+            match["date"]["$gte"] = start_date
+        if end_date:
+            match["date"]["$lte"] = end_date
+    if vehicle_ids is not None:
+        match["vehicle_id"] = {"$in": vehicle_ids}
+    return await db[SUMMARY_COLLECTION].find(match, projection or {"_id": 0}).sort(
+        [("date", 1), ("vehicle_id", 1)]
+    ).to_list(length=None)
+
+
+async def ensure_day_summary_indexes(db) -> None:
+    await db[SUMMARY_COLLECTION].create_index(
+        [("vehicle_id", 1), ("date", 1)], name="uniq_vehicle_date", unique=True
+    )
+    await db[SUMMARY_COLLECTION].create_index([("date", 1)], name="idx_date")
+    await db[SUMMARY_COLLECTION].create_index([("imported_at", -1)], name="idx_imported_at")
+    await db[IMPORT_LOG_COLLECTION].create_index(
+        [("at", 1)], name="ttl_at", expireAfterSeconds=IMPORT_LOG_TTL_DAYS * 24 * 3600
+    )
+
+
+# ==================== REBUILD ====================
+
+async def rebuild_day_summaries(
+    db,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    missing_only: bool = False
+) -> Dict:
+    """
+    Recompute summaries from montra_feed_data for every vehicle-day in the
+    range (all data by default), and drop summaries of days that no longer
+    have rows. With missing_only, existing summaries are kept as they are.
+    """
+    started = datetime.now(timezone.utc)
+    match = {}
+    if start_date or end_date:
+        match["date"] = {key: value for key, value in (("$gte", start_date), ("$lte", end_date)) if value}
+    if vehicle_id:
+        match["vehicle_id"] = vehicle_id
+
+    days = await db.montra_feed_data.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"vehicle_id": "$vehicle_id", "date": "$date"}}},
+    ], allowDiskUse=True).to_list(length=None)
+    keys = {(d["_id"].get("vehicle_id"), d["_id"].get("date")) for d in days}
+    keys = {key for key in keys if key[0] and key[1]}
+
+    existing = {
+        (s["vehicle_id"], s["date"])
+        async for s in db[SUMMARY_COLLECTION].find(match, {"_id": 0, "vehicle_id": 1, "date": 1})
+    }
+    rebuilt = 0
+    for vehicle, date in sorted(keys):
+        if missing_only and (vehicle, date) in existing:
+            continue
+        await refresh_day_summary(db, vehicle, date)
+        rebuilt += 1
+        if rebuilt % 200 == 0:
+            logger.info(f"Vehicle day summary rebuild: {rebuilt} of {len(keys)} vehicle-days")
+
+    removed = 0
+    for vehicle, date in existing - keys:
+        await delete_day_summary(db, vehicle, date)
+        removed += 1
+
+    duration = round((datetime.now(timezone.utc) - started).total_seconds(), 2)
+    logger.info(f"Vehicle day summary rebuild: {rebuilt} rebuilt, {removed} removed in {duration}s")
+    return {"success": True, "vehicle_days": len(keys), "rebuilt": rebuilt, "removed": removed, "duration_seconds": duration}
+
+
+async def rebuild_with_lease(db, **kwargs) -> Optional[Dict]:
+    """rebuild_day_summaries unless another instance is already rebuilding"""
+    from scheduler_worker import acquire_lease, release_lease
+
+    if not await acquire_lease(db, REBUILD_LEASE, ttl_seconds=REBUILD_LEASE_SECONDS):
+        logger.info("Vehicle day summary rebuild already running elsewhere")
+        return None
+    try:
+        return await rebuild_day_summaries(db, **kwargs)
+    except Exception as e:
+        logger.error(f"Vehicle day summary rebuild failed: {str(e)}")
+        return None
+    finally:
+        await release_lease(db, REBUILD_LEASE)
+
+
+async def backfill_if_empty(db) -> Optional[Dict]:
+    """First start after upgrading: build the summaries of the existing feed data"""
+    if await db[SUMMARY_COLLECTION].count_documents({}, limit=1):
+        return None
+    if not await db.montra_feed_data.count_documents({}, limit=1):
+        return None
+    logger.info("vehicle_day_summary is empty; building it from montra_feed_data")
+    return await rebuild_with_lease(db, missing_only=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Rebuild vehicle_day_summary from montra_feed_data")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--end-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--vehicle", default=None)
+    parser.add_argument("--missing-only", action="store_true", help="Only build summaries that do not exist yet")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[os.environ.get('DB_NAME', 'nura_pulse_db')]
+        await ensure_day_summary_indexes(database)
+        report = await rebuild_day_summaries(
+            database, args.start_date, args.end_date, args.vehicle, missing_only=args.missing_only
+        )
+        print(f"Rebuilt {report['rebuilt']} of {report['vehicle_days']} vehicle-day summaries, "
+              f"removed {report['removed']} ({report['duration_seconds']}s)")
+        client.close()
+
+    asyncio.run(main())
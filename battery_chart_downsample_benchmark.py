@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Battery Chart Downsampling Benchmark
+Builds synthetic vehicle-days of increasing sampling density and compares the
+battery-data payload before (first 2000 full rows) and after server-side
+downsampling (backend/telemetry_downsample.py, chart fields only). Also
+reports downsampling time and checks that LTTB keeps the SOC extremes.
+
+Usage:
+    python battery_chart_downsample_benchmark.py [--points 500] [--sizes 2000,20000,86400]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from montra_feed_import import build_feed_documents, parse_feed_filename, prepare_feed_frame, read_feed_frame  # noqa: E402
+from montra_feed_import_benchmark import FILENAME, MODE_DICT, MODEL_DICT, REGISTRATION, make_feed_csv  # noqa: E402
+from telemetry_downsample import CHART_FIELDS, METHODS, downsample_rows  # noqa: E402
+
+
+def payload_kib(rows):
+    return len(json.dumps(rows, default=str).encode()) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--points', type=int, default=500)
+    parser.add_argument('--sizes', default="2000,20000,86400")
+    args = parser.parse_args()
+
+    meta = parse_feed_filename(FILENAME)
+    print(f"{'samples':>9}  {'full rows KiB':>14}  {'method':<7}{'points':>8}{'KiB':>9}{'ms':>8}  SOC range kept")
+    for size in [int(n) for n in args.sizes.split(',')]:
+        frame = prepare_feed_frame(read_feed_frame(make_feed_csv(size), "csv"))
+        docs = build_feed_documents(frame, meta, FILENAME, REGISTRATION, MODEL_DICT, MODE_DICT)
+        full = payload_kib(docs[:2000])
+        projected = [{field: doc[field] for field in CHART_FIELDS if field in doc} for doc in docs]
+        soc = [row["Battery Soc(%)"] for row in projected]
+        for method in METHODS:
+            started = time.perf_counter()
+            sampled = downsample_rows(projected, args.points, method)
+            elapsed = (time.perf_counter() - started) * 1000
+            kept = [row["Battery Soc(%)"] for row in sampled]
+            extremes = min(kept) == min(soc) and max(kept) == max(soc)
+            print(f"{size:>9,}  {full:>14,.0f}  {method:<7}{len(sampled):>8,}{payload_kib(sampled):>9,.0f}"
+                  f"{elapsed:>8.0f}  {extremes}")
+
+
+if __name__ == "__main__":
+    main()
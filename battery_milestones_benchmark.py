@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Battery Milestones Benchmark
+Runs the previous per-record milestone loops of get_battery_milestones and the
+vectorized engine (backend/battery_milestones.py) on a synthetic fleet month,
+checks both produce the same milestones and reports the time taken.
+
+The legacy loops read the ``time`` / ``battery_soc_percentage`` / ``km`` keys,
+so they get a copy of the rows under those names; the engine reads the rows
+as the feed store returns them (feed_ts, "Battery Soc(%)", "Odometer (km)").
+
+Usage:
+    python battery_milestones_benchmark.py [--vehicles 50] [--days 30] [--interval 120]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from battery_milestones import compute_milestones  # noqa: E402
+
+
+def make_fleet(vehicles, days, interval):
+    """One row per vehicle per ``interval`` seconds: overnight charge, two driving shifts, a lunch top-up"""
+    rng = np.random.default_rng(11)
+    seconds = np.arange(0, 24 * 3600, interval)
+    rows, legacy_rows = [], []
+    for v in range(vehicles):
+        vehicle_id = f"P60G25125{v:08d}"
+        for d in range(days):
+            day = datetime(2025, 9, 1) + timedelta(days=d)
+            hours = seconds / 3600
+            drain = rng.uniform(4.5, 7.5)
+            soc = np.where(
+                hours < 6, np.minimum(100, 40 + hours * 12),
+                np.where(hours < 12, 100 - (hours - 6) * drain,
+                         np.where(hours < 13.5, 100 - 6 * drain + (hours - 12) * 18,
+                                  100 - 6 * drain + 27 - (hours - 13.5) * drain))
+            )
+            soc = np.clip(np.round(soc + rng.normal(0, 0.6, len(seconds))), 3, 100)
+            driving = ((hours >= 6) & (hours < 12)) | (hours >= 13.5)
+            odometer = 10000 + v * 500 + d * 150 + np.cumsum(np.where(driving, rng.uniform(0, 0.9, len(seconds)), 0))
+            missing = rng.random(len(seconds)) < 0.01
+            for s, value, km, gap in zip(seconds.tolist(), soc.tolist(), np.round(odometer, 2).tolist(), missing.tolist()):
+                value = None if gap else int(value)
+                ts = day + timedelta(seconds=s)
+                date = day.strftime("%Y-%m-%d")
+                rows.append({"vehicle_id": vehicle_id, "date": date, "feed_ts": ts,
+                             "Battery Soc(%)": value, "Odometer (km)": km})
+                legacy_rows.append({"vehicle_id": vehicle_id, "date": date, "time": ts.strftime("%H:%M:%S"),
+                                    "battery_soc_percentage": value, "km": km})
+    return rows, legacy_rows
+
+
+def legacy_milestones(records_by_vehicle, vehicle_ids):
+    """The previous get_battery_milestones loops, per vehicle (queries replaced by the pre-fetched rows)"""
+    results = []
+    for vehicle_id in vehicle_ids:
+        records = records_by_vehicle.get(vehicle_id, [])
+        date_groups = {}
+        for record in records:
+            date_groups.setdefault(record.get("date"), []).append(record)
+
+        for date_str, day_records in date_groups.items():
+            day_records.sort(key=lambda x: x.get("time", "00:00:00"))
+            if len(day_records) < 5:
+                continue
+            analysis = {
+                "date": date_str, "vehicle": vehicle_id, "charge_at_6am": None,
+                "time_at_80": None, "km_at_80": None, "time_at_50": None, "km_at_50": None,
+                "time_at_30": None, "time_at_20": None, "km_at_20": None,
+                "derived_mileage": None, "midday_charge": None
+            }
+            charge_at_6am = None
+            for record in day_records:
+                record_time = datetime.strptime(record.get("time", "00:00:00"), "%H:%M:%S").time()
+                if record_time <= dt_time(7, 0):
+                    battery_pct = record.get("battery_soc_percentage")
+                    if battery_pct is not None:
+                        charge_at_6am = battery_pct
+            if charge_at_6am is None:
+                continue
+            analysis["charge_at_6am"] = f"{charge_at_6am}%"
+
+            milestones = {80: False, 50: False, 30: False, 20: False}
+            prev_battery = None
+            has_any_milestone = False
+            for record in day_records:
+                battery_pct = record.get("battery_soc_percentage")
+                km = record.get("km")
+                record_time = record.get("time")
+                if battery_pct is None:
+                    continue
+                is_driving = prev_battery is not None and battery_pct < prev_battery
+                if is_driving or prev_battery is None:
+                    for milestone in [80, 50, 30, 20]:
+                        if not milestones[milestone] and battery_pct <= milestone:
+                            milestones[milestone] = True
+                            has_any_milestone = True
+                            analysis[f"time_at_{milestone}"] = record_time
+                            if km and milestone != 30:
+                                analysis[f"km_at_{milestone}"] = km
+                prev_battery = battery_pct
+            if not has_any_milestone:
+                continue
+
+            driving_segments = []
+            prev_record = None
+            for record in day_records:
+                battery_pct = record.get("battery_soc_percentage")
+                km = record.get("km")
+                if prev_record and battery_pct is not None and km is not None:
+                    prev_battery_pct = prev_record.get("battery_soc_percentage")
+                    prev_km = prev_record.get("km")
+                    if prev_battery_pct and prev_km and battery_pct < prev_battery_pct:
+                        charge_drop = prev_battery_pct - battery_pct
+                        km_traveled = km - prev_km
+                        if charge_drop > 0 and km_traveled > 0 and charge_drop < 50 and km_traveled < 100:
+                            driving_segments.append(km_traveled / charge_drop)
+                prev_record = record
+            if driving_segments:
+                analysis["derived_mileage"] = f"{sum(driving_segments) / len(driving_segments):.2f}"
+
+            total_midday_charge = 0
+            prev_battery_midday = None
+            for record in day_records:
+                battery_pct = record.get("battery_soc_percentage")
+                record_time = datetime.strptime(record.get("time", "00:00:00"), "%H:%M:%S").time()
+                if dt_time(7, 0) <= record_time <= dt_time(19, 0):
+                    if battery_pct is not None and prev_battery_midday is not None:
+                        if battery_pct > prev_battery_midday and battery_pct - prev_battery_midday < 50:
+                            total_midday_charge += battery_pct - prev_battery_midday
+                    prev_battery_midday = battery_pct
+            if total_midday_charge > 0:
+                analysis["midday_charge"] = f"{total_midday_charge:.1f}%"
+            results.append(analysis)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--interval', type=int, default=120, help="Seconds between samples")
+    args = parser.parse_args()
+
+    rows, legacy_rows = make_fleet(args.vehicles, args.days, args.interval)
+    vehicle_ids = [f"P60G25125{v:08d}" for v in range(args.vehicles)]
+    print(f"{args.vehicles} vehicles x {args.days} days, one sample every {args.interval}s = {len(rows):,} rows\n")
+
+    by_vehicle = {}
+    for record in legacy_rows:
+        by_vehicle.setdefault(record["vehicle_id"], []).append(record)
+    started = time.perf_counter()
+    old = legacy_milestones(by_vehicle, vehicle_ids)
+    old_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    new = compute_milestones(rows, vehicle_ids)
+    new_seconds = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(old, new) if a != b) + abs(len(old) - len(new))
+    print(f"per-record loops      {old_seconds:7.2f}s  {len(rows) / old_seconds:12,.0f} rows/s")
+    print(f"vectorized engine     {new_seconds:7.2f}s  {len(rows) / new_seconds:12,.0f} rows/s")
+    print(f"speedup               {old_seconds / new_seconds:7.1f}x")
+    print(f"vehicle-days          {len(new)}")
+    print(f"identical milestones  {mismatches == 0} ({mismatches} mismatches)")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
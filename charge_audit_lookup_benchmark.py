@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Charge Audit Lookup Benchmark
+Compares the searchsorted time lookups (backend/telemetry_lookup.py) with the
+per-target record scans the charge audits used before, and checks that both
+give the same results.
+
+1. Microbenchmarks: closest sample to each target time, and first sample in
+   each window, for growing numbers of samples and targets.
+2. Equivalence on random sample times with duplicates: ``nearest_index`` and
+   ``first_in_window`` against the scan loops, with and without tolerance.
+3. Equivalence on synthetic vehicle-days: the previous live battery audit
+   and morning charge audit loops of server.py, against summarize_day +
+   battery_audit_row / morning_audit_row. Rows have no missing SOC, because
+   the old battery audit read a missing SOC as 0%.
+
+Usage:
+    python charge_audit_lookup_benchmark.py [--days 200] [--repeats 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from telemetry_lookup import first_in_window, nearest_index  # noqa: E402
+from vehicle_day_summary import battery_audit_row, morning_audit_row, summarize_day  # noqa: E402
+
+
+# ==================== SCAN LOOPS (previous behaviour) ====================
+
+def scan_nearest(times, target, tolerance=np.inf):
+    """analytics_cache / morning audit: keep the closest record, strict < so the first wins ties"""
+    best, best_gap = -1, None
+    for i, t in enumerate(times):
+        gap = abs(t - target)
+        if gap <= tolerance and (best_gap is None or gap < best_gap):
+            best, best_gap = i, gap
+    return best
+
+
+def scan_first_in_window(times, start, end):
+    """battery audit: first record inside the window"""
+    for i, t in enumerate(times):
+        if start <= t <= end:
+            return i
+    return -1
+
+
+def legacy_battery_audit(day_records, vehicle_id, display_name, date):
+    """The previous live loop of get_battery_charge_audit for one vehicle-day"""
+    day_records.sort(key=lambda x: datetime.fromisoformat(
+        str(x.get("Date", "")).replace(' ', 'T')
+    ) if x.get("Date") else datetime.min)
+    charge_6am = charge_12pm = charge_5pm = None
+    odometer_6am = odometer_12pm = odometer_5pm = None
+    for record in day_records:
+        dt = datetime.fromisoformat(str(record.get("Date", "")).replace(' ', 'T'))
+        record_time = dt.time()
+        battery = float(record.get("Battery Soc(%)") or record.get("Battery SOC(%)") or 0)
+        odometer = float(record.get("Odometer (km)") or 0)
+        if dt_time(5, 0) <= record_time <= dt_time(7, 0) and charge_6am is None:
+            charge_6am, odometer_6am = battery, odometer
+        if dt_time(11, 0) <= record_time <= dt_time(13, 0) and charge_12pm is None:
+            charge_12pm, odometer_12pm = battery, odometer
+        if dt_time(16, 0) <= record_time <= dt_time(18, 0) and charge_5pm is None:
+            charge_5pm, odometer_5pm = battery, odometer
+    if charge_6am is None or charge_12pm is None or charge_5pm is None:
+        return None
+
+    km_6am_12pm = odometer_12pm - odometer_6am
+    km_6am_5pm = odometer_5pm - odometer_6am
+    drop_12pm, drop_5pm = charge_6am - charge_12pm, charge_6am - charge_5pm
+    return {
+        "date": date,
+        "vehicle_name": display_name,
+        "vehicle_id": vehicle_id,
+        "charge_6am": round(charge_6am, 1),
+        "charge_12pm": round(charge_12pm, 1),
+        "charge_5pm": round(charge_5pm, 1),
+        "km_6am_12pm": round(km_6am_12pm, 2),
+        "km_6am_5pm": round(km_6am_5pm, 2),
+        "mileage_6am_12pm": round((km_6am_12pm * 100 / drop_12pm) if drop_12pm > 0 else 0, 2),
+        "mileage_6am_5pm": round((km_6am_5pm * 100 / drop_5pm) if drop_5pm > 0 else 0, 2),
+        "is_critical": (charge_12pm < 60 and charge_5pm < 20)
+    }
+
+
+def legacy_morning_audit(day_records, display_name, date):
+    """The previous live loop of get_morning_charge_audit for one vehicle-day"""
+    day_records.sort(key=lambda x: x.get("Portal Received Time", x.get("time", "00:00:00")))
+    charge_at_6am, closest = None, None
+    for record in day_records:
+        battery_pct = record.get("Battery Soc(%)")
+        time_str = record.get("Portal Received Time")
+        if not (battery_pct and time_str):
+            continue
+        record_time = datetime.fromisoformat(time_str.replace(' ', 'T')).time()
+        if dt_time(5, 30) <= record_time <= dt_time(6, 30):
+            diff = abs((datetime.combine(datetime.today(), record_time)
+                        - datetime.combine(datetime.today(), dt_time(6, 0))).total_seconds())
+            if closest is None or diff < closest:
+                closest, charge_at_6am = diff, float(str(battery_pct))
+        elif record_time > dt_time(6, 30):
+            break
+    if charge_at_6am is not None and charge_at_6am < 95:
+        return {"date": date, "vehicle_name": display_name, "charge_at_6am": round(charge_at_6am, 1)}
+    return None
+
+
+# ==================== DATA ====================
+
+def random_times(rng, n):
+    """Sorted seconds of day with irregular gaps and some repeated timestamps"""
+    times = np.sort(rng.integers(0, 24 * 3600, n)).astype(np.float64)
+    repeat = rng.random(n) < 0.05
+    times[1:][repeat[1:]] = times[:-1][repeat[1:]]
+    return times
+
+
+def make_days(rng, days):
+    """Vehicle-days sampled every ~2 minutes with jitter, gaps in the early morning on some days"""
+    result = []
+    for d in range(days):
+        vehicle_id, date = f"P60G25125{d % 20:08d}", (datetime(2025, 9, 1) + timedelta(days=d // 20)).strftime("%Y-%m-%d")
+        seconds = np.cumsum(rng.integers(60, 180, 800))
+        seconds = seconds[seconds < 24 * 3600]
+        if d % 7 == 0:
+            # No morning readings at all
+            seconds = seconds[(seconds < 5 * 3600) | (seconds > 7 * 3600)]
+        soc = np.clip(np.round(100 - seconds / 3600 * rng.uniform(2, 6) + rng.normal(0, 1, len(seconds))), 1, 100)
+        odometer = np.round(10000 + np.cumsum(rng.uniform(0, 0.8, len(seconds))), 2)
+        rows = []
+        for s, value, km in zip(seconds.tolist(), soc.tolist(), odometer.tolist()):
+            ts = datetime.strptime(date, "%Y-%m-%d") + timedelta(seconds=s)
+            text = ts.strftime("%Y-%m-%d %H:%M:%S")
+            rows.append({"vehicle_id": vehicle_id, "date": date, "feed_ts": ts, "Date": text,
+                         "Portal Received Time": text, "Battery Soc(%)": int(value), "Odometer (km)": km})
+        result.append(rows)
+    return result
+
+
+# ==================== RUNS ====================
+
+def timed(func, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def microbenchmarks(rng, repeats):
+    print("Closest sample to each target (seconds, best of runs)")
+    print(f"{'samples':>9} {'targets':>8} {'scan':>10} {'searchsorted':>13} {'speedup':>8}")
+    for n in (720, 10_000, 100_000):
+        times = random_times(rng, n)
+        time_list = times.tolist()
+        for k in (3, 100, 1000):
+            if n * k > 20_000_000:
+                continue
+            targets = rng.uniform(0, 24 * 3600, k)
+            scan = timed(lambda: [scan_nearest(time_list, t) for t in targets], max(1, repeats // 2))
+            fast = timed(lambda: nearest_index(times, targets), repeats)
+            print(f"{n:>9,} {k:>8,} {scan:>10.4f} {fast:>13.6f} {scan / fast:>7.0f}x")
+
+    print("\nFirst sample in each window")
+    print(f"{'samples':>9} {'windows':>8} {'scan':>10} {'searchsorted':>13} {'speedup':>8}")
+    for n in (720, 10_000, 100_000):
+        times = random_times(rng, n)
+        time_list = times.tolist()
+        for k in (3, 100):
+            starts = rng.uniform(0, 23 * 3600, k)
+            ends = starts + 3600
+            scan = timed(lambda: [scan_first_in_window(time_list, a, b) for a, b in zip(starts, ends)], max(1, repeats // 2))
+            fast = timed(lambda: first_in_window(times, starts, ends), repeats)
+            print(f"{n:>9,} {k:>8,} {scan:>10.4f} {fast:>13.6f} {scan / fast:>7.0f}x")
+
+
+def lookup_equivalence(rng, cases=300):
+    mismatches = 0
+    for _ in range(cases):
+        times = random_times(rng, int(rng.integers(0, 400)))
+        time_list = times.tolist()
+        targets = np.concatenate([rng.uniform(-600, 24 * 3600 + 600, 20), rng.choice(times, 5) if len(times) else []])
+        for tolerance in (np.inf, 1800.0, 60.0, 0.0):
+            fast = nearest_index(times, targets, tolerance)
+            mismatches += sum(int(f != scan_nearest(time_list, t, tolerance)) for f, t in zip(fast, targets))
+        starts = rng.uniform(0, 24 * 3600, 10)
+        ends = starts + rng.uniform(0, 7200, 10)
+        fast = first_in_window(times, starts, ends)
+        mismatches += sum(int(f != scan_first_in_window(time_list, a, b)) for f, a, b in zip(fast, starts, ends))
+    return mismatches
+
+
+def audit_equivalence(days):
+    battery_mismatches = morning_mismatches = battery_rows = morning_rows = 0
+    legacy_seconds = summary_seconds = 0.0
+    for rows in days:
+        vehicle_id, date = rows[0]["vehicle_id"], rows[0]["date"]
+
+        started = time.perf_counter()
+        old_battery = legacy_battery_audit([dict(r) for r in rows], vehicle_id, vehicle_id, date)
+        old_morning = legacy_morning_audit([dict(r) for r in rows], vehicle_id, date)
+        legacy_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        summary = summarize_day(rows)
+        new_battery, new_morning = battery_audit_row(summary), morning_audit_row(summary)
+        summary_seconds += time.perf_counter() - started
+
+        battery_rows += old_battery is not None
+        morning_rows += old_morning is not None
+        battery_mismatches += old_battery != new_battery
+        morning_mismatches += old_morning != new_morning
+    return battery_mismatches, morning_mismatches, battery_rows, morning_rows, legacy_seconds, summary_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(5)
+
+    microbenchmarks(rng, args.repeats)
+
+    lookups = lookup_equivalence(rng)
+    print(f"\nLookup equivalence on random times: {lookups} mismatches")
+
+    battery, morning, battery_rows, morning_rows, legacy_seconds, summary_seconds = audit_equivalence(make_days(rng, args.days))
+    print(f"Battery audit on {args.days} vehicle-days: {battery_rows} entries, {battery} mismatches")
+    print(f"Morning audit on {args.days} vehicle-days: {morning_rows} entries, {morning} mismatches")
+    print(f"(previous loops {legacy_seconds:.2f}s, full day summaries incl. milestones {summary_seconds:.2f}s)")
+    return lookups == 0 and battery == 0 and morning == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Charging Sessions Benchmark
+Extracts charging sessions from a synthetic fleet month with a per-record
+loop over each vehicle's readings (the way the charge endpoints walked SOC
+series) and with the vectorized extractor (backend/charging_sessions.py),
+checks both find the same sessions and reports the time taken.
+
+Over a whole month both are bound by reading the row dicts, so the gain of
+the extractor is where it runs: once per import, on one vehicle-day and its
+neighbours, after which requests read stored sessions. The last line is
+that per-import cost.
+
+Each vehicle charges overnight (across midnight), tops up at lunch, and
+drives two shifts with sensor noise and small regeneration bumps. Rows look
+like imported documents: the file's "Battery Soc(%)" (text on some days) and
+"Odometer (km)" columns plus the typed soc_percent / odometer_km fields.
+
+Usage:
+    python charging_sessions_benchmark.py [--vehicles 50] [--days 30] [--interval 120]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from charging_sessions import (  # noqa: E402
+    MAX_SESSION_KM, MAX_STEP_GAP, MAX_STEP_KM, MIN_SESSION_SOC, SESSION_GAP, SOC_NOISE, extract_sessions
+)
+
+
+def make_fleet(vehicles, days, interval):
+    """One row per vehicle per ``interval`` seconds"""
+    rng = np.random.default_rng(5)
+    seconds = np.arange(0, 24 * 3600, interval)
+    hours = seconds / 3600
+    rows = []
+    for v in range(vehicles):
+        vehicle_id = f"P60G25125{v:08d}"
+        odometer = 10000.0 + v * 500
+        for d in range(days):
+            day = datetime(2025, 9, 1) + timedelta(days=d)
+            date = day.strftime("%Y-%m-%d")
+            drain = rng.uniform(4.5, 7.0)
+            soc = np.where(
+                hours < 5, np.minimum(100, 55 + hours * 12),                        # overnight charge, from 22:00
+                np.where(hours < 6, 100,                                              # parked, full
+                np.where(hours < 12, 100 - (hours - 6) * drain,                       # morning shift
+                np.where(hours < 13.5, 100 - 6 * drain + (hours - 12) * 14,           # lunch top-up
+                np.where(hours < 22, 100 - 6 * drain + 21 - (hours - 13.5) * drain,   # afternoon shift
+                         100 - 6 * drain + 21 - 8.5 * drain + (hours - 22) * 12))))   # overnight charge
+            )
+            driving = ((hours >= 6) & (hours < 12)) | ((hours >= 13.5) & (hours < 22))
+            noise = np.where(driving, rng.normal(0, 0.4, len(seconds)), 0) + (rng.random(len(seconds)) < 0.01) * driving
+            soc = np.clip(np.round(soc + noise), 3, 100)
+            km = odometer + np.cumsum(np.where(driving, rng.uniform(0, 0.9, len(seconds)), 0))
+            odometer = float(km[-1])
+            missing = rng.random(len(seconds)) < 0.01
+            as_text = d % 3 == 0
+            for s, value, reading, gap in zip(seconds.tolist(), soc.tolist(), np.round(km, 2).tolist(), missing.tolist()):
+                rows.append({"vehicle_id": vehicle_id, "date": date, "feed_ts": day + timedelta(seconds=s),
+                             "Battery Soc(%)": None if gap else (str(int(value)) if as_text else int(value)),
+                             "Odometer (km)": reading,
+                             "soc_percent": None if gap else value, "odometer_km": reading})
+    return rows
+
+
+def loop_sessions(rows):
+    """Per-record loop: walk each vehicle's readings in time order and track the open session"""
+    by_vehicle = {}
+    for row in rows:
+        value = row.get("Battery Soc(%)")
+        try:
+            soc = float(value)
+        except (TypeError, ValueError):
+            continue
+        if row.get("feed_ts") is None:
+            continue
+        by_vehicle.setdefault(row["vehicle_id"], []).append((row["feed_ts"], soc, row.get("Odometer (km)")))
+
+    sessions = []
+    for vehicle_id in sorted(by_vehicle):
+        readings = sorted(by_vehicle[vehicle_id], key=lambda r: r[0])
+
+        def close(start, end):
+            (t0, soc0, km0), (t1, soc1, km1) = readings[start], readings[end]
+            moved = km0 is not None and km1 is not None and km1 - km0 > MAX_SESSION_KM
+            if soc1 - soc0 >= MIN_SESSION_SOC and not moved:
+                sessions.append((vehicle_id, t0, t1, soc0, soc1))
+
+        start = end = None
+        broken = False
+        for i in range(1, len(readings)):
+            rise = readings[i][1] - readings[i - 1][1]
+            gap = (readings[i][0] - readings[i - 1][0]).total_seconds()
+            km0, km1 = readings[i - 1][2], readings[i][2]
+            moving = km0 is not None and km1 is not None and km1 - km0 > MAX_STEP_KM
+            if rise > 0 and gap <= MAX_STEP_GAP and not moving:
+                if start is not None and not broken and \
+                        (readings[i - 1][0] - readings[end][0]).total_seconds() <= SESSION_GAP:
+                    end = i
+                else:
+                    if start is not None:
+                        close(start, end)
+                    start, end, broken = i - 1, i, False
+            elif rise < -SOC_NOISE or moving:
+                broken = True
+        if start is not None:
+            close(start, end)
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--interval', type=int, default=120, help="Seconds between readings")
+    args = parser.parse_args()
+
+    rows = make_fleet(args.vehicles, args.days, args.interval)
+    print(f"{args.vehicles} vehicles x {args.days} days, one sample every {args.interval}s = {len(rows):,} rows\n")
+
+    started = time.perf_counter()
+    expected = loop_sessions(rows)
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sessions = extract_sessions(rows)
+    vector_seconds = time.perf_counter() - started
+
+    # Incremental refresh after one import: one vehicle, the imported day and the days either side
+    dates = sorted({row["date"] for row in rows})
+    windows = [
+        (vehicle_id, dates[max(0, d - 1):d + 2])
+        for vehicle_id in sorted({row["vehicle_id"] for row in rows})[:5] for d in range(0, len(dates), 7)
+    ]
+    by_key = {}
+    for row in rows:
+        by_key.setdefault((row["vehicle_id"], row["date"]), []).append(row)
+    started = time.perf_counter()
+    for vehicle_id, window in windows:
+        extract_sessions([row for day in window for row in by_key.get((vehicle_id, day), [])])
+    per_import_ms = (time.perf_counter() - started) * 1000 / len(windows)
+
+    found = [(s["vehicle_id"], s["start"], s["end"], float(s["soc_start"]), float(s["soc_end"])) for s in sessions]
+    mismatches = sum(1 for a, b in zip(expected, found) if a != b) + abs(len(expected) - len(found))
+    overnight = sum(1 for s in sessions if s["start"].date() != s["end"].date())
+
+    print(f"per-record loop      {loop_seconds:7.2f}s  {len(rows) / loop_seconds:12,.0f} rows/s")
+    print(f"vectorized extractor {vector_seconds:7.2f}s  {len(rows) / vector_seconds:12,.0f} rows/s")
+    print(f"speedup              {loop_seconds / vector_seconds:7.1f}x")
+    print(f"sessions             {len(sessions)} ({overnight} across midnight, "
+          f"{sum(s['energy_kwh'] for s in sessions):,.0f} kWh)")
+    print(f"identical sessions   {mismatches == 0} ({mismatches} mismatches)")
+    print(f"per import           {per_import_ms:7.1f}ms  (one vehicle, 3 days, {len(windows)} samples)")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
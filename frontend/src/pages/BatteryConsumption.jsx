@@ -13,6 +13,9 @@ import { toast } from "sonner";
 import { useNavigate } from "react-router-dom";
 import { format, eachDayOfInterval, parseISO } from "date-fns";
 
+// Max chart rows requested from the backend (downsampled server-side, shared by the series)
+const CHART_POINTS = 500;
+
 const BatteryConsumption = () => {
   const navigate = useNavigate();
   const [vehicles, setVehicles] = useState([]);
@@ -75,7 +78,8 @@ const BatteryConsumption = () => {
           {
             params: {
               vehicle_id: selectedVehicle,
-              date: isoDate  // Send ISO format to backend
+              date: isoDate,  // Send ISO format to backend
+              points: CHART_POINTS
             },
             headers: { Authorization: `Bearer ${token}` }
           }
@@ -93,10 +97,10 @@ const BatteryConsumption = () => {
             formattedDate: formattedDate,
             chartData: processedData,
             summary: summary,
-            count: response.data.count
+            count: response.data.raw_count ?? response.data.count
           });
           
-          totalDataPoints += response.data.count;
+          totalDataPoints += response.data.raw_count ?? response.data.count;
         }
       }
 
@@ -120,7 +124,8 @@ const BatteryConsumption = () => {
     
     // Extract all battery values from raw data with timestamps
     rawData.forEach((row) => {
-      const battery = parseFloat(row['Battery Soc(%)'] || row['Battery SOC(%)'] || 0);
+      // soc_percent is the typed SOC stored at import; older rows only have the header
+      const battery = row.soc_percent ?? parseFloat(row['Battery Soc(%)'] || row['Battery SOC(%)'] || 0);
       const dateTime = row['Date'] || row['Time'] || '';  // Support both 'Date' and 'Time' columns
       
       if (battery > 0 && dateTime) {
@@ -192,6 +197,7 @@ const BatteryConsumption = () => {
     
     // Check for different possible distance column names
     const possibleDistanceColumns = [
+      'odometer_km',
       'Odometer (km)',
       'Odometer(km)',
       'Odometer',
@@ -293,7 +299,7 @@ const BatteryConsumption = () => {
         
         // Get odometer reading
         const currentOdometer = parseFloat(lastReading[distanceColumn]);
-        const currentBattery = parseFloat(lastReading['Battery Soc(%)'] || lastReading['Battery SOC(%)'] || 0);
+        const currentBattery = lastReading.soc_percent ?? parseFloat(lastReading['Battery Soc(%)'] || lastReading['Battery SOC(%)'] || 0);
         
         let distanceTraveled = 0;
         let chargeDrop = 0;
@@ -2020,6 +2020,34 @@ const DriverOnboardingPage = () => {
     }
   };
   
+  // Load the next page of a No Response group
+  const loadMoreNoResponseLeads = async (groupIndex) => {
+    const group = noResponseData?.telecaller_groups?.[groupIndex];
+    if (!group || !group.next_cursor) return;
+    
+    try {
+      const token = localStorage.getItem("token");
+      const response = await axios.get(`${API}/driver-onboarding/no-response-leads`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { telecaller: group.telecaller_email, cursor: group.next_cursor }
+      });
+      
+      if (response.data.success) {
+        setNoResponseData((prev) => ({
+          ...prev,
+          telecaller_groups: prev.telecaller_groups.map((g, i) =>
+            i === groupIndex
+              ? { ...g, leads: [...g.leads, ...response.data.leads], next_cursor: response.data.next_cursor }
+              : g
+          )
+        }));
+      }
+    } catch (error) {
+      console.error("Error loading more no response leads:", error);
+      toast.error("Failed to load more leads");
+    }
+  };
+  
   // Parse Excel file and show column mapping
   const handleFileUpload = async (file) => {
     if (!file) return;
@@ -5190,6 +5218,14 @@ const DriverOnboardingPage = () => {
                         </tbody>
                       </table>
                     </div>
+                    
+                    {group.next_cursor && (
+                      <div className="flex justify-center mt-3">
+                        <Button size="sm" variant="outline" onClick={() => loadMoreNoResponseLeads(index)}>
+                          Load more ({group.count - group.leads.length} remaining)
+                        </Button>
+                      </div>
+                    )}
                   </div>
                 ))}
               </div>
@@ -10,6 +10,8 @@ import { useNavigate } from "react-router-dom";
 import { Label } from "@/components/ui/label";
 import { Input } from "@/components/ui/input";
 
+const FEED_DATABASE_PAGE_SIZE = 1000;
+
 const MontraVehicle = () => {
   const navigate = useNavigate();
   const { user } = useAuth();
@@ -239,13 +241,22 @@ const MontraVehicle = () => {
     setLoadingDatabase(true);
     try {
       const token = localStorage.getItem("token");
-      const response = await axios.get(`${API}/montra-vehicle/feed-database`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
+      // The feed file manifest is paginated; load every page
+      const files = [];
+      let skip = 0;
+      let response;
+      do {
+        response = await axios.get(`${API}/montra-vehicle/feed-database`, {
+          headers: { Authorization: `Bearer ${token}` },
+          params: { skip, limit: FEED_DATABASE_PAGE_SIZE }
+        });
+        if (!response.data.success) break;
+        files.push(...(response.data.files || []));
+        skip += response.data.count;
+      } while (response.data.has_more && response.data.count > 0);
       
       if (response.data.success) {
         // Group files by month_year for folder structure
-        const files = response.data.files || [];
         const groupedFiles = files.reduce((acc, file) => {
           const monthYear = file.month_year || `${file.month || 'Unknown'} ${file.year || '2025'}`;
           if (!acc[monthYear]) {
@@ -422,6 +433,7 @@ const MontraVehicle = () => {
     try {
       const token = localStorage.getItem("token");
       const fileIdentifiers = selectedFiles.map(file => ({
+        id: file.id,
         vehicle_id: file.vehicle_id,
         date: file.date,
         filename: file.filename
@@ -233,11 +233,14 @@ function syncAllToApp(showUI) {
           '✅ Sync Complete!\n\n' +
           'Created: ' + result.created + '\n' +
           'Updated: ' + result.updated + '\n' +
+          'Deleted: ' + result.deleted + '\n' +
+          'Unchanged: ' + result.unchanged + '\n' +
           'Total: ' + result.total_processed
         );
       }
       
-      Logger.log('Sync successful: Created ' + result.created + ', Updated ' + result.updated);
+      Logger.log('Sync successful: Created ' + result.created + ', Updated ' + result.updated +
+                 ', Unchanged ' + result.unchanged);
       
       // Update last sync time
       const props = PropertiesService.getDocumentProperties();
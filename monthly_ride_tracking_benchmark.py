@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Monthly Ride Tracking Benchmark
+Latency of the monthly ride tracking queries against fleet size:
+
+* per-vehicle: the previous endpoint, one montra_feed_data aggregation per
+  vehicle for the selected period plus one for the comparison period
+* single pipeline, raw: backend/monthly_ride_tracking.py over montra_feed_data
+* single pipeline, summary: the same over vehicle_day_summary
+
+Each fleet is loaded into a scratch database, with odometer samples for the
+selected 30 days and the 30 days before. The benchmark checks that all three
+give the same total km, per-vehicle totals and previous-period km, then
+reports median / p95 latency. The scratch database is dropped afterwards.
+
+--mongomock runs the same check in memory (needs mongomock_motor) when no
+MongoDB server is available. Only the equivalence column means anything
+then; the latencies are mongomock's, not MongoDB's.
+
+Usage:
+    python monthly_ride_tracking_benchmark.py --mongo-url mongodb://localhost:27017 [--fleets 10,50,200] [--samples 48]
+    python monthly_ride_tracking_benchmark.py --mongomock [--fleets 5,20] [--samples 12]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from monthly_ride_tracking import fetch_ride_tracking  # noqa: E402
+from vehicle_day_summary import SUMMARY_COLLECTION, ensure_day_summary_indexes  # noqa: E402
+
+START, END = "2025-09-01", "2025-09-30"
+PREV_START, PREV_END = "2025-08-02", "2025-08-31"
+
+
+async def load_fleet(db, vehicles, samples):
+    """Odometer samples per vehicle-day in montra_feed_data, and the matching day summaries"""
+    rng = np.random.default_rng(vehicles)
+    first = datetime(2025, 8, 2)
+    rows, summaries = [], []
+    for v in range(vehicles):
+        vehicle_id = f"P60G25125{v:08d}"
+        odometer = 10000.0 + v * 1000
+        for d in range(60):
+            date = (first + timedelta(days=d)).strftime("%Y-%m-%d")
+            readings = np.round(odometer + np.cumsum(rng.uniform(0, 4, samples)), 2)
+            odometer = float(readings[-1])
+            rows.extend({"vehicle_id": vehicle_id, "date": date, "Odometer (km)": km} for km in readings.tolist())
+            summaries.append({"vehicle_id": vehicle_id, "date": date, "rows": samples,
+                              "min_odometer": float(readings.min()), "max_odometer": float(readings.max())})
+    for start in range(0, len(rows), 50000):
+        await db.montra_feed_data.insert_many(rows[start:start + 50000], ordered=False)
+    await db[SUMMARY_COLLECTION].insert_many(summaries)
+    await db.montra_feed_data.create_index([("vehicle_id", 1), ("date", 1)], name="idx_vehicle_date")
+    await ensure_day_summary_indexes(db)
+    return len(rows)
+
+
+async def per_vehicle(db, vehicle_ids):
+    """The previous per-vehicle aggregations (current period), then the comparison period"""
+    totals = {}
+    for vehicle_id in vehicle_ids:
+        daily = await db.montra_feed_data.aggregate([
+            {"$match": {"vehicle_id": vehicle_id, "date": {"$gte": START, "$lte": END}}},
+            {"$group": {"_id": "$date", "min_odometer": {"$min": "$Odometer (km)"},
+                        "max_odometer": {"$max": "$Odometer (km)"}}},
+            {"$sort": {"_id": 1}},
+        ]).to_list(100)
+        totals[vehicle_id] = sum(max(0, (r["max_odometer"] or 0) - (r["min_odometer"] or 0)) for r in daily)
+    previous = await db.montra_feed_data.aggregate([
+        {"$match": {"vehicle_id": {"$in": vehicle_ids}, "date": {"$gte": PREV_START, "$lte": PREV_END}}},
+        {"$group": {"_id": {"vehicle_id": "$vehicle_id", "date": "$date"},
+                    "min_odometer": {"$min": "$Odometer (km)"}, "max_odometer": {"$max": "$Odometer (km)"}}},
+    ]).to_list(None)
+    previous_km = sum(max(0, (r["max_odometer"] or 0) - (r["min_odometer"] or 0)) for r in previous)
+    return totals, previous_km
+
+
+async def single_pipeline(db, vehicle_ids, source):
+    result = await fetch_ride_tracking(db, vehicle_ids, START, END, PREV_START, PREV_END, source)
+    totals = {v["_id"]: v["total_km"] for v in result["vehicles"]}
+    previous_km = result["previous"][0]["total_km"] if result["previous"] else 0
+    return totals, previous_km
+
+
+def same(a, b):
+    totals_a, previous_a = a
+    totals_b, previous_b = b
+    return (set(totals_a) == set(totals_b)
+            and all(abs(totals_a[k] - totals_b[k]) < 1e-6 for k in totals_a)
+            and abs(previous_a - previous_b) < 1e-6)
+
+
+async def measure(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return result, statistics.median(timings), timings[max(0, math.ceil(len(timings) * 0.95) - 1)]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--mongo-url')
+    target.add_argument('--mongomock', action='store_true', help="In-memory equivalence check, no MongoDB server")
+    parser.add_argument('--fleets', default="10,50,200", help="Comma-separated fleet sizes")
+    parser.add_argument('--samples', type=int, default=48, help="Odometer samples per vehicle-day")
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(args.mongo_url)
+    ok = True
+    print(f"{'vehicles':>8} {'rows':>10} {'query':<26} {'median ms':>10} {'p95 ms':>9} {'same':>5}")
+    for vehicles in [int(x) for x in args.fleets.split(",")]:
+        db = client[f"ride_tracking_benchmark_{uuid.uuid4().hex[:8]}"]
+        try:
+            rows = await load_fleet(db, vehicles, args.samples)
+            vehicle_ids = [f"P60G25125{v:08d}" for v in range(vehicles)]
+            baseline, median, p95 = await measure(lambda: per_vehicle(db, vehicle_ids), args.repeats)
+            print(f"{vehicles:>8} {rows:>10,} {'per-vehicle (previous)':<26} {median:>10.1f} {p95:>9.1f} {'-':>5}")
+            for source in ("raw", "summary"):
+                result, median, p95 = await measure(lambda: single_pipeline(db, vehicle_ids, source), args.repeats)
+                equal = same(baseline, result)
+                ok &= equal
+                print(f"{vehicles:>8} {rows:>10,} {'single pipeline, ' + source:<26} {median:>10.1f} {p95:>9.1f} {str(equal):>5}")
+        finally:
+            await client.drop_database(db.name)
+    client.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Montra Feed Batch Ingestion Benchmark
+Parses a ZIP of synthetic per-vehicle, per-day feed files through the batch
+ingestion worker pool (backend/montra_feed_import.py) with 1, 2, 4, ... worker
+processes and reports how wall time scales with the number of workers.
+
+Runs parse-only by default; pass --mongo-url to also insert into a scratch
+database (dropped afterwards).
+
+Usage:
+    python montra_feed_batch_benchmark.py [--files 24] [--rows 20000] [--mongo-url mongodb://localhost:27017]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from montra_feed_import import create_ingest_pool, expand_feed_uploads, ingest_feed_file  # noqa: E402
+from montra_feed_import_benchmark import MODE_DICT, MODEL_DICT, REGISTRATION, make_feed_csv  # noqa: E402
+
+
+def make_zip(files: int, rows: int) -> bytes:
+    content = make_feed_csv(rows)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            archive.writestr(f"feeds/P60G25125{i:08d} - {(i % 28) + 1:02d} Sep 2025.csv", content)
+        archive.writestr("feeds/README.txt", "not a feed")
+    return buffer.getvalue()
+
+
+def run(feed_files, workers, mongo_url, db_name):
+    pool = create_ingest_pool(workers, mongo_url, db_name)
+    # Start every worker before timing so process spawn is not measured
+    wait([pool.submit(time.sleep, 0.2) for _ in range(workers)])
+
+    started = time.perf_counter()
+    futures = [
+        pool.submit(ingest_feed_file, name, content, REGISTRATION, MODEL_DICT, MODE_DICT)
+        for name, content in feed_files
+    ]
+    results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+
+    assert all(r["success"] for r in results), [r for r in results if not r["success"]][:1]
+    return elapsed, sum(r["rows"] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=24)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', default=None, help="Comma-separated worker counts (default 1,2,4,8 up to the core count)")
+    parser.add_argument('--mongo-url', default=None)
+    args = parser.parse_args()
+
+    feed_files, skipped = expand_feed_uploads([("feeds.zip", make_zip(args.files, args.rows))])
+    cores = os.cpu_count() or 1
+    db_name = f"montra_batch_benchmark_{uuid.uuid4().hex[:8]}"
+    print(f"{len(feed_files)} files x {args.rows} rows from one ZIP (skipped {skipped}), "
+          f"{cores} cores, {'insert' if args.mongo_url else 'parse only'}\n")
+
+    if args.workers:
+        worker_counts = [int(n) for n in args.workers.split(',')]
+    else:
+        worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    baseline = None
+    for workers in worker_counts:
+        elapsed, rows = run(feed_files, workers, args.mongo_url, db_name)
+        baseline = baseline or elapsed
+        print(f"{workers:>2} worker(s)  {elapsed:7.2f}s  {rows / elapsed:12,.0f} rows/s  "
+              f"speedup {baseline / elapsed:4.1f}x")
+
+    if args.mongo_url:
+        from pymongo import MongoClient
+        MongoClient(args.mongo_url).drop_database(db_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Montra Feed Dedupe Test
+Runs the feed dedupe job on legacy rows (no feed_ts, time in "Date") while
+the partial natural-key index already exists, as it does after startup:
+legacy duplicates, a legacy row duplicated by a newer import, and unique
+rows. Checks the job removes the extra copies, backfills feed_ts and leaves
+the unique index rejecting re-imported rows.
+
+The partial index behaviour is MongoDB's own (mongomock ignores
+partialFilterExpression), so this needs a MongoDB at MONGO_URL (default
+mongodb://localhost:27017); a scratch database is created and dropped.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+from montra_feed_import import NATURAL_KEY_INDEX, dedupe_feed_data, ensure_feed_indexes  # noqa: E402
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+VEHICLE = "P60G2512500001"
+START = datetime(2025, 3, 1, 8, 0, 0)
+results = []
+
+
+def log_test(name, success, message=""):
+    success = bool(success)
+    results.append(success)
+    print(f"{'✅ PASS' if success else '❌ FAIL'} {name}{': ' + message if message else ''}")
+
+
+def legacy_row(seconds, soc=80):
+    return {"vehicle_id": VEHICLE, "date": "01 Mar", "Date": START + timedelta(seconds=seconds), "Battery Soc(%)": soc}
+
+
+async def load(db):
+    await ensure_feed_indexes(db)
+    rows = [legacy_row(s) for s in range(0, 600, 60)]           # 10 unique legacy rows
+    rows += [legacy_row(s, soc=81) for s in range(0, 300, 60)]  # the same file imported again (5 rows)
+    await db.montra_feed_data.insert_many(rows)
+    # A newer import of the same reading, with feed_ts
+    await db.montra_feed_data.insert_one({**legacy_row(540), "feed_ts": START + timedelta(seconds=540)})
+    log_test("Legacy duplicates are accepted while the partial index exists",
+             await db.montra_feed_data.count_documents({}) == 16)
+
+
+async def check_dry_run(db):
+    report = await dedupe_feed_data(db, dry_run=True)
+    log_test("Dry run counts the duplicates without changing anything",
+             report["duplicates_deleted"] == 6 and await db.montra_feed_data.count_documents({}) == 16,
+             f"{report['duplicate_keys']} keys, {report['duplicates_deleted']} rows")
+
+
+async def check_dedupe(db):
+    report = await dedupe_feed_data(db)
+    total = await db.montra_feed_data.count_documents({})
+    log_test("Dedupe completes with the index in place", report["success"], str(report))
+    log_test("One row is left per reading", total == 10 and report["duplicates_deleted"] == 6, f"{total} rows")
+    log_test("The first imported copy is kept",
+             await db.montra_feed_data.count_documents({"Battery Soc(%)": 81}) == 0)
+    log_test("Every row has feed_ts",
+             await db.montra_feed_data.count_documents({"feed_ts": {"$type": "date"}}) == 10)
+
+    indexes = await db.montra_feed_data.index_information()
+    log_test("Natural-key index exists", NATURAL_KEY_INDEX in indexes)
+    try:
+        await db.montra_feed_data.insert_one({**legacy_row(0), "feed_ts": START})
+        rejected = False
+    except DuplicateKeyError:
+        rejected = True
+    log_test("Re-importing a deduplicated reading is rejected", rejected)
+
+    again = await dedupe_feed_data(db)
+    log_test("A second run finds nothing", again["duplicates_deleted"] == 0 and again["feed_ts_backfilled"] == 0)
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=3000)
+    db = client[f"montra_feed_dedupe_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        await load(db)
+        await check_dry_run(db)
+        await check_dedupe(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Montra Feed Export Benchmark
+Compares the previous feed database download (all rows loaded, then one
+in-memory CSV) with the streaming export (backend/feed_export.py), plain and
+gzip, on synthetic feed data in a scratch database:
+
+* time to first byte and total time
+* peak Python memory while producing the export (tracemalloc)
+* output size, and that every variant produces the same CSV
+
+Needs a running MongoDB; the scratch database is dropped afterwards.
+
+Usage:
+    python montra_feed_export_benchmark.py --mongo-url mongodb://localhost:27017 [--vehicles 10] [--days 30] [--rows 720]
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from feed_export import export_fieldnames, stream_feed_csv, vehicle_day_keys  # noqa: E402
+
+
+async def load(db, vehicles, days, rows):
+    rng = np.random.default_rng(3)
+    files = []
+    for v in range(vehicles):
+        vehicle_id = f"P60G25125{v:08d}"
+        for d in range(days):
+            day = datetime(2025, 9, 1) + timedelta(days=d)
+            date = day.strftime("%Y-%m-%d")
+            seconds = np.sort(rng.integers(0, 24 * 3600, rows))
+            docs = [{
+                "vehicle_id": vehicle_id, "date": date, "feed_ts": day + timedelta(seconds=int(s)),
+                "Battery Soc(%)": int(rng.integers(5, 100)), "Odometer (km)": round(10000 + s / 100, 2),
+                "Speed (km/h)": float(rng.uniform(0, 60)), "mode_name": "Drive",
+                "filename": f"{vehicle_id} - {day.strftime('%d %b %Y')}.csv",
+            } for s in seconds.tolist()]
+            await db.montra_feed_data.insert_many(docs)
+            files.append({"vehicle_id": vehicle_id, "date": date})
+    await db.montra_feed_data.create_index([("vehicle_id", 1), ("date", 1)], name="idx_vehicle_date")
+    return files
+
+
+async def previous_export(db, files):
+    """The previous endpoint body: every row in a list, then one CSV string"""
+    all_records = []
+    for file_info in files:
+        records = await db.montra_feed_data.find({"vehicle_id": file_info["vehicle_id"], "date": file_info["date"]}).to_list(None)
+        all_records.extend(records)
+    output = StringIO()
+    fieldnames = set()
+    for record in all_records:
+        fieldnames.update(record.keys())
+    fieldnames.discard('_id')
+    writer = csv.DictWriter(output, fieldnames=sorted(fieldnames))
+    writer.writeheader()
+    for record in all_records:
+        record.pop('_id', None)
+        writer.writerow(record)
+    yield output.getvalue().encode("utf-8")
+
+
+async def streaming_export(db, files, compression=None):
+    vehicle_days = vehicle_day_keys(files)
+    fieldnames = await export_fieldnames(db, vehicle_days)
+    async for chunk in stream_feed_csv(db, vehicle_days, fieldnames, compression):
+        yield chunk
+
+
+async def run(generator):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte, parts = None, []
+    async for chunk in generator:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        parts.append(chunk)
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The chunks are kept only for the equality check; their size is excluded from the peak
+    data = b"".join(parts)
+    return data, first_byte or total, total, max(0, peak - len(data))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mongo-url', required=True)
+    parser.add_argument('--vehicles', type=int, default=10)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=720, help="Rows per vehicle-day")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[f"feed_export_benchmark_{uuid.uuid4().hex[:8]}"]
+    try:
+        files = await load(db, args.vehicles, args.days, args.rows)
+        print(f"{len(files)} vehicle-days, {len(files) * args.rows:,} rows\n")
+        print(f"{'export':<22}{'first byte ms':>14}{'total ms':>10}{'peak MB':>9}{'size MB':>9}{'same CSV':>9}")
+
+        reference = None
+        for name, generator in (
+            ("previous (in memory)", lambda: previous_export(db, files)),
+            ("streaming csv", lambda: streaming_export(db, files)),
+            ("streaming gzip", lambda: streaming_export(db, files, "gzip")),
+        ):
+            data, first_byte, total, peak = await run(generator())
+            csv_bytes = gzip.decompress(data) if name.endswith("gzip") else data
+            reference = reference or csv_bytes
+            print(f"{name:<22}{first_byte * 1000:>14.1f}{total * 1000:>10.1f}{peak / 1e6:>9.1f}"
+                  f"{len(data) / 1e6:>9.1f}{str(csv_bytes == reference):>9}")
+            if csv_bytes != reference:
+                return False
+        return True
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
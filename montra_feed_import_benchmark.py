@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Montra Feed Import Benchmark
+Compares the previous iterrows-based document builder of import_montra_feed
+with the vectorized builder in backend/montra_feed_import.py on a synthetic
+one-vehicle, one-day feed, checks both produce identical documents and
+reports throughput in rows per second.
+
+Usage:
+    python montra_feed_import_benchmark.py [--rows 50000]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from montra_feed_import import (  # noqa: E402
+    build_feed_documents, parse_feed_filename, prepare_feed_frame, read_feed_frame
+)
+from telemetry_fields import CANONICAL_NUMERIC_FIELDS  # noqa: E402
+
+FILENAME = "P60G2512500002032 - 01 Sep 2025.csv"
+REGISTRATION = "TN01AB1234"
+MODEL_DICT = {REGISTRATION: "Montra Super Auto"}
+MODE_DICT = {
+    f"Montra Super Auto {mode}": {"mode_name": name, "mode_type": kind}
+    for mode, name, kind in [(1, "Eco", "Economy"), (2, "City", "Normal"), (3, "Power", "Boost")]
+}
+
+
+def make_feed_csv(rows: int) -> bytes:
+    rng = np.random.default_rng(7)
+    start = pd.Timestamp("2025-09-01 00:00:00")
+    df = pd.DataFrame({
+        "Date": (start + pd.to_timedelta(rng.permutation(rows), unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "Battery Soc(%)": rng.integers(5, 100, rows),
+        "Odometer (km)": np.round(np.linspace(1000, 1120, rows), 2),
+        "Speed (km/h)": np.round(rng.uniform(0, 60, rows), 1),
+        "Ride Mode": rng.choice([1, 2, 3, 4, 0], rows),
+    })
+    for i in range(len(df.columns), 21):
+        df[f"Signal {i}"] = np.round(rng.normal(50, 10, rows), 3)
+    df.loc[rng.choice(rows, rows // 100, replace=False), "Ride Mode"] = np.nan
+    return df.to_csv(index=False).encode()
+
+
+def enrich_with_mode_data(vehicle_id, ride_mode, model_dict, mode_dict):
+    """Copy of the per-row lookup in server.py"""
+    model = model_dict.get(vehicle_id, "Unknown")
+    if model == "Unknown":
+        return "Unknown Model", "Unknown"
+    mode_details = mode_dict.get(f"{model} {ride_mode}")
+    if mode_details:
+        return mode_details['mode_name'], mode_details['mode_type']
+    return "Unknown Mode", "Unknown"
+
+
+def legacy_documents(df, meta, imported_at):
+    """The previous import_montra_feed loop (iterrows + per-row enrichment)"""
+    day, month, year = meta["day"], meta["month"], meta["year"]
+    rows_to_import = []
+    for _, row in df.iterrows():
+        row_data = row.tolist()
+        row_data.extend([meta["vehicle_id"], "-", day, month, REGISTRATION])
+        rows_to_import.append(row_data)
+    headers = df.columns.tolist() + ['Vehicle ID', 'Separator', 'Day', 'Month', 'Registration Number']
+    docs = []
+    for row_data in rows_to_import:
+        doc = {
+            "vehicle_id": meta["vehicle_id"], "date": meta["iso_date"], "date_display": f"{day} {month} {year}",
+            "day": day, "month": month, "year": year, "registration_number": REGISTRATION,
+            "filename": FILENAME, "imported_at": imported_at,
+        }
+        for i, header in enumerate(headers):
+            if i < len(row_data):
+                doc[header] = row_data[i]
+        ride_mode = doc.get("Ride Mode", "")
+        if ride_mode:
+            doc["mode_name"], doc["mode_type"] = enrich_with_mode_data(REGISTRATION, str(ride_mode), MODEL_DICT, MODE_DICT)
+        else:
+            doc["mode_name"] = doc["mode_type"] = "Unknown"
+        docs.append(doc)
+    return docs
+
+
+def same_value(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    content = make_feed_csv(args.rows)
+    meta = parse_feed_filename(FILENAME)
+    print(f"{args.rows} rows, {len(content) / 1024 / 1024:.1f} MiB CSV\n")
+
+    started = time.perf_counter()
+    df = prepare_feed_frame(read_feed_frame(content, "csv"))
+    parse_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    new_docs = build_feed_documents(df.copy(), meta, FILENAME, REGISTRATION, MODEL_DICT, MODE_DICT)
+    new_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    old_docs = legacy_documents(df.copy(), meta, new_docs[0]["imported_at"])
+    old_seconds = time.perf_counter() - started
+
+    # feed_ts (the natural key) and the canonical telemetry fields are new; everything else must match the old loop
+    added = {"feed_ts", "schema_version", *CANONICAL_NUMERIC_FIELDS}
+    new_docs_compared = [{k: v for k, v in doc.items() if k not in added} for doc in new_docs]
+    mismatches = sum(
+        1 for old, new in zip(old_docs, new_docs_compared)
+        if list(old) != list(new) or not all(same_value(old[k], new[k]) for k in old)
+    )
+
+    print(f"parse + sort (shared)      {parse_seconds:7.3f}s")
+    print(f"iterrows builder           {old_seconds:7.3f}s  {args.rows / old_seconds:12,.0f} rows/s")
+    print(f"vectorized builder         {new_seconds:7.3f}s  {args.rows / new_seconds:12,.0f} rows/s")
+    print(f"speedup                    {old_seconds / new_seconds:7.1f}x")
+    print(f"identical documents        {mismatches == 0 and len(old_docs) == len(new_docs)} "
+          f"({mismatches} mismatches)")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Montra Feed Storage Benchmark
+Loads the same synthetic feed data into a scratch database twice, once as
+per-sample montra_feed_data documents and once as hourly montra_feed_buckets
+(backend/montra_feed_store.py). It then compares:
+
+* storage: document count, data size, on-disk storage size and index size
+  (collStats)
+* latency: one vehicle-day read (battery consumption chart) and a
+  one-vehicle date-range read (battery milestones) through each store,
+  median / p95 over repeated runs
+* that both stores return identical rows
+
+Needs a running MongoDB; the scratch database is dropped afterwards.
+
+Usage:
+    python montra_feed_storage_benchmark.py --mongo-url mongodb://localhost:27017 [--vehicles 4] [--days 7] [--rows 20000]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from montra_feed_import import (  # noqa: E402
+    build_feed_documents, ensure_feed_indexes, insert_feed_documents, parse_feed_filename,
+    prepare_feed_frame, read_feed_frame
+)
+from montra_feed_import_benchmark import MODE_DICT, MODEL_DICT, REGISTRATION, make_feed_csv  # noqa: E402
+from montra_feed_store import (  # noqa: E402
+    BUCKETS_COLLECTION, BucketFeedStore, DocumentFeedStore, ensure_feed_bucket_indexes, write_feed_buckets
+)
+
+
+def same_rows(a, b):
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if list(x) != list(y):
+            return False
+        for key in x:
+            if x[key] != y[key] and not (
+                isinstance(x[key], float) and isinstance(y[key], float) and math.isnan(x[key]) and math.isnan(y[key])
+            ):
+                return False
+    return True
+
+
+async def load(db, vehicles, days, rows):
+    content = make_feed_csv(rows)
+    frame = prepare_feed_frame(read_feed_frame(content, "csv"))
+    for v in range(vehicles):
+        for d in range(days):
+            filename = f"P60G25125{v:08d} - {d + 1:02d} Sep 2025.csv"
+            meta = parse_feed_filename(filename)
+            docs = build_feed_documents(frame.copy(), meta, filename, REGISTRATION, MODEL_DICT, MODE_DICT)
+            await insert_feed_documents(db.montra_feed_data, docs)
+            await write_feed_buckets(db, docs)
+
+
+async def collection_stats(db, name):
+    stats = await db.command("collStats", name)
+    return stats["count"], stats["size"], stats["storageSize"], stats["totalIndexSize"]
+
+
+async def timed(coro_factory, repeats):
+    samples = []
+    rows = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, math.ceil(len(samples) * 0.95) - 1)], rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mongo-url', required=True)
+    parser.add_argument('--vehicles', type=int, default=4)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--rows', type=int, default=20000, help="Samples per vehicle-day")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[f"montra_storage_benchmark_{uuid.uuid4().hex[:8]}"]
+    try:
+        await db.montra_feed_data.create_index([("vehicle_id", 1), ("date", 1)], name="idx_vehicle_date")
+        await ensure_feed_indexes(db)
+        await ensure_feed_bucket_indexes(db)
+
+        started = time.perf_counter()
+        await load(db, args.vehicles, args.days, args.rows)
+        print(f"{args.vehicles} vehicles x {args.days} days x {args.rows} rows loaded into both layouts "
+              f"in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'layout':<12}{'docs':>10}{'data MiB':>12}{'storage MiB':>14}{'index MiB':>12}")
+        for label, name in (("documents", "montra_feed_data"), ("buckets", BUCKETS_COLLECTION)):
+            count, size, storage, index = await collection_stats(db, name)
+            mib = 1024 * 1024
+            print(f"{label:<12}{count:>10,}{size / mib:>12.1f}{storage / mib:>14.1f}{index / mib:>12.1f}")
+
+        stores = [DocumentFeedStore(db), BucketFeedStore(db)]
+        vehicle_ids = [f"P60G25125{v:08d}" for v in range(args.vehicles)]
+        dates = [parse_feed_filename(f"X - {d + 1:02d} Sep 2025.csv")["iso_date"] for d in range(args.days)]
+        random.seed(7)
+        day_picks = [(random.choice(vehicle_ids), random.choice(dates)) for _ in range(args.repeats)]
+
+        print(f"\n{'query':<34}{'layout':<12}{'median ms':>11}{'p95 ms':>10}{'rows':>9}")
+        results = {}
+        for store in stores:
+            picks = iter(day_picks * 2)
+            median, p95, rows = await timed(lambda: store.day_rows(*next(picks), limit=2000), args.repeats)
+            results[("day", store.name)] = rows
+            print(f"{'vehicle-day (limit 2000)':<34}{store.name:<12}{median:>11.1f}{p95:>10.1f}{len(rows):>9,}")
+        for store in stores:
+            median, p95, rows = await timed(
+                lambda: store.range_rows(vehicle_ids[0], dates[0], dates[-1]), max(3, args.repeats // 4)
+            )
+            results[("range", store.name)] = rows
+            print(f"{f'vehicle range ({args.days} days)':<34}{store.name:<12}{median:>11.1f}{p95:>10.1f}{len(rows):>9,}")
+
+        identical = all(
+            same_rows(results[(query, "documents")], results[(query, "buckets")]) for query in ("day", "range")
+        )
+        print(f"\nidentical rows from both layouts: {identical}")
+        return identical
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Full Resync Benchmark
+Compares the old sequential `requests.post` batch loop with the pooled async
+client (backend/sheets_client.py) against a local stand-in Web App that
+simulates Apps Script latency (fixed round trip + per-lead write cost).
+
+Usage:
+    python sheets_client_benchmark.py [--leads 30000] [--rtt-ms 400] [--per-lead-ms 0.05]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sheets_client import AdaptiveBatchSizer, SheetsClient  # noqa: E402
+
+
+class LatencyWebApp(BaseHTTPRequestHandler):
+    """Upserts leads into memory after sleeping rtt + per-lead cost"""
+    protocol_version = "HTTP/1.1"
+    rtt_seconds = 0.4
+    per_lead_seconds = 0.00005
+    rows = {}
+    connections = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        leads = json.loads(body).get('leads', [])
+        time.sleep(self.rtt_seconds + self.per_lead_seconds * len(leads))
+
+        with self.lock:
+            LatencyWebApp.connections.add(self.client_address)
+            created = sum(1 for lead in leads if lead['id'] not in self.rows)
+            for lead in leads:
+                self.rows[lead['id']] = lead
+
+        response = json.dumps({"success": True, "created": created, "updated": len(leads) - created}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_leads(count):
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Driver {i}",
+        "phone_number": f"9{i:09d}",
+        "status": "New",
+        "stage": "S1 - Filtering",
+        "source": "Benchmark",
+        "import_date": "2026-01-01",
+        "notes": "Interested in EV leasing, call back after 6 PM",
+    } for i in range(count)]
+
+
+def sequential_sync(url, leads, batch_size=500):
+    """The previous sync_leads_to_sheets loop"""
+    for i in range(0, len(leads), batch_size):
+        response = requests.post(url, json={"action": "sync_from_app", "leads": leads[i:i + batch_size]}, timeout=60)
+        assert response.status_code == 200 and response.json().get('success')
+    return -(-len(leads) // batch_size)
+
+
+async def pooled_sync(url, leads, concurrency, gzip_enabled):
+    client = SheetsClient(url, concurrency=concurrency, gzip_enabled=gzip_enabled)
+    try:
+        return await client.upload_batches(
+            leads,
+            lambda batch: {"action": "sync_from_app", "leads": batch},
+            sizer=AdaptiveBatchSizer(initial=500, target_seconds=2.0)
+        )
+    finally:
+        await client.close()
+
+
+def run(label, func):
+    LatencyWebApp.rows.clear()
+    LatencyWebApp.connections.clear()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:8.2f}s  rows={len(LatencyWebApp.rows):<6} "
+          f"connections={len(LatencyWebApp.connections):<3} {result}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--leads', type=int, default=30000)
+    parser.add_argument('--rtt-ms', type=float, default=400)
+    parser.add_argument('--per-lead-ms', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    LatencyWebApp.rtt_seconds = args.rtt_ms / 1000
+    LatencyWebApp.per_lead_seconds = args.per_lead_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LatencyWebApp)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/exec"
+
+    leads = make_leads(args.leads)
+    raw = len(json.dumps(leads[:500]).encode())
+    print(f"{args.leads} leads, rtt={args.rtt_ms}ms, per-lead={args.per_lead_ms}ms, "
+          f"500-lead body {raw / 1024:.0f} KiB raw / {len(gzip.compress(json.dumps(leads[:500]).encode(), 5)) / 1024:.0f} KiB gzip\n")
+
+    baseline = run("sequential requests.post (500/batch)", lambda: f"batches={sequential_sync(url, leads)}")
+
+    def summary(result):
+        sizes = result["batch_sizes"]
+        return f"batches={result['batches']} sizes={min(sizes)}..{max(sizes)} ok={result['success']}"
+
+    for gzip_enabled in (False, True):
+        label = f"pooled async x{args.concurrency}{' + gzip' if gzip_enabled else ''}"
+        elapsed = run(label, lambda: summary(asyncio.run(pooled_sync(url, leads, args.concurrency, gzip_enabled))))
+        print(f"{'':<34} speedup {baseline / elapsed:.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Delta Sync Test
+Runs the leads delta sync with a recording stand-in for the Sheets client and
+checks that leads written through the app's endpoints after a watermark exists
+are picked up: a manually created lead, a call status update and a stage sync.
+Also checks a multi-tab Web App tab (payment_reconciliation): a full resync
+replaces the tab in one request and a delta sync upserts only the new record.
+
+Needs a MongoDB at MONGO_URL (default mongodb://localhost:27017); a scratch
+database is created and dropped.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ['DB_NAME'] = f"sheets_delta_sync_test_{uuid.uuid4().hex[:8]}"
+os.environ['GOOGLE_SHEETS_ENABLED'] = 'false'
+# server.py creates its working folders relative to the current directory
+os.chdir(BACKEND_DIR)
+
+import server  # noqa: E402
+import sheets_delta_sync  # noqa: E402
+
+results = []
+ADMIN = SimpleNamespace(id="admin-1", email="admin@nura.test", account_type="admin", first_name="Admin", last_name="")
+
+
+def log_test(name, success, message=""):
+    success = bool(success)
+    results.append(success)
+    print(f"{'✅ PASS' if success else '❌ FAIL'} {name}{': ' + message if message else ''}")
+
+
+class RecordingClient:
+    """Stands in for SheetsClient; records the ids of every uploaded lead and every posted payload"""
+    concurrency = 4
+
+    def __init__(self):
+        self.sent = []
+        self.posted = []
+
+    async def upload_batches(self, records, make_payload):
+        payload = make_payload(records)
+        self.sent.extend(lead.get("id") for lead in payload["leads"])
+        return {"success": True, "updated": len(records), "created": 0, "batches": 1, "failed_batches": []}
+
+    async def post(self, payload):
+        self.posted.append(payload)
+        return {"success": True}
+
+
+async def delta_sync(db):
+    client = RecordingClient()
+    result = await sheets_delta_sync.sync_tab(db, 'leads', client)
+    return result, set(client.sent)
+
+
+async def check_created_lead(db):
+    result = await server.create_single_lead(
+        name="Ravi", phone_number="9876500001", email=None, source="Manual Entry", status="New",
+        current_location=None, experience=None, monthly_salary=None, has_driving_license="no",
+        driving_license_no=None, has_badge="no", badge_no=None, duplicate_action="skip", current_user=ADMIN
+    )
+    result, sent = await delta_sync(db)
+    lead = await db.driver_leads.find_one({"phone_number": "9876500001"}, {"_id": 0, "id": 1})
+    log_test("Lead created after the watermark is sent by the delta sync",
+             result["mode"] == "delta" and lead and lead["id"] in sent, f"sent {len(sent)} lead(s)")
+    log_test("Untouched lead is not resent", "seed-old" not in sent)
+
+
+async def check_call_status(db):
+    await server.update_call_status(lead_id="seed-old", call_outcome="Not Interested", notes=None, current_user=ADMIN)
+    result, sent = await delta_sync(db)
+    log_test("Call status update is sent by the delta sync", result["mode"] == "delta" and "seed-old" in sent)
+
+
+async def check_stage_sync(db):
+    result = await server.sync_driver_stage(lead_id="seed-stage", current_user=ADMIN)
+    result_sync, sent = await delta_sync(db)
+    log_test("Stage sync is sent by the delta sync",
+             result["success"] and result_sync["mode"] == "delta" and "seed-stage" in sent)
+
+
+async def check_payment_tab(db):
+    await db.payment_reconciliation.insert_one(
+        {"id": "pay-old", "transaction_id": "T1", "amount": 100.0,
+         "last_modified": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()}
+    )
+    client = RecordingClient()
+    result = await sheets_delta_sync.sync_tab(db, 'payment_reconciliation', client)
+    log_test("First payment sync replaces the tab with one sync_all",
+             result["mode"] == "full" and [p["action"] for p in client.posted] == ["sync_all"])
+
+    await server.create_payment(
+        payment_data=server.PaymentRecordCreate(transaction_id="T2", amount=250.0, payment_method="UPI"),
+        current_user=ADMIN
+    )
+    client = RecordingClient()
+    result = await sheets_delta_sync.sync_tab(db, 'payment_reconciliation', client)
+    sent = [(p["action"], p["record"]["transaction_id"]) for p in client.posted]
+    log_test("New payment is upserted alone by the delta sync",
+             result["mode"] == "delta" and result["success"] and sent == [("sync_single", "T2")], str(sent))
+
+
+async def main():
+    db = server.db
+    try:
+        old = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+        await db.driver_leads.insert_many([
+            {"id": "seed-old", "name": "Old lead", "phone_number": "9876500002", "status": "New", "stage": "S1",
+             "last_modified": old},
+            {"id": "seed-stage", "name": "Stage lead", "phone_number": "9876500003", "status": "Highly Interested",
+             "stage": "S1", "last_modified": old},
+        ])
+        result, sent = await delta_sync(db)
+        log_test("First sync runs as a full resync and sets the watermark",
+                 result["mode"] == "full" and result["success"] and sent == {"seed-old", "seed-stage"})
+
+        await check_created_lead(db)
+        await check_call_status(db)
+        await check_stage_sync(db)
+        await check_payment_tab(db)
+    finally:
+        await server.client.drop_database(db.name)
+        server.client.close()
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Sync Outbox Test
+Runs the outbox against a local stand-in for the Apps Script Web App:
+coalescing, batched sends, retry/backoff on failures and status reporting.
+
+Needs a MongoDB at MONGO_URL (default mongodb://localhost:27017); a scratch
+database is created and dropped.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+
+class StandInWebApp(BaseHTTPRequestHandler):
+    """Records payloads; fails the next ``fail_next`` requests with HTTP 500"""
+    payloads = []
+    fail_next = 0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if StandInWebApp.fail_next > 0:
+            StandInWebApp.fail_next -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        StandInWebApp.payloads.append(payload)
+        body = json.dumps({"success": True, "message": f"ok: {payload.get('action')}"}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), StandInWebApp)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+os.environ['GOOGLE_SHEETS_ENABLED'] = 'true'
+os.environ['GOOGLE_SHEETS_WEB_APP_URL'] = f"http://127.0.0.1:{server.server_port}/exec"
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+import sheets_outbox  # noqa: E402
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+results = []
+
+
+def log_test(name, success, message=""):
+    success = bool(success)
+    results.append(success)
+    print(f"{'✅ PASS' if success else '❌ FAIL'} {name}{': ' + message if message else ''}")
+
+
+async def reset(db):
+    StandInWebApp.payloads.clear()
+    StandInWebApp.fail_next = 0
+    await db[sheets_outbox.OUTBOX_COLLECTION].delete_many({})
+
+
+async def check_coalescing(db):
+    await reset(db)
+    lead = {"id": "lead-1", "name": "Ravi", "status": "New", "_id": "mongo-id"}
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', [lead])
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', [{**lead, "status": "Interested"}])
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', [{**lead, "status": "Onboarded"}])
+
+    entries = await db[sheets_outbox.OUTBOX_COLLECTION].find({}).to_list(None)
+    log_test("Repeated updates coalesce into one entry", len(entries) == 1, f"{len(entries)} entries")
+    log_test("Entry holds the latest snapshot without _id",
+             entries[0]["record"]["status"] == "Onboarded" and "_id" not in entries[0]["record"])
+
+    stats = await sheets_outbox.flush_once(db)
+    sent_leads = [lead for p in StandInWebApp.payloads for lead in p.get("leads", [])]
+    log_test("Flush sends one lead once", stats["sent"] == 1 and len(sent_leads) == 1, str(stats))
+    log_test("Outbox is empty after ack", await db[sheets_outbox.OUTBOX_COLLECTION].count_documents({}) == 0)
+
+
+async def check_batching(db):
+    await reset(db)
+    leads = [{"id": f"lead-{i}", "created_at": datetime.now(timezone.utc)} for i in range(450)]
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', leads)
+    await sheets_outbox.enqueue_sheets_sync(db, 'payment_reconciliation', [{"id": "pay-1"}, {"id": "pay-2"}])
+    await sheets_outbox.enqueue_sheets_delete(db, 'leads', ["lead-gone"])
+
+    await sheets_outbox.flush_once(db, limit=1000)
+    actions = [p["action"] for p in StandInWebApp.payloads]
+    batches = [p for p in StandInWebApp.payloads if p["action"] == "sync_from_app"]
+    log_test("Leads are sent as batch upserts (never sync_all)",
+             "sync_all" not in actions and len(batches) == -(-450 // sheets_outbox.BATCH_SIZE),
+             f"{len(batches)} batches")
+    log_test("Other tabs are sent per record", actions.count("sync_single") == 2)
+    log_test("Deletes are sent", actions.count("delete_record") == 1)
+
+
+async def check_retry_backoff(db):
+    await reset(db)
+    await sheets_outbox.enqueue_sheets_sync(db, 'driver_onboarding', [{"id": "drv-1"}])
+    StandInWebApp.fail_next = 1
+
+    stats = await sheets_outbox.flush_once(db)
+    entry = await db[sheets_outbox.OUTBOX_COLLECTION].find_one({"_id": "driver_onboarding|drv-1"})
+    log_test("Failed send keeps the entry", stats["failed"] == 1 and entry is not None)
+    next_attempt = entry["next_attempt_at"].replace(tzinfo=timezone.utc)
+    log_test("Failed entry is backed off",
+             entry["attempts"] == 1 and next_attempt > datetime.now(timezone.utc) and entry["last_error"])
+
+    stats = await sheets_outbox.flush_once(db)
+    log_test("Backed-off entry is not retried early", stats["due"] == 0)
+
+    await db[sheets_outbox.OUTBOX_COLLECTION].update_one(
+        {"_id": "driver_onboarding|drv-1"},
+        {"$set": {"next_attempt_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+    stats = await sheets_outbox.flush_once(db)
+    log_test("Entry is delivered on retry", stats["sent"] == 1 and StandInWebApp.payloads)
+
+    delays = [sheets_outbox.backoff_seconds(n) for n in range(1, 20)]
+    log_test("Backoff grows and is capped",
+             delays[0] < delays[3] and max(delays) <= sheets_outbox.MAX_BACKOFF_SECONDS * 1.2)
+
+
+async def check_update_during_flight(db):
+    await reset(db)
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', [{"id": "lead-x", "status": "New"}])
+
+    def slow_sender(payload):
+        # A newer update lands while the first version is being sent
+        asyncio.run_coroutine_threadsafe(
+            sheets_outbox.enqueue_sheets_sync(db, 'leads', [{"id": "lead-x", "status": "Interested"}]), loop
+        ).result()
+        return {"success": True}
+
+    loop = asyncio.get_running_loop()
+    await sheets_outbox.flush_once(db, sender=slow_sender)
+    entry = await db[sheets_outbox.OUTBOX_COLLECTION].find_one({"_id": "leads|lead-x"})
+    log_test("Update made during a send is not lost",
+             entry is not None and entry["record"]["status"] == "Interested")
+
+
+async def check_status(db):
+    await reset(db)
+    await sheets_outbox.enqueue_sheets_sync(db, 'leads', [{"id": "a"}, {"id": "b"}])
+    status = await sheets_outbox.get_outbox_status(db)
+    log_test("Status reports depth and lag",
+             status["queue_depth"] == 2 and status["by_tab"] == {"leads": 2} and status["lag_seconds"] >= 0,
+             json.dumps(status, default=str))
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=3000)
+    db = client[f"sheets_outbox_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        await check_coalescing(db)
+        await check_batching(db)
+        await check_retry_backoff(db)
+        await check_update_during_flight(db)
+        await check_status(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+        server.shutdown()
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)